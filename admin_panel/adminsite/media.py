@@ -70,7 +70,7 @@ def _validate_upload(upload: UploadFile) -> str | None:
     return None
 
 
-async def save_upload(upload: UploadFile) -> dict[str, str]:
+def save_upload(upload: UploadFile) -> dict[str, str]:
     from uuid import uuid4
 
     _ensure_dir()
@@ -78,7 +78,7 @@ async def save_upload(upload: UploadFile) -> dict[str, str]:
     if validation_error:
         raise HTTPException(status_code=422, detail=validation_error)
 
-    data = await upload.read()
+    data = upload.file.read()
     if not data:
         raise HTTPException(status_code=422, detail="Файл пустой")
 
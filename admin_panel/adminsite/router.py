@@ -9,11 +9,13 @@ from uuid import uuid4
 from decimal import Decimal
 
 from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, UploadFile
-from fastapi.responses import JSONResponse
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from admin_panel.dependencies import get_current_admin, get_db_session
+from admin_panel.executor import AdminRoute
 from schemas.adminsite_page import PageConfig
 from . import media as media_service, service
 from services import adminsite_pages
@@ -21,6 +23,7 @@ from database import DATABASE_URL
 from models import AdminSiteItem, AdminSitePage
 from sqlalchemy.engine.url import make_url
 from services.theme_service import ThemeApplyError, apply_theme
+from utils.http_cache import PRIVATE_CACHE_CONTROL, conditional_json_response, dump_json
 from .schemas import (
     CategoryPayload,
     CategoryResponse,
@@ -42,7 +45,7 @@ CATEGORY_TYPE_MAP = {
     "courses": "course",
 }
 
-router = APIRouter(prefix="/api/adminsite", tags=["AdminSite"])
+router = APIRouter(prefix="/api/adminsite", tags=["AdminSite"], route_class=AdminRoute)
 logger = logging.getLogger(__name__)
 
 
@@ -212,11 +215,16 @@ def debug_diag(request: Request, db: Session = Depends(get_db_session)) -> dict[
     }
 
 
-def _get_page_response(page_key: str, request: Request, db: Session) -> JSONResponse | dict:
+def _get_page_response(page_key: str, request: Request, db: Session) -> Response:
     service.ensure_admin(request, db)
     slug = _safe_slug(page_key)
     try:
-        return _attach_page_metadata(adminsite_pages.get_page(slug, raise_on_error=True))
+        payload = _attach_page_metadata(adminsite_pages.get_page(slug, raise_on_error=True))
+        return conditional_json_response(
+            request,
+            dump_json(jsonable_encoder(payload)),
+            cache_control=PRIVATE_CACHE_CONTROL,
+        )
     except HTTPException as exc:
         if exc.status_code >= 500:
             logger.exception("AdminSite page load failed for %s", slug)
@@ -299,13 +307,13 @@ def list_media(request: Request, q: str | None = Query(None), db: Session = Depe
 
 
 @router.post("/media/upload", response_model=dict)
-async def upload_media(
+def upload_media(
     request: Request,
     file: UploadFile = File(...),
     db: Session = Depends(get_db_session),
 ):
     service.ensure_admin(request, db)
-    return await media_service.save_upload(file)
+    return media_service.save_upload(file)
 
 
 @router.delete("/media/{filename}", response_model=dict)
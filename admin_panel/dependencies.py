@@ -4,38 +4,46 @@ from typing import Iterable, Optional
 
 from fastapi import Request
 from sqlalchemy.orm import Session
+from starlette.datastructures import FormData
 
 from models.admin_user import AdminRole, AdminUser
 from services import auth as auth_service
+from services.auth import AdminPrincipal
 
 
 SESSION_COOKIE_NAME = "admin_session"
 
 
 def get_db_session() -> Session:
-    from database import SessionLocal  # импорт внутри, чтобы избежать циклов
+    from database import get_sessionmaker  # импорт внутри, чтобы избежать циклов
 
-    db = SessionLocal()
+    # Админки работают через собственный пул соединений (роль admin).
+    db = get_sessionmaker("admin")()
     try:
         yield db
     finally:
         db.close()
 
 
-def get_current_admin(request: Request, db: Session) -> Optional[AdminUser]:
+async def get_request_form(request: Request) -> FormData:
+    """Тело формы читается в event loop, чтобы sync-маршрут получил его готовым."""
+
+    return await request.form()
+
+
+def get_current_admin(request: Request, db: Session) -> Optional[AdminPrincipal]:
     token = request.cookies.get(SESSION_COOKIE_NAME)
     if not token:
         return None
 
-    session = auth_service.get_session(db, token)
-    return session.user if session else None
+    return auth_service.get_principal(db, token)
 
 
 def require_admin(
     request: Request,
     db: Session,
     roles: Iterable[AdminRole] | None = None,
-) -> Optional[AdminUser]:
+) -> Optional[AdminPrincipal]:
     user = get_current_admin(request=request, db=db)
     if not user:
         return None
@@ -48,3 +56,16 @@ def require_admin(
         return user
 
     return None
+
+
+def require_admin_user(
+    request: Request,
+    db: Session,
+    roles: Iterable[AdminRole] | None = None,
+) -> Optional[AdminUser]:
+    """Как require_admin, но со строкой AdminUser — для страниц, меняющих свой профиль."""
+
+    principal = require_admin(request, db, roles=roles)
+    if not principal:
+        return None
+    return db.get(AdminUser, principal.id)
@@ -0,0 +1,67 @@
+"""Выполнение маршрутов админок в собственном пуле потоков.
+
+Маршруты админок синхронные (работают с sync Session). FastAPI запускает такие
+функции в общем пуле потоков anyio, который делят и публичные sync-маршруты
+(каталог, заказы). AdminRoute переносит синхронные обработчики админок в
+отдельный ThreadPoolExecutor на ADMIN_EXECUTOR_WORKERS потоков: применение
+большого шаблона или тяжёлый отчёт не блокируют event loop и занимают не больше
+этих потоков и пула соединений роли admin.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import inspect
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from fastapi.routing import APIRoute
+
+ADMIN_EXECUTOR_WORKERS = int(os.getenv("ADMIN_EXECUTOR_WORKERS", "4"))
+
+_executor: ThreadPoolExecutor | None = None
+
+
+def get_admin_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=ADMIN_EXECUTOR_WORKERS, thread_name_prefix="admin")
+    return _executor
+
+
+def shutdown_admin_executor() -> None:
+    global _executor
+    executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def run_in_admin_executor(func: Callable[..., Any]) -> Callable[..., Any]:
+    """Обернуть синхронный обработчик в корутину, выполняющую его в пуле админки."""
+
+    @functools.wraps(func)
+    async def _endpoint(*args: Any, **kwargs: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_admin_executor(), functools.partial(func, *args, **kwargs))
+
+    return _endpoint
+
+
+class AdminRoute(APIRoute):
+    """route_class для роутеров админок: sync-обработчики уходят в пул админки."""
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any) -> None:
+        if not inspect.iscoroutinefunction(endpoint):
+            endpoint = run_in_admin_executor(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+
+__all__ = [
+    "ADMIN_EXECUTOR_WORKERS",
+    "AdminRoute",
+    "get_admin_executor",
+    "run_in_admin_executor",
+    "shutdown_admin_executor",
+]
@@ -3,9 +3,11 @@
 from fastapi import APIRouter, Depends, Form, Request
 from fastapi.responses import RedirectResponse
 from sqlalchemy.orm import Session
+from starlette.datastructures import FormData
 
 from admin_panel import TEMPLATES
-from admin_panel.dependencies import get_db_session, require_admin
+from admin_panel.dependencies import get_db_session, get_request_form, require_admin
+from admin_panel.executor import AdminRoute
 from admin_panel.routes import auth as auth_routes
 from models import (
     BotAutomationRule,
@@ -25,6 +27,7 @@ from services import automations as automations_service
 from . import (
     adminbot_buttons,
     adminbot_admins,
+    adminbot_funnel,
     adminbot_media,
     adminbot_logs,
     adminbot_nodes,
@@ -35,7 +38,7 @@ from . import (
     adminbot_automations,
 )
 
-router = APIRouter(prefix="/adminbot", tags=["AdminBot"])
+router = APIRouter(prefix="/adminbot", tags=["AdminBot"], route_class=AdminRoute)
 
 
 ALLOWED_ROLES = (
@@ -205,24 +208,23 @@ def _section_status(
 
 
 @router.get("/login")
-async def login_form(request: Request):
-    return await auth_routes.login_form(request, next="/adminbot")
+def login_form(request: Request):
+    return auth_routes.login_form(request, next="/adminbot")
 
 
 @router.post("/login")
-async def login(
+def login(
     request: Request,
     username: str = Form(...),
     password: str = Form(...),
+    form: FormData = Depends(get_request_form),
     db: Session = Depends(get_db_session),
 ):
-    return await auth_routes.login(
-        request, username=username, password=password, next="/adminbot", db=db
-    )
+    return auth_routes.login(request, next="/adminbot", form=form, db=db)
 
 
 @router.get("/")
-async def dashboard(
+def dashboard(
     request: Request, db: Session = Depends(get_db_session)
 ):
     user = require_admin(request, db, roles=ALLOWED_ROLES)
@@ -235,7 +237,7 @@ async def dashboard(
 
 
 @router.get("/builder")
-async def builder_dashboard(request: Request, db: Session = Depends(get_db_session)):
+def builder_dashboard(request: Request, db: Session = Depends(get_db_session)):
     user = require_admin(request, db, roles=ALLOWED_ROLES)
     if not user:
         return _login_redirect(_next_from_request(request))
@@ -354,7 +356,7 @@ async def builder_dashboard(request: Request, db: Session = Depends(get_db_sessi
 
 
 @router.get("/integrity")
-async def integrity_check_page(
+def integrity_check_page(
     request: Request, db: Session = Depends(get_db_session)
 ):
     user = require_admin(request, db, roles=ALLOWED_ROLES)
@@ -376,7 +378,7 @@ async def integrity_check_page(
 
 
 @router.get("/api/integrity")
-async def integrity_check_api(
+def integrity_check_api(
     request: Request, db: Session = Depends(get_db_session)
 ):
     user = require_admin(request, db, roles=ALLOWED_ROLES)
@@ -388,8 +390,8 @@ async def integrity_check_api(
 
 
 @router.get("/logout")
-async def logout(request: Request, db: Session = Depends(get_db_session)):
-    return await auth_routes.logout(request, db)
+def logout(request: Request, db: Session = Depends(get_db_session)):
+    return auth_routes.logout(request, db)
 
 
 router.include_router(adminbot_nodes.router)
@@ -398,6 +400,7 @@ router.include_router(adminbot_menu_buttons.router)
 router.include_router(adminbot_triggers.router)
 router.include_router(adminbot_runtime.router)
 router.include_router(adminbot_logs.router)
+router.include_router(adminbot_funnel.router)
 router.include_router(adminbot_templates.router)
 router.include_router(adminbot_admins.router)
 router.include_router(adminbot_media.router)
@@ -9,12 +9,13 @@ from sqlalchemy import or_
 from sqlalchemy.orm import Session
 
 from admin_panel import TEMPLATES
-from admin_panel.dependencies import get_db_session, require_admin
+from admin_panel.dependencies import get_db_session, require_admin, require_admin_user
+from admin_panel.executor import AdminRoute
 from models.admin_user import AdminRole, AdminUser, AdminRoleModel
 from services import auth as auth_service
 from services.passwords import hash_password, verify_password
 
-router = APIRouter(tags=["AdminBotAdmins"])
+router = APIRouter(tags=["AdminBotAdmins"], route_class=AdminRoute)
 
 ADMIN_ROLES = (
     AdminRole.superadmin,
@@ -77,7 +78,7 @@ def _render_admins(
 
 
 @router.get("/admins")
-async def admins_list(request: Request, db: Session = Depends(get_db_session)):
+def admins_list(request: Request, db: Session = Depends(get_db_session)):
     current_user = require_admin(request, db, roles=(AdminRole.superadmin,))
     if not current_user:
         return _login_redirect("/adminbot/admins")
@@ -87,7 +88,7 @@ async def admins_list(request: Request, db: Session = Depends(get_db_session)):
 
 
 @router.get("/admins/new")
-async def admin_new_form(request: Request, db: Session = Depends(get_db_session)):
+def admin_new_form(request: Request, db: Session = Depends(get_db_session)):
     current_user = require_admin(request, db, roles=(AdminRole.superadmin,))
     if not current_user:
         return _login_redirect("/adminbot/admins/new")
@@ -106,7 +107,7 @@ async def admin_new_form(request: Request, db: Session = Depends(get_db_session)
 
 
 @router.post("/admins/new")
-async def admin_create(
+def admin_create(
     request: Request,
     username: str = Form(...),
     password: str = Form(...),
@@ -159,7 +160,7 @@ async def admin_create(
 
 
 @router.get("/admins/{user_id}/edit")
-async def admin_edit_form(
+def admin_edit_form(
     request: Request, user_id: int, db: Session = Depends(get_db_session)
 ):
     current_user = require_admin(request, db, roles=(AdminRole.superadmin,))
@@ -184,7 +185,7 @@ async def admin_edit_form(
 
 
 @router.post("/admins/{user_id}/edit")
-async def admin_update(
+def admin_update(
     request: Request,
     user_id: int,
     username: str = Form(...),
@@ -244,12 +245,13 @@ async def admin_update(
 
     db.add(target)
     db.commit()
+    auth_service.forget_principals(target.id)
 
     return RedirectResponse(url="/adminbot/admins?message=Сохранено", status_code=303)
 
 
 @router.post("/admins/{user_id}/resetpass")
-async def admin_reset_password(
+def admin_reset_password(
     request: Request,
     user_id: int,
     new_password: str = Form(...),
@@ -279,8 +281,8 @@ async def admin_reset_password(
 
 
 @router.get("/profile")
-async def profile(request: Request, db: Session = Depends(get_db_session)):
-    current_user = require_admin(request, db, roles=ADMIN_ROLES)
+def profile(request: Request, db: Session = Depends(get_db_session)):
+    current_user = require_admin_user(request, db, roles=ADMIN_ROLES)
     if not current_user:
         return _login_redirect("/adminbot/profile")
 
@@ -298,14 +300,14 @@ async def profile(request: Request, db: Session = Depends(get_db_session)):
 
 
 @router.post("/profile/password")
-async def change_password(
+def change_password(
     request: Request,
     old_password: str = Form(""),
     new_password: str = Form(""),
     new_password_confirm: str = Form(""),
     db: Session = Depends(get_db_session),
 ):
-    current_user = require_admin(request, db, roles=ADMIN_ROLES)
+    current_user = require_admin_user(request, db, roles=ADMIN_ROLES)
     if not current_user:
         return _login_redirect("/adminbot/profile")
 
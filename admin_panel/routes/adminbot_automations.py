@@ -8,11 +8,12 @@ from sqlalchemy.orm import Session
 
 from admin_panel import TEMPLATES
 from admin_panel.dependencies import get_db_session, require_admin
+from admin_panel.executor import AdminRoute
 from models import BotAutomationRule, BotButtonPreset
 from models.admin_user import AdminRole
 from services import automations as automations_service
 
-router = APIRouter(tags=["AdminBot"])
+router = APIRouter(tags=["AdminBot"], route_class=AdminRoute)
 
 ALLOWED_ROLES = (AdminRole.superadmin, AdminRole.admin_bot, AdminRole.moderator)
 logger = logging.getLogger(__name__)
@@ -152,7 +153,7 @@ def _build_presets_payload(presets: list[BotButtonPreset]) -> list[dict[str, Any
 
 
 @router.get("/automations")
-async def automations_list(request: Request, db: Session = Depends(get_db_session)):
+def automations_list(request: Request, db: Session = Depends(get_db_session)):
     user = require_admin(request, db, roles=ALLOWED_ROLES)
     if not user:
         return _login_redirect(_next_from_request(request))
@@ -175,7 +176,7 @@ async def automations_list(request: Request, db: Session = Depends(get_db_sessio
 
 
 @router.post("/automations/seed")
-async def automations_seed(request: Request, db: Session = Depends(get_db_session)):
+def automations_seed(request: Request, db: Session = Depends(get_db_session)):
     user = require_admin(request, db, roles=ALLOWED_ROLES)
     if not user:
         return _login_redirect(_next_from_request(request))
@@ -259,7 +260,7 @@ async def automations_seed(request: Request, db: Session = Depends(get_db_sessio
 
 
 @router.get("/automations/new")
-async def automations_new_form(request: Request, db: Session = Depends(get_db_session)):
+def automations_new_form(request: Request, db: Session = Depends(get_db_session)):
     user = require_admin(request, db, roles=ALLOWED_ROLES)
     if not user:
         return _login_redirect(_next_from_request(request))
@@ -288,7 +289,7 @@ async def automations_new_form(request: Request, db: Session = Depends(get_db_se
 
 
 @router.post("/automations/new")
-async def automations_create(
+def automations_create(
     request: Request,
     title: str = Form(...),
     trigger_type: str = Form(...),
@@ -359,7 +360,7 @@ async def automations_create(
 
 
 @router.get("/automations/{rule_id}/edit")
-async def automations_edit_form(
+def automations_edit_form(
     request: Request, rule_id: int, db: Session = Depends(get_db_session)
 ):
     user = require_admin(request, db, roles=ALLOWED_ROLES)
@@ -418,7 +419,7 @@ async def automations_edit_form(
 
 
 @router.post("/automations/{rule_id}/edit")
-async def automations_update(
+def automations_update(
     request: Request,
     rule_id: int,
     title: str = Form(...),
@@ -516,7 +517,7 @@ async def automations_update(
 
 
 @router.post("/automations/{rule_id}/delete")
-async def automations_delete(
+def automations_delete(
     request: Request, rule_id: int, db: Session = Depends(get_db_session)
 ):
     user = require_admin(request, db, roles=ALLOWED_ROLES)
@@ -532,7 +533,7 @@ async def automations_delete(
 
 
 @router.get("/automations/button-presets")
-async def button_presets_list(request: Request, db: Session = Depends(get_db_session)):
+def button_presets_list(request: Request, db: Session = Depends(get_db_session)):
     user = require_admin(request, db, roles=ALLOWED_ROLES)
     if not user:
         return _login_redirect(_next_from_request(request))
@@ -550,7 +551,7 @@ async def button_presets_list(request: Request, db: Session = Depends(get_db_ses
 
 
 @router.get("/automations/button-presets/new")
-async def button_presets_new_form(request: Request, db: Session = Depends(get_db_session)):
+def button_presets_new_form(request: Request, db: Session = Depends(get_db_session)):
     user = require_admin(request, db, roles=ALLOWED_ROLES)
     if not user:
         return _login_redirect(_next_from_request(request))
@@ -569,7 +570,7 @@ async def button_presets_new_form(request: Request, db: Session = Depends(get_db
 
 
 @router.post("/automations/button-presets/new")
-async def button_presets_create(
+def button_presets_create(
     request: Request,
     title: str = Form(...),
     scope: str = Form(...),
@@ -626,7 +627,7 @@ async def button_presets_create(
 
 
 @router.get("/automations/button-presets/{preset_id}/edit")
-async def button_presets_edit_form(
+def button_presets_edit_form(
     request: Request, preset_id: int, db: Session = Depends(get_db_session)
 ):
     user = require_admin(request, db, roles=ALLOWED_ROLES)
@@ -651,7 +652,7 @@ async def button_presets_edit_form(
 
 
 @router.post("/automations/button-presets/{preset_id}/edit")
-async def button_presets_update(
+def button_presets_update(
     request: Request,
     preset_id: int,
     title: str = Form(...),
@@ -711,7 +712,7 @@ async def button_presets_update(
 
 
 @router.post("/automations/button-presets/{preset_id}/delete")
-async def button_presets_delete(
+def button_presets_delete(
     request: Request, preset_id: int, db: Session = Depends(get_db_session)
 ):
     user = require_admin(request, db, roles=ALLOWED_ROLES)
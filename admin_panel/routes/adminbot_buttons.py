@@ -11,10 +11,12 @@ from sqlalchemy.orm import Session
 
 from admin_panel import TEMPLATES
 from admin_panel.dependencies import get_db_session, require_admin
+from admin_panel.executor import AdminRoute
 from models import BotButton, BotNode, BotRuntime
 from models.admin_user import AdminRole
+from services.bot_config import invalidate_config_cache_on_commit
 
-router = APIRouter(tags=["AdminBot"])
+router = APIRouter(tags=["AdminBot"], route_class=AdminRoute)
 
 ALLOWED_ROLES = (AdminRole.superadmin, AdminRole.admin_bot, AdminRole.moderator)
 
@@ -74,6 +76,7 @@ def _bump_runtime(db: Session) -> None:
     if not runtime:
         runtime = BotRuntime(config_version=1, start_node_code="MAIN_MENU")
     runtime.config_version = (runtime.config_version or 1) + 1
+    invalidate_config_cache_on_commit(db)
     db.add(runtime)
     db.commit()
 
@@ -424,7 +427,7 @@ def _next_button_position(db: Session, node_id: int) -> tuple[int, int]:
 
 
 @router.get("/nodes/{node_id}/buttons")
-async def list_buttons(
+def list_buttons(
     request: Request,
     node_id: int,
     db: Session = Depends(get_db_session),
@@ -460,7 +463,7 @@ async def list_buttons(
 
 
 @router.get("/nodes/{node_id}/buttons/new")
-async def new_button_form(
+def new_button_form(
     request: Request,
     node_id: int,
     db: Session = Depends(get_db_session),
@@ -491,7 +494,7 @@ async def new_button_form(
 
 
 @router.post("/nodes/{node_id}/buttons/new")
-async def create_button(
+def create_button(
     request: Request,
     node_id: int,
     title: str = Form(...),
@@ -578,7 +581,7 @@ async def create_button(
 
 
 @router.get("/buttons/{button_id}/edit")
-async def edit_button_form(
+def edit_button_form(
     request: Request,
     button_id: int,
     db: Session = Depends(get_db_session),
@@ -613,7 +616,7 @@ async def edit_button_form(
 
 
 @router.post("/buttons/{button_id}/edit")
-async def update_button(
+def update_button(
     request: Request,
     button_id: int,
     title: str = Form(...),
@@ -702,7 +705,7 @@ async def update_button(
 
 
 @router.post("/buttons/{button_id}/delete")
-async def delete_button(
+def delete_button(
     request: Request, button_id: int, db: Session = Depends(get_db_session)
 ):
     user = require_admin(request, db, roles=ALLOWED_ROLES)
@@ -723,7 +726,7 @@ async def delete_button(
 
 
 @router.post("/nodes/quick-create")
-async def quick_create_node(
+def quick_create_node(
     request: Request,
     title: str = Form(...),
     node_type: str = Form("MESSAGE"),
@@ -757,7 +760,7 @@ async def quick_create_node(
 
 
 @router.get("/api/buttons")
-async def api_list_buttons(
+def api_list_buttons(
     request: Request,
     node_id: int,
     db: Session = Depends(get_db_session),
@@ -800,7 +803,7 @@ async def api_list_buttons(
 
 
 @router.post("/api/buttons/save")
-async def api_save_button(
+def api_save_button(
     request: Request,
     payload: ButtonPayload,
     db: Session = Depends(get_db_session),
@@ -851,7 +854,7 @@ async def api_save_button(
 
 
 @router.post("/api/buttons/delete")
-async def api_delete_button(
+def api_delete_button(
     request: Request,
     payload: DeletePayload,
     db: Session = Depends(get_db_session),
@@ -872,7 +875,7 @@ async def api_delete_button(
 
 
 @router.post("/nodes/{node_id}/submenu")
-async def create_submenu(
+def create_submenu(
     request: Request,
     node_id: int,
     submenu_title: str = Form(...),
@@ -965,7 +968,7 @@ async def create_submenu(
 
 
 @router.get("/buttons/{button_id}/move")
-async def move_button(
+def move_button(
     request: Request,
     button_id: int,
     direction: str,
@@ -0,0 +1,22 @@
+from fastapi import APIRouter, Depends, Request
+from sqlalchemy.orm import Session
+
+from admin_panel.dependencies import get_db_session, require_admin
+from admin_panel.executor import AdminRoute
+from models.admin_user import AdminRole
+from services.bot_funnel import get_funnel
+
+router = APIRouter(tags=["AdminBot"], route_class=AdminRoute)
+
+ALLOWED_ROLES = (AdminRole.superadmin, AdminRole.admin_bot)
+
+
+@router.get("/api/funnel")
+def bot_funnel_api(request: Request, db: Session = Depends(get_db_session)):
+    """Воронка по узлам из агрегатов bot_funnel_*; сырой журнал при запросе не читается."""
+
+    user = require_admin(request, db, roles=ALLOWED_ROLES)
+    if not user:
+        return {"ok": False, "error": "Authentication required"}
+
+    return {"ok": True, **get_funnel(db)}
@@ -1,4 +1,4 @@
-from math import ceil
+from datetime import datetime, timedelta
 from pathlib import Path
 from urllib.parse import urlencode
 
@@ -8,16 +8,19 @@ from sqlalchemy.orm import Session
 
 from admin_panel import TEMPLATES
 from admin_panel.dependencies import get_db_session, require_admin
+from admin_panel.executor import AdminRoute
 from models.admin_user import AdminRole
-from services.bot_logs import fetch_logs, fetch_user_history
+from services.bot_logs import fetch_hourly_summary, fetch_logs, fetch_user_history
 from utils.log_reader import read_tail
 from utils.logging_config import API_LOG_FILE, BOT_LOG_FILE
 
-router = APIRouter(tags=["AdminBot"])
+router = APIRouter(tags=["AdminBot"], route_class=AdminRoute)
 
 ALLOWED_ROLES = (AdminRole.superadmin, AdminRole.admin_bot)
 DEFAULT_LIMIT = 200
 MAX_LIMIT = 2000
+MAX_SUMMARY_HOURS = 24 * 366
+SUMMARY_GROUPS = ("event_type", "node_code", "config_version")
 
 SOURCES: dict[str, Path] = {
     "api": API_LOG_FILE,
@@ -52,7 +55,7 @@ def _normalize_int(value: int | str | None, *, default: int, min_value: int, max
 
 @router.get("/logs")
 @router.get("/logs/")
-async def adminbot_file_logs(
+def adminbot_file_logs(
     request: Request,
     source: str = "api",
     limit: int | str = DEFAULT_LIMIT,
@@ -84,10 +87,34 @@ async def adminbot_file_logs(
     )
 
 
+@router.get("/api/logs/summary")
+def bot_logs_summary_api(
+    request: Request,
+    hours: int | str = 24,
+    group_by: str = "event_type",
+    by_hour: bool = False,
+    db: Session = Depends(get_db_session),
+):
+    user = require_admin(request, db, roles=ALLOWED_ROLES)
+    if not user:
+        return {"ok": False, "error": "Authentication required"}
+
+    normalized_hours = _normalize_int(hours, default=24, min_value=1, max_value=MAX_SUMMARY_HOURS)
+    groups = [name for name in (part.strip() for part in group_by.split(",")) if name in SUMMARY_GROUPS]
+    since = datetime.utcnow().replace(minute=0, second=0, microsecond=0) - timedelta(hours=normalized_hours - 1)
+    rows = fetch_hourly_summary(db, since=since, group_by=groups, by_hour=by_hour)
+    for row in rows:
+        if "hour" in row:
+            row["hour"] = row["hour"].isoformat()
+    return {"ok": True, "since": since.isoformat(), "group_by": groups, "rows": rows}
+
+
 @router.get("/logs/history")
-async def bot_logs_history(
+def bot_logs_history(
     request: Request,
-    page: int = 1,
+    after: str | None = None,
+    before: str | None = None,
+    exact_count: bool = False,
     event_type: str | None = None,
     user_id: str | None = None,
     username: str | None = None,
@@ -101,10 +128,12 @@ async def bot_logs_history(
         return _login_redirect(_next_from_request(request))
 
     per_page = 50
-    logs, total = fetch_logs(
+    result = fetch_logs(
         db,
-        page=page,
+        after=after,
+        before=before,
         per_page=per_page,
+        count_mode="exact" if exact_count else "estimate",
         event_type=event_type,
         user_id=user_id,
         username=username,
@@ -113,8 +142,6 @@ async def bot_logs_history(
         date_to=date_to,
     )
 
-    total_pages = ceil(total / per_page) if total else 1
-
     base_params = {
         "event_type": (event_type or "").strip(),
         "user_id": (user_id or "").strip(),
@@ -124,31 +151,29 @@ async def bot_logs_history(
         "date_to": date_to or "",
     }
 
-    def _page_url(target_page: int) -> str:
-        params = {**base_params, "page": target_page}
+    def _page_url(**cursor: str | None) -> str:
+        params = {**base_params, **cursor}
         normalized = {k: v for k, v in params.items() if v}
         return f"/adminbot/logs/history?{urlencode(normalized)}"
 
-    prev_page = page - 1 if page > 1 else None
-    next_page = page + 1 if page < total_pages else None
-
     return TEMPLATES.TemplateResponse(
         "adminbot_logs.html",
         {
             "request": request,
-            "logs": logs,
-            "page": page,
-            "total": total,
-            "total_pages": total_pages,
-            "prev_url": _page_url(prev_page) if prev_page else None,
-            "next_url": _page_url(next_page) if next_page else None,
+            "logs": result.rows,
+            "total": result.total,
+            "total_is_estimate": result.total_is_estimate,
+            "first_url": _page_url() if result.prev_cursor else None,
+            "prev_url": _page_url(before=result.prev_cursor) if result.prev_cursor else None,
+            "next_url": _page_url(after=result.next_cursor) if result.next_cursor else None,
+            "exact_count_url": _page_url(after=after, before=before, exact_count="1"),
             "filters": base_params,
         },
     )
 
 
 @router.get("/users/{user_id}/logs")
-async def user_logs(
+def user_logs(
     request: Request,
     user_id: int,
     db: Session = Depends(get_db_session),
@@ -12,10 +12,11 @@ from sqlalchemy.orm import Session
 
 from admin_panel import TEMPLATES
 from admin_panel.dependencies import get_db_session, require_admin
+from admin_panel.executor import AdminRoute
 from models.admin_user import AdminRole
 from media_paths import ADMIN_BOT_MEDIA_ROOT, MEDIA_ROOT, ensure_media_dirs
 
-router = APIRouter(tags=["AdminBot"])
+router = APIRouter(tags=["AdminBot"], route_class=AdminRoute)
 
 
 ALLOWED_ROLES = (AdminRole.superadmin, AdminRole.admin_bot, AdminRole.moderator)
@@ -62,7 +63,7 @@ def _list_files() -> list[dict]:
 
 
 @router.get("/media")
-async def media_manager(request: Request, db: Session = Depends(get_db_session)):
+def media_manager(request: Request, db: Session = Depends(get_db_session)):
     user = require_admin(request, db, roles=ALLOWED_ROLES)
     if not user:
         return _login_redirect(request.url.path)
@@ -90,7 +91,7 @@ def _validate_upload(upload: UploadFile) -> str | None:
 
 
 @router.post("/media/upload")
-async def upload_media(
+def upload_media(
     request: Request, file: UploadFile = File(...), db: Session = Depends(get_db_session)
 ):
     user = require_admin(request, db, roles=ALLOWED_ROLES)
@@ -102,7 +103,7 @@ async def upload_media(
     if validation_error:
         return JSONResponse(status_code=422, content={"error": validation_error})
 
-    data = await file.read()
+    data = file.file.read()
     if not data:
         return JSONResponse(status_code=422, content={"error": "Файл пустой"})
 
@@ -128,7 +129,7 @@ async def upload_media(
 
 
 @router.post("/media/delete")
-async def delete_media(
+def delete_media(
     request: Request,
     filename: str = Form(...),
     db: Session = Depends(get_db_session),
@@ -6,10 +6,12 @@ from sqlalchemy.orm import Session
 
 from admin_panel import TEMPLATES
 from admin_panel.dependencies import get_db_session, require_admin
+from admin_panel.executor import AdminRoute
 from models import BotRuntime, MenuButton
 from models.admin_user import AdminRole
+from services.bot_config import invalidate_config_cache_on_commit
 
-router = APIRouter(tags=["AdminBot"])
+router = APIRouter(tags=["AdminBot"], route_class=AdminRoute)
 
 ALLOWED_ROLES = (AdminRole.superadmin, AdminRole.admin_bot, AdminRole.moderator)
 ACTION_TYPES = {"node", "command", "url", "webapp"}
@@ -38,6 +40,7 @@ def _bump_runtime(db: Session) -> None:
     if not runtime:
         runtime = BotRuntime(config_version=1)
     runtime.config_version = (runtime.config_version or 1) + 1
+    invalidate_config_cache_on_commit(db)
     db.add(runtime)
 
 
@@ -85,7 +88,7 @@ def _prepare_menu_button_payload(
 
 
 @router.get("/menu-buttons")
-async def menu_buttons_list(request: Request, db: Session = Depends(get_db_session)):
+def menu_buttons_list(request: Request, db: Session = Depends(get_db_session)):
     user = require_admin(request, db, roles=ALLOWED_ROLES)
     if not user:
         return _login_redirect(request.url.path)
@@ -102,7 +105,7 @@ async def menu_buttons_list(request: Request, db: Session = Depends(get_db_sessi
 
 
 @router.get("/menu-buttons/new")
-async def new_menu_button_form(
+def new_menu_button_form(
     request: Request, db: Session = Depends(get_db_session)
 ):
     user = require_admin(request, db, roles=ALLOWED_ROLES)
@@ -116,7 +119,7 @@ async def new_menu_button_form(
 
 
 @router.post("/menu-buttons/new")
-async def create_menu_button(
+def create_menu_button(
     request: Request,
     text: str = Form(...),
     action_type: str = Form("node"),
@@ -159,7 +162,7 @@ async def create_menu_button(
 
 
 @router.get("/menu-buttons/{button_id}/edit")
-async def edit_menu_button_form(
+def edit_menu_button_form(
     request: Request, button_id: int, db: Session = Depends(get_db_session)
 ):
     user = require_admin(request, db, roles=ALLOWED_ROLES)
@@ -177,7 +180,7 @@ async def edit_menu_button_form(
 
 
 @router.post("/menu-buttons/{button_id}/edit")
-async def edit_menu_button(
+def edit_menu_button(
     request: Request,
     button_id: int,
     text: str = Form(...),
@@ -228,7 +231,7 @@ async def edit_menu_button(
 
 
 @router.post("/menu-buttons/{button_id}/delete")
-async def deactivate_menu_button(
+def deactivate_menu_button(
     request: Request, button_id: int, db: Session = Depends(get_db_session)
 ):
     user = require_admin(request, db, roles=ALLOWED_ROLES)
@@ -248,7 +251,7 @@ async def deactivate_menu_button(
 
 
 @router.post("/menu-buttons/{button_id}/activate")
-async def activate_menu_button(
+def activate_menu_button(
     request: Request, button_id: int, db: Session = Depends(get_db_session)
 ):
     user = require_admin(request, db, roles=ALLOWED_ROLES)
@@ -6,13 +6,16 @@ from fastapi import APIRouter, Depends, Form, Request
 from fastapi.responses import RedirectResponse
 from sqlalchemy import or_
 from sqlalchemy.orm import Session
+from starlette.datastructures import FormData
 
 from admin_panel import TEMPLATES
-from admin_panel.dependencies import get_db_session, require_admin
+from admin_panel.dependencies import get_db_session, get_request_form, require_admin
+from admin_panel.executor import AdminRoute
 from models import BotButton, BotNode, BotNodeAction, BotRuntime, BotTrigger
 from models.admin_user import AdminRole
+from services.bot_config import invalidate_config_cache_on_commit
 
-router = APIRouter(tags=["AdminBot"])
+router = APIRouter(tags=["AdminBot"], route_class=AdminRoute)
 
 
 ALLOWED_ROLES = (AdminRole.superadmin, AdminRole.admin_bot, AdminRole.moderator)
@@ -65,6 +68,7 @@ def _bump_runtime(db: Session) -> None:
     if not runtime:
         runtime = BotRuntime(config_version=1)
     runtime.config_version = (runtime.config_version or 1) + 1
+    invalidate_config_cache_on_commit(db)
     db.add(runtime)
 
 
@@ -497,7 +501,7 @@ def _serialize_actions(actions: list[BotNodeAction]) -> list[dict]:
 
 
 @router.get("/nodes")
-async def list_nodes(request: Request, db: Session = Depends(get_db_session)):
+def list_nodes(request: Request, db: Session = Depends(get_db_session)):
     user = require_admin(request, db, roles=ALLOWED_ROLES)
     if not user:
         return _login_redirect(_next_from_request(request))
@@ -519,7 +523,7 @@ async def list_nodes(request: Request, db: Session = Depends(get_db_session)):
 
 
 @router.get("/nodes/new")
-async def new_node_form(request: Request, db: Session = Depends(get_db_session)):
+def new_node_form(request: Request, db: Session = Depends(get_db_session)):
     user = require_admin(request, db, roles=ALLOWED_ROLES)
     if not user:
         return _login_redirect(_next_from_request(request))
@@ -539,7 +543,7 @@ async def new_node_form(request: Request, db: Session = Depends(get_db_session))
 
 
 @router.post("/nodes/new")
-async def create_node(
+def create_node(
     request: Request,
     code: str = Form(...),
     title: str = Form(...),
@@ -570,13 +574,13 @@ async def create_node(
     cond_sub_subscribe_url: str | None = Form(None),
     cond_sub_check_button_text: str | None = Form(None),
     cond_sub_subscribe_button_text: str | None = Form(None),
+    form: FormData = Depends(get_request_form),
     db: Session = Depends(get_db_session),
 ):
     user = require_admin(request, db, roles=ALLOWED_ROLES)
     if not user:
         return _login_redirect(_next_from_request(request))
 
-    form = await request.form()
     actions_error, actions = _parse_actions_from_form(form)
 
     code = (code or "").strip()
@@ -656,7 +660,7 @@ async def create_node(
 
 
 @router.get("/nodes/{node_id}/edit")
-async def edit_node_form(
+def edit_node_form(
     request: Request,
     node_id: int,
     db: Session = Depends(get_db_session),
@@ -693,7 +697,7 @@ async def edit_node_form(
 
 
 @router.post("/nodes/{node_id}/edit")
-async def edit_node(
+def edit_node(
     request: Request,
     node_id: int,
     title: str = Form(...),
@@ -724,6 +728,7 @@ async def edit_node(
     cond_sub_subscribe_url: str | None = Form(None),
     cond_sub_check_button_text: str | None = Form(None),
     cond_sub_subscribe_button_text: str | None = Form(None),
+    form: FormData = Depends(get_request_form),
     db: Session = Depends(get_db_session),
 ):
     user = require_admin(request, db, roles=ALLOWED_ROLES)
@@ -734,7 +739,6 @@ async def edit_node(
     if not node:
         return RedirectResponse(url="/adminbot/nodes", status_code=303)
 
-    form = await request.form()
     actions_error, actions = _parse_actions_from_form(form)
 
     error, payload = _prepare_node_payload(
@@ -802,7 +806,7 @@ async def edit_node(
 
 
 @router.post("/nodes/{node_id}/delete")
-async def delete_node(request: Request, node_id: int, db: Session = Depends(get_db_session)):
+def delete_node(request: Request, node_id: int, db: Session = Depends(get_db_session)):
     user = require_admin(request, db, roles=ALLOWED_ROLES)
     if not user:
         return _login_redirect(_next_from_request(request))
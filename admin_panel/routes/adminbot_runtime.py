@@ -1,15 +1,18 @@
 """Управление версией конфигурации бота."""
 
 from fastapi import APIRouter, Depends, Form, Request
-from fastapi.responses import RedirectResponse
+from fastapi.responses import JSONResponse, RedirectResponse
 from sqlalchemy.orm import Session
 
 from admin_panel import TEMPLATES
 from admin_panel.dependencies import get_db_session, require_admin
+from admin_panel.executor import AdminRoute
+from database import DB_ROLE, get_pool_stats
 from models import BotRuntime
 from models.admin_user import AdminRole
+from services.bot_config import invalidate_config_cache_on_commit
 
-router = APIRouter(tags=["AdminBot"])
+router = APIRouter(tags=["AdminBot"], route_class=AdminRoute)
 
 ALLOWED_ROLES = (AdminRole.superadmin, AdminRole.admin_bot)
 
@@ -35,7 +38,7 @@ def _get_runtime(db: Session) -> BotRuntime:
 
 
 @router.get("/runtime")
-async def runtime_page(request: Request, db: Session = Depends(get_db_session)):
+def runtime_page(request: Request, db: Session = Depends(get_db_session)):
     user = require_admin(request, db, roles=ALLOWED_ROLES)
     if not user:
         return _login_redirect(_next_from_request(request))
@@ -52,7 +55,7 @@ async def runtime_page(request: Request, db: Session = Depends(get_db_session)):
 
 
 @router.post("/runtime")
-async def update_runtime_settings(
+def update_runtime_settings(
     request: Request,
     action: str = Form("bump"),
     start_node_code: str | None = Form(None),
@@ -70,7 +73,19 @@ async def update_runtime_settings(
     else:
         runtime.config_version = (runtime.config_version or 1) + 1
 
+    invalidate_config_cache_on_commit(db)
     db.add(runtime)
     db.commit()
 
     return RedirectResponse(url="/adminbot/runtime", status_code=303)
+
+
+@router.get("/runtime/db-pool")
+def runtime_db_pool_stats(request: Request, db: Session = Depends(get_db_session)):
+    """Состояние пулов соединений процесса API: занятые, overflow, ожидание."""
+
+    user = require_admin(request, db, roles=ALLOWED_ROLES)
+    if not user:
+        return JSONResponse(status_code=401, content={"detail": "Admin authentication required"})
+
+    return {"process_role": DB_ROLE, "pools": get_pool_stats()}
@@ -8,9 +8,11 @@ from typing import Any, Dict, Iterable
 from fastapi import APIRouter, Depends, Request
 from fastapi.responses import RedirectResponse
 from sqlalchemy.orm import Session
+from starlette.datastructures import FormData
 
 from admin_panel import TEMPLATES
-from admin_panel.dependencies import get_db_session, require_admin
+from admin_panel.dependencies import get_db_session, get_request_form, require_admin
+from admin_panel.executor import AdminRoute
 from models import (
     BotAutomationRule,
     BotButton,
@@ -22,8 +24,9 @@ from models import (
     BotTrigger,
 )
 from models.admin_user import AdminRole
+from services.bot_config import invalidate_config_cache_on_commit
 
-router = APIRouter(tags=["AdminBot"])
+router = APIRouter(tags=["AdminBot"], route_class=AdminRoute)
 
 ALLOWED_ROLES = (AdminRole.superadmin, AdminRole.admin_bot)
 
@@ -237,6 +240,7 @@ def _bump_runtime(db: Session) -> None:
     if not runtime:
         runtime = BotRuntime(config_version=1)
     runtime.config_version = (runtime.config_version or 1) + 1
+    invalidate_config_cache_on_commit(db)
     db.add(runtime)
 
 
@@ -687,7 +691,7 @@ def _apply_template(db: Session, template: BotTemplate, plan: dict) -> dict:
 
 
 @router.get("/templates")
-async def list_templates(request: Request, db: Session = Depends(get_db_session)):
+def list_templates(request: Request, db: Session = Depends(get_db_session)):
     user = require_admin(request, db, roles=ALLOWED_ROLES)
     if not user:
         return _login_redirect(_next_from_request(request))
@@ -704,7 +708,7 @@ async def list_templates(request: Request, db: Session = Depends(get_db_session)
 
 
 @router.get("/templates/{template_code}")
-async def template_preview(
+def template_preview(
     request: Request, template_code: str, db: Session = Depends(get_db_session)
 ):
     user = require_admin(request, db, roles=ALLOWED_ROLES)
@@ -738,7 +742,7 @@ async def template_preview(
 
 
 @router.post("/templates/{template_code}/delete")
-async def delete_template(
+def delete_template(
     request: Request, template_code: str, db: Session = Depends(get_db_session)
 ):
     user = require_admin(request, db, roles=ALLOWED_ROLES)
@@ -754,8 +758,11 @@ async def delete_template(
 
 
 @router.post("/templates/{template_code}/apply")
-async def apply_template(
-    request: Request, template_code: str, db: Session = Depends(get_db_session)
+def apply_template(
+    request: Request,
+    template_code: str,
+    form: FormData = Depends(get_request_form),
+    db: Session = Depends(get_db_session),
 ):
     user = require_admin(request, db, roles=ALLOWED_ROLES)
     if not user:
@@ -765,7 +772,6 @@ async def apply_template(
     if not template:
         return RedirectResponse(url="/adminbot/templates", status_code=303)
 
-    form = await request.form()
     replace_items = set(form.getlist("replace_items"))
     plan = _build_template_plan(db, template, replace_items=replace_items)
 
@@ -4,10 +4,12 @@ from sqlalchemy.orm import Session
 
 from admin_panel import TEMPLATES
 from admin_panel.dependencies import get_db_session, require_admin
+from admin_panel.executor import AdminRoute
 from models import BotRuntime, BotTrigger
 from models.admin_user import AdminRole
+from services.bot_config import invalidate_config_cache_on_commit
 
-router = APIRouter(tags=["AdminBot"])
+router = APIRouter(tags=["AdminBot"], route_class=AdminRoute)
 
 ALLOWED_ROLES = (AdminRole.superadmin, AdminRole.admin_bot)
 TRIGGER_TYPES = {
@@ -37,6 +39,7 @@ def _bump_runtime(db: Session) -> None:
     if not runtime:
         runtime = BotRuntime(config_version=1, start_node_code="MAIN_MENU")
     runtime.config_version = (runtime.config_version or 1) + 1
+    invalidate_config_cache_on_commit(db)
     db.add(runtime)
     db.commit()
 
@@ -106,7 +109,7 @@ def _ensure_single_fallback(db: Session, *, current_id: int | None, is_enabled:
 
 
 @router.get("/triggers")
-async def list_triggers(
+def list_triggers(
     request: Request,
     trigger_type: str | None = Query(None),
     search: str | None = Query(None),
@@ -139,7 +142,7 @@ async def list_triggers(
 
 
 @router.get("/triggers/new")
-async def new_trigger_form(request: Request, db: Session = Depends(get_db_session)):
+def new_trigger_form(request: Request, db: Session = Depends(get_db_session)):
     user = require_admin(request, db, roles=ALLOWED_ROLES)
     if not user:
         return _login_redirect(_next_from_request(request))
@@ -159,7 +162,7 @@ async def new_trigger_form(request: Request, db: Session = Depends(get_db_sessio
 
 
 @router.post("/triggers/new")
-async def create_trigger(
+def create_trigger(
     request: Request,
     trigger_type: str = Form(...),
     trigger_value: str | None = Form(None),
@@ -221,7 +224,7 @@ async def create_trigger(
 
 
 @router.get("/triggers/{trigger_id}/edit")
-async def edit_trigger_form(
+def edit_trigger_form(
     request: Request,
     trigger_id: int,
     db: Session = Depends(get_db_session),
@@ -249,7 +252,7 @@ async def edit_trigger_form(
 
 
 @router.post("/triggers/{trigger_id}/edit")
-async def update_trigger(
+def update_trigger(
     request: Request,
     trigger_id: int,
     trigger_type: str = Form(...),
@@ -318,7 +321,7 @@ async def update_trigger(
 
 
 @router.post("/triggers/{trigger_id}/delete")
-async def delete_trigger(request: Request, trigger_id: int, db: Session = Depends(get_db_session)):
+def delete_trigger(request: Request, trigger_id: int, db: Session = Depends(get_db_session)):
     user = require_admin(request, db, roles=ALLOWED_ROLES)
     if not user:
         return _login_redirect(_next_from_request(request))
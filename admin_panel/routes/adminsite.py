@@ -6,12 +6,15 @@ import traceback
 
 from fastapi import APIRouter, Depends, Form, Request
 from sqlalchemy.orm import Session
+from starlette.datastructures import FormData
 
 from admin_panel.dependencies import (
     SESSION_COOKIE_NAME,
     get_db_session,
+    get_request_form,
     require_admin,
 )
+from admin_panel.executor import AdminRoute
 from admin_panel.adminsite import (
     ADMINSITE_CONSTRUCTOR_PATH,
     ADMINSITE_STATIC_DIR,
@@ -22,7 +25,7 @@ from admin_panel.routes import auth as auth_routes
 from models.admin_user import AdminRole
 from services import auth as auth_service
 
-router = APIRouter(prefix="/adminsite", tags=["AdminSite"])
+router = APIRouter(prefix="/adminsite", tags=["AdminSite"], route_class=AdminRoute)
 
 
 logger = logging.getLogger(__name__)
@@ -47,7 +50,7 @@ def _render_login_page(request: Request):
 
 
 @router.get("/_debug_static")
-async def debug_static_assets() -> dict[str, str | bool]:
+def debug_static_assets() -> dict[str, str | bool]:
     base_css = ADMINSITE_STATIC_DIR / "base.css"
     constructor_js = ADMINSITE_CONSTRUCTOR_PATH
     return {
@@ -58,7 +61,7 @@ async def debug_static_assets() -> dict[str, str | bool]:
 
 
 @router.get("/login")
-async def login_form(request: Request):
+def login_form(request: Request):
     return TEMPLATES.TemplateResponse(
         "login.html",
         {
@@ -70,13 +73,13 @@ async def login_form(request: Request):
 
 
 @router.post("/login")
-async def login(
+def login(
     request: Request,
     username: str = Form(...),
     password: str = Form(...),
+    form: FormData = Depends(get_request_form),
     db: Session = Depends(get_db_session),
 ):
-    form = await request.form()
 
     normalized_next = auth_routes._normalize_next_url(
         form.get("next") or "/adminsite"
@@ -110,7 +113,7 @@ async def login(
 
 
 @router.get("/")
-async def dashboard(
+def dashboard(
     request: Request, db: Session = Depends(get_db_session)
 ):
     try:
@@ -128,12 +131,12 @@ async def dashboard(
 
 
 @router.get("/logout")
-async def logout(request: Request, db: Session = Depends(get_db_session)):
-    return await auth_routes.logout(request, db)
+def logout(request: Request, db: Session = Depends(get_db_session)):
+    return auth_routes.logout(request, db)
 
 
 @router.get("/constructor")
-async def constructor(
+def constructor(
     request: Request, db: Session = Depends(get_db_session)
 ):
     user = require_admin(request, db, roles=ALLOWED_ROLES)
@@ -5,12 +5,14 @@ from datetime import datetime
 from fastapi import APIRouter, Depends, Form, Request
 from fastapi.responses import RedirectResponse
 from sqlalchemy.orm import Session
+from starlette.datastructures import FormData
 
 from admin_panel import TEMPLATES
-from admin_panel.dependencies import SESSION_COOKIE_NAME, get_db_session
+from admin_panel.dependencies import SESSION_COOKIE_NAME, get_db_session, get_request_form
+from admin_panel.executor import AdminRoute
 from services import auth as auth_service
 
-router = APIRouter(tags=["AdminAuth"])
+router = APIRouter(tags=["AdminAuth"], route_class=AdminRoute)
 
 
 def _normalize_next_url(next_url: str | None) -> str:
@@ -20,7 +22,7 @@ def _normalize_next_url(next_url: str | None) -> str:
 
 
 @router.get("/login")
-async def login_form(request: Request, next: str | None = None):
+def login_form(request: Request, next: str | None = None):
     return TEMPLATES.TemplateResponse(
         "login.html",
         {"request": request, "error": None, "next": _normalize_next_url(next)},
@@ -28,12 +30,12 @@ async def login_form(request: Request, next: str | None = None):
 
 
 @router.post("/login")
-async def login(
+def login(
     request: Request,
     next: str = Form("/adminbot"),
+    form: FormData = Depends(get_request_form),
     db: Session = Depends(get_db_session),
 ):
-    form = await request.form()
 
     username = (
         form.get("username")
@@ -76,7 +78,7 @@ async def login(
 
 
 @router.post("/logout")
-async def logout(request: Request, db: Session = Depends(get_db_session)):
+def logout(request: Request, db: Session = Depends(get_db_session)):
     token = request.cookies.get(SESSION_COOKIE_NAME)
     if token:
         auth_service.remove_session(db, token)
@@ -92,5 +94,5 @@ async def logout(request: Request, db: Session = Depends(get_db_session)):
 
 
 @router.get("/logout")
-async def logout_get(request: Request, db: Session = Depends(get_db_session)):
-    return await logout(request, db)
+def logout_get(request: Request, db: Session = Depends(get_db_session)):
+    return logout(request, db)
@@ -8,12 +8,18 @@ from fastapi.responses import RedirectResponse
 from sqlalchemy.orm import Session
 
 from admin_panel import TEMPLATES
-from admin_panel.dependencies import SESSION_COOKIE_NAME, get_db_session, require_admin
+from admin_panel.dependencies import (
+    SESSION_COOKIE_NAME,
+    get_db_session,
+    require_admin,
+    require_admin_user,
+)
+from admin_panel.executor import AdminRoute
 from models.admin_user import AdminRole, AdminUser
 from services import auth as auth_service
 from services.passwords import hash_password, verify_password
 
-router = APIRouter(prefix="/admin", tags=["AdminUsers"])
+router = APIRouter(prefix="/admin", tags=["AdminUsers"], route_class=AdminRoute)
 
 
 def _login_redirect(next_url: str) -> RedirectResponse:
@@ -60,7 +66,7 @@ def _parse_role(role_value: str) -> Optional[str]:
 
 
 @router.get("/users")
-async def list_admins(request: Request, db: Session = Depends(get_db_session)):
+def list_admins(request: Request, db: Session = Depends(get_db_session)):
     user = require_admin(request, db, roles=(AdminRole.superadmin,))
     if not user:
         return _login_redirect("/admin/users")
@@ -70,7 +76,7 @@ async def list_admins(request: Request, db: Session = Depends(get_db_session)):
 
 
 @router.post("/users")
-async def create_admin(
+def create_admin(
     request: Request,
     username: str = Form(...),
     password: str = Form(...),
@@ -114,7 +120,7 @@ async def create_admin(
 
 
 @router.post("/users/{user_id}")
-async def update_admin(
+def update_admin(
     request: Request,
     user_id: int,
     username: str = Form(...),
@@ -169,12 +175,13 @@ async def update_admin(
 
     db.add(target)
     db.commit()
+    auth_service.forget_principals(target.id)
 
     return RedirectResponse(url="/admin/users?message=Сохранено", status_code=303)
 
 
 @router.post("/users/{user_id}/reset_password")
-async def reset_password(
+def reset_password(
     request: Request,
     user_id: int,
     new_password: str = Form(...),
@@ -205,8 +212,8 @@ async def reset_password(
 
 
 @router.get("/profile")
-async def profile(request: Request, db: Session = Depends(get_db_session)):
-    user = require_admin(request, db)
+def profile(request: Request, db: Session = Depends(get_db_session)):
+    user = require_admin_user(request, db)
     if not user:
         return _login_redirect("/admin/profile")
 
@@ -223,14 +230,14 @@ async def profile(request: Request, db: Session = Depends(get_db_session)):
 
 
 @router.post("/profile")
-async def update_profile(
+def update_profile(
     request: Request,
     username: str = Form(...),
     old_password: str = Form(""),
     new_password: str = Form(""),
     db: Session = Depends(get_db_session),
 ):
-    user = require_admin(request, db)
+    user = require_admin_user(request, db)
     if not user:
         return _login_redirect("/admin/profile")
 
@@ -8,24 +8,22 @@
 
 import asyncio
 import logging
+import os
+
+# Процесс бота использует собственный пул соединений (см. database.POOL_ROLES).
+os.environ.setdefault("DB_ROLE", "bot")
 
-from aiogram import Bot, Dispatcher
 from aiogram.exceptions import TelegramNetworkError
-from aiogram.enums import ParseMode
-from aiogram.fsm.storage.memory import MemoryStorage
-from aiogram.client.default import DefaultBotProperties  # 👈 ДОБАВИЛИ ЭТОТ ИМПОРТ
-from aiogram.client.session.aiohttp import AiohttpSession
-from aiohttp import ClientError, ClientTimeout
+from aiohttp import ClientError
 from aiohttp.client_exceptions import ServerDisconnectedError
 
+from bot_app import create_bot, create_dispatcher
 from config import get_settings
 from initdb import init_db
 from utils.logging_config import BOT_LOG_FILE, setup_logging
 
-from handlers import admin, baskets, cart, checkout, courses, login, start, webapp
-from handlers import faq, site_chat, support
-from middlewares.user_registration import EnsureUserMiddleware
-
+# polling (по умолчанию) или webhook — см. bot_webhook.py
+BOT_MODE = os.getenv("BOT_MODE", "polling").strip().lower()
 
 
 async def main() -> None:
@@ -38,39 +36,8 @@ async def main() -> None:
     # Инициализация БД (создаём таблицы при первом запуске)
     init_db()
 
-    # Инициализация бота
-    # В aiogram 3.7.0+ parse_mode нужно передавать через DefaultBotProperties
-    session = AiohttpSession(timeout=ClientTimeout(total=60))
-    bot = Bot(
-        token=settings.bot_token,
-        default=DefaultBotProperties(parse_mode=ParseMode.HTML),
-        session=session,
-    )
-
-    # FIX: aiogram может пытаться сложить bot.session.timeout + int
-    # если timeout — ClientTimeout, приводим к секундам
-    if isinstance(getattr(bot.session, "timeout", None), ClientTimeout):
-        bot.session.timeout = int(bot.session.timeout.total or 60)
-    
-    # FSM-хранилище в памяти (для состояний при оформлении заказа и т.п.)
-    dp = Dispatcher(storage=MemoryStorage())
-
-    # Регистрируем пользователя по telegram_id при первом обращении
-    dp.message.middleware(EnsureUserMiddleware())
-    dp.callback_query.middleware(EnsureUserMiddleware())
-
-    # Подключаем актуальные роутеры
-    dp.include_router(admin.router)
-    dp.include_router(baskets.router)
-    dp.include_router(cart.router)
-    dp.include_router(checkout.router)
-    dp.include_router(courses.router)
-    dp.include_router(webapp.router)
-    dp.include_router(faq.faq_router)
-    dp.include_router(site_chat.site_chat_router)
-    dp.include_router(support.support_router)
-    dp.include_router(login.router)
-    dp.include_router(start.router)
+    bot = create_bot(settings)
+    dp = create_dispatcher()
 
     # Старт поллинга
     await bot.delete_webhook(drop_pending_updates=True)
@@ -95,4 +62,9 @@ async def main() -> None:
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    if BOT_MODE == "webhook":
+        import bot_webhook
+
+        bot_webhook.run_standalone()
+    else:
+        asyncio.run(main())
@@ -0,0 +1,57 @@
+"""Сборка Bot и Dispatcher MiniDeN — общая для polling (bot.py) и webhook (bot_webhook.py)."""
+
+from __future__ import annotations
+
+from aiogram import Bot, Dispatcher
+from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.enums import ParseMode
+from aiohttp import ClientTimeout
+
+from config import Settings, get_settings
+from handlers import admin, baskets, cart, checkout, courses, login, start, webapp
+from handlers import faq, site_chat, support
+from middlewares.user_registration import EnsureUserMiddleware
+from services.fsm_storage import make_fsm_storage
+
+
+def create_bot(settings: Settings | None = None) -> Bot:
+    settings = settings or get_settings()
+
+    # В aiogram 3.7.0+ parse_mode нужно передавать через DefaultBotProperties
+    session = AiohttpSession(timeout=ClientTimeout(total=60))
+    bot = Bot(
+        token=settings.bot_token,
+        default=DefaultBotProperties(parse_mode=ParseMode.HTML),
+        session=session,
+    )
+
+    # FIX: aiogram может пытаться сложить bot.session.timeout + int
+    # если timeout — ClientTimeout, приводим к секундам
+    if isinstance(getattr(bot.session, "timeout", None), ClientTimeout):
+        bot.session.timeout = int(bot.session.timeout.total or 60)
+    return bot
+
+
+def create_dispatcher() -> Dispatcher:
+    # FSM-хранилище (оформление заказа, вход, выдача доступа к курсам) общее для
+    # всех процессов бота и переживает рестарт; бэкенд выбирает FSM_STORAGE.
+    dp = Dispatcher(storage=make_fsm_storage())
+
+    # Регистрируем пользователя по telegram_id при первом обращении
+    dp.message.middleware(EnsureUserMiddleware())
+    dp.callback_query.middleware(EnsureUserMiddleware())
+
+    # Подключаем актуальные роутеры
+    dp.include_router(admin.router)
+    dp.include_router(baskets.router)
+    dp.include_router(cart.router)
+    dp.include_router(checkout.router)
+    dp.include_router(courses.router)
+    dp.include_router(webapp.router)
+    dp.include_router(faq.faq_router)
+    dp.include_router(site_chat.site_chat_router)
+    dp.include_router(support.support_router)
+    dp.include_router(login.router)
+    dp.include_router(start.router)
+    return dp
@@ -0,0 +1,320 @@
+"""Приём обновлений Telegram через webhook с пулом обработчиков.
+
+Webhook-эндпоинт не обрабатывает апдейт сам: он кладёт его в ограниченную очередь
+и сразу отвечает Telegram. Апдейты разбирают BOT_WEBHOOK_WORKERS воркеров; у
+каждого воркера своя очередь, и апдейты одного чата всегда попадают к одному и
+тому же воркеру (шардирование по chat_id). Так сообщения одного пользователя
+обрабатываются строго по порядку, а разные чаты — параллельно.
+
+Если очереди заполнены дольше BOT_WEBHOOK_ENQUEUE_TIMEOUT секунд, эндпоинт
+отвечает 503, и Telegram повторит доставку позже.
+
+Режимы запуска:
+- отдельным процессом: BOT_MODE=webhook python bot.py (порт BOT_WEBHOOK_PORT);
+- внутри API: BOT_WEBHOOK_IN_API=1 для uvicorn webapi:app.
+Метрики (глубина очередей, задержки обработки) отдаёт GET {BOT_WEBHOOK_PATH}/metrics —
+только при заданном BOT_WEBHOOK_SECRET и с тем же заголовком, что и webhook.
+
+Апдейт, который не разбирается (битый JSON или не проходит валидацию Update),
+логируется и подтверждается 200: иначе Telegram повторял бы его бесконечно.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import statistics
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from fastapi import APIRouter, FastAPI, Request
+from fastapi.responses import JSONResponse
+from pydantic import ValidationError
+
+logger = logging.getLogger(__name__)
+
+BOT_WEBHOOK_IN_API = os.getenv("BOT_WEBHOOK_IN_API") == "1"
+BOT_WEBHOOK_BASE_URL = os.getenv("BOT_WEBHOOK_BASE_URL", "").rstrip("/")
+BOT_WEBHOOK_PATH = os.getenv("BOT_WEBHOOK_PATH", "/bot/webhook")
+BOT_WEBHOOK_SECRET = os.getenv("BOT_WEBHOOK_SECRET", "")
+BOT_WEBHOOK_WORKERS = int(os.getenv("BOT_WEBHOOK_WORKERS", "8"))
+BOT_WEBHOOK_QUEUE_SIZE = int(os.getenv("BOT_WEBHOOK_QUEUE_SIZE", "1000"))
+BOT_WEBHOOK_ENQUEUE_TIMEOUT = float(os.getenv("BOT_WEBHOOK_ENQUEUE_TIMEOUT", "1"))
+BOT_WEBHOOK_HOST = os.getenv("BOT_WEBHOOK_HOST", "127.0.0.1")
+BOT_WEBHOOK_PORT = int(os.getenv("BOT_WEBHOOK_PORT", "8081"))
+# Путь к JSONL-файлу: входящие апдейты дописываются туда для нагрузочного теста.
+BOT_WEBHOOK_RECORD_FILE = os.getenv("BOT_WEBHOOK_RECORD_FILE", "")
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+LATENCY_WINDOW = 1000
+
+FeedFunc = Callable[[Update], Awaitable[Any]]
+
+
+def shard_key(update: Update) -> int:
+    """chat_id апдейта (или id пользователя), по которому выбирается воркер."""
+
+    try:
+        event = update.event
+    except Exception:
+        return update.update_id
+
+    chat = getattr(event, "chat", None)
+    if chat is None:
+        message = getattr(event, "message", None)
+        chat = getattr(message, "chat", None)
+    if chat is not None:
+        return int(chat.id)
+
+    user = getattr(event, "from_user", None) or getattr(event, "user", None)
+    if user is not None:
+        return int(user.id)
+    return update.update_id
+
+
+def _percentile(values: list[float], percent: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(percent / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class UpdateWorkerPool:
+    def __init__(
+        self,
+        feed: FeedFunc,
+        *,
+        workers: int = BOT_WEBHOOK_WORKERS,
+        queue_size: int = BOT_WEBHOOK_QUEUE_SIZE,
+        enqueue_timeout: float = BOT_WEBHOOK_ENQUEUE_TIMEOUT,
+    ) -> None:
+        self.feed = feed
+        self.workers = max(1, workers)
+        self.queue_size = max(self.workers, queue_size)
+        self.enqueue_timeout = enqueue_timeout
+
+        self._queues: list[asyncio.Queue] = []
+        self._tasks: list[asyncio.Task] = []
+        self._in_flight = 0
+        self._counters = {"received": 0, "processed": 0, "failed": 0, "rejected": 0}
+        self._latencies: deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self._waits: deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+    @classmethod
+    def for_dispatcher(cls, dispatcher: Dispatcher, bot: Bot, **kwargs: Any) -> "UpdateWorkerPool":
+        async def _feed(update: Update) -> Any:
+            return await dispatcher.feed_update(bot, update)
+
+        return cls(_feed, **kwargs)
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        per_worker = self.queue_size // self.workers
+        self._queues = [asyncio.Queue(maxsize=per_worker) for _ in range(self.workers)]
+        loop = asyncio.get_running_loop()
+        self._tasks = [
+            loop.create_task(self._worker(queue), name=f"bot-update-worker-{index}")
+            for index, queue in enumerate(self._queues)
+        ]
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Дать воркерам доработать очередь (не дольше timeout) и остановить их."""
+
+        if self._queues:
+            try:
+                await asyncio.wait_for(
+                    asyncio.gather(*(queue.join() for queue in self._queues)), timeout=timeout
+                )
+            except asyncio.TimeoutError:
+                logger.warning("Bot update queue not drained in %ss, %s updates dropped", timeout, self.queue_depth())
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._queues = []
+
+    async def submit(self, update: Update) -> bool:
+        """Поставить апдейт в очередь его чата. False — очередь переполнена."""
+
+        self._counters["received"] += 1
+        queue = self._queues[shard_key(update) % self.workers]
+        item = (update, time.perf_counter())
+        try:
+            queue.put_nowait(item)
+        except asyncio.QueueFull:
+            try:
+                await asyncio.wait_for(queue.put(item), timeout=self.enqueue_timeout)
+            except asyncio.TimeoutError:
+                self._counters["rejected"] += 1
+                return False
+        return True
+
+    async def _worker(self, queue: asyncio.Queue) -> None:
+        while True:
+            update, enqueued_at = await queue.get()
+            started = time.perf_counter()
+            self._waits.append((started - enqueued_at) * 1000)
+            self._in_flight += 1
+            try:
+                await self.feed(update)
+                self._counters["processed"] += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self._counters["failed"] += 1
+                logger.exception("Bot update %s failed", update.update_id)
+            finally:
+                self._in_flight -= 1
+                self._latencies.append((time.perf_counter() - started) * 1000)
+                queue.task_done()
+
+    def queue_depth(self) -> int:
+        return sum(queue.qsize() for queue in self._queues)
+
+    def metrics(self) -> dict[str, Any]:
+        latencies = list(self._latencies)
+        waits = list(self._waits)
+        return {
+            **self._counters,
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "queue_depth": self.queue_depth(),
+            "queue_depth_max_shard": max((queue.qsize() for queue in self._queues), default=0),
+            "in_flight": self._in_flight,
+            "handler_ms": {
+                "mean": round(statistics.mean(latencies), 2) if latencies else 0.0,
+                "p50": round(_percentile(latencies, 50), 2),
+                "p95": round(_percentile(latencies, 95), 2),
+                "max": round(max(latencies), 2) if latencies else 0.0,
+            },
+            "queue_wait_ms": {
+                "p50": round(_percentile(waits, 50), 2),
+                "p95": round(_percentile(waits, 95), 2),
+            },
+        }
+
+
+class BotWebhookService:
+    """Bot + Dispatcher + пул воркеров и FastAPI-роутер webhook."""
+
+    def __init__(self, *, path: str = BOT_WEBHOOK_PATH, secret: str = BOT_WEBHOOK_SECRET) -> None:
+        self.path = path
+        self.secret = secret
+        self.bot: Bot | None = None
+        self.dispatcher: Dispatcher | None = None
+        self.pool: UpdateWorkerPool | None = None
+        self.router = self._build_router()
+
+    def _authorized(self, request: Request) -> bool:
+        return not self.secret or request.headers.get(SECRET_HEADER) == self.secret
+
+    def _build_router(self) -> APIRouter:
+        router = APIRouter()
+
+        @router.post(self.path, include_in_schema=False)
+        async def telegram_webhook(request: Request):
+            if not self._authorized(request):
+                return JSONResponse({"ok": False}, status_code=403)
+            if self.pool is None or self.bot is None:
+                return JSONResponse({"ok": False, "detail": "not ready"}, status_code=503)
+            try:
+                payload = await request.json()
+            except ValueError:
+                logger.warning("Bot webhook: body is not JSON, update skipped")
+                return {"ok": True}
+            if BOT_WEBHOOK_RECORD_FILE:
+                _record_update(payload)
+            try:
+                update = Update.model_validate(payload, context={"bot": self.bot})
+            except ValidationError as exc:
+                update_id = payload.get("update_id") if isinstance(payload, dict) else None
+                logger.warning("Bot webhook: invalid update %s skipped: %s", update_id, exc)
+                return {"ok": True}
+            if not await self.pool.submit(update):
+                return JSONResponse({"ok": False, "detail": "queue is full"}, status_code=503)
+            return {"ok": True}
+
+        if not self.secret:
+            # Без секрета метрики были бы открыты всем на публичном хосте API.
+            return router
+
+        @router.get(f"{self.path}/metrics", include_in_schema=False)
+        async def telegram_webhook_metrics(request: Request):
+            if not self._authorized(request):
+                return JSONResponse({"ok": False}, status_code=403)
+            return self.pool.metrics() if self.pool is not None else {}
+
+        return router
+
+    async def start(self) -> None:
+        from bot_app import create_bot, create_dispatcher
+
+        self.bot = create_bot()
+        self.dispatcher = create_dispatcher()
+        self.pool = UpdateWorkerPool.for_dispatcher(self.dispatcher, self.bot)
+        self.pool.start()
+        await self.dispatcher.emit_startup(bot=self.bot, dispatcher=self.dispatcher, **self.dispatcher.workflow_data)
+
+        if BOT_WEBHOOK_BASE_URL:
+            await self.bot.set_webhook(
+                f"{BOT_WEBHOOK_BASE_URL}{self.path}",
+                secret_token=self.secret or None,
+                allowed_updates=self.dispatcher.resolve_used_update_types(),
+                max_connections=min(100, max(1, self.pool.workers * 5)),
+            )
+            logger.info("Telegram webhook set to %s%s", BOT_WEBHOOK_BASE_URL, self.path)
+        else:
+            logger.warning("BOT_WEBHOOK_BASE_URL is empty: webhook is not registered in Telegram")
+
+    async def stop(self) -> None:
+        if self.pool is not None:
+            await self.pool.stop()
+        if self.dispatcher is not None and self.bot is not None:
+            # Закрывает и FSM-хранилище (дописывает отложенные изменения).
+            await self.dispatcher.emit_shutdown(bot=self.bot, dispatcher=self.dispatcher, **self.dispatcher.workflow_data)
+        if self.bot is not None:
+            await self.bot.session.close()
+        self.pool = None
+
+
+def _record_update(payload: dict[str, Any]) -> None:
+    try:
+        with open(BOT_WEBHOOK_RECORD_FILE, "a", encoding="utf-8") as fh:
+            fh.write(json.dumps(payload, ensure_ascii=False) + "\n")
+    except OSError:
+        logger.exception("Failed to record bot update to %s", BOT_WEBHOOK_RECORD_FILE)
+
+
+def create_standalone_app() -> FastAPI:
+    service = BotWebhookService()
+
+    @asynccontextmanager
+    async def _lifespan(app: FastAPI):
+        await service.start()
+        try:
+            yield
+        finally:
+            await service.stop()
+
+    app = FastAPI(title="MiniDeN bot webhook", lifespan=_lifespan)
+    app.include_router(service.router)
+    return app
+
+
+def run_standalone() -> None:
+    import uvicorn
+
+    from initdb import init_db
+    from utils.logging_config import BOT_LOG_FILE, setup_logging
+
+    setup_logging(level=logging.INFO, log_file=BOT_LOG_FILE)
+    init_db()
+    uvicorn.run(create_standalone_app(), host=BOT_WEBHOOK_HOST, port=BOT_WEBHOOK_PORT)
@@ -3,14 +3,31 @@
 Используется одновременно Telegram-ботом и backend webapi.py.
 Таблицы создаются через Base.metadata.create_all.
 .env НЕ изменяем.
+
+Пулы соединений настраиваются через окружение и разделены по ролям
+(api, bot, jobs, admin). Роль процесса задаёт DB_ROLE, параметры пула —
+DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE,
+DB_POOL_PRE_PING; переопределение для роли: DB_<ROLE>_POOL_SIZE и т.д. Роль admin — отдельный
+небольшой пул для запросов админок внутри процесса API: тяжёлые операции
+админки не забирают соединения у публичных маршрутов. Роль jobs — пул фоновых
+воркеров (outbox, обслуживание bot_logs, воронка, сверка user_stats): они берут
+соединения через get_session("jobs") в любом процессе.
 """
 
+import asyncio
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
-from typing import Iterator
+from dataclasses import dataclass
+from functools import partial
+from typing import Any, Callable, Iterator, TypeVar
 
-from sqlalchemy import create_engine
+from sqlalchemy import Engine, create_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.orm import Session, declarative_base, sessionmaker
+from sqlalchemy.pool import QueuePool
 
 
 
@@ -25,20 +42,207 @@ DATABASE_URL = os.getenv(
     f"postgresql+psycopg2://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}",
 )
 
-engine = create_engine(DATABASE_URL, future=True, echo=os.getenv("SQLALCHEMY_ECHO") == "1")
-SessionLocal = sessionmaker(
-    bind=engine,
-    autoflush=False,
-    autocommit=False,
-    expire_on_commit=False,
-    future=True,
-)
+POOL_ROLES = ("api", "bot", "jobs", "admin")
+DB_ROLE = (os.getenv("DB_ROLE") or "api").strip().lower()
+if DB_ROLE not in POOL_ROLES:
+    DB_ROLE = "api"
+
+
+@dataclass(frozen=True)
+class PoolSettings:
+    pool_size: int
+    max_overflow: int
+    pool_timeout: float
+    pool_recycle: int
+    pool_pre_ping: bool
+
+
+_POOL_DEFAULTS: dict[str, PoolSettings] = {
+    "api": PoolSettings(pool_size=10, max_overflow=10, pool_timeout=30, pool_recycle=1800, pool_pre_ping=True),
+    "bot": PoolSettings(pool_size=5, max_overflow=5, pool_timeout=30, pool_recycle=1800, pool_pre_ping=True),
+    "jobs": PoolSettings(pool_size=2, max_overflow=2, pool_timeout=30, pool_recycle=1800, pool_pre_ping=True),
+    "admin": PoolSettings(pool_size=4, max_overflow=2, pool_timeout=30, pool_recycle=1800, pool_pre_ping=True),
+}
+
+
+def _pool_env(role: str, name: str) -> str | None:
+    value = os.getenv(f"DB_{role.upper()}_{name}")
+    if value is None or not value.strip():
+        value = os.getenv(f"DB_{name}")
+    return value.strip() if value and value.strip() else None
+
+
+def load_pool_settings(role: str) -> PoolSettings:
+    defaults = _POOL_DEFAULTS.get(role, _POOL_DEFAULTS["api"])
+
+    def _int(name: str, default: int) -> int:
+        raw = _pool_env(role, name)
+        try:
+            return int(raw) if raw is not None else default
+        except ValueError:
+            return default
+
+    def _float(name: str, default: float) -> float:
+        raw = _pool_env(role, name)
+        try:
+            return float(raw) if raw is not None else default
+        except ValueError:
+            return default
+
+    pre_ping_raw = _pool_env(role, "POOL_PRE_PING")
+    pre_ping = defaults.pool_pre_ping if pre_ping_raw is None else pre_ping_raw.lower() in {"1", "true", "yes", "on"}
+
+    return PoolSettings(
+        pool_size=_int("POOL_SIZE", defaults.pool_size),
+        max_overflow=_int("MAX_OVERFLOW", defaults.max_overflow),
+        pool_timeout=_float("POOL_TIMEOUT", defaults.pool_timeout),
+        pool_recycle=_int("POOL_RECYCLE", defaults.pool_recycle),
+        pool_pre_ping=pre_ping,
+    )
+
+
+class PoolMetrics:
+    """Счётчики выдачи соединений из пула: ожидание, таймауты, максимум."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.waited_checkouts = 0
+        self.timeouts = 0
+        self.wait_total_ms = 0.0
+        self.wait_max_ms = 0.0
+
+    def record(self, wait_ms: float, *, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            if wait_ms >= 1.0:
+                self.waited_checkouts += 1
+            self.wait_total_ms += wait_ms
+            self.wait_max_ms = max(self.wait_max_ms, wait_ms)
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            attempts = self.checkouts + self.timeouts
+            return {
+                "checkouts_total": self.checkouts,
+                "waited_checkouts_total": self.waited_checkouts,
+                "timeouts_total": self.timeouts,
+                "wait_time_total_ms": round(self.wait_total_ms, 3),
+                "wait_time_avg_ms": round(self.wait_total_ms / attempts, 3) if attempts else 0.0,
+                "wait_time_max_ms": round(self.wait_max_ms, 3),
+            }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool, замеряющий время ожидания свободного соединения."""
+
+    metrics: PoolMetrics
+
+    def _do_get(self):  # type: ignore[override]
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.record((time.perf_counter() - started) * 1000, timed_out=True)
+            raise
+        self.metrics.record((time.perf_counter() - started) * 1000)
+        return connection
+
+
+_engines: dict[str, Engine] = {}
+_sessionmakers: dict[str, sessionmaker] = {}
+_pool_settings: dict[str, PoolSettings] = {}
+_engines_lock = threading.Lock()
+
+
+def create_role_engine(role: str, url: str = DATABASE_URL) -> Engine:
+    settings = load_pool_settings(role)
+    # Отдельный класс на роль: метрики переживают engine.dispose()/pool.recreate().
+    pool_class = type(
+        f"{role.capitalize()}QueuePool", (InstrumentedQueuePool,), {"metrics": PoolMetrics()}
+    )
+    role_engine = create_engine(
+        url,
+        future=True,
+        echo=os.getenv("SQLALCHEMY_ECHO") == "1",
+        poolclass=pool_class,
+        pool_size=settings.pool_size,
+        max_overflow=settings.max_overflow,
+        pool_timeout=settings.pool_timeout,
+        pool_recycle=settings.pool_recycle,
+        pool_pre_ping=settings.pool_pre_ping,
+    )
+    _pool_settings[role] = settings
+    return role_engine
+
+
+def get_engine(role: str | None = None) -> Engine:
+    role = role or DB_ROLE
+    role_engine = _engines.get(role)
+    if role_engine is not None:
+        return role_engine
+    with _engines_lock:
+        if role not in _engines:
+            _engines[role] = create_role_engine(role)
+        return _engines[role]
+
+
+def get_sessionmaker(role: str | None = None) -> sessionmaker:
+    role = role or DB_ROLE
+    factory = _sessionmakers.get(role)
+    if factory is None:
+        factory = sessionmaker(
+            bind=get_engine(role),
+            autoflush=False,
+            autocommit=False,
+            expire_on_commit=False,
+            future=True,
+        )
+        _sessionmakers[role] = factory
+    return factory
+
+
+def get_pool_stats() -> dict[str, dict[str, Any]]:
+    """Состояние пулов всех ролей, созданных в текущем процессе."""
+
+    stats: dict[str, dict[str, Any]] = {}
+    for role, role_engine in list(_engines.items()):
+        pool = role_engine.pool
+        settings = _pool_settings.get(role)
+        entry: dict[str, Any] = {
+            "pool_size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": settings.max_overflow if settings else None,
+            "pool_timeout": settings.pool_timeout if settings else None,
+            "pool_recycle": settings.pool_recycle if settings else None,
+            "pool_pre_ping": settings.pool_pre_ping if settings else None,
+        }
+        metrics = getattr(pool, "metrics", None)
+        if isinstance(metrics, PoolMetrics):
+            entry.update(metrics.snapshot())
+        stats[role] = entry
+    return stats
+
+
+engine = get_engine(DB_ROLE)
+SessionLocal = get_sessionmaker(DB_ROLE)
 Base = declarative_base()
 
+T = TypeVar("T")
+
+# Пул потоков для синхронной работы с БД из asyncio-кода (хендлеры бота).
+DB_EXECUTOR_WORKERS = int(os.getenv("DB_EXECUTOR_WORKERS", "8"))
+_db_executor: ThreadPoolExecutor | None = None
+
 
 @contextmanager
-def get_session() -> Iterator[Session]:
-    session = SessionLocal()
+def get_session(role: str | None = None) -> Iterator[Session]:
+    session = SessionLocal() if role is None else get_sessionmaker(role)()
     try:
         yield session
         session.commit()
@@ -56,3 +260,28 @@ def get_db() -> Iterator[Session]:
     finally:
         db.close()
 
+
+def get_db_executor() -> ThreadPoolExecutor:
+    global _db_executor
+    if _db_executor is None:
+        _db_executor = ThreadPoolExecutor(
+            max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix="db"
+        )
+    return _db_executor
+
+
+async def run_db(func: Callable[..., T], /, *args: Any, **kwargs: Any) -> T:
+    """Выполнить синхронную функцию с запросами к БД в пуле потоков, не блокируя event loop."""
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_db_executor(), partial(func, *args, **kwargs))
+
+
+async def run_in_session(func: Callable[[Session], T]) -> T:
+    """Асинхронный аналог get_session(): func(session) выполняется в пуле потоков с commit/rollback."""
+
+    def _call() -> T:
+        with get_session() as session:
+            return func(session)
+
+    return await run_db(_call)
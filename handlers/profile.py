@@ -3,6 +3,7 @@ from aiogram.filters import Command
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup, WebAppInfo
 
 from config import ADMIN_IDS, get_settings
+from services import media_registry
 from utils.telegram import answer_with_thread
 from services.subscription import ensure_subscribed
 
@@ -42,9 +43,11 @@ async def show_profile(message: types.Message) -> None:
     if not await ensure_subscribed(message, message.bot, is_admin=is_admin):
         return
 
-    banner = get_settings().banner_profile
+    banner_source = get_settings().banner_profile
+    banner = await media_registry.resolve_photo(message.bot.id, banner_source)
     if banner:
-        await message.answer_photo(photo=banner, caption="👤 Ваш профиль")
+        sent = await message.answer_photo(photo=banner, caption="👤 Ваш профиль")
+        await media_registry.remember_photo(message.bot.id, banner_source, sent, used=banner)
 
     await answer_with_thread(message, WEBAPP_PROFILE_MESSAGE, reply_markup=_build_profile_keyboard())
 
@@ -18,21 +18,20 @@ from aiogram.types import (
 from aiohttp import ClientError
 
 from config import ADMIN_IDS, ADMIN_IDS_SET, get_settings
-from database import get_session
-from models import AuthSession, User, UserState, UserTag, UserVar
+from database import get_session, run_db
+from models import User, UserState, UserTag, UserVar
+from services import auth_sessions as auth_sessions_service
+from services import media_registry
 from services import users as users_service
 from services.bot_config import (
-    BotTriggerView,
     MenuButtonView,
     NodeButtonView,
     NodeView,
-    cache_node_image_file_id,
     get_start_node_code,
     load_button,
     load_menu_buttons,
     load_node,
-    load_triggers,
-    persist_node_image_file_id,
+    load_trigger_matcher,
 )
 from services.bot_logging import (
     log_action_event,
@@ -185,7 +184,7 @@ def _remember_bot_message(user_id: int, bot_message: types.Message | None) -> No
 
 
 async def _clear_previous_bot_messages(message: types.Message) -> None:
-    tracked = _get_tracked_messages(message.from_user.id)
+    tracked = await run_db(_get_tracked_messages, message.from_user.id)
     if not tracked:
         return
 
@@ -198,7 +197,7 @@ async def _clear_previous_bot_messages(message: types.Message) -> None:
         except Exception:
             continue
 
-    _save_tracked_messages(message.from_user.id, [])
+    await run_db(_save_tracked_messages, message.from_user.id, [])
 
 
 def _extract_node_code_from_payload(raw_payload: str | None) -> tuple[str | None, str]:
@@ -221,7 +220,7 @@ async def _answer_and_track(message: types.Message, text: str, **kwargs):
     if not sent:
         return None
 
-    _remember_bot_message(message.from_user.id, sent)
+    await run_db(_remember_bot_message, message.from_user.id, sent)
     return sent
 
 
@@ -360,7 +359,7 @@ def _build_subscription_keyboard(node: NodeView) -> InlineKeyboardMarkup:
 async def _send_subscription_prompt(
     message: types.Message, node: NodeView, *, text_override: str | None = None
 ) -> None:
-    user_vars = _load_user_vars(message.from_user.id)
+    user_vars = await run_db(_load_user_vars, message.from_user.id)
     keyboard = _build_subscription_keyboard(node)
     text = text_override or node.message_text
     await _send_message_node(message, node, user_vars, reply_markup=keyboard)
@@ -371,12 +370,8 @@ async def _send_message_node(
 ) -> None:
     settings = get_settings()
     keyboard = reply_markup if reply_markup is not None else node.keyboard
-    photo = (
-        (node.config_json or {}).get("image_file_id")
-        or _to_absolute_media(node.image_url)
-        or settings.banner_start
-        or settings.start_banner_id
-    )
+    photo_source = node.image_url or settings.banner_start or settings.start_banner_id
+    photo = await media_registry.resolve_photo(message.bot.id, photo_source, to_upload=_to_absolute_media)
     context_vars = _build_template_context(message.from_user, user_vars)
     rendered_text = _apply_variables(node.message_text, context_vars)
 
@@ -391,12 +386,9 @@ async def _send_message_node(
             reply_markup=keyboard,
             fallback_text=rendered_text,
         )
+        await media_registry.remember_photo(message.bot.id, photo_source, sent_message, used=photo)
         if sent_message:
-            if sent_message.photo:
-                photo_id = sent_message.photo[-1].file_id
-                cache_node_image_file_id(node.code, photo_id)
-                persist_node_image_file_id(node.code, photo_id)
-            _remember_bot_message(message.from_user.id, sent_message)
+            await run_db(_remember_bot_message, message.from_user.id, sent_message)
             return
         # Fallback to text if Telegram rejects the image URL or network error occurred
 
@@ -409,7 +401,7 @@ async def _send_message_node(
     if not sent_message:
         return
 
-    _remember_bot_message(message.from_user.id, sent_message)
+    await run_db(_remember_bot_message, message.from_user.id, sent_message)
 
 
 async def _send_input_node(message: types.Message, node: NodeView, user_vars: dict[str, str]) -> None:
@@ -423,17 +415,17 @@ async def _send_input_node(message: types.Message, node: NodeView, user_vars: di
             reply_markup=_build_contact_keyboard(node),
         )
 
-    _set_waiting_state(message.from_user.id, node)
+    await run_db(_set_waiting_state, message.from_user.id, node)
 
 
 async def _send_node(message: types.Message, node: NodeView, *, remove_reply_keyboard: bool = False) -> None:
-    user_vars = _load_user_vars(message.from_user.id)
+    user_vars = await run_db(_load_user_vars, message.from_user.id)
     log_node_event(
         user_id=message.from_user.id,
         username=message.from_user.username,
         node_code=node.code,
     )
-    _remember_current_node(message.from_user.id, node.code)
+    await run_db(_remember_current_node, message.from_user.id, node.code)
     reply_keyboard = _build_reply_keyboard(node) or _build_global_reply_keyboard()
     if node.clear_chat:
         await _clear_previous_bot_messages(message)
@@ -442,7 +434,7 @@ async def _send_node(message: types.Message, node: NodeView, *, remove_reply_key
     else:
         await _apply_reply_keyboard(message, ReplyKeyboardRemove())
     if node.node_type == "CONDITION":
-        _clear_user_state(message.from_user.id)
+        await run_db(_clear_user_state, message.from_user.id)
         if _is_subscription_condition(node):
             await _send_subscription_prompt(message, node)
             return
@@ -459,7 +451,7 @@ async def _send_node(message: types.Message, node: NodeView, *, remove_reply_key
     if node.node_type == "INPUT":
         await _send_input_node(message, node, user_vars)
     else:
-        _clear_user_state(message.from_user.id)
+        await run_db(_clear_user_state, message.from_user.id)
         await _send_message_node(message, node, user_vars)
 
 
@@ -552,76 +544,25 @@ def _extract_command(text: str) -> str:
     return normalized[1:].split(maxsplit=1)[0].lower()
 
 
-def _matches_text_trigger(trigger: BotTriggerView, normalized_text: str) -> bool:
-    value = (trigger.trigger_value or "").strip().lower()
-    if not value:
-        return False
-
-    mode = (trigger.match_mode or "EXACT").upper()
-    if mode == "CONTAINS":
-        return value in normalized_text
-    if mode == "STARTS_WITH":
-        return normalized_text.startswith(value)
-    return normalized_text == value
-
-
-def _matches_command_trigger(trigger: BotTriggerView, command: str) -> bool:
-    value = (trigger.trigger_value or "").strip().lower()
-    if not value:
-        return False
-
-    mode = (trigger.match_mode or "EXACT").upper()
-    if mode == "STARTS_WITH":
-        return command.startswith(value)
-    if mode == "CONTAINS":
-        return value in command
-    return command == value
-
-
 async def _process_triggers(
     message: types.Message, *, text_override: str | None = None
 ) -> bool:
     text_value = (text_override or message.text or "").strip()
     normalized_text = text_value.lower()
     command = _extract_command(text_value)
-    triggers = load_triggers()
-
-    for trigger in triggers:
-        trigger_type = (trigger.trigger_type or "").upper()
-        if trigger_type == "COMMAND":
-            if command and _matches_command_trigger(trigger, command):
-                log_trigger_event(
-                    user_id=message.from_user.id,
-                    username=message.from_user.username,
-                    trigger_type="COMMAND",
-                    trigger_value=trigger.trigger_value,
-                    target_node=trigger.target_node_code,
-                )
-                await _open_node_with_fallback(message, trigger.target_node_code)
-                return True
-        elif trigger_type == "TEXT":
-            if text_value and _matches_text_trigger(trigger, normalized_text):
-                log_trigger_event(
-                    user_id=message.from_user.id,
-                    username=message.from_user.username,
-                    trigger_type="TEXT",
-                    trigger_value=trigger.trigger_value,
-                    target_node=trigger.target_node_code,
-                )
-                await _open_node_with_fallback(message, trigger.target_node_code)
-                return True
-        elif trigger_type == "FALLBACK":
-            log_trigger_event(
-                user_id=message.from_user.id,
-                username=message.from_user.username,
-                trigger_type="FALLBACK",
-                trigger_value=trigger.trigger_value,
-                target_node=trigger.target_node_code,
-            )
-            await _open_node_with_fallback(message, trigger.target_node_code)
-            return True
+    trigger = load_trigger_matcher().match(normalized_text, command)
+    if trigger is None:
+        return False
 
-    return False
+    log_trigger_event(
+        user_id=message.from_user.id,
+        username=message.from_user.username,
+        trigger_type=(trigger.trigger_type or "").upper(),
+        trigger_value=trigger.trigger_value,
+        target_node=trigger.target_node_code,
+    )
+    await _open_node_with_fallback(message, trigger.target_node_code)
+    return True
 
 
 def _evaluate_condition(node: NodeView, user_vars: dict[str, str]) -> bool:
@@ -684,7 +625,7 @@ def _evaluate_condition(node: NodeView, user_vars: dict[str, str]) -> bool:
 
 
 async def _handle_cancel_action(message: types.Message, state: UserState) -> None:
-    _clear_user_state(state.user_id)
+    await run_db(_clear_user_state, state.user_id)
     if state.next_node_code_cancel:
         await _open_node_by_code(message, state.next_node_code_cancel)
     else:
@@ -694,13 +635,15 @@ async def _handle_cancel_action(message: types.Message, state: UserState) -> Non
 
 
 def _ensure_user_exists(telegram_user: types.User) -> None:
-    users_service.get_or_create_user_from_telegram(
+    # Без кэша профилей: /start должен восстановить удалённого или слитого пользователя.
+    users_service.ensure_user_from_telegram(
         {
             "id": telegram_user.id,
             "username": telegram_user.username,
             "first_name": telegram_user.first_name,
             "last_name": telegram_user.last_name,
-        }
+        },
+        force=True,
     )
 
 
@@ -946,7 +889,7 @@ async def _execute_single_action(
                 return False, None
             value = _apply_variables(str(payload.get("value", "")), context)
             user_vars[key] = value
-            _save_user_var(message.from_user.id, key, value)
+            await run_db(_save_user_var, message.from_user.id, key, value)
             return False, None
 
         if action_type == "CLEAR_VAR":
@@ -955,7 +898,7 @@ async def _execute_single_action(
                 logger.error("[ACTION] CLEAR_VAR: отсутствует ключ переменной (узел=%s)", node.code)
                 return False, None
             user_vars.pop(key, None)
-            _delete_user_var(message.from_user.id, key)
+            await run_db(_delete_user_var, message.from_user.id, key)
             return False, None
 
         if action_type in {"INCREMENT_VAR", "DECREMENT_VAR"}:
@@ -974,7 +917,7 @@ async def _execute_single_action(
             delta = step if action_type == "INCREMENT_VAR" else -step
             new_value = current + delta
             user_vars[key] = str(new_value)
-            _save_user_var(message.from_user.id, key, str(new_value))
+            await run_db(_save_user_var, message.from_user.id, key, str(new_value))
             return False, None
 
         if action_type == "ADD_TAG":
@@ -988,7 +931,7 @@ async def _execute_single_action(
                     details="ADD_TAG: отсутствует тег",
                 )
                 return False, None
-            _add_user_tag(message.from_user.id, tag)
+            await run_db(_add_user_tag, message.from_user.id, tag)
             return False, None
 
         if action_type == "REMOVE_TAG":
@@ -1002,7 +945,7 @@ async def _execute_single_action(
                     details="REMOVE_TAG: отсутствует тег",
                 )
                 return False, None
-            _remove_user_tag(message.from_user.id, tag)
+            await run_db(_remove_user_tag, message.from_user.id, tag)
             return False, None
 
         if action_type == "SEND_MESSAGE":
@@ -1030,7 +973,7 @@ async def _execute_single_action(
                     details="SEND_ADMIN_MESSAGE: пустой текст",
                 )
                 return False, None
-            admin_ids = _get_admin_telegram_ids()
+            admin_ids = await run_db(_get_admin_telegram_ids)
             for admin_id in admin_ids:
                 try:
                     await send_message_with_thread(
@@ -1101,7 +1044,7 @@ async def _execute_single_action(
 
 
 async def _execute_action_node(message: types.Message, node: NodeView, user_vars: dict[str, str]) -> None:
-    _clear_user_state(message.from_user.id)
+    await run_db(_clear_user_state, message.from_user.id)
     for action in sorted(node.actions, key=lambda a: (a.sort_order, a.action_type)):
         if not action.is_enabled:
             continue
@@ -1135,19 +1078,18 @@ async def cmd_start_deeplink(message: types.Message, command: CommandObject):
 
     token = payload[len("auth_") :]
 
-    _ensure_user_exists(message.from_user)
+    await run_db(_ensure_user_exists, message.from_user)
 
     # связываем token ↔ telegram_id
-    with get_session() as s:
-        session = s.query(AuthSession).filter(AuthSession.token == token).first()
-        if not session:
-            await _answer_and_track(
-                message,
-                "Ссылка для авторизации устарела или неверна. Попробуйте начать авторизацию на сайте заново.",
-            )
-            return
-
-        session.telegram_id = message.from_user.id
+    attached = await run_db(
+        auth_sessions_service.attach_telegram_id, token, message.from_user.id
+    )
+    if not attached:
+        await _answer_and_track(
+            message,
+            "Ссылка для авторизации устарела или неверна. Попробуйте начать авторизацию на сайте заново.",
+        )
+        return
 
     await _answer_and_track(
         message,
@@ -1161,7 +1103,7 @@ async def cmd_start(message: types.Message):
     user_id = message.from_user.id
     is_admin = user_id in ADMIN_IDS
 
-    _ensure_user_exists(message.from_user)
+    await run_db(_ensure_user_exists, message.from_user)
 
     payload = (message.text or "").split(maxsplit=1)
     deep_link = payload[1] if len(payload) > 1 else ""
@@ -1195,7 +1137,7 @@ async def start_button(message: types.Message):
     user_id = message.from_user.id
     is_admin = user_id in ADMIN_IDS
 
-    _ensure_user_exists(message.from_user)
+    await run_db(_ensure_user_exists, message.from_user)
 
     if await _open_start_node(message, is_admin=is_admin):
         return
@@ -1242,7 +1184,7 @@ async def open_menu_command(message: types.Message):
     user_id = message.from_user.id
     is_admin = user_id in ADMIN_IDS
 
-    _ensure_user_exists(message.from_user)
+    await run_db(_ensure_user_exists, message.from_user)
 
     if await _open_start_node(message, is_admin=is_admin):
         return
@@ -1252,12 +1194,13 @@ async def open_menu_command(message: types.Message):
 
 
 async def _send_start_screen(message: types.Message, is_admin: bool) -> None:
-    _remember_current_node(message.from_user.id, None)
+    await run_db(_remember_current_node, message.from_user.id, None)
     if await _send_dynamic_start_screen(message, None):
         return
 
     settings = get_settings()
-    banner = settings.banner_start or settings.start_banner_id
+    banner_source = settings.banner_start or settings.start_banner_id
+    banner = await media_registry.resolve_photo(message.bot.id, banner_source, to_upload=_to_absolute_media)
 
     if banner:
         sent = await _safe_answer_photo(
@@ -1266,12 +1209,10 @@ async def _send_start_screen(message: types.Message, is_admin: bool) -> None:
             caption=format_start_text(),
             fallback_text=format_start_text(),
         )
+        await media_registry.remember_photo(message.bot.id, banner_source, sent, used=banner)
         if not sent:
             return
-        if sent.photo:
-            settings.start_banner_id = sent.photo[-1].file_id
-            settings.banner_start = settings.start_banner_id
-        _remember_bot_message(message.from_user.id, sent)
+        await run_db(_remember_bot_message, message.from_user.id, sent)
     else:
         await _answer_and_track(
             message,
@@ -1428,7 +1369,7 @@ async def handle_subscription_check_callback(callback: CallbackQuery):
 @router.callback_query(F.data.startswith("INPUT_CANCEL:"))
 async def handle_input_cancel(callback: CallbackQuery):
     _, node_code = callback.data.split(":", maxsplit=1)
-    state = _get_user_state(callback.from_user.id)
+    state = await run_db(_get_user_state, callback.from_user.id)
     if not state or not state.waiting_node_code:
         await callback.answer("Нечего отменять")
         return
@@ -1454,16 +1395,20 @@ async def handle_send_text(callback: CallbackQuery):
     await callback.answer()
 
 
-@router.message(lambda message: bool(_get_user_state(message.from_user.id)))
+async def _has_user_state(message: types.Message) -> bool:
+    return bool(await run_db(_get_user_state, message.from_user.id))
+
+
+@router.message(_has_user_state)
 async def handle_waiting_input(message: types.Message):
-    state = _get_user_state(message.from_user.id)
+    state = await run_db(_get_user_state, message.from_user.id)
     if not state or not state.waiting_node_code:
         return
 
     node = load_node(state.waiting_node_code)
     if not node:
         await _answer_and_track(message, "Ошибка конфигурации: узел не найден")
-        _clear_user_state(message.from_user.id)
+        await run_db(_clear_user_state, message.from_user.id)
         log_error_event(
             user_id=message.from_user.id,
             username=message.from_user.username,
@@ -1483,9 +1428,9 @@ async def handle_waiting_input(message: types.Message):
         return
 
     if node.input_var_key:
-        _save_user_var(message.from_user.id, node.input_var_key, value)
+        await run_db(_save_user_var, message.from_user.id, node.input_var_key, value)
 
-    _clear_user_state(message.from_user.id)
+    await run_db(_clear_user_state, message.from_user.id)
 
     if not node.next_node_code_success:
         await _answer_and_track(message, "Ошибка конфигурации: узел не найден")
@@ -1502,7 +1447,7 @@ async def handle_waiting_input(message: types.Message):
 
 @router.message(F.text)
 async def handle_reply_buttons_or_triggers(message: types.Message):
-    current_node_code = _get_current_node_code(message.from_user.id)
+    current_node_code = await run_db(_get_current_node_code, message.from_user.id)
     if current_node_code:
         node = load_node(current_node_code)
         if node:
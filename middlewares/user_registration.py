@@ -1,14 +1,25 @@
+import asyncio
 import logging
 from typing import Any, Awaitable, Callable
 
 from aiogram import BaseMiddleware
 from aiogram.types import TelegramObject
 
+from database import run_db
 from services import users as users_service
 
 
 class EnsureUserMiddleware(BaseMiddleware):
-    """Создаёт или обновляет пользователя по telegram_id при первом обращении."""
+    """Создаёт или обновляет пользователя по telegram_id при первом обращении.
+
+    В БД идём, только если профиль (username, имя, фамилия) не совпадает с
+    закэшированным в services.users. Нового для процесса пользователя сохраняем
+    до вызова обработчика: обработчики рассчитывают, что запись в users уже есть.
+    Изменение профиля известного пользователя пишется в фоне и обработчик не ждёт.
+    """
+
+    def __init__(self) -> None:
+        self._background: set[asyncio.Task] = set()
 
     async def __call__(
         self,
@@ -19,16 +30,24 @@ class EnsureUserMiddleware(BaseMiddleware):
         telegram_user = getattr(event, "from_user", None)
 
         if telegram_user:
-            try:
-                users_service.get_or_create_user_from_telegram(
-                    {
-                        "id": telegram_user.id,
-                        "username": telegram_user.username,
-                        "first_name": telegram_user.first_name,
-                        "last_name": telegram_user.last_name,
-                    }
-                )
-            except Exception:  # noqa: BLE001
-                logging.exception("Не удалось создать/обновить пользователя в БД")
+            payload = {
+                "id": telegram_user.id,
+                "username": telegram_user.username,
+                "first_name": telegram_user.first_name,
+                "last_name": telegram_user.last_name,
+            }
+            cached = users_service.get_cached_telegram_profile(telegram_user.id)
+            if cached is None:
+                await self._ensure_user(payload)
+            elif cached != users_service.telegram_profile(payload):
+                task = asyncio.create_task(self._ensure_user(payload))
+                self._background.add(task)
+                task.add_done_callback(self._background.discard)
 
         return await handler(event, data)
+
+    async def _ensure_user(self, payload: dict[str, Any]) -> None:
+        try:
+            await run_db(users_service.ensure_user_from_telegram, payload)
+        except Exception:  # noqa: BLE001
+            logging.exception("Не удалось создать/обновить пользователя в БД")
@@ -12,6 +12,7 @@ from sqlalchemy import (
     BigInteger,
     Column,
     CheckConstraint,
+    Date,
     DateTime,
     ForeignKey,
     Index,
@@ -209,6 +210,17 @@ class BotTemplate(Base):
 class BotLog(Base):
     __tablename__ = "bot_logs"
 
+    # Журнал листается от новых к старым по (created_at, id), обычно с фильтром
+    # по пользователю, типу события или узлу; поиск подстрокой — триграммные
+    # индексы из миграции 0021. В Postgres таблица секционирована по месяцам
+    # created_at (миграция 0022, первичный ключ там (id, created_at)).
+    __table_args__ = (
+        Index("ix_bot_logs_created_id", "created_at", "id"),
+        Index("ix_bot_logs_user_created", "user_id", "created_at", "id"),
+        Index("ix_bot_logs_event_created", "event_type", "created_at", "id"),
+        Index("ix_bot_logs_node_created", "node_code", "created_at", "id"),
+    )
+
     id = Column(BigInteger, primary_key=True, autoincrement=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     user_id = Column(BigInteger, index=True, nullable=False)
@@ -219,6 +231,91 @@ class BotLog(Base):
     config_version = Column(Integer, nullable=False, default=1, server_default="1")
 
 
+class BotLogHourly(Base):
+    """Почасовая сводка bot_logs; пересчитывается services/bot_logs_maintenance."""
+
+    __tablename__ = "bot_logs_hourly"
+
+    hour = Column(DateTime, primary_key=True)
+    event_type = Column(String(32), primary_key=True)
+    # Пустая строка вместо NULL: колонка входит в первичный ключ.
+    node_code = Column(String(64), primary_key=True, default="", server_default="")
+    config_version = Column(Integer, primary_key=True, default=0, server_default="0")
+    events = Column(BigInteger, nullable=False, default=0, server_default="0")
+
+
+class TelegramMedia(Base):
+    """Реестр file_id: картинка, уже загруженная в Telegram, отправляется повторно по file_id."""
+
+    __tablename__ = "telegram_media"
+    __table_args__ = (
+        UniqueConstraint("bot_id", "source", "content_hash", name="uq_telegram_media_source"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    # file_id действителен только для бота, который загрузил файл.
+    bot_id = Column(BigInteger, nullable=False)
+    source = Column(Text, nullable=False)
+    content_hash = Column(String(64), nullable=False, default="", server_default="")
+    file_id = Column(Text, nullable=False)
+    file_unique_id = Column(String(128), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+
+class BotFunnelState(Base):
+    """Водяной знак инкрементального расчёта воронки: последняя учтённая строка bot_logs."""
+
+    __tablename__ = "bot_funnel_state"
+
+    name = Column(String(32), primary_key=True)
+    last_created_at = Column(DateTime, nullable=True)
+    last_log_id = Column(BigInteger, nullable=False, default=0, server_default="0")
+    processed_events = Column(BigInteger, nullable=False, default=0, server_default="0")
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class BotFunnelNode(Base):
+    __tablename__ = "bot_funnel_nodes"
+
+    node_code = Column(String(64), primary_key=True)
+    visits = Column(BigInteger, nullable=False, default=0, server_default="0")
+    unique_users = Column(BigInteger, nullable=False, default=0, server_default="0")
+    # Пользователи, для которых этот узел пока последний: на нём воронка оборвалась.
+    current_users = Column(BigInteger, nullable=False, default=0, server_default="0")
+    exits = Column(BigInteger, nullable=False, default=0, server_default="0")
+    triggers = Column(BigInteger, nullable=False, default=0, server_default="0")
+    actions = Column(BigInteger, nullable=False, default=0, server_default="0")
+    last_event_at = Column(DateTime, nullable=True)
+
+
+class BotFunnelNodeUser(Base):
+    """Кто хоть раз заходил в узел — для инкрементального подсчёта уникальных пользователей."""
+
+    __tablename__ = "bot_funnel_node_users"
+
+    node_code = Column(String(64), primary_key=True)
+    user_id = Column(BigInteger, primary_key=True)
+
+
+class BotFunnelTransition(Base):
+    __tablename__ = "bot_funnel_transitions"
+
+    from_node = Column(String(64), primary_key=True)
+    to_node = Column(String(64), primary_key=True)
+    transitions = Column(BigInteger, nullable=False, default=0, server_default="0")
+
+
+class BotFunnelPosition(Base):
+    """Последний узел пользователя: следующий NODE_ENTER даёт переход из него."""
+
+    __tablename__ = "bot_funnel_positions"
+
+    user_id = Column(BigInteger, primary_key=True)
+    node_code = Column(String(64), nullable=False)
+    entered_at = Column(DateTime, nullable=False)
+
+
 class ProductBasket(Base):
     __tablename__ = "products_baskets"
 
@@ -336,7 +433,7 @@ class User(Base):
     phone = Column(String, unique=True, nullable=True, index=True)
     avatar_url = Column(Text, nullable=True)
     is_admin = Column(Boolean, default=False, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
 
     cart_items = relationship("CartItem", back_populates="user", cascade="all, delete-orphan")
     orders = relationship("Order", back_populates="user")
@@ -392,6 +489,13 @@ class UserStats(Base):
     orders_count = Column(Integer, default=0, nullable=False)
     total_spent = Column(Integer, default=0, nullable=False)
     last_order_at = Column(DateTime, nullable=True)
+    last_order_id = Column(Integer, nullable=True)
+    # Заказы по статусам; поддерживаются дельтами в services.stats (record_user_order*).
+    new_count = Column(Integer, default=0, nullable=False, server_default="0")
+    in_progress_count = Column(Integer, default=0, nullable=False, server_default="0")
+    paid_count = Column(Integer, default=0, nullable=False, server_default="0")
+    sent_count = Column(Integer, default=0, nullable=False, server_default="0")
+    archived_count = Column(Integer, default=0, nullable=False, server_default="0")
 
 
 class SiteBranding(Base):
@@ -443,6 +547,9 @@ class UserState(Base):
     next_node_code_success = Column(String, nullable=True)
     next_node_code_cancel = Column(String, nullable=True)
     bot_message_ids = Column(JSONB, nullable=True)
+    # FSM aiogram (см. services/fsm_storage.py): {ключ чата: {state, data, expires_at}}.
+    fsm = Column(JSONB, nullable=True)
+    fsm_expires_at = Column(DateTime, nullable=True, index=True)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=func.now(), nullable=False)
 
 
@@ -478,6 +585,48 @@ class Order(Base):
     items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
 
 
+class OrderStatsDaily(Base):
+    """Заказы и выручка по дню создания и текущему статусу; ведёт services/stats.
+
+    Как и stats_counters, разбита на shard-строки; значение за день и статус —
+    сумма по shard.
+    """
+
+    __tablename__ = "order_stats_daily"
+
+    day = Column(Date, primary_key=True)
+    status = Column(String, primary_key=True, default="", server_default="")
+    shard = Column(SmallInteger, primary_key=True, default=0, server_default="0")
+    orders_count = Column(BigInteger, nullable=False, default=0, server_default="0")
+    total_amount = Column(Numeric(14, 2), nullable=False, default=0, server_default="0")
+
+
+class ProductSalesStats(Base):
+    """Продажи по позициям каталога (сумма order_items); ведёт services/stats."""
+
+    __tablename__ = "product_sales_stats"
+    __table_args__ = (Index("ix_product_sales_stats_type_amount", "type", "total_amount"),)
+
+    product_id = Column(Integer, primary_key=True)
+    type = Column(String, primary_key=True)
+    total_qty = Column(BigInteger, nullable=False, default=0, server_default="0")
+    total_amount = Column(Numeric(14, 2), nullable=False, default=0, server_default="0")
+
+
+class StatsCounter(Base):
+    """Счётчики дашборда (пользователи, избранное, заказы, выручка) без COUNT по таблицам.
+
+    Счётчик разбит на shard-строки: параллельные транзакции прибавляют к разным
+    строкам и не ждут блокировку одной; значение — сумма по name.
+    """
+
+    __tablename__ = "stats_counters"
+
+    name = Column(String(64), primary_key=True)
+    shard = Column(SmallInteger, primary_key=True, default=0, server_default="0")
+    value = Column(Numeric(16, 2), nullable=False, default=0, server_default="0")
+
+
 class CheckoutOrder(Base):
     __tablename__ = "checkout_orders"
 
@@ -851,6 +1000,38 @@ class AdminSitePage(Base):
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
+
+class OutboxMessage(Base):
+    __tablename__ = "outbox_messages"
+    __table_args__ = (Index("ix_outbox_messages_status_next_attempt", "status", "next_attempt_at"),)
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    idempotency_key = Column(String(191), nullable=False, unique=True)
+    kind = Column(String(64), nullable=False)
+    payload = Column(JSONB, nullable=False, default=dict, server_default="{}")
+    status = Column(String(16), nullable=False, default="pending", server_default="pending")
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    locked_until = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+
+class CatalogVersion(Base):
+    __tablename__ = "catalog_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=1, server_default="1")
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class SchemaMigration(Base):
+    __tablename__ = "schema_migrations"
+
+    version = Column(String(64), primary_key=True)
+    applied_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
 __all__ = [
     "BotNode",
     "BotButton",
@@ -893,4 +1074,7 @@ __all__ = [
     "AdminSiteCategory",
     "AdminSiteItem",
     "AdminSitePage",
+    "CatalogVersion",
+    "OutboxMessage",
+    "SchemaMigration",
 ]
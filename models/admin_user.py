@@ -108,11 +108,12 @@ class AdminRoleModel(Base):
         back_populates="roles",
         lazy="selectin",
     )
+    # Обратные связи не загружаются жадно: иначе загрузка ролей пользователя
+    # тянула бы всех админов каждой роли.
     users = relationship(
         "AdminUser",
         secondary="admin_user_roles",
         back_populates="roles",
-        lazy="selectin",
     )
 
 
@@ -128,7 +129,6 @@ class AdminPermission(Base):
         "AdminRoleModel",
         secondary="admin_role_permissions",
         back_populates="permissions",
-        lazy="selectin",
     )
 
 
@@ -32,7 +32,7 @@ from admin_panel.adminsite import service as adminsite_service
 from admin_panel.routes import adminsite
 from admin_panel.routes import auth as admin_auth
 from admin_panel.routes import users as admin_users
-from database import get_db, get_session
+from database import get_db, get_session, run_db
 from media_paths import ADMIN_SITE_MEDIA_ROOT, MEDIA_ROOT, ensure_media_dirs
 from models import User
 from models.support import (
@@ -1299,6 +1299,11 @@ def admin_product_categories(user_id: int, type: str = "basket"):
 @router.post("/api/admin/product-categories", deprecated=True)
 async def admin_create_product_category(request: Request, image_file: UploadFile | None = File(None)):
     payload, image_file = await _parse_category_payload(request, image_file=image_file)
+    # Тело прочитано; запросы к БД и запись файла — в пуле потоков, не в event loop.
+    return await run_db(_create_product_category, payload, image_file)
+
+
+def _create_product_category(payload: dict[str, Any], image_file: UploadFile | None) -> dict[str, Any]:
     _ensure_admin(payload["user_id"])
 
     product_type = payload.get("type") or "basket"
@@ -1329,6 +1334,12 @@ async def admin_update_product_category(
     category_id: int, request: Request, image_file: UploadFile | None = File(None)
 ):
     payload, image_file = await _parse_category_payload(request, image_file=image_file, is_update=True)
+    return await run_db(_update_product_category, category_id, payload, image_file)
+
+
+def _update_product_category(
+    category_id: int, payload: dict[str, Any], image_file: UploadFile | None
+) -> dict[str, Any]:
     _ensure_admin(payload["user_id"])
     product_type = payload.get("type")
 
@@ -10,8 +10,6 @@ import time
 from datetime import datetime
 from pathlib import Path
 from typing import Any, Optional
-from urllib.parse import urlencode
-import urllib.request
 from uuid import uuid4
 
 from fastapi import (
@@ -24,38 +22,43 @@ from fastapi import (
     Response,
     UploadFile,
 )
-from fastapi.responses import FileResponse, RedirectResponse
+from fastapi.responses import FileResponse, RedirectResponse, StreamingResponse
 from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
 
 from config import get_settings
-from database import get_session
+from database import get_session, run_db
 from media_paths import (
     MEDIA_ROOT,
     ensure_media_dirs,
 )
-from models import BotEventTrigger, BotButtonPreset, CheckoutOrder, User
+from models import BotEventTrigger, BotButtonPreset, User
 from models.support import WebChatMessagesResponse
 from services import automations as automations_service
 from services import branding as branding_service
 from services import cart as cart_service
+from services import checkout as checkout_service
 from services import favorites as favorites_service
 from services import faq_service
 from services import home as home_service
 from services import menu_catalog
 from services import orders as orders_service
+from services import outbox as outbox_service
 from services import products as products_service
 from services import promocodes as promocodes_service
 from services import reviews as reviews_service
+from services import telegram_bot_api
 from services import user_admin as user_admin_service
 from services import user_stats as user_stats_service
 from services import users as users_service
+from services import webchat_events
 from services import webchat_service
 from services.telegram_webapp_auth import (
     get_telegram_init_data_from_request,
     validate_telegram_webapp_init_data,
 )
 from utils import site_chat_storage
+from utils.http_cache import conditional_json_response, dump_json
 from utils.jwt_auth import decode_access_token
 from utils.texts import format_order_for_admin
 
@@ -71,6 +74,9 @@ SETTINGS = get_settings()
 BOT_TOKEN = SETTINGS.bot_token
 COOKIE_MAX_AGE = 30 * 24 * 60 * 60
 CART_SESSION_COOKIE = "cart_session_id"
+CHECKOUT_CREATED_EVENT = "webapp_checkout_created"
+WEBCHAT_STREAM_HEARTBEAT = float(os.getenv("WEBCHAT_STREAM_HEARTBEAT", "15"))
+WEBCHAT_LONG_POLL_TIMEOUT = float(os.getenv("WEBCHAT_LONG_POLL_TIMEOUT", "25"))
 ALLOWED_TYPES = set(menu_catalog.MENU_ITEM_TYPES) | {"basket"}
 ALLOWED_CATEGORY_TYPES = {"basket", "course", "mixed"}
 
@@ -251,59 +257,24 @@ def _serve_webapp_index() -> FileResponse:
     return FileResponse(WEBAPP_DIR / "index.html", media_type="text/html")
 
 
-def _send_message_to_admins(
-    text: str, reply_markup: dict[str, Any] | None = None
-) -> list[int]:
+def _admin_chat_ids() -> list[int]:
     admin_ids = list(getattr(SETTINGS, "admin_ids", set()) or [])
     primary_admin = getattr(SETTINGS, "admin_chat_id", None)
     if primary_admin and primary_admin not in admin_ids:
         admin_ids.append(primary_admin)
+    return admin_ids
+
 
+async def _send_message_to_admins(
+    text: str, reply_markup: dict[str, Any] | None = None
+) -> list[int]:
+    admin_ids = _admin_chat_ids()
     if not BOT_TOKEN or not admin_ids:
         return []
-
-    api_url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
-    message_ids: list[int] = []
-
-    for chat_id in admin_ids:
-        payload_data: dict[str, Any] = {"chat_id": chat_id, "text": text}
-        if reply_markup:
-            payload_data["reply_markup"] = json.dumps(reply_markup, ensure_ascii=False)
-        payload = urlencode(payload_data).encode()
-        try:
-            with urllib.request.urlopen(api_url, data=payload, timeout=10) as response:
-                data = json.load(response)
-        except Exception:
-            logger.exception("Failed to notify admin via Telegram")
-            continue
-
-        if data.get("ok"):
-            try:
-                message_id = int(data["result"]["message_id"])
-                message_ids.append(message_id)
-            except Exception:
-                continue
-    return message_ids
-
-
-def _send_bot_message(chat_id: int, text: str, reply_markup: dict[str, Any] | None = None) -> bool:
-    if not BOT_TOKEN:
-        return False
-
-    api_url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
-    payload: dict[str, Any] = {"chat_id": chat_id, "text": text}
-    if reply_markup:
-        payload["reply_markup"] = json.dumps(reply_markup, ensure_ascii=False)
-
-    try:
-        data = urlencode(payload).encode()
-        with urllib.request.urlopen(api_url, data=data, timeout=10) as response:
-            result = json.load(response)
-    except Exception:
-        logger.exception("Failed to send bot message to user %s", chat_id)
-        return False
-
-    return bool(result.get("ok"))
+    results = await telegram_bot_api.get_client().broadcast(
+        admin_ids, **telegram_bot_api.build_message_payload(text, reply_markup)
+    )
+    return telegram_bot_api.message_ids(results)
 
 
 def _format_checkout_items(items: list[dict[str, Any]], currency: str) -> str:
@@ -400,15 +371,15 @@ def _build_webapp_automation_context(
 
 def _apply_webapp_automation_rules(
     *,
-    request: Request,
+    webapp_url: str,
     tg_user_id: int,
     items: list[dict[str, Any]],
     totals: dict[str, Any],
     order_id: int,
     saved_order_id: int | None = None,
+    messages: "_CheckoutMessages",
 ) -> dict[str, bool]:
     currency = totals.get("currency") or "₽"
-    webapp_url = _resolve_webapp_url(request)
     context = _build_webapp_automation_context(
         tg_user_id=tg_user_id,
         items=items,
@@ -513,10 +484,10 @@ def _apply_webapp_automation_rules(
                     context=context,
                 )
                 if target_scope == "user":
-                    _send_bot_message(tg_user_id, text, reply_markup=reply_markup)
+                    messages.to_user(tg_user_id, text, reply_markup)
                     user_sent = True
                 else:
-                    _send_message_to_admins(text, reply_markup=reply_markup)
+                    messages.to_admins(text, reply_markup)
                     admin_sent = True
                 any_executed = True
                 continue
@@ -524,26 +495,50 @@ def _apply_webapp_automation_rules(
     return {"any": any_executed, "user_sent": user_sent, "admin_sent": admin_sent}
 
 
-def _dispatch_webapp_checkout_created(
-    *,
-    request: Request,
-    tg_user_id: int,
-    items: list[dict[str, Any]],
-    totals: dict[str, Any],
-    order_id: int,
-    saved_order_id: int | None = None,
-    client_context: dict[str, Any] | None = None,
-) -> None:
+class _CheckoutMessages:
+    """Сообщения по заказу, которые уйдут в outbox; ключи стабильны между повторами."""
+
+    def __init__(self, order_id: int) -> None:
+        self.prefix = f"webapp_checkout:{order_id}"
+        self.events: list[outbox_service.OutboxEvent] = []
+
+    def to_user(self, chat_id: int, text: str, reply_markup: dict[str, Any] | None = None) -> None:
+        key = f"{self.prefix}:{len(self.events)}:user:{chat_id}"
+        self.events.append(outbox_service.telegram_message_event(key, chat_id, text, reply_markup))
+
+    def to_admins(self, text: str, reply_markup: dict[str, Any] | None = None) -> None:
+        if not BOT_TOKEN:
+            return
+        index = len(self.events)
+        for chat_id in _admin_chat_ids():
+            key = f"{self.prefix}:{index}:admin:{chat_id}"
+            self.events.append(
+                outbox_service.telegram_message_event(key, chat_id, text, reply_markup)
+            )
+
+
+def _dispatch_webapp_checkout_created(payload: dict[str, Any]) -> list[outbox_service.OutboxEvent]:
+    """Обработчик outbox-события заказа: автоматизации и шаблоны → сообщения получателям."""
+
+    tg_user_id = int(payload["tg_user_id"])
+    items: list[dict[str, Any]] = payload.get("items") or []
+    totals: dict[str, Any] = payload.get("totals") or {}
+    order_id = int(payload["order_id"])
+    saved_order_id = payload.get("saved_order_id")
+    client_context = payload.get("client_context")
+    webapp_url = payload.get("webapp_url") or ""
+    messages = _CheckoutMessages(order_id)
+
     automation_result = _apply_webapp_automation_rules(
-        request=request,
+        webapp_url=webapp_url,
         tg_user_id=tg_user_id,
         items=items,
         totals=totals,
         order_id=order_id,
         saved_order_id=saved_order_id,
+        messages=messages,
     )
 
-    webapp_url = _resolve_webapp_url(request)
     with get_session() as session:
         trigger = (
             session.query(BotEventTrigger)
@@ -590,7 +585,7 @@ def _dispatch_webapp_checkout_created(
                 ]
             }
 
-        _send_bot_message(tg_user_id, text, reply_markup=keyboard)
+        messages.to_user(tg_user_id, text, keyboard)
 
     if not automation_result["admin_sent"]:
         admin_text = (
@@ -599,17 +594,22 @@ def _dispatch_webapp_checkout_created(
             f"{items_text}\n"
             f"Итого: {sum_total} {currency}"
         )
-        _send_message_to_admins(admin_text)
+        messages.to_admins(admin_text)
+
+    return messages.events
+
 
+outbox_service.register_handler(CHECKOUT_CREATED_EVENT, _dispatch_webapp_checkout_created)
 
-def _notify_admin_about_chat(chat_session, preview_text: str) -> list[int]:
+
+async def _notify_admin_about_chat(chat_session, preview_text: str) -> list[int]:
     snippet = (preview_text or "")[:200]
     text = (
         f"Новый чат с сайта #{chat_session.id}\n"
         f"Текст: {snippet}\n"
         "Чтобы ответить — ответьте на это сообщение."
     )
-    message_ids = _send_message_to_admins(text)
+    message_ids = await _send_message_to_admins(text)
     for message_id in message_ids:
         try:
             site_chat_storage.remember_admin_message(message_id, int(chat_session.id))
@@ -804,46 +804,41 @@ def _build_cart_response(
 ) -> dict[str, Any]:
     items, removed_ids = cart_service.get_cart_items(user_id, session_id=session_id)
 
-    normalized_items: list[dict[str, Any]] = []
+    candidates: list[tuple[int, str, int]] = []
     removed_items: list[dict[str, Any]] = []
-    total = 0
+    stale_keys: list[tuple[int, str]] = []
 
     for item in items:
         product_type = item.get("type") or "product"
         if product_type not in ALLOWED_TYPES:
             removed_items.append({"product_id": item.get("product_id"), "type": product_type, "reason": "invalid"})
-            cart_service.remove_from_cart(
-                user_id,
-                int(item.get("product_id") or 0),
-                product_type,
-                session_id=session_id,
-            )
+            stale_keys.append((int(item.get("product_id") or 0), product_type))
             continue
         try:
             product_id = int(item.get("product_id"))
         except (TypeError, ValueError):
             removed_items.append({"product_id": None, "type": product_type, "reason": "invalid"})
             continue
+        candidates.append((product_id, product_type, max(int(item.get("qty") or 0), 0)))
 
-        product_info = _product_by_type(product_type, product_id)
-        if not product_info:
+    active_products = menu_catalog.get_items_by_ids(
+        [product_id for product_id, _, _ in candidates],
+        {menu_catalog.map_legacy_item_type(product_type) or "product" for _, product_type, _ in candidates},
+    )
+
+    normalized_items: list[dict[str, Any]] = []
+    total = 0
+
+    for product_id, product_type, qty in candidates:
+        resolved_type = menu_catalog.map_legacy_item_type(product_type) or "product"
+        product_info = active_products.get(product_id)
+        if not product_info or product_info.get("type") != resolved_type:
             removed_items.append({"product_id": product_id, "type": product_type, "reason": "inactive"})
-            cart_service.remove_from_cart(
-                user_id,
-                product_id,
-                product_type,
-                session_id=session_id,
-            )
+            stale_keys.append((product_id, product_type))
             continue
 
-        qty = max(int(item.get("qty") or 0), 0)
         if qty <= 0:
-            cart_service.remove_from_cart(
-                user_id,
-                product_id,
-                product_type,
-                session_id=session_id,
-            )
+            stale_keys.append((product_id, product_type))
             continue
 
         price = int(product_info.get("price") or 0)
@@ -863,10 +858,12 @@ def _build_cart_response(
             }
         )
 
+    if stale_keys:
+        cart_service.remove_items_from_cart(user_id, stale_keys, session_id=session_id)
+
+    removed_products = menu_catalog.get_items_by_ids(removed_ids, include_inactive=True)
     for removed_id in removed_ids:
-        product_info = menu_catalog.get_item_by_id(
-            removed_id, include_inactive=True, item_type=None
-        )
+        product_info = removed_products.get(int(removed_id))
         removed_items.append(
             {
                 "product_id": removed_id,
@@ -890,6 +887,19 @@ def _validate_category_type(product_type: str) -> str:
     return product_type
 
 
+def _catalog_response(request: Request, kind: str, key: str | None = None) -> Response:
+    try:
+        snapshot = menu_catalog.get_catalog_snapshot(kind, key)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc))
+    return conditional_json_response(
+        request,
+        snapshot.body,
+        etag=snapshot.etag,
+        last_modified=snapshot.last_modified,
+    )
+
+
 def _faq_to_dict(item) -> dict:
     return {
         "id": int(item.id),
@@ -1069,13 +1079,31 @@ async def api_webchat_message(
         current_session.status == "waiting_manager"
         and not current_session.telegram_thread_message_id
     ):
-        message_ids = _notify_admin_about_chat(current_session, text)
+        message_ids = await _notify_admin_about_chat(current_session, text)
         if message_ids:
             webchat_service.set_thread_message_id(current_session, message_ids[0])
 
     return {"ok": True, "message_id": int(message.id), "text": text}
 
 
+def _serialize_webchat_message(msg) -> dict[str, Any]:
+    return {
+        "id": msg.id,
+        "sender": msg.sender,
+        "text": msg.text,
+        "created_at": msg.created_at.isoformat() if msg.created_at else None,
+        "is_read_by_manager": msg.is_read_by_manager,
+        "is_read_by_client": msg.is_read_by_client,
+    }
+
+
+def _fetch_client_messages(session, after_id: int, limit: int | None = None) -> list[dict[str, Any]]:
+    messages = webchat_service.get_messages(
+        session, limit=limit, after_id=after_id, mark_read_for="client"
+    )
+    return [_serialize_webchat_message(msg) for msg in messages]
+
+
 @router.get("/api/webchat/messages", response_model=WebChatMessagesResponse)
 def api_webchat_messages(
     session_key: str, limit: Optional[int] = None, after_id: int = 0
@@ -1084,30 +1112,77 @@ def api_webchat_messages(
     if not session:
         return {"ok": True, "status": "open", "messages": []}
 
-    messages = webchat_service.get_messages(
-        session, limit=limit, after_id=after_id, mark_read_for="client"
-    )
-
-    payload_messages = []
-    for msg in messages:
-        payload_messages.append(
-            {
-                "id": msg.id,
-                "sender": msg.sender,
-                "text": msg.text,
-                "created_at": msg.created_at.isoformat() if msg.created_at else None,
-                "is_read_by_manager": msg.is_read_by_manager,
-                "is_read_by_client": msg.is_read_by_client,
-            }
-        )
-
     return {
         "ok": True,
         "status": session.status,
-        "messages": payload_messages,
+        "messages": _fetch_client_messages(session, after_id, limit),
     }
 
 
+@router.get("/api/webchat/stream")
+async def api_webchat_stream(request: Request, session_key: str, after_id: int = 0):
+    """
+    Server-Sent Events по сессии веб-чата.
+
+    Новые сообщения приходят как `data: {...}` с `id: <message_id>`; при переподключении
+    EventSource сам передаёт Last-Event-ID, и пропущенное дочитывается по after_id.
+    Пока событий нет, раз в WEBCHAT_STREAM_HEARTBEAT секунд уходит комментарий-пинг.
+    """
+    session = await run_db(webchat_service.get_session_by_key, session_key)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    last_event_id = request.headers.get("last-event-id") or ""
+    if last_event_id.isdigit():
+        after_id = max(after_id, int(last_event_id))
+
+    async def _events():
+        last_id = after_id
+        async with webchat_events.subscribe(session.id) as queue:
+            yield "retry: 3000\n\n"
+            pending = True
+            while True:
+                if pending:
+                    for payload in await run_db(_fetch_client_messages, session, last_id):
+                        last_id = max(last_id, int(payload["id"]))
+                        data = json.dumps(payload, ensure_ascii=False)
+                        yield f"id: {payload['id']}\ndata: {data}\n\n"
+                if await request.is_disconnected():
+                    break
+                pending = (
+                    await webchat_events.wait_for_message(queue, WEBCHAT_STREAM_HEARTBEAT)
+                    is not None
+                )
+                if not pending:
+                    yield ": ping\n\n"
+
+    return StreamingResponse(
+        _events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/api/webchat/poll", response_model=WebChatMessagesResponse)
+async def api_webchat_poll(
+    session_key: str, after_id: int = 0, timeout: float = WEBCHAT_LONG_POLL_TIMEOUT
+):
+    """Long-polling для клиентов без EventSource: ждёт новое сообщение до timeout секунд."""
+    session = await run_db(webchat_service.get_session_by_key, session_key)
+    if not session:
+        # 404, как у /stream: клиент повторяет запрос с WEBCHAT_RETRY_DELAY, а не сразу.
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    timeout = min(max(timeout, 0.0), WEBCHAT_LONG_POLL_TIMEOUT)
+    async with webchat_events.subscribe(session.id) as queue:
+        messages = await run_db(_fetch_client_messages, session, after_id)
+        if not messages and timeout:
+            if await webchat_events.wait_for_message(queue, timeout) is not None:
+                messages = await run_db(_fetch_client_messages, session, after_id)
+
+    return {"ok": True, "status": session.status, "messages": messages}
+
+
 async def _handle_manager_reply(
     session_id: int | str | None, text: str, session_key: str | None = None
 ):
@@ -1155,92 +1230,72 @@ async def api_webchat_manager_reply(
 
 
 @router.get("/public/site-settings")
-def public_site_settings():
-    return menu_catalog.get_site_settings()
+def public_site_settings(request: Request):
+    return _catalog_response(request, "settings")
 
 
 @router.get("/public/menu")
-def public_menu(type: str | None = None):
-    try:
-        return menu_catalog.build_public_menu(type)
-    except ValueError as exc:
-        raise HTTPException(status_code=422, detail=str(exc))
+def public_menu(request: Request, type: str | None = None):
+    return _catalog_response(request, "menu", type)
 
 
 @router.get("/public/menu/tree")
-def public_menu_tree(type: str | None = None):
-    try:
-        return menu_catalog.build_public_menu_tree(type)
-    except ValueError as exc:
-        raise HTTPException(status_code=422, detail=str(exc))
+def public_menu_tree(request: Request, type: str | None = None):
+    return _catalog_response(request, "tree", type)
 
 
 @router.get("/public/menu/categories")
-def public_menu_categories(type: str | None = None):
-    try:
-        return {"items": menu_catalog.list_categories(include_inactive=False, category_type=type)}
-    except ValueError as exc:
-        raise HTTPException(status_code=422, detail=str(exc))
+def public_menu_categories(request: Request, type: str | None = None):
+    return _catalog_response(request, "categories", type)
 
 
 @router.get("/public/menu/items")
-def public_menu_items(category: str | None = None, type: str | None = None):
+def public_menu_items(request: Request, category: str | None = None, type: str | None = None):
+    if not category:
+        return _catalog_response(request, "items", type)
     try:
-        if category:
-            if category.isdigit():
-                return {
-                    "items": menu_catalog.list_items(
-                        include_inactive=False,
-                        category_id=int(category),
-                        category_type=type,
-                    )
-                }
-            category_record = menu_catalog.get_category_by_slug(
-                category, include_inactive=False, category_type=type
-            )
-            if not category_record:
-                raise HTTPException(status_code=404, detail="Category not found")
+        if category.isdigit():
             return {
                 "items": menu_catalog.list_items(
                     include_inactive=False,
-                    category_id=int(category_record.id),
+                    category_id=int(category),
                     category_type=type,
                 )
             }
+        category_record = menu_catalog.get_category_by_slug(
+            category, include_inactive=False, category_type=type
+        )
+        if not category_record:
+            raise HTTPException(status_code=404, detail="Category not found")
         return {
-            "items": menu_catalog.list_items(include_inactive=False, category_type=type)
+            "items": menu_catalog.list_items(
+                include_inactive=False,
+                category_id=int(category_record.id),
+                category_type=type,
+            )
         }
     except ValueError as exc:
         raise HTTPException(status_code=422, detail=str(exc))
 
 
 @router.get("/api/public/site-settings")
-def api_public_site_settings():
-    return menu_catalog.get_site_settings()
+def api_public_site_settings(request: Request):
+    return _catalog_response(request, "settings")
 
 
 @router.get("/api/public/menu")
-def api_public_menu(type: str | None = None):
-    try:
-        return menu_catalog.build_public_menu(type)
-    except ValueError as exc:
-        raise HTTPException(status_code=422, detail=str(exc))
+def api_public_menu(request: Request, type: str | None = None):
+    return _catalog_response(request, "menu", type)
 
 
 @router.get("/api/public/menu/tree")
-def api_public_menu_tree(type: str | None = None):
-    try:
-        return menu_catalog.build_public_menu_tree(type)
-    except ValueError as exc:
-        raise HTTPException(status_code=422, detail=str(exc))
+def api_public_menu_tree(request: Request, type: str | None = None):
+    return _catalog_response(request, "tree", type)
 
 
 @router.get("/api/public/menu/categories")
-def api_public_menu_categories(type: str | None = None):
-    try:
-        return {"items": menu_catalog.list_categories(include_inactive=False, category_type=type)}
-    except ValueError as exc:
-        raise HTTPException(status_code=422, detail=str(exc))
+def api_public_menu_categories(request: Request, type: str | None = None):
+    return _catalog_response(request, "categories", type)
 
 
 @router.get("/api/public/menu/category/{slug}")
@@ -1257,22 +1312,22 @@ def api_public_menu_category(slug: str, type: str | None = None):
 
 
 @router.get("/api/public/menu/items")
-def api_public_menu_items(category_slug: str | None = None, type: str | None = None):
+def api_public_menu_items(request: Request, category_slug: str | None = None, type: str | None = None):
+    if not category_slug:
+        return _catalog_response(request, "items", type)
     try:
-        if category_slug:
-            category_record = menu_catalog.get_category_by_slug(
-                category_slug, include_inactive=False, category_type=type
+        category_record = menu_catalog.get_category_by_slug(
+            category_slug, include_inactive=False, category_type=type
+        )
+        if not category_record:
+            raise HTTPException(status_code=404, detail="Category not found")
+        return {
+            "items": menu_catalog.list_items(
+                include_inactive=False,
+                category_id=int(category_record.id),
+                category_type=type,
             )
-            if not category_record:
-                raise HTTPException(status_code=404, detail="Category not found")
-            return {
-                "items": menu_catalog.list_items(
-                    include_inactive=False,
-                    category_id=int(category_record.id),
-                    category_type=type,
-                )
-            }
-        return {"items": menu_catalog.list_items(include_inactive=False, category_type=type)}
+        }
     except ValueError as exc:
         raise HTTPException(status_code=422, detail=str(exc))
 
@@ -1286,8 +1341,12 @@ def api_public_item(item_id: int):
 
 
 @router.get("/api/public/blocks")
-def api_public_blocks(page: str | None = None):
-    return {"items": menu_catalog.list_blocks(include_inactive=False, page=page)}
+def api_public_blocks(request: Request, page: str | None = None):
+    if page and page not in menu_catalog.BLOCK_PAGES:
+        # Нестандартные страницы не кэшируем, но ETag по содержимому отдаём.
+        body = dump_json({"items": menu_catalog.list_blocks(include_inactive=False, page=page)})
+        return conditional_json_response(request, body)
+    return _catalog_response(request, "blocks", page)
 
 
 @router.post("/api/public/checkout/from-webapp")
@@ -1352,71 +1411,41 @@ def api_public_checkout_from_webapp(payload: WebappCheckoutPayload, request: Req
     full_name = " ".join(part for part in [first_name, last_name] if part).strip() or None
     username = (user_data.get("username") or "").strip() or None
 
-    with get_session() as session:
-        user = users_service.get_or_create_user_from_telegram(
+    webapp_url = _resolve_webapp_url(request)
+
+    def _enqueue_notifications(session: Session, order_id: int) -> None:
+        outbox_service.enqueue(
             session,
-            telegram_id=int(payload.tg_user_id),
-            username=username,
-            full_name=full_name,
-        )
-        contact = user.phone or ""
-        user_name = (
-            user.first_name if user and user.first_name else username or "Пользователь"
+            outbox_service.OutboxEvent(
+                kind=CHECKOUT_CREATED_EVENT,
+                idempotency_key=f"{CHECKOUT_CREATED_EVENT}:{order_id}",
+                payload={
+                    "tg_user_id": int(payload.tg_user_id),
+                    "items": normalized_items,
+                    "totals": totals_payload,
+                    "order_id": order_id,
+                    "saved_order_id": order_id,
+                    "client_context": client_context,
+                    "webapp_url": webapp_url,
+                },
+            ),
         )
-        order = CheckoutOrder(
-            tg_user_id=int(payload.tg_user_id),
-            status="created",
-            items_json=normalized_items,
-            totals_json=totals_payload,
-            client_context_json=client_context,
-        )
-        session.add(order)
-        session.flush()
-        checkout_order_id = int(order.id)
-    order_items = [
-        {
-            "product_id": int(item.get("item_id") or 0),
-            "name": item.get("title"),
-            "price": int(item.get("price") or 0),
-            "qty": int(item.get("qty") or 0),
-            "type": item.get("type") or "basket",
-        }
-        for item in normalized_items
-    ]
-    order_text = format_order_for_admin(
-        user_id=int(payload.tg_user_id),
-        user_name=user_name,
-        items=order_items,
-        total=int(totals_payload.get("sum_total") or 0),
-        customer_name=user_name,
-        contact=contact,
-        comment="",
-    )
-    saved_order_id = orders_service.add_order(
-        user_id=int(payload.tg_user_id),
-        user_name=user_name,
-        items=order_items,
-        total=int(totals_payload.get("sum_total") or 0),
-        customer_name=user_name,
-        contact=contact,
-        comment="",
-        order_text=order_text,
-    )
 
-    _dispatch_webapp_checkout_created(
-        request=request,
-        tg_user_id=int(payload.tg_user_id),
+    result = checkout_service.place_checkout(
+        telegram_id=int(payload.tg_user_id),
+        username=username,
+        full_name=full_name,
         items=normalized_items,
         totals=totals_payload,
-        order_id=saved_order_id,
-        saved_order_id=saved_order_id,
         client_context=client_context,
+        after_insert=_enqueue_notifications,
     )
+    outbox_service.wake()
 
     return {
         "ok": True,
-        "order_id": saved_order_id,
-        "checkout_order_id": checkout_order_id,
+        "order_id": result.order_id,
+        "checkout_order_id": result.checkout_order_id,
         "message": "sent",
     }
 
@@ -1430,8 +1459,8 @@ def api_webapp_order(payload: WebappOrderPayload):
 
 
 @router.get("/api/site/menu")
-def site_menu():
-    return menu_catalog.build_public_menu()
+def site_menu(request: Request):
+    return _catalog_response(request, "menu")
 
 
 @router.get("/api/site/theme", deprecated=True)
@@ -1440,13 +1469,13 @@ def site_theme():
 
 
 @router.get("/api/site-settings")
-def site_settings():
-    return menu_catalog.get_site_settings()
+def site_settings(request: Request):
+    return _catalog_response(request, "settings")
 
 
 @router.get("/api/site/categories")
-def site_categories():
-    return {"items": menu_catalog.list_categories(include_inactive=False)}
+def site_categories(request: Request):
+    return _catalog_response(request, "categories")
 
 
 @router.get("/api/site/categories/{slug}")
@@ -1483,11 +1512,11 @@ def site_items(category_id: int | None = None, type: str | None = None):
 
 
 @router.get("/api/site/home")
-def site_home():
-    return {
-        "settings": menu_catalog.get_site_settings(),
-        "menu": menu_catalog.build_public_menu(),
-    }
+def site_home(request: Request):
+    settings = menu_catalog.get_catalog_snapshot("settings")
+    menu = menu_catalog.get_catalog_snapshot("menu")
+    body = b'{"settings":' + settings.body + b',"menu":' + menu.body + b"}"
+    return conditional_json_response(request, body, last_modified=menu.last_modified)
 
 
 @router.get("/api/site/pages/{page_key}", deprecated=True)
@@ -1968,13 +1997,19 @@ def api_favorites_toggle(payload: FavoriteTogglePayload):
 def api_promocode_validate(payload: PromocodeValidatePayload):
     cart_items: list[dict[str, Any]] = []
     if payload.items:
+        requested_types = {_validate_type(item.type) for item in payload.items}
+        products = menu_catalog.get_items_by_ids(
+            [int(item.product_id) for item in payload.items],
+            {menu_catalog.map_legacy_item_type(value) or "product" for value in requested_types},
+        )
         for item in payload.items:
             product_type = _validate_type(item.type)
             qty = max(int(item.qty or 0), 0)
             if qty <= 0:
                 continue
-            product = _product_by_type(product_type, int(item.product_id))
-            if not product:
+            product = products.get(int(item.product_id))
+            resolved_type = menu_catalog.map_legacy_item_type(product_type) or "product"
+            if not product or product.get("type") != resolved_type:
                 continue
             cart_items.append(
                 {
@@ -0,0 +1,176 @@
+"""Нагрузочный тест: задержка публичного /api/public/menu, пока админ применяет шаблон бота.
+
+Клиенты непрерывно запрашивают /api/public/menu. Сначала без нагрузки от админки
+(baseline), затем параллельно с применением шаблона. Если маршруты админки не
+блокируют event loop, p95/max во второй фазе остаются на уровне baseline.
+
+Два режима:
+- --url: запущенный backend (staging!) и cookie админа; шаблон применяется
+  POST /adminbot/templates/{code}/apply, --replace задаёт заменяемые элементы
+  (replace_items, например node:start), чтобы нагрузка не ограничилась пропуском;
+- без --url: uvicorn в этом процессе с маршрутами-заглушками. Применение шаблона
+  имитируется синхронной работой --admin-ms; сравниваются async-маршрут,
+  выполняющий её прямо в event loop (как было), и маршрут на AdminRoute.
+
+Запуск:
+    python scripts/bench_admin_offloop.py --admin-ms 2000
+    python scripts/bench_admin_offloop.py --url http://127.0.0.1:8000 --cookie TOKEN --template shop \
+        --replace node:start --replace node:catalog
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+os.environ.setdefault("BOT_TOKEN", "bench-bot-token")
+
+import aiohttp  # noqa: E402
+
+from admin_panel.dependencies import SESSION_COOKIE_NAME  # noqa: E402
+from admin_panel.executor import AdminRoute  # noqa: E402
+
+PUBLIC_PATH = "/api/public/menu"
+
+
+def _report(label: str, values: list[float]) -> None:
+    if not values:
+        print(f"{label:<16} нет запросов")
+        return
+    ordered = sorted(values)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(
+        f"{label:<16} n={len(values):6d}  median={statistics.median(values):8.2f} ms  "
+        f"p95={p95:8.2f} ms  max={max(values):8.2f} ms"
+    )
+
+
+async def _poll_public(session: aiohttp.ClientSession, base_url: str, stop: asyncio.Event, timings: list[float]) -> None:
+    while not stop.is_set():
+        started = time.perf_counter()
+        async with session.get(f"{base_url}{PUBLIC_PATH}") as response:
+            await response.read()
+        timings.append((time.perf_counter() - started) * 1000)
+
+
+async def _phase(base_url: str, clients: int, admin_call) -> list[float]:
+    """Опрашивать каталог, пока выполняется admin_call (или 2 секунды без него)."""
+
+    timings: list[float] = []
+    stop = asyncio.Event()
+    async with aiohttp.ClientSession() as session:
+        pollers = [asyncio.create_task(_poll_public(session, base_url, stop, timings)) for _ in range(clients)]
+        if admin_call is None:
+            await asyncio.sleep(2)
+        else:
+            started = time.perf_counter()
+            status = await admin_call()
+            print(f"admin request: status={status}, {(time.perf_counter() - started) * 1000:.0f} ms")
+        stop.set()
+        await asyncio.gather(*pollers)
+    return timings
+
+
+async def _run_remote(args: argparse.Namespace) -> None:
+    base_url = args.url.rstrip("/")
+
+    async def _apply() -> int:
+        cookies = {SESSION_COOKIE_NAME: args.cookie}
+        form = aiohttp.FormData([("replace_items", item) for item in args.replace])
+        async with aiohttp.ClientSession(cookies=cookies) as session:
+            url = f"{base_url}/adminbot/templates/{args.template}/apply"
+            async with session.post(url, data=form, allow_redirects=False) as response:
+                await response.read()
+                return response.status
+
+    _report("baseline", await _phase(base_url, args.clients, None))
+    _report("during apply", await _phase(base_url, args.clients, _apply))
+
+
+def _stub_app(admin_ms: float):
+    from fastapi import APIRouter, FastAPI
+
+    def _apply_template() -> None:
+        # Имитация применения большого шаблона: синхронные запросы к БД.
+        time.sleep(admin_ms / 1000)
+
+    app = FastAPI()
+
+    @app.get(PUBLIC_PATH)
+    def public_menu() -> dict:
+        return {"items": []}
+
+    @app.post("/blocking/apply")
+    async def blocking_apply() -> dict:
+        _apply_template()
+        return {"ok": True}
+
+    admin_router = APIRouter(route_class=AdminRoute)
+
+    @admin_router.post("/offloop/apply")
+    def offloop_apply() -> dict:
+        _apply_template()
+        return {"ok": True}
+
+    app.include_router(admin_router)
+    return app
+
+
+async def _run_local(args: argparse.Namespace) -> None:
+    import uvicorn
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(_stub_app(args.admin_ms), port=port, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    base_url = f"http://127.0.0.1:{port}"
+
+    def _admin(path: str):
+        async def _call() -> int:
+            async with aiohttp.ClientSession() as session:
+                async with session.post(f"{base_url}{path}") as response:
+                    await response.read()
+                    return response.status
+
+        return _call
+
+    try:
+        _report("baseline", await _phase(base_url, args.clients, None))
+        _report("async def", await _phase(base_url, args.clients, _admin("/blocking/apply")))
+        _report("AdminRoute", await _phase(base_url, args.clients, _admin("/offloop/apply")))
+    finally:
+        server.should_exit = True
+        await serving
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Задержка /api/public/menu во время применения шаблона бота")
+    parser.add_argument("--url", help="Адрес запущенного backend, например http://127.0.0.1:8000")
+    parser.add_argument("--cookie", help=f"Значение cookie {SESSION_COOKIE_NAME} администратора")
+    parser.add_argument("--template", help="Код шаблона бота для применения")
+    parser.add_argument("--replace", action="append", default=[], help="Элемент шаблона для замены (повторяемый)")
+    parser.add_argument("--clients", type=int, default=8, help="Число параллельных клиентов каталога")
+    parser.add_argument("--admin-ms", type=float, default=2000, help="Длительность заглушки применения шаблона")
+    args = parser.parse_args()
+
+    if args.url:
+        if not args.cookie or not args.template:
+            parser.error("--url требует --cookie и --template")
+        asyncio.run(_run_remote(args))
+    else:
+        asyncio.run(_run_local(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""Бенчмарк оформления заказа из WebApp: заказов в секунду до и после одной транзакции.
+
+"До" повторяет прежний путь api_public_checkout_from_webapp: сессия на upsert
+пользователя и checkout_orders, отдельная проверка пользователя, запрос к каталогу
+на каждую позицию, сессия на заказ и позиции (по INSERT на строку) и пересчёт
+user_stats по всем заказам во вложенной сессии. add_order, поиск позиций и
+recalc_user_stats скопированы сюда в прежнем виде (_legacy_*), потому что в
+сервисах их уже заменили. Не воспроизводится только проверка схемы в каждом
+вызове сервиса: её убрали раньше, отдельным изменением.
+"После" — services.checkout.place_checkout: всё в одной транзакции с одним commit.
+
+Заказы пишутся в БД из DATABASE_URL от пользователей с telegram_id от --base-user-id —
+запускать на тестовой базе.
+
+Запуск:
+    python scripts/bench_checkout.py --checkouts 500 --threads 8 --users 50
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import func, select
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+import initdb  # noqa: E402
+from database import get_session  # noqa: E402
+from models import CheckoutOrder, Order, OrderItem, UserStats  # noqa: E402
+from services import checkout as checkout_service  # noqa: E402
+from services import menu_catalog  # noqa: E402
+from services import orders as orders_service  # noqa: E402
+from services import users as users_service  # noqa: E402
+from utils.texts import format_order_for_admin  # noqa: E402
+
+
+def _cart(rng: random.Random) -> tuple[list[dict], dict]:
+    items = [
+        {
+            "item_id": rng.randint(1, 50),
+            "title": f"Товар {index}",
+            "qty": rng.randint(1, 3),
+            "price": rng.randint(1, 20) * 100,
+            "type": "basket",
+        }
+        for index in range(rng.randint(1, 5))
+    ]
+    return items, {
+        "qty_total": sum(item["qty"] for item in items),
+        "sum_total": sum(item["qty"] * item["price"] for item in items),
+    }
+
+
+def _legacy_recalc_user_stats(user_id: int) -> None:
+    with get_session() as session:
+        orders_count = session.scalar(select(func.count(Order.id)).where(Order.user_id == user_id))
+        total_spent = session.scalar(
+            select(func.coalesce(func.sum(Order.total_amount), 0)).where(Order.user_id == user_id)
+        )
+        last_order = session.scalar(
+            select(Order.created_at)
+            .where(Order.user_id == user_id)
+            .order_by(Order.created_at.desc(), Order.id.desc())
+            .limit(1)
+        )
+        stats = session.scalar(select(UserStats).where(UserStats.user_id == user_id))
+        if stats is None:
+            stats = UserStats(user_id=user_id, orders_count=0, total_spent=0)
+            session.add(stats)
+            session.flush()
+        stats.orders_count = int(orders_count or 0)
+        stats.total_spent = int(total_spent or 0)
+        stats.last_order_at = last_order
+        session.flush()
+        session.refresh(stats)
+
+
+def _legacy_normalize_order_items(items: list[dict]) -> tuple[list[dict], int]:
+    normalized = []
+    total_amount = 0
+    for item in items:
+        resolved_type = menu_catalog.map_legacy_item_type(item.get("type")) or "product"
+        product_data = menu_catalog.get_item_by_id(
+            int(item["product_id"]), include_inactive=True, item_type=resolved_type
+        ) or {}
+        price = int(item["price"]) if item.get("price") is not None else int(product_data.get("price") or 0)
+        normalized.append({"product_id": int(item["product_id"]), "qty": int(item["qty"]), "price": price, "type": resolved_type})
+        total_amount += price * int(item["qty"])
+    return normalized, total_amount
+
+
+def _legacy_add_order(user_id: int, user_name: str, items: list[dict], contact: str, order_text: str) -> int:
+    users_service.get_user_by_telegram_id(user_id)
+    normalized, computed_total = _legacy_normalize_order_items(items)
+    with get_session() as session:
+        order = Order(
+            user_id=user_id,
+            total_amount=computed_total,
+            created_at=datetime.utcnow(),
+            customer_name=user_name,
+            contact=contact,
+            comment="",
+            order_text=order_text,
+            status=orders_service.STATUS_NEW,
+        )
+        session.add(order)
+        session.flush()
+        for item in normalized:
+            session.add(OrderItem(order_id=order.id, **item))
+        _legacy_recalc_user_stats(user_id)
+        return int(order.id)
+
+
+def _legacy_checkout(telegram_id: int, items: list[dict], totals: dict) -> int:
+    with get_session() as session:
+        user = users_service.get_or_create_user_from_telegram(session, telegram_id=telegram_id, full_name="Bench")
+        user_name = user.first_name or "Пользователь"
+        contact = user.phone or ""
+        session.add(CheckoutOrder(tg_user_id=telegram_id, status="created", items_json=items, totals_json=totals))
+    order_items = [
+        {"product_id": item["item_id"], "name": item["title"], "price": item["price"], "qty": item["qty"], "type": item["type"]}
+        for item in items
+    ]
+    order_text = format_order_for_admin(
+        user_id=telegram_id,
+        user_name=user_name,
+        items=order_items,
+        total=totals["sum_total"],
+        customer_name=user_name,
+        contact=contact,
+        comment="",
+    )
+    return _legacy_add_order(telegram_id, user_name, order_items, contact, order_text)
+
+
+def _new_checkout(telegram_id: int, items: list[dict], totals: dict) -> int:
+    return checkout_service.place_checkout(
+        telegram_id=telegram_id, username=None, full_name="Bench", items=items, totals=totals
+    ).order_id
+
+
+def _run(label: str, func, args: argparse.Namespace) -> None:
+    rng = random.Random(42)
+    jobs = [(args.base_user_id + rng.randrange(args.users), *_cart(rng)) for _ in range(args.checkouts)]
+    latencies: list[float] = []
+
+    def _one(job) -> None:
+        started = time.perf_counter()
+        func(*job)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        list(pool.map(_one, jobs))
+    elapsed = time.perf_counter() - started
+    ordered = sorted(latencies)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(
+        f"{label:<8} {len(jobs) / elapsed:8.1f} checkouts/s  "
+        f"median={statistics.median(latencies):8.2f} ms  p95={p95:8.2f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Заказов в секунду: несколько сессий против одной транзакции")
+    parser.add_argument("--checkouts", type=int, default=300, help="Заказов на каждый вариант")
+    parser.add_argument("--threads", type=int, default=4, help="Параллельных потоков")
+    parser.add_argument("--users", type=int, default=50, help="Разных покупателей")
+    parser.add_argument("--base-user-id", type=int, default=9_000_000_000, help="Первый telegram_id тестовых покупателей")
+    args = parser.parse_args()
+
+    initdb.init_db()
+    _run("before", _legacy_checkout, args)
+    _run("after", _new_checkout, args)
+
+
+if __name__ == "__main__":
+    main()
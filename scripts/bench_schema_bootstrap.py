@@ -0,0 +1,66 @@
+"""Бенчмарк стоимости подготовки схемы на один запрос: до и после schema_migrations.
+
+"До" — то, что раньше делал каждый сервисный вызов: create_all + все шаги initdb.
+"После" — ensure_schema(), то есть проверка in-memory флага.
+
+Запуск (нужна рабочая БД из DATABASE_URL):
+    python scripts/bench_schema_bootstrap.py --iterations 50
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+import initdb  # noqa: E402
+from database import engine  # noqa: E402
+from models import Base  # noqa: E402
+
+
+def _legacy_bootstrap() -> None:
+    Base.metadata.create_all(bind=engine)
+    for _, step in initdb.SCHEMA_MIGRATIONS:
+        step()
+    for step in initdb.REPEATABLE_STEPS:
+        step()
+
+
+def _measure(func, iterations: int) -> list[float]:
+    timings: list[float] = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def _report(label: str, timings: list[float]) -> None:
+    print(
+        f"{label:<8} mean={statistics.mean(timings):9.3f} ms  "
+        f"median={statistics.median(timings):9.3f} ms  max={max(timings):9.3f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Сравнение init_db() на запрос и ensure_schema()")
+    parser.add_argument("--iterations", type=int, default=20, help="Количество повторов")
+    args = parser.parse_args()
+
+    initdb.init_db()
+
+    before = _measure(_legacy_bootstrap, args.iterations)
+    after = _measure(initdb.ensure_schema, args.iterations * 1000)
+
+    _report("before", before)
+    _report("after", after)
+    speedup = statistics.mean(before) / max(statistics.mean(after), 1e-9)
+    print(f"speedup  x{speedup:,.0f}")
+
+
+if __name__ == "__main__":
+    main()
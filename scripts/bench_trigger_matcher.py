@@ -0,0 +1,144 @@
+"""Микробенчмарк поиска триггера: линейный перебор против TriggerMatcher.
+
+Генерирует N триггеров (поровну EXACT/STARTS_WITH/CONTAINS, TEXT и COMMAND)
+и прогоняет одинаковый набор сообщений через прежний перебор из
+handlers/start и через скомпилированный индекс. БД не нужна.
+
+Запуск:
+    python scripts/bench_trigger_matcher.py --triggers 10000 --messages 2000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import string
+import sys
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+os.environ.setdefault("BOT_TOKEN", "bench-bot-token")
+
+from services.bot_config import BotTriggerView  # noqa: E402
+from services.trigger_matcher import compile_triggers  # noqa: E402
+
+MODES = ("EXACT", "STARTS_WITH", "CONTAINS")
+
+
+def _word(rng: random.Random, length: int) -> str:
+    return "".join(rng.choice(string.ascii_lowercase) for _ in range(length))
+
+
+def _make_triggers(count: int, rng: random.Random) -> list[BotTriggerView]:
+    triggers = [
+        BotTriggerView(
+            id=index,
+            trigger_type="COMMAND" if index % 10 == 0 else "TEXT",
+            trigger_value=_word(rng, rng.randint(4, 10)),
+            match_mode=MODES[index % len(MODES)],
+            target_node_code=f"NODE_{index}",
+            priority=rng.randint(1, 1000),
+            is_enabled=True,
+        )
+        for index in range(1, count + 1)
+    ]
+    triggers.append(
+        BotTriggerView(
+            id=count + 1,
+            trigger_type="FALLBACK",
+            trigger_value=None,
+            match_mode="EXACT",
+            target_node_code="FALLBACK",
+            priority=100,
+            is_enabled=True,
+        )
+    )
+    type_order = {"COMMAND": 0, "TEXT": 1, "FALLBACK": 2}
+    return sorted(triggers, key=lambda t: (type_order[t.trigger_type], t.priority, t.id))
+
+
+def _linear_match(triggers, normalized_text: str, command: str):
+    for trigger in triggers:
+        trigger_type = trigger.trigger_type.upper()
+        if trigger_type == "FALLBACK":
+            return trigger
+        subject = command if trigger_type == "COMMAND" else normalized_text
+        value = (trigger.trigger_value or "").strip().lower()
+        if not subject or not value:
+            continue
+        mode = (trigger.match_mode or "EXACT").upper()
+        if mode == "CONTAINS":
+            matched = value in subject
+        elif mode == "STARTS_WITH":
+            matched = subject.startswith(value)
+        else:
+            matched = subject == value
+        if matched:
+            return trigger
+    return None
+
+
+def _make_messages(triggers, count: int, rng: random.Random) -> list[tuple[str, str]]:
+    messages: list[tuple[str, str]] = []
+    for _ in range(count):
+        roll = rng.random()
+        if roll < 0.3:
+            # Промах: сообщение, на которое отвечает только FALLBACK.
+            text = " ".join(_word(rng, 5) for _ in range(rng.randint(1, 8)))
+        else:
+            value = rng.choice(triggers).trigger_value or "x"
+            text = f"{_word(rng, 3)} {value} {_word(rng, 4)}" if roll < 0.65 else value
+        command = text.split()[0] if roll > 0.9 else ""
+        messages.append((text, command))
+    return messages
+
+
+def _measure(func, messages) -> list[float]:
+    timings: list[float] = []
+    for text, command in messages:
+        started = time.perf_counter()
+        func(text, command)
+        timings.append((time.perf_counter() - started) * 1_000_000)
+    return timings
+
+
+def _report(label: str, timings: list[float]) -> None:
+    print(
+        f"{label:<9} mean={statistics.mean(timings):10.2f} us  "
+        f"median={statistics.median(timings):10.2f} us  max={max(timings):10.2f} us"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Поиск триггера: перебор против скомпилированного индекса")
+    parser.add_argument("--triggers", type=int, default=10_000, help="Количество триггеров")
+    parser.add_argument("--messages", type=int, default=2_000, help="Количество сообщений")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    triggers = _make_triggers(args.triggers, rng)
+    messages = _make_messages(triggers, args.messages, rng)
+
+    started = time.perf_counter()
+    matcher = compile_triggers(triggers)
+    print(f"compile   {(time.perf_counter() - started) * 1000:.1f} ms for {len(matcher)} triggers")
+
+    for text, command in messages:
+        if matcher.match(text, command) != _linear_match(triggers, text, command):
+            raise SystemExit(f"mismatch for {text!r} / {command!r}")
+
+    linear = _measure(lambda text, command: _linear_match(triggers, text, command), messages)
+    compiled = _measure(matcher.match, messages)
+
+    _report("linear", linear)
+    _report("compiled", compiled)
+    print(f"speedup   x{statistics.mean(linear) / max(statistics.mean(compiled), 1e-9):,.0f}")
+
+
+if __name__ == "__main__":
+    main()
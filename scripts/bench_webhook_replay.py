@@ -0,0 +1,133 @@
+"""Нагрузочный тест webhook-приёма: повтор записанных апдейтов из JSONL.
+
+Апдейты записываются работающим webhook при BOT_WEBHOOK_RECORD_FILE=/path/updates.jsonl
+(по одному JSON-объекту Update в строке).
+
+Два режима:
+- --url: апдейты отправляются POST-запросами на запущенный webhook (staging!),
+  после прогона выводятся метрики из {url}/metrics;
+- без --url: апдейты прогоняются через UpdateWorkerPool в этом процессе с
+  обработчиком-заглушкой (--handler-ms), проверяется порядок внутри каждого чата.
+
+Запуск:
+    python scripts/bench_webhook_replay.py updates.jsonl --workers 8 --handler-ms 20
+    python scripts/bench_webhook_replay.py updates.jsonl --url http://127.0.0.1:8081/bot/webhook --secret S
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+os.environ.setdefault("BOT_TOKEN", "bench-bot-token")
+
+import aiohttp  # noqa: E402
+from aiogram.types import Update  # noqa: E402
+
+import bot_webhook  # noqa: E402
+
+
+def _load_updates(path: Path, repeat: int) -> list[dict]:
+    with path.open(encoding="utf-8") as fh:
+        updates = [json.loads(line) for line in fh if line.strip()]
+    result: list[dict] = []
+    # При повторах update_id сдвигается, чтобы апдейты не считались дублями.
+    for round_index in range(repeat):
+        offset = round_index * 10_000_000
+        result.extend({**update, "update_id": int(update["update_id"]) + offset} for update in updates)
+    return result
+
+
+def _report(label: str, values: list[float]) -> None:
+    if not values:
+        return
+    ordered = sorted(values)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(f"{label:<12} mean={statistics.mean(values):8.2f} ms  p95={p95:8.2f} ms  max={max(values):8.2f} ms")
+
+
+async def _replay_http(updates: list[dict], url: str, secret: str, concurrency: int) -> None:
+    headers = {bot_webhook.SECRET_HEADER: secret} if secret else {}
+    semaphore = asyncio.Semaphore(concurrency)
+    timings: list[float] = []
+    statuses: dict[int, int] = {}
+
+    async with aiohttp.ClientSession(headers=headers) as session:
+
+        async def _post(update: dict) -> None:
+            async with semaphore:
+                started = time.perf_counter()
+                async with session.post(url, json=update) as response:
+                    await response.read()
+                    statuses[response.status] = statuses.get(response.status, 0) + 1
+                timings.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(_post(update) for update in updates))
+        elapsed = time.perf_counter() - started
+
+        print(f"sent {len(updates)} updates in {elapsed:.2f}s ({len(updates) / elapsed:,.0f} upd/s), statuses={statuses}")
+        _report("http", timings)
+        async with session.get(f"{url}/metrics") as response:
+            if response.status != 200:
+                print(f"metrics unavailable ({response.status}): set BOT_WEBHOOK_SECRET and pass --secret")
+            else:
+                print(json.dumps(await response.json(), ensure_ascii=False, indent=2))
+
+
+async def _replay_local(updates: list[dict], workers: int, queue_size: int, handler_ms: float) -> None:
+    handled: dict[int, list[int]] = {}
+
+    async def _feed(update: Update) -> None:
+        await asyncio.sleep(handler_ms / 1000)
+        handled.setdefault(bot_webhook.shard_key(update), []).append(update.update_id)
+
+    pool = bot_webhook.UpdateWorkerPool(_feed, workers=workers, queue_size=queue_size, enqueue_timeout=30)
+    pool.start()
+    parsed = [Update.model_validate(update) for update in updates]
+    expected: dict[int, list[int]] = {}
+    for update in parsed:
+        expected.setdefault(bot_webhook.shard_key(update), []).append(update.update_id)
+
+    started = time.perf_counter()
+    for update in parsed:
+        await pool.submit(update)
+    await pool.stop(timeout=600)
+    elapsed = time.perf_counter() - started
+
+    print(f"processed {len(parsed)} updates from {len(expected)} chats in {elapsed:.2f}s ({len(parsed) / elapsed:,.0f} upd/s)")
+    print(json.dumps(pool.metrics(), ensure_ascii=False, indent=2))
+    if handled != expected:
+        raise SystemExit("per-chat order violated")
+    print("per-chat order: ok")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Повтор записанных апдейтов Telegram")
+    parser.add_argument("file", type=Path, help="JSONL с апдейтами")
+    parser.add_argument("--repeat", type=int, default=1, help="Сколько раз прогнать файл")
+    parser.add_argument("--url", help="Адрес webhook; без него — локальный прогон пула")
+    parser.add_argument("--secret", default=bot_webhook.BOT_WEBHOOK_SECRET)
+    parser.add_argument("--concurrency", type=int, default=50, help="Параллельных HTTP-запросов")
+    parser.add_argument("--workers", type=int, default=bot_webhook.BOT_WEBHOOK_WORKERS)
+    parser.add_argument("--queue-size", type=int, default=bot_webhook.BOT_WEBHOOK_QUEUE_SIZE)
+    parser.add_argument("--handler-ms", type=float, default=20, help="Время обработчика-заглушки")
+    args = parser.parse_args()
+
+    updates = _load_updates(args.file, args.repeat)
+    if args.url:
+        asyncio.run(_replay_http(updates, args.url.rstrip("/"), args.secret, args.concurrency))
+    else:
+        asyncio.run(_replay_local(updates, args.workers, args.queue_size, args.handler_ms))
+
+
+if __name__ == "__main__":
+    main()
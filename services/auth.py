@@ -1,17 +1,67 @@
-"""Логика аутентификации админов."""
+"""Логика аутентификации админов.
+
+Запросы админок проверяются через get_principal: токен сессии превращается в
+компактный AdminPrincipal (id, активность, коды ролей, права) одним запросом,
+результат кэшируется в процессе на ADMIN_SESSION_CACHE_TTL секунд. Выход и
+invalidate_user_sessions сбрасывают кэш сразу; в других процессах запись
+устаревает не позже TTL.
+"""
 
 from __future__ import annotations
 
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Optional
 from uuid import uuid4
 
+from sqlalchemy import delete, select
 from sqlalchemy.orm import Session
 
-from models.admin_user import AdminRole, AdminSession, AdminUser
+from models.admin_user import (
+    AdminPermission,
+    AdminRole,
+    AdminRoleModel,
+    AdminRolePermission,
+    AdminSession,
+    AdminUser,
+    AdminUserRole,
+)
 from services.passwords import verify_password
 
 SESSION_TTL_HOURS = 24
+ADMIN_SESSION_CACHE_TTL = float(os.getenv("ADMIN_SESSION_CACHE_TTL", "30"))
+ADMIN_SESSION_CACHE_SIZE = int(os.getenv("ADMIN_SESSION_CACHE_SIZE", "1000"))
+
+
+@dataclass(frozen=True)
+class AdminPrincipal:
+    """Кто выполняет запрос в админке: без ORM-объектов и ленивых связей."""
+
+    id: int
+    username: str
+    role: str
+    is_active: bool
+    roles: tuple[str, ...]
+    permissions: frozenset[str]
+    expires_at: datetime
+
+    def role_codes(self) -> list[str]:
+        return list(self.roles)
+
+    def has_role(self, code: str) -> bool:
+        return code in self.roles
+
+    def has_permission(self, code: str) -> bool:
+        return code in self.permissions
+
+
+# токен -> (момент загрузки по time.monotonic(), principal)
+_principals: OrderedDict[str, tuple[float, AdminPrincipal]] = OrderedDict()
+_principals_lock = threading.Lock()
 
 
 def authenticate_admin(
@@ -40,6 +90,8 @@ def create_session(db: Session, user: AdminUser) -> AdminSession:
 def remove_session(db: Session, token: str) -> None:
     db.query(AdminSession).filter(AdminSession.token == token).delete()
     db.commit()
+    with _principals_lock:
+        _principals.pop(token, None)
 
 
 def get_session(db: Session, token: str) -> Optional[AdminSession]:
@@ -55,14 +107,93 @@ def get_session(db: Session, token: str) -> Optional[AdminSession]:
     return session
 
 
+def _load_principal(db: Session, token: str) -> Optional[AdminPrincipal]:
+    rows = db.execute(
+        select(
+            AdminSession.expires_at,
+            AdminUser.id,
+            AdminUser.username,
+            AdminUser.role,
+            AdminUser.is_active,
+            AdminRoleModel.code.label("role_code"),
+            AdminPermission.code.label("permission_code"),
+        )
+        .join(AdminUser, AdminUser.id == AdminSession.user_id)
+        .outerjoin(AdminUserRole, AdminUserRole.user_id == AdminUser.id)
+        .outerjoin(AdminRoleModel, AdminRoleModel.id == AdminUserRole.role_id)
+        .outerjoin(AdminRolePermission, AdminRolePermission.role_id == AdminRoleModel.id)
+        .outerjoin(AdminPermission, AdminPermission.id == AdminRolePermission.permission_id)
+        .where(AdminSession.token == token)
+    ).all()
+    if not rows:
+        return None
+
+    first = rows[0]
+    if first.expires_at <= datetime.utcnow():
+        db.execute(delete(AdminSession).where(AdminSession.token == token))
+        db.commit()
+        return None
+    if not first.is_active:
+        return None
+
+    role_codes = sorted({row.role_code for row in rows if row.role_code})
+    if not role_codes and first.role:
+        role_codes = [first.role]
+    return AdminPrincipal(
+        id=first.id,
+        username=first.username,
+        role=first.role,
+        is_active=bool(first.is_active),
+        roles=tuple(role_codes),
+        permissions=frozenset(row.permission_code for row in rows if row.permission_code),
+        expires_at=first.expires_at,
+    )
+
+
+def get_principal(db: Session, token: str) -> Optional[AdminPrincipal]:
+    """Принципал по токену сессии: из кэша процесса или одним запросом к БД."""
+
+    now = time.monotonic()
+    with _principals_lock:
+        cached = _principals.get(token)
+        if cached is not None:
+            loaded_at, principal = cached
+            if now - loaded_at < ADMIN_SESSION_CACHE_TTL and principal.expires_at > datetime.utcnow():
+                _principals.move_to_end(token)
+                return principal
+            del _principals[token]
+
+    principal = _load_principal(db, token)
+    if principal is None:
+        return None
+    with _principals_lock:
+        _principals[token] = (now, principal)
+        while len(_principals) > ADMIN_SESSION_CACHE_SIZE:
+            _principals.popitem(last=False)
+    return principal
+
+
+def forget_principals(user_id: int) -> None:
+    """Сбросить кэш сессий пользователя: роли или активность изменились."""
+
+    with _principals_lock:
+        for token in [token for token, (_, principal) in _principals.items() if principal.id == user_id]:
+            del _principals[token]
+
+
 def invalidate_user_sessions(db: Session, user_id: int) -> None:
     db.query(AdminSession).filter(AdminSession.user_id == user_id).delete()
     db.commit()
+    forget_principals(user_id)
 
 
 __all__ = [
+    "ADMIN_SESSION_CACHE_TTL",
+    "AdminPrincipal",
     "authenticate_admin",
     "create_session",
+    "forget_principals",
+    "get_principal",
     "get_session",
     "invalidate_user_sessions",
     "remove_session",
@@ -1,13 +1,23 @@
-"""Загрузка конфигурации бота (узлы/кнопки) из БД с кэшем по версии."""
+"""Загрузка конфигурации бота (узлы/кнопки) из БД с кэшем по версии.
+
+Вся конфигурация держится в памяти одним неизменяемым снимком BotConfigSnapshot.
+Обработчики читают только снимок и в БД не ходят. Версию в bot_runtime проверяет
+фоновый поток раз в BOT_CONFIG_REFRESH_INTERVAL секунд: если она сменилась, он
+собирает новый снимок и подменяет ссылку на него целиком.
+"""
 
 from __future__ import annotations
 
 import logging
-from dataclasses import dataclass
-from typing import Dict, Optional
+import os
+import threading
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional
 
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup, WebAppInfo
-from sqlalchemy.orm import selectinload
+from sqlalchemy import event
+from sqlalchemy.orm import Session, selectinload
 
 from database import get_session
 from models import (
@@ -18,6 +28,7 @@ from models import (
     BotTrigger,
     MenuButton,
 )
+from services.trigger_matcher import TriggerMatcher, compile_triggers
 
 logger = logging.getLogger(__name__)
 
@@ -97,14 +108,24 @@ class MenuButtonView:
     is_active: bool
 
 
-_cache: dict[str, object] = {
-    "version": None,
-    "nodes": {},
-    "triggers": [],
-    "start_node_code": None,
-    "menu_buttons": [],
-    "buttons": {},
-}
+BOT_CONFIG_REFRESH_INTERVAL = float(os.getenv("BOT_CONFIG_REFRESH_INTERVAL", "2"))
+
+
+@dataclass(frozen=True)
+class BotConfigSnapshot:
+    version: int
+    start_node_code: str | None
+    nodes: Mapping[str, NodeView] = field(default_factory=lambda: MappingProxyType({}))
+    buttons: Mapping[int, NodeButtonView] = field(default_factory=lambda: MappingProxyType({}))
+    triggers: tuple[BotTriggerView, ...] = ()
+    menu_buttons: tuple[MenuButtonView, ...] = ()
+    trigger_matcher: TriggerMatcher = field(default_factory=lambda: compile_triggers(()))
+
+
+_snapshot: BotConfigSnapshot | None = None
+_reload_lock = threading.Lock()
+_refresher: threading.Thread | None = None
+_refresh_wakeup = threading.Event()
 
 
 def _get_runtime(session) -> BotRuntime:
@@ -177,7 +198,7 @@ def _build_inline_keyboard(buttons: list[BotButton]) -> InlineKeyboardMarkup | N
     return InlineKeyboardMarkup(inline_keyboard=inline_keyboard)
 
 
-def _reload_cache(session, version: int, start_node_code: str | None) -> None:
+def _build_snapshot(session, version: int, start_node_code: str | None) -> BotConfigSnapshot:
     nodes = (
         session.query(BotNode)
         .options(selectinload(BotNode.buttons))
@@ -253,7 +274,6 @@ def _reload_cache(session, version: int, start_node_code: str | None) -> None:
             config_json=config_json,
             clear_chat=bool(node.clear_chat),
         )
-    _cache["buttons"] = buttons_map
 
     triggers = (
         session.query(BotTrigger)
@@ -298,99 +318,123 @@ def _reload_cache(session, version: int, start_node_code: str | None) -> None:
         if btn.is_active
     ]
 
-    _cache["version"] = version
-    _cache["nodes"] = prepared
-    _cache["triggers"] = prepared_triggers
-    _cache["start_node_code"] = start_node_code
-    _cache["menu_buttons"] = prepared_menu
+    return BotConfigSnapshot(
+        version=version,
+        start_node_code=start_node_code,
+        nodes=MappingProxyType(prepared),
+        buttons=MappingProxyType(buttons_map),
+        triggers=tuple(prepared_triggers),
+        menu_buttons=tuple(prepared_menu),
+        trigger_matcher=compile_triggers(prepared_triggers),
+    )
+
+
+def _reload_cache(session, version: int, start_node_code: str | None) -> BotConfigSnapshot:
+    global _snapshot
+    snapshot = _build_snapshot(session, version, start_node_code)
+    _snapshot = snapshot
     logger.info(
         "Bot config cache reloaded (version=%s, nodes=%s, triggers=%s, menu_buttons=%s)",
         version,
-        len(prepared),
-        len(prepared_triggers),
-        len(prepared_menu),
+        len(snapshot.nodes),
+        len(snapshot.triggers),
+        len(snapshot.menu_buttons),
     )
+    return snapshot
 
 
-def load_node(code: str) -> Optional[NodeView]:
-    with get_session() as session:
-        runtime = _get_runtime(session)
-        if _cache.get("version") != runtime.config_version:
-            _reload_cache(session, runtime.config_version, runtime.start_node_code)
+def refresh_config(force: bool = False) -> BotConfigSnapshot:
+    """Сверить версию с bot_runtime и при изменении пересобрать снимок.
 
-        nodes: Dict[str, NodeView] = _cache.get("nodes", {})  # type: ignore[assignment]
-        return nodes.get(code)
+    Пересборка идёт под одной блокировкой: одновременные вызовы дождутся
+    первого и получат его снимок, а не будут читать конфигурацию параллельно.
+    """
 
+    with _reload_lock:
+        with get_session() as session:
+            runtime = _get_runtime(session)
+            current = _snapshot
+            if (
+                not force
+                and current is not None
+                and current.version == runtime.config_version
+                and current.start_node_code == runtime.start_node_code
+            ):
+                return current
+            return _reload_cache(session, runtime.config_version, runtime.start_node_code)
 
-def load_button(button_id: int) -> Optional[NodeButtonView]:
-    with get_session() as session:
-        runtime = _get_runtime(session)
-        if _cache.get("version") != runtime.config_version:
-            _reload_cache(session, runtime.config_version, runtime.start_node_code)
 
-        buttons: Dict[int, NodeButtonView] = _cache.get("buttons", {})  # type: ignore[assignment]
-        return buttons.get(button_id)
+def _refresh_forever() -> None:
+    while True:
+        try:
+            refresh_config()
+        except Exception:
+            logger.exception("Bot config refresh failed")
+        _refresh_wakeup.wait(BOT_CONFIG_REFRESH_INTERVAL)
+        _refresh_wakeup.clear()
 
 
-def load_triggers() -> list[BotTriggerView]:
-    with get_session() as session:
-        runtime = _get_runtime(session)
-        if _cache.get("version") != runtime.config_version:
-            _reload_cache(session, runtime.config_version, runtime.start_node_code)
+def invalidate_config_cache() -> None:
+    """Попросить фоновый поток сверить версию сейчас, не дожидаясь интервала."""
 
-        return list(_cache.get("triggers", []))  # type: ignore[list-item]
+    _refresh_wakeup.set()
 
 
-def get_start_node_code() -> str:
-    with get_session() as session:
-        runtime = _get_runtime(session)
-        if _cache.get("version") != runtime.config_version:
-            _reload_cache(session, runtime.config_version, runtime.start_node_code)
+def invalidate_config_cache_on_commit(session: Session) -> None:
+    """Сверить версию сразу после commit сессии, в которой поднят config_version.
 
-        cached_start_node = _cache.get("start_node_code") or runtime.start_node_code
-        return (cached_start_node or "MAIN_MENU").strip() or "MAIN_MENU"
+    До commit фоновый поток прочитал бы прежнюю версию, поэтому будим его из after_commit.
+    """
 
+    event.listen(session, "after_commit", lambda _session: invalidate_config_cache(), once=True)
 
-def load_menu_buttons() -> list[MenuButtonView]:
-    with get_session() as session:
-        runtime = _get_runtime(session)
-        if _cache.get("version") != runtime.config_version:
-            _reload_cache(session, runtime.config_version, runtime.start_node_code)
 
-        return list(_cache.get("menu_buttons", []))  # type: ignore[list-item]
+def _ensure_refresher() -> None:
+    global _refresher
+    if BOT_CONFIG_REFRESH_INTERVAL <= 0:
+        return
+    with _reload_lock:
+        if _refresher is not None and _refresher.is_alive():
+            return
+        _refresher = threading.Thread(target=_refresh_forever, name="bot-config-refresh", daemon=True)
+        _refresher.start()
 
 
-def cache_node_image_file_id(node_code: str, file_id: str) -> None:
-    nodes: Dict[str, NodeView] = _cache.get("nodes", {})  # type: ignore[assignment]
-    node_view = nodes.get(node_code)
-    if not node_view:
-        return
+def get_config_snapshot() -> BotConfigSnapshot:
+    """Текущий снимок конфигурации; БД читается только при самом первом обращении."""
 
-    updated_config = dict(node_view.config_json or {})
-    updated_config["image_file_id"] = file_id
-    node_view.config_json = updated_config
+    snapshot = _snapshot
+    if snapshot is None:
+        snapshot = refresh_config()
+        _ensure_refresher()
+    return snapshot
 
 
-def persist_node_image_file_id(node_code: str, file_id: str) -> None:
-    with get_session() as session:
-        node: BotNode | None = (
-            session.query(BotNode).filter(BotNode.code == node_code).first()
-        )
-        if not node:
-            return
+def get_cached_config_version() -> int | None:
+    snapshot = _snapshot
+    return snapshot.version if snapshot is not None else None
+
+
+def load_node(code: str) -> Optional[NodeView]:
+    return get_config_snapshot().nodes.get(code)
 
-        config: dict = node.config_json if isinstance(node.config_json, dict) else {}
-        if config.get("image_file_id") == file_id:
-            return
 
-        config["image_file_id"] = file_id
-        node.config_json = config
+def load_button(button_id: int) -> Optional[NodeButtonView]:
+    return get_config_snapshot().buttons.get(button_id)
 
-        runtime = _get_runtime(session)
-        runtime.config_version = (runtime.config_version or 1) + 1
 
-        session.add_all([node, runtime])
-        session.commit()
+def load_triggers() -> list[BotTriggerView]:
+    return list(get_config_snapshot().triggers)
+
+
+def load_trigger_matcher() -> TriggerMatcher:
+    return get_config_snapshot().trigger_matcher
+
 
-        _reload_cache(session, runtime.config_version, runtime.start_node_code)
-        cache_node_image_file_id(node_code, file_id)
+def get_start_node_code() -> str:
+    cached_start_node = get_config_snapshot().start_node_code
+    return (cached_start_node or "MAIN_MENU").strip() or "MAIN_MENU"
+
+
+def load_menu_buttons() -> list[MenuButtonView]:
+    return list(get_config_snapshot().menu_buttons)
@@ -0,0 +1,288 @@
+"""Инкрементальная воронка по узлам бота на основе bot_logs.
+
+Фоновая задача читает из bot_logs только новые события NODE_ENTER / TRIGGER /
+ACTION — после водяного знака (created_at, id) из bot_funnel_state — и
+обновляет агрегаты:
+
+- bot_funnel_nodes — заходы, уникальные пользователи, выходы, срабатывания
+  триггеров и действия по каждому узлу, а также current_users — сколько
+  пользователей остановились на узле (отток);
+- bot_funnel_transitions — переходы «узел → узел» по последовательным NODE_ENTER
+  одного пользователя;
+- bot_funnel_positions / bot_funnel_node_users — служебное состояние: последний
+  узел пользователя и факт захода пользователя в узел.
+
+Агрегаты и водяной знак меняются в одной транзакции, поэтому каждое событие
+учитывается ровно один раз. События моложе BOT_FUNNEL_SAFETY_LAG секунд не
+читаются: логи пишутся пачками из буферов разных процессов и могут появиться
+в БД не в порядке created_at. Админка читает только агрегаты (get_funnel).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from typing import Any
+
+from sqlalchemy import and_, delete, or_, select
+from sqlalchemy.orm import Session
+
+from database import get_session, run_db
+from models import (
+    BotFunnelNode,
+    BotFunnelNodeUser,
+    BotFunnelPosition,
+    BotFunnelState,
+    BotFunnelTransition,
+    BotLog,
+    BotNode,
+)
+
+logger = logging.getLogger(__name__)
+
+BOT_FUNNEL_INTERVAL = float(os.getenv("BOT_FUNNEL_INTERVAL", "60"))
+BOT_FUNNEL_BATCH_SIZE = int(os.getenv("BOT_FUNNEL_BATCH_SIZE", "5000"))
+BOT_FUNNEL_SAFETY_LAG = float(os.getenv("BOT_FUNNEL_SAFETY_LAG", "60"))
+
+STATE_NAME = "nodes"
+EVENT_NODE_ENTER = "NODE_ENTER"
+EVENT_TRIGGER = "TRIGGER"
+EVENT_ACTION = "ACTION"
+FUNNEL_EVENTS = (EVENT_NODE_ENTER, EVENT_TRIGGER, EVENT_ACTION)
+NODE_COUNTERS = ("visits", "unique_users", "current_users", "exits", "triggers", "actions")
+
+_task: asyncio.Task | None = None
+
+
+def _load_state(session: Session) -> BotFunnelState:
+    state = session.get(BotFunnelState, STATE_NAME, with_for_update=True)
+    if state is None:
+        state = BotFunnelState(name=STATE_NAME, last_log_id=0, processed_events=0, updated_at=datetime.utcnow())
+        session.add(state)
+        session.flush()
+    return state
+
+
+def _next_events(session: Session, state: BotFunnelState, *, limit: int, until: datetime) -> list[Any]:
+    query = select(BotLog.id, BotLog.created_at, BotLog.user_id, BotLog.event_type, BotLog.node_code).where(
+        BotLog.event_type.in_(FUNNEL_EVENTS),
+        BotLog.created_at < until,
+    )
+    if state.last_created_at is not None:
+        query = query.where(
+            or_(
+                BotLog.created_at > state.last_created_at,
+                and_(BotLog.created_at == state.last_created_at, BotLog.id > state.last_log_id),
+            )
+        )
+    return session.execute(query.order_by(BotLog.created_at, BotLog.id).limit(limit)).all()
+
+
+def _apply_events(session: Session, rows: list[Any]) -> None:
+    enter_rows = [row for row in rows if row.event_type == EVENT_NODE_ENTER and row.node_code]
+    user_ids = {row.user_id for row in enter_rows}
+    node_codes = {row.node_code for row in enter_rows}
+
+    positions: dict[int, BotFunnelPosition] = {}
+    known_pairs: set[tuple[str, int]] = set()
+    if user_ids:
+        positions = {
+            position.user_id: position
+            for position in session.scalars(
+                select(BotFunnelPosition).where(BotFunnelPosition.user_id.in_(user_ids))
+            )
+        }
+        known_pairs = {
+            (pair.node_code, pair.user_id)
+            for pair in session.scalars(
+                select(BotFunnelNodeUser).where(
+                    BotFunnelNodeUser.user_id.in_(user_ids), BotFunnelNodeUser.node_code.in_(node_codes)
+                )
+            )
+        }
+
+    node_deltas: dict[str, Counter] = defaultdict(Counter)
+    last_event_at: dict[str, datetime] = {}
+    transitions: Counter = Counter()
+    current: dict[int, str] = {user_id: position.node_code for user_id, position in positions.items()}
+    moved: dict[int, tuple[str, datetime]] = {}
+    new_pairs: list[dict[str, Any]] = []
+
+    for row in rows:
+        node = row.node_code
+        if not node:
+            continue
+        delta = node_deltas[node]
+        last_event_at[node] = row.created_at
+        if row.event_type == EVENT_TRIGGER:
+            delta["triggers"] += 1
+            continue
+        if row.event_type == EVENT_ACTION:
+            delta["actions"] += 1
+            continue
+
+        delta["visits"] += 1
+        pair = (node, row.user_id)
+        if pair not in known_pairs:
+            known_pairs.add(pair)
+            new_pairs.append({"node_code": node, "user_id": row.user_id})
+            delta["unique_users"] += 1
+
+        previous = current.get(row.user_id)
+        if previous is None:
+            delta["current_users"] += 1
+        elif previous != node:
+            transitions[(previous, node)] += 1
+            node_deltas[previous]["exits"] += 1
+            node_deltas[previous]["current_users"] -= 1
+            delta["current_users"] += 1
+        current[row.user_id] = node
+        moved[row.user_id] = (node, row.created_at)
+
+    if node_deltas:
+        existing = {
+            node.node_code: node
+            for node in session.scalars(select(BotFunnelNode).where(BotFunnelNode.node_code.in_(node_deltas)))
+        }
+        for node_code, delta in node_deltas.items():
+            node = existing.get(node_code)
+            if node is None:
+                node = BotFunnelNode(node_code=node_code, **{name: 0 for name in NODE_COUNTERS})
+                session.add(node)
+            for name in NODE_COUNTERS:
+                setattr(node, name, int(getattr(node, name) or 0) + delta[name])
+            if node_code in last_event_at:
+                node.last_event_at = last_event_at[node_code]
+
+    if transitions:
+        sources = {source for source, _ in transitions}
+        existing_transitions = {
+            (transition.from_node, transition.to_node): transition
+            for transition in session.scalars(
+                select(BotFunnelTransition).where(BotFunnelTransition.from_node.in_(sources))
+            )
+        }
+        for (source, target), count in transitions.items():
+            transition = existing_transitions.get((source, target))
+            if transition is None:
+                session.add(BotFunnelTransition(from_node=source, to_node=target, transitions=count))
+            else:
+                transition.transitions = int(transition.transitions or 0) + count
+
+    for user_id, (node_code, entered_at) in moved.items():
+        position = positions.get(user_id)
+        if position is None:
+            session.add(BotFunnelPosition(user_id=user_id, node_code=node_code, entered_at=entered_at))
+        else:
+            position.node_code = node_code
+            position.entered_at = entered_at
+
+    if new_pairs:
+        session.add_all(BotFunnelNodeUser(**pair) for pair in new_pairs)
+
+
+def process_batch(limit: int = BOT_FUNNEL_BATCH_SIZE, *, now: datetime | None = None) -> int:
+    """Учесть следующую пачку событий; возвращает число прочитанных строк bot_logs."""
+
+    until = (now or datetime.utcnow()) - timedelta(seconds=BOT_FUNNEL_SAFETY_LAG)
+    with get_session("jobs") as session:
+        state = _load_state(session)
+        rows = _next_events(session, state, limit=limit, until=until)
+        if not rows:
+            return 0
+        _apply_events(session, rows)
+        last = rows[-1]
+        state.last_created_at = last.created_at
+        state.last_log_id = last.id
+        state.processed_events = int(state.processed_events or 0) + len(rows)
+        state.updated_at = datetime.utcnow()
+    return len(rows)
+
+
+def process_pending(limit: int = BOT_FUNNEL_BATCH_SIZE, *, now: datetime | None = None) -> int:
+    """Догнать журнал пачками по limit событий."""
+
+    total = 0
+    while True:
+        processed = process_batch(limit, now=now)
+        total += processed
+        if processed < limit:
+            return total
+
+
+def reset() -> None:
+    """Стереть агрегаты и водяной знак — следующий прогон пересчитает воронку с начала журнала."""
+
+    with get_session("jobs") as session:
+        for model in (BotFunnelTransition, BotFunnelNodeUser, BotFunnelPosition, BotFunnelNode, BotFunnelState):
+            session.execute(delete(model))
+
+
+def get_funnel(db: Session) -> dict[str, Any]:
+    """Воронка для админки: узлы графа со счётчиками и переходы между ними."""
+
+    stats = {node.node_code: node for node in db.scalars(select(BotFunnelNode))}
+    titles = dict(db.execute(select(BotNode.code, BotNode.title)).all())
+
+    nodes = []
+    for code in sorted(set(titles) | set(stats)):
+        node = stats.get(code)
+        counters = {name: int(getattr(node, name) or 0) if node else 0 for name in NODE_COUNTERS}
+        unique_users = counters["unique_users"]
+        nodes.append(
+            {
+                "code": code,
+                "title": titles.get(code),
+                "exists": code in titles,
+                **counters,
+                "dropoff": counters["current_users"],
+                "dropoff_rate": round(counters["current_users"] / unique_users, 4) if unique_users else 0.0,
+                "last_event_at": node.last_event_at.isoformat() if node and node.last_event_at else None,
+            }
+        )
+
+    transitions = [
+        {"from": row.from_node, "to": row.to_node, "count": int(row.transitions or 0)}
+        for row in db.scalars(
+            select(BotFunnelTransition).order_by(BotFunnelTransition.transitions.desc(), BotFunnelTransition.from_node)
+        )
+    ]
+    state = db.get(BotFunnelState, STATE_NAME)
+    return {
+        "nodes": nodes,
+        "transitions": transitions,
+        "watermark": state.last_created_at.isoformat() if state and state.last_created_at else None,
+        "processed_events": int(state.processed_events or 0) if state else 0,
+    }
+
+
+async def _funnel_loop(interval: float) -> None:
+    while True:
+        try:
+            await run_db(process_pending)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Bot funnel update failed")
+        await asyncio.sleep(interval)
+
+
+def start_worker(interval: float = BOT_FUNNEL_INTERVAL) -> None:
+    """Запустить пересчёт воронки как asyncio-задачу текущего event loop (вызывается на startup)."""
+
+    global _task
+    if _task is not None or interval <= 0:
+        return
+    _task = asyncio.get_running_loop().create_task(_funnel_loop(interval), name="bot-funnel")
+
+
+async def stop_worker() -> None:
+    global _task
+    task, _task = _task, None
+    if task is None:
+        return
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
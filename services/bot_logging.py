@@ -1,17 +1,43 @@
-"""Безопасное логирование работы бот-сценариев в БД и в fallback-лог."""
+"""Безопасное логирование работы бот-сценариев в БД и в fallback-лог.
+
+События не пишутся в БД синхронно: log_bot_event кладёт строку в ограниченный
+буфер в памяти, а фоновый поток сбрасывает его одним executemany-INSERT раз в
+BOT_LOG_FLUSH_INTERVAL секунд или как только набралось BOT_LOG_BATCH_SIZE строк.
+Если БД не успевает и буфер заполнен (BOT_LOG_BUFFER_SIZE), новые события
+отбрасываются и учитываются в счётчике dropped (см. get_buffer_stats).
+"""
 
 from __future__ import annotations
 
+import atexit
 import json
 import logging
+import os
+import threading
+from collections import deque
+from datetime import datetime
 from typing import Any
 
+from sqlalchemy import insert
+
 from database import get_session
 from models import BotLog
-from services.bot_config import get_config_version
+from services import bot_config
 
 logger = logging.getLogger(__name__)
 
+BOT_LOG_BUFFER_SIZE = int(os.getenv("BOT_LOG_BUFFER_SIZE", "10000"))
+BOT_LOG_BATCH_SIZE = int(os.getenv("BOT_LOG_BATCH_SIZE", "200"))
+BOT_LOG_FLUSH_INTERVAL = float(os.getenv("BOT_LOG_FLUSH_INTERVAL", "0.5"))
+
+_buffer: deque[dict[str, Any]] = deque()
+_buffer_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_wakeup = threading.Event()
+_stopping = threading.Event()
+_flusher: threading.Thread | None = None
+_stats = {"written": 0, "dropped": 0, "failed_batches": 0}
+
 
 def _serialize_details(details: Any) -> str:
     if details is None:
@@ -24,6 +50,99 @@ def _serialize_details(details: Any) -> str:
         return str(details)
 
 
+def _ensure_flusher() -> None:
+    global _flusher
+    if _flusher is not None and _flusher.is_alive():
+        return
+    with _buffer_lock:
+        if _flusher is not None and _flusher.is_alive():
+            return
+        _stopping.clear()
+        _flusher = threading.Thread(target=_flush_forever, name="bot-log-flusher", daemon=True)
+        _flusher.start()
+
+
+def _enqueue(row: dict[str, Any]) -> None:
+    with _buffer_lock:
+        if len(_buffer) >= BOT_LOG_BUFFER_SIZE:
+            _stats["dropped"] += 1
+            dropped = _stats["dropped"]
+        else:
+            _buffer.append(row)
+            dropped = 0
+            if len(_buffer) >= BOT_LOG_BATCH_SIZE:
+                _wakeup.set()
+    if dropped and (dropped == 1 or dropped % 1000 == 0):
+        logger.warning("Буфер bot_logs переполнен, событий отброшено: %s", dropped)
+
+
+def _take_batch() -> list[dict[str, Any]]:
+    with _buffer_lock:
+        count = min(len(_buffer), BOT_LOG_BATCH_SIZE)
+        return [_buffer.popleft() for _ in range(count)]
+
+
+def _write_batch(rows: list[dict[str, Any]]) -> None:
+    with get_session() as session:
+        if any(row["config_version"] is None for row in rows):
+            # Кэш бота ещё не загружен — один запрос версии на пачку, а не на событие.
+            version = bot_config.get_config_version(session) or 1
+            for row in rows:
+                if row["config_version"] is None:
+                    row["config_version"] = version
+        session.execute(insert(BotLog), rows)
+
+
+def flush() -> int:
+    """Сбросить весь буфер в БД. Возвращает число записанных строк."""
+
+    written = 0
+    with _flush_lock:
+        while True:
+            rows = _take_batch()
+            if not rows:
+                return written
+            try:
+                _write_batch(rows)
+            except Exception as exc:
+                # Пачка теряется целиком: повтор при лежащей БД только раздует буфер.
+                with _buffer_lock:
+                    _stats["failed_batches"] += 1
+                    _stats["dropped"] += len(rows)
+                logger.warning("Не удалось записать %s событий в bot_logs: %s", len(rows), exc)
+                return written
+            written += len(rows)
+            with _buffer_lock:
+                _stats["written"] += len(rows)
+
+
+def _flush_forever() -> None:
+    while not _stopping.is_set():
+        _wakeup.wait(BOT_LOG_FLUSH_INTERVAL)
+        _wakeup.clear()
+        flush()
+
+
+def shutdown(timeout: float = 5.0) -> None:
+    """Остановить фоновый поток и дописать остаток буфера."""
+
+    global _flusher
+    _stopping.set()
+    _wakeup.set()
+    thread, _flusher = _flusher, None
+    if thread is not None:
+        thread.join(timeout=timeout)
+    flush()
+
+
+atexit.register(shutdown)
+
+
+def get_buffer_stats() -> dict[str, int]:
+    with _buffer_lock:
+        return {**_stats, "buffered": len(_buffer)}
+
+
 def log_bot_event(
     event_type: str,
     *,
@@ -33,26 +152,24 @@ def log_bot_event(
     details: Any = None,
     config_version: int | None = None,
 ) -> None:
-    """Записать событие в bot_logs, не ломая основной поток."""
+    """Поставить событие в очередь записи в bot_logs, не ломая основной поток."""
 
     if not user_id:
         return
 
     try:
-        with get_session() as session:
-            version = config_version
-            if version is None:
-                version = get_config_version(session)
-
-            log_row = BotLog(
-                user_id=user_id,
-                username=username,
-                event_type=event_type,
-                node_code=node_code,
-                details=_serialize_details(details),
-                config_version=version or 1,
-            )
-            session.add(log_row)
+        _enqueue(
+            {
+                "created_at": datetime.utcnow(),
+                "user_id": user_id,
+                "username": username,
+                "event_type": event_type,
+                "node_code": node_code,
+                "details": _serialize_details(details),
+                "config_version": config_version or bot_config.get_cached_config_version(),
+            }
+        )
+        _ensure_flusher()
     except Exception as exc:  # pragma: no cover - безопасность
         logger.warning(
             "Не удалось записать событие %s для пользователя %s: %s",
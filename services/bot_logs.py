@@ -1,11 +1,30 @@
 from __future__ import annotations
 
+import base64
+import json
+from dataclasses import dataclass, field
 from datetime import datetime, time
-from typing import Iterable, Optional
+from typing import Iterable, Literal, Optional
 
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.orm import Query, Session
 
-from models import BotLog
+from models import BotLog, BotLogHourly
+
+CountMode = Literal["exact", "estimate", "none"]
+SummaryGroup = Literal["event_type", "node_code", "config_version"]
+
+# Оценки ниже этого порога пересчитываются точно: COUNT по небольшой выборке дешёвый.
+EXACT_COUNT_THRESHOLD = 10_000
+
+
+@dataclass
+class BotLogsPage:
+    rows: list[BotLog] = field(default_factory=list)
+    next_cursor: str | None = None
+    prev_cursor: str | None = None
+    total: int | None = None
+    total_is_estimate: bool = False
 
 
 def _parse_int(value: str | int | None) -> Optional[int]:
@@ -27,21 +46,32 @@ def _normalize_date(value: str | None, is_end: bool = False) -> Optional[datetim
         return None
 
 
-def fetch_logs(
+def encode_cursor(row: BotLog) -> str:
+    raw = f"{row.created_at.isoformat()}|{row.id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str | None) -> tuple[datetime, int] | None:
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, row_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception:
+        return None
+
+
+def _filtered_query(
     db: Session,
     *,
-    page: int = 1,
-    per_page: int = 50,
     user_id: str | int | None = None,
     username: str | None = None,
     event_type: str | None = None,
     node_code: str | None = None,
     date_from: str | None = None,
     date_to: str | None = None,
-) -> tuple[list[BotLog], int]:
-    page = max(page, 1)
-    per_page = max(per_page, 1)
-
+) -> Query:
     query = db.query(BotLog)
 
     normalized_user_id = _parse_int(user_id)
@@ -68,14 +98,109 @@ def fetch_logs(
     if end_date:
         query = query.filter(BotLog.created_at <= end_date)
 
-    total = query.count()
-    rows = (
-        query.order_by(BotLog.created_at.desc())
-        .offset((page - 1) * per_page)
-        .limit(per_page)
-        .all()
+    return query
+
+
+def _estimate_count(db: Session, query: Query) -> int | None:
+    """Оценка числа строк по плану Postgres (EXPLAIN), без прохода по таблице."""
+
+    if db.get_bind().dialect.name != "postgresql":
+        return None
+    compiled = query.with_entities(BotLog.id).statement.compile(dialect=db.get_bind().dialect)
+    try:
+        # SAVEPOINT: ошибка EXPLAIN не должна ломать транзакцию запроса страницы.
+        with db.begin_nested():
+            plan = db.connection().exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+    except Exception:
+        return None
+
+
+def _count(db: Session, query: Query, mode: CountMode) -> tuple[int | None, bool]:
+    if mode == "none":
+        return None, False
+    if mode == "estimate":
+        estimate = _estimate_count(db, query)
+        if estimate is not None and estimate >= EXACT_COUNT_THRESHOLD:
+            return estimate, True
+    total = db.execute(select(func.count()).select_from(query.with_entities(BotLog.id).subquery())).scalar()
+    return int(total or 0), False
+
+
+def fetch_logs(
+    db: Session,
+    *,
+    after: str | None = None,
+    before: str | None = None,
+    per_page: int = 50,
+    count_mode: CountMode = "estimate",
+    user_id: str | int | None = None,
+    username: str | None = None,
+    event_type: str | None = None,
+    node_code: str | None = None,
+    date_from: str | None = None,
+    date_to: str | None = None,
+) -> BotLogsPage:
+    """Страница журнала от новых к старым с keyset-пагинацией по (created_at, id).
+
+    after — курсор последней строки предыдущей страницы (листаем к более старым),
+    before — курсор первой строки текущей страницы (возвращаемся к более новым).
+    Глубина страницы не влияет на стоимость запроса, в отличие от OFFSET.
+    """
+
+    per_page = max(per_page, 1)
+    query = _filtered_query(
+        db,
+        user_id=user_id,
+        username=username,
+        event_type=event_type,
+        node_code=node_code,
+        date_from=date_from,
+        date_to=date_to,
+    )
+    total, is_estimate = _count(db, query, count_mode)
+
+    after_key = decode_cursor(after)
+    before_key = decode_cursor(before) if after_key is None else None
+    if before_key is not None:
+        created_at, row_id = before_key
+        rows = (
+            query.filter(
+                or_(
+                    BotLog.created_at > created_at,
+                    and_(BotLog.created_at == created_at, BotLog.id > row_id),
+                )
+            )
+            .order_by(BotLog.created_at.asc(), BotLog.id.asc())
+            .limit(per_page + 1)
+            .all()
+        )
+        has_newer = len(rows) > per_page
+        rows = list(reversed(rows[:per_page]))
+        has_older = True
+    else:
+        if after_key is not None:
+            created_at, row_id = after_key
+            query = query.filter(
+                or_(
+                    BotLog.created_at < created_at,
+                    and_(BotLog.created_at == created_at, BotLog.id < row_id),
+                )
+            )
+        rows = query.order_by(BotLog.created_at.desc(), BotLog.id.desc()).limit(per_page + 1).all()
+        has_older = len(rows) > per_page
+        rows = rows[:per_page]
+        has_newer = after_key is not None
+
+    return BotLogsPage(
+        rows=rows,
+        next_cursor=encode_cursor(rows[-1]) if rows and has_older else None,
+        prev_cursor=encode_cursor(rows[0]) if rows and has_newer else None,
+        total=total,
+        total_is_estimate=is_estimate,
     )
-    return rows, total
 
 
 def fetch_user_history(
@@ -92,3 +217,25 @@ def fetch_user_history(
         query = query.filter(BotLog.event_type.in_(normalized))
 
     return query.order_by(BotLog.created_at.asc()).limit(limit).all()
+
+
+def fetch_hourly_summary(
+    db: Session,
+    *,
+    since: datetime,
+    until: datetime | None = None,
+    group_by: Iterable[SummaryGroup] = ("event_type",),
+    by_hour: bool = False,
+) -> list[dict]:
+    """Число событий из почасовой сводки bot_logs_hourly, без чтения самого журнала."""
+
+    columns = [getattr(BotLogHourly, name) for name in group_by]
+    if by_hour:
+        columns.insert(0, BotLogHourly.hour)
+    total = func.sum(BotLogHourly.events).label("events")
+    query = select(*columns, total).where(BotLogHourly.hour >= since)
+    if until is not None:
+        query = query.where(BotLogHourly.hour < until)
+    if columns:
+        query = query.group_by(*columns).order_by(*columns)
+    return [dict(row._mapping, events=int(row.events or 0)) for row in db.execute(query)]
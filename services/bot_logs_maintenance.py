@@ -0,0 +1,267 @@
+"""Обслуживание журнала bot_logs: месячные партиции, срок хранения и почасовые сводки.
+
+В Postgres bot_logs секционирована по created_at (миграция 0022): одна партиция
+bot_logs_pYYYYMM на календарный месяц плюс bot_logs_default для строк вне
+диапазонов. Фоновая задача раз в BOT_LOGS_MAINTENANCE_INTERVAL секунд:
+
+- заранее создаёт партиции на BOT_LOGS_PARTITIONS_AHEAD месяцев вперёд;
+- пересчитывает почасовую сводку bot_logs_hourly (событие × узел × версия
+  конфигурации) от последнего посчитанного часа до текущего;
+- удаляет партиции старше BOT_LOGS_RETENTION_MONTHS месяцев целиком (DROP TABLE
+  вместо DELETE: без раздувания таблицы и долгого VACUUM). Перед удалением сводка
+  по партиции пересчитывается, поэтому графики за старые месяцы не теряются.
+
+В одном процессе задачу выполняет только один из воркеров API (advisory lock).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import re
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Iterator
+
+from sqlalchemy import delete, func, insert, select, text
+from sqlalchemy.orm import Session
+
+from database import get_engine, get_session, run_db
+from models import BotLog, BotLogHourly
+
+logger = logging.getLogger(__name__)
+
+BOT_LOGS_RETENTION_MONTHS = int(os.getenv("BOT_LOGS_RETENTION_MONTHS", "6"))
+BOT_LOGS_PARTITIONS_AHEAD = int(os.getenv("BOT_LOGS_PARTITIONS_AHEAD", "2"))
+BOT_LOGS_MAINTENANCE_INTERVAL = float(os.getenv("BOT_LOGS_MAINTENANCE_INTERVAL", "900"))
+# Сколько уже посчитанных часов пересчитывать заново: события пишутся из буфера
+# с задержкой и могут попасть в час, который сводка уже видела.
+BOT_LOGS_ROLLUP_LOOKBACK_HOURS = int(os.getenv("BOT_LOGS_ROLLUP_LOOKBACK_HOURS", "2"))
+
+MAINTENANCE_LOCK_KEY = 0x626F746C6F6773  # "botlogs"
+DEFAULT_PARTITION = "bot_logs_default"
+_PARTITION_RE = re.compile(r"^bot_logs_p(\d{4})(\d{2})$")
+
+_task: asyncio.Task | None = None
+
+
+def month_start(value: datetime) -> datetime:
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(value: datetime, months: int) -> datetime:
+    index = value.year * 12 + value.month - 1 + months
+    return value.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"bot_logs_p{month.year:04d}{month.month:02d}"
+
+
+def create_partition_sql(month: datetime) -> str:
+    start = month_start(month)
+    end = add_months(start, 1)
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(start)} PARTITION OF bot_logs "
+        f"FOR VALUES FROM ('{start:%Y-%m-%d %H:%M:%S}') TO ('{end:%Y-%m-%d %H:%M:%S}')"
+    )
+
+
+def _is_postgres(session: Session) -> bool:
+    return session.get_bind().dialect.name == "postgresql"
+
+
+def is_partitioned(session: Session) -> bool:
+    if not _is_postgres(session):
+        return False
+    return bool(
+        session.execute(
+            text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('bot_logs')")
+        ).first()
+    )
+
+
+def list_partitions(session: Session) -> dict[str, datetime]:
+    """Месячные партиции bot_logs: имя → начало месяца."""
+
+    rows = session.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass('bot_logs')"
+        )
+    ).scalars()
+    partitions: dict[str, datetime] = {}
+    for name in rows:
+        match = _PARTITION_RE.match(name)
+        if match:
+            partitions[name] = datetime(int(match.group(1)), int(match.group(2)), 1)
+    return partitions
+
+
+def ensure_partitions(months_ahead: int = BOT_LOGS_PARTITIONS_AHEAD, *, now: datetime | None = None) -> list[str]:
+    """Создать недостающие партиции с текущего месяца на months_ahead вперёд."""
+
+    current = month_start(now or datetime.utcnow())
+    created: list[str] = []
+    with get_session("jobs") as session:
+        if not is_partitioned(session):
+            return created
+        existing = set(list_partitions(session))
+    for offset in range(max(0, months_ahead) + 1):
+        month = add_months(current, offset)
+        name = partition_name(month)
+        if name in existing:
+            continue
+        # Отдельная транзакция на партицию: CREATE ... PARTITION OF ненадолго
+        # блокирует родительскую таблицу.
+        with get_session("jobs") as session:
+            session.execute(text(create_partition_sql(month)))
+        created.append(name)
+    if created:
+        logger.info("bot_logs partitions created: %s", ", ".join(created))
+    return created
+
+
+def _hour_bucket(session: Session):
+    if _is_postgres(session):
+        return func.date_trunc("hour", BotLog.created_at)
+    return func.strftime("%Y-%m-%d %H:00:00", BotLog.created_at)
+
+
+def _as_datetime(value: Any) -> datetime:
+    return value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+
+
+def rollup_range(start: datetime, end: datetime) -> int:
+    """Пересчитать сводку за часы [start, end): старые строки сводки заменяются целиком."""
+
+    start = start.replace(minute=0, second=0, microsecond=0)
+    if end <= start:
+        return 0
+    with get_session("jobs") as session:
+        hour = _hour_bucket(session).label("hour")
+        node_code = func.coalesce(BotLog.node_code, "").label("node_code")
+        rows = session.execute(
+            select(hour, BotLog.event_type, node_code, BotLog.config_version, func.count().label("events"))
+            .where(BotLog.created_at >= start, BotLog.created_at < end)
+            .group_by(hour, BotLog.event_type, node_code, BotLog.config_version)
+        ).all()
+        session.execute(delete(BotLogHourly).where(BotLogHourly.hour >= start, BotLogHourly.hour < end))
+        if rows:
+            session.execute(
+                insert(BotLogHourly),
+                [
+                    {
+                        "hour": _as_datetime(row.hour),
+                        "event_type": row.event_type,
+                        "node_code": row.node_code,
+                        "config_version": row.config_version or 0,
+                        "events": int(row.events),
+                    }
+                    for row in rows
+                ],
+            )
+    return len(rows)
+
+
+def rollup(*, now: datetime | None = None) -> int:
+    """Досчитать сводку от последнего посчитанного часа (минус запас) до текущего часа включительно."""
+
+    now = now or datetime.utcnow()
+    end = now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    with get_session("jobs") as session:
+        watermark = session.execute(select(func.max(BotLogHourly.hour))).scalar()
+        if watermark is None:
+            watermark = session.execute(select(func.min(BotLog.created_at))).scalar()
+            if watermark is None:
+                return 0
+            start = _as_datetime(watermark)
+        else:
+            start = _as_datetime(watermark) - timedelta(hours=BOT_LOGS_ROLLUP_LOOKBACK_HOURS)
+    return rollup_range(start, end)
+
+
+def drop_expired_partitions(
+    retention_months: int = BOT_LOGS_RETENTION_MONTHS, *, now: datetime | None = None
+) -> list[str]:
+    """Удалить партиции, целиком старше retention_months месяцев. 0 — хранить всё."""
+
+    if retention_months <= 0:
+        return []
+    cutoff = add_months(month_start(now or datetime.utcnow()), -retention_months)
+    with get_session("jobs") as session:
+        if not is_partitioned(session):
+            return []
+        expired = sorted(
+            (month, name) for name, month in list_partitions(session).items() if add_months(month, 1) <= cutoff
+        )
+
+    dropped: list[str] = []
+    for month, name in expired:
+        rollup_range(month, add_months(month, 1))
+        with get_session("jobs") as session:
+            session.execute(text(f"DROP TABLE IF EXISTS {name}"))
+        dropped.append(name)
+    if dropped:
+        logger.info("bot_logs partitions dropped by retention: %s", ", ".join(dropped))
+    return dropped
+
+
+@contextmanager
+def _maintenance_lock() -> Iterator[bool]:
+    """Session-level advisory lock Postgres; в других СУБД блокировка не нужна."""
+
+    engine = get_engine("jobs")
+    if engine.dialect.name != "postgresql":
+        yield True
+        return
+    with engine.connect() as conn:
+        acquired = bool(conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": MAINTENANCE_LOCK_KEY}).scalar())
+        conn.commit()
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MAINTENANCE_LOCK_KEY})
+                conn.commit()
+
+
+def run_maintenance(*, now: datetime | None = None) -> dict[str, Any]:
+    with _maintenance_lock() as acquired:
+        if not acquired:
+            return {"skipped": True}
+        return {
+            "created": ensure_partitions(now=now),
+            "rolled_up": rollup(now=now),
+            "dropped": drop_expired_partitions(now=now),
+        }
+
+
+async def _maintenance_loop(interval: float) -> None:
+    while True:
+        try:
+            await run_db(run_maintenance)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("bot_logs maintenance failed")
+        await asyncio.sleep(interval)
+
+
+def start_worker(interval: float = BOT_LOGS_MAINTENANCE_INTERVAL) -> None:
+    """Запустить обслуживание как asyncio-задачу текущего event loop (вызывается на startup)."""
+
+    global _task
+    if _task is not None or interval <= 0:
+        return
+    _task = asyncio.get_running_loop().create_task(_maintenance_loop(interval), name="bot-logs-maintenance")
+
+
+async def stop_worker() -> None:
+    global _task
+    task, _task = _task, None
+    if task is None:
+        return
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
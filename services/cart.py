@@ -1,44 +1,27 @@
 from __future__ import annotations
 
-from typing import Any, Tuple
+from typing import Any, Iterable, Tuple
 
-from sqlalchemy import delete, select
+from sqlalchemy import and_, delete, or_, select
 
 from database import get_session
-from initdb import init_db
+from initdb import ensure_schema
 from models import CartItem
 from services import menu_catalog
 from services import users as users_service
 
 
-def _normalize_product(item: CartItem) -> tuple[dict[str, Any] | None, bool]:
-    product_type = item.type
-    resolved_type = menu_catalog.map_legacy_item_type(product_type) or "product"
-    product = menu_catalog.get_item_by_id(
-        int(item.product_id),
-        include_inactive=True,
-        item_type=resolved_type,
-    )
-
-    if not product:
-        return None, True
-
-    name = product.get("title") if isinstance(product, dict) else None
-    if not name and isinstance(product, dict):
-        name = product.get("name")
-
-    return (
-        {
-            "product_id": int(item.product_id),
-            "name": name,
-            "price": int(product.get("price", 0) or 0),
-            "qty": int(item.qty),
-            "type": resolved_type,
-            "category_id": product.get("category_id"),
-            "category_name": product.get("category_title") or product.get("category_name"),
-        },
-        False,
-    )
+def _serialize_cart_item(item: CartItem, product: dict[str, Any], resolved_type: str) -> dict[str, Any]:
+    name = product.get("title") or product.get("name")
+    return {
+        "product_id": int(item.product_id),
+        "name": name,
+        "price": int(product.get("price", 0) or 0),
+        "qty": int(item.qty),
+        "type": resolved_type,
+        "category_id": product.get("category_id"),
+        "category_name": product.get("category_title") or product.get("category_name"),
+    }
 
 
 def _build_cart_filters(user_id: int | None, session_id: str | None) -> list[Any]:
@@ -50,22 +33,31 @@ def _build_cart_filters(user_id: int | None, session_id: str | None) -> list[Any
 
 
 def get_cart_items(user_id: int | None, session_id: str | None = None) -> Tuple[list[dict[str, Any]], list[int]]:
-    init_db()
+    ensure_schema()
     with get_session() as session:
         filters = _build_cart_filters(user_id, session_id)
         items = session.scalars(select(CartItem).where(*filters).order_by(CartItem.id)).all()
 
+    products = menu_catalog.get_items_by_ids(
+        [int(item.product_id) for item in items], include_inactive=True
+    )
+
     result: list[dict[str, Any]] = []
     removed: list[int] = []
+    stale_row_ids: list[int] = []
 
     for item in items:
-        normalized, was_removed = _normalize_product(item)
-        if was_removed:
-            remove_from_cart(user_id, int(item.product_id), item.type, session_id=session_id)
+        resolved_type = menu_catalog.map_legacy_item_type(item.type) or "product"
+        product = products.get(int(item.product_id))
+        if not product or product.get("type") != resolved_type:
+            stale_row_ids.append(int(item.id))
             removed.append(int(item.product_id))
             continue
-        if normalized:
-            result.append(normalized)
+        result.append(_serialize_cart_item(item, product, resolved_type))
+
+    if stale_row_ids:
+        with get_session() as session:
+            session.execute(delete(CartItem).where(CartItem.id.in_(stale_row_ids)))
 
     return result, removed
 
@@ -129,7 +121,7 @@ def change_qty(
     product_type: str = "basket",
     session_id: str | None = None,
 ) -> None:
-    init_db()
+    ensure_schema()
     normalized_type = menu_catalog.map_legacy_item_type(product_type) or product_type
     with get_session() as session:
         filters = _build_cart_filters(user_id, session_id)
@@ -163,7 +155,7 @@ def remove_from_cart(
     product_type: str = "basket",
     session_id: str | None = None,
 ) -> None:
-    init_db()
+    ensure_schema()
     normalized_type = menu_catalog.map_legacy_item_type(product_type) or product_type
     with get_session() as session:
         filters = _build_cart_filters(user_id, session_id)
@@ -186,8 +178,33 @@ def remove_from_cart(
             session.delete(item)
 
 
+def remove_items_from_cart(
+    user_id: int | None,
+    keys: Iterable[tuple[int, str]],
+    session_id: str | None = None,
+) -> None:
+    """Удалить несколько позиций (product_id, type) одним DELETE."""
+
+    conditions = []
+    for product_id, product_type in keys:
+        normalized_type = menu_catalog.map_legacy_item_type(product_type) or product_type
+        conditions.append(
+            and_(
+                CartItem.product_id == int(product_id),
+                CartItem.type.in_({normalized_type, product_type}),
+            )
+        )
+    if not conditions:
+        return
+
+    ensure_schema()
+    with get_session() as session:
+        filters = _build_cart_filters(user_id, session_id)
+        session.execute(delete(CartItem).where(*filters, or_(*conditions)))
+
+
 def clear_cart(user_id: int | None, session_id: str | None = None) -> None:
-    init_db()
+    ensure_schema()
     with get_session() as session:
         filters = _build_cart_filters(user_id, session_id)
         session.execute(delete(CartItem).where(*filters))
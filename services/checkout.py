@@ -0,0 +1,100 @@
+"""Оформление заказа из WebApp одной транзакцией.
+
+Пользователь (upsert по telegram_id), запись checkout_orders, заказ с позициями
+(одна пачка INSERT в order_items), агрегаты статистики и user_stats, а также
+события outbox (after_insert) пишутся в одной сессии с одним commit. Поиск
+товаров в каталоге (normalize_order_items) выполняется до открытия транзакции
+одним запросом на всю корзину (menu_catalog.get_items_by_ids) в отдельной
+короткой сессии.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from sqlalchemy.orm import Session
+
+from database import get_session
+from models import CheckoutOrder
+from services import orders as orders_service
+from services import users as users_service
+from utils.texts import format_order_for_admin
+
+
+@dataclass(frozen=True)
+class CheckoutResult:
+    order_id: int
+    checkout_order_id: int
+
+
+def place_checkout(
+    *,
+    telegram_id: int,
+    username: str | None,
+    full_name: str | None,
+    items: list[dict[str, Any]],
+    totals: dict[str, Any],
+    client_context: dict[str, Any] | None = None,
+    after_insert: Callable[[Session, int], None] | None = None,
+) -> CheckoutResult:
+    """
+    Сохранить заказ из корзины WebApp. items — проверенные позиции корзины
+    (item_id, title, qty, price, type), totals — итоги с sum_total.
+    """
+    order_items = [
+        {
+            "product_id": int(item.get("item_id") or 0),
+            "name": item.get("title"),
+            "price": int(item.get("price") or 0),
+            "qty": int(item.get("qty") or 0),
+            "type": item.get("type") or "basket",
+        }
+        for item in items
+    ]
+    total = int(totals.get("sum_total") or 0)
+    normalized_items, computed_total = orders_service.normalize_order_items(order_items)
+
+    with get_session() as session:
+        user = users_service.get_or_create_user_from_telegram(
+            session,
+            telegram_id=int(telegram_id),
+            username=username,
+            full_name=full_name,
+        )
+        contact = user.phone or ""
+        user_name = user.first_name or username or "Пользователь"
+
+        checkout_order = CheckoutOrder(
+            tg_user_id=int(telegram_id),
+            status="created",
+            items_json=items,
+            totals_json=totals,
+            client_context_json=client_context,
+        )
+        session.add(checkout_order)
+
+        order_text = format_order_for_admin(
+            user_id=int(telegram_id),
+            user_name=user_name,
+            items=order_items,
+            total=total,
+            customer_name=user_name,
+            contact=contact,
+            comment="",
+        )
+        order_id = orders_service.insert_order(
+            session,
+            user_id=int(telegram_id),
+            items=normalized_items,
+            total=computed_total if normalized_items else total,
+            customer_name=user_name,
+            contact=contact,
+            comment="",
+            order_text=order_text,
+            after_insert=after_insert,
+        )
+        return CheckoutResult(order_id=order_id, checkout_order_id=int(checkout_order.id))
+
+
+__all__ = ["CheckoutResult", "place_checkout"]
@@ -6,9 +6,10 @@ from typing import Any, List
 from sqlalchemy import delete, select
 
 from database import get_session
-from initdb import init_db
+from initdb import ensure_schema
 from models import Favorite
 from services import menu_catalog
+from services import stats as stats_service
 
 
 ALLOWED_TYPES = {"basket", "course", "product", "service", "masterclass"}
@@ -21,7 +22,7 @@ def _validate_type(product_type: str) -> str:
 
 
 def add_favorite(user_id: int, product_id: int, product_type: str) -> bool:
-    init_db()
+    ensure_schema()
     _validate_type(product_type)
     with get_session() as session:
         exists = session.scalar(
@@ -41,12 +42,13 @@ def add_favorite(user_id: int, product_id: int, product_type: str) -> bool:
             created_at=datetime.utcnow(),
         )
         session.add(favorite)
+        stats_service.bump_counter(session, stats_service.COUNTER_FAVORITES, 1)
         return True
 
 
 def remove_favorite(user_id: int, product_id: int, product_type: str) -> bool:
     _validate_type(product_type)
-    init_db()
+    ensure_schema()
     with get_session() as session:
         result = session.execute(
             delete(Favorite).where(
@@ -55,7 +57,9 @@ def remove_favorite(user_id: int, product_id: int, product_type: str) -> bool:
                 Favorite.type == product_type,
             )
         )
-        return result.rowcount > 0
+        removed = int(result.rowcount or 0)
+        stats_service.bump_counter(session, stats_service.COUNTER_FAVORITES, -removed)
+        return removed > 0
 
 
 def _serialize_favorite(row: Favorite) -> dict[str, Any]:
@@ -80,7 +84,7 @@ def _serialize_favorite(row: Favorite) -> dict[str, Any]:
 
 
 def list_favorites(user_id: int) -> List[dict[str, Any]]:
-    init_db()
+    ensure_schema()
     with get_session() as session:
         rows = session.scalars(
             select(Favorite)
@@ -92,7 +96,7 @@ def list_favorites(user_id: int) -> List[dict[str, Any]]:
 
 def is_favorite(user_id: int, product_id: int, product_type: str) -> bool:
     _validate_type(product_type)
-    init_db()
+    ensure_schema()
     with get_session() as session:
         row = session.scalar(
             select(Favorite).where(
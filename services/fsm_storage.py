@@ -0,0 +1,293 @@
+"""Хранилище FSM aiogram, общее для всех процессов бота.
+
+По умолчанию состояние и данные FSM лежат в той же строке user_state, что и
+состояние сценариев конструктора (current_node_code, ожидание ввода и т.д.):
+колонка fsm — словарь «ключ чата → {state, data, expires_at}». Поэтому всё, что
+бот помнит о диалоге с пользователем, хранится в одном месте и переживает
+рестарт, а несколько процессов бота видят одно и то же состояние.
+
+Запись отложенная: изменения копятся в памяти и раз в FSM_FLUSH_INTERVAL секунд
+(или при FSM_FLUSH_BATCH изменённых ключах) пишутся одной транзакцией. Пока
+запись не ушла в БД, чтение того же ключа отдаёт значение из памяти этого
+процесса, а другие процессы видят прежнюю запись. Поэтому отложенная запись
+рассчитана на то, что апдейты одного чата обрабатывает один процесс (webhook в
+одном процессе или маршрутизация по чату). Без такой привязки нужен
+FSM_FLUSH_INTERVAL=0: set_state/set_data тогда дожидаются записи в БД.
+
+У каждой записи есть version. Если при сбросе оказалось, что другой процесс
+успел изменить ключ после нашего чтения, поверх его записи переносятся только
+поля, изменённые здесь (state и/или data), и конфликт пишется в лог.
+Записи старше FSM_STATE_TTL секунд считаются пустыми и периодически вычищаются.
+
+FSM_STORAGE=redis переключает бота на RedisStorage из aiogram (нужен пакет redis
+и любой сервер с протоколом Redis), FSM_STORAGE=memory — на прежний MemoryStorage.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Any, Mapping
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from sqlalchemy import update
+
+from database import get_session, run_db
+from models import UserState
+
+logger = logging.getLogger(__name__)
+
+FSM_STORAGE = os.getenv("FSM_STORAGE", "postgres").strip().lower()
+FSM_REDIS_URL = os.getenv("FSM_REDIS_URL", "redis://localhost:6379/0")
+FSM_STATE_TTL = float(os.getenv("FSM_STATE_TTL", str(7 * 24 * 3600)))
+FSM_FLUSH_INTERVAL = float(os.getenv("FSM_FLUSH_INTERVAL", "0.2"))
+FSM_FLUSH_BATCH = int(os.getenv("FSM_FLUSH_BATCH", "100"))
+FSM_PURGE_INTERVAL = float(os.getenv("FSM_PURGE_INTERVAL", "3600"))
+
+Record = dict[str, Any]
+PendingKey = tuple[int, str]
+# Запись к сбросу и поля, изменённые в этом процессе.
+PendingWrite = tuple[Record, frozenset[str]]
+
+
+def _empty_record() -> Record:
+    return {"state": None, "data": {}, "expires_at": None, "version": 0}
+
+
+def _is_empty(record: Record) -> bool:
+    return record.get("state") is None and not record.get("data")
+
+
+def _is_expired(record: Record, now: float) -> bool:
+    expires_at = record.get("expires_at")
+    return expires_at is not None and float(expires_at) <= now
+
+
+def _load_record(user_id: int, record_key: str) -> Record | None:
+    with get_session() as session:
+        row = session.get(UserState, user_id)
+        if row is None or not isinstance(row.fsm, dict):
+            return None
+        record = row.fsm.get(record_key)
+        return dict(record) if isinstance(record, dict) else None
+
+
+def _write_records(batch: Mapping[PendingKey, PendingWrite]) -> dict[PendingKey, int]:
+    """
+    Слить изменённые записи в user_state.fsm: строка пользователя блокируется, чужие
+    ключи не трогаются. Возвращает новые версии записанных ключей.
+    """
+
+    by_user: dict[int, dict[str, PendingWrite]] = {}
+    for (user_id, record_key), write in batch.items():
+        by_user.setdefault(user_id, {})[record_key] = write
+
+    now = time.time()
+    versions: dict[PendingKey, int] = {}
+    with get_session() as session:
+        for user_id in sorted(by_user):
+            row = session.get(UserState, user_id, with_for_update=True)
+            if row is None:
+                row = UserState(user_id=user_id)
+                session.add(row)
+            fsm = {
+                key: value
+                for key, value in (row.fsm or {}).items()
+                if isinstance(value, dict) and not _is_expired(value, now)
+            }
+            for record_key, (record, fields) in by_user[user_id].items():
+                current = fsm.get(record_key)
+                current_version = int((current or {}).get("version") or 0)
+                if current is not None and current_version != int(record.get("version") or 0):
+                    logger.warning(
+                        "FSM-запись %s пользователя %s изменена другим процессом, переносим только %s",
+                        record_key,
+                        user_id,
+                        ", ".join(sorted(fields)),
+                    )
+                    record = {**current, **{field: record.get(field) for field in fields}, "expires_at": record.get("expires_at")}
+                record = {**record, "version": current_version + 1}
+                versions[(user_id, record_key)] = record["version"]
+                if _is_empty(record):
+                    fsm.pop(record_key, None)
+                else:
+                    fsm[record_key] = record
+            row.fsm = fsm or None
+            expires = [value["expires_at"] for value in fsm.values() if value.get("expires_at") is not None]
+            row.fsm_expires_at = datetime.utcfromtimestamp(max(expires)) if expires else None
+    return versions
+
+
+def purge_expired() -> int:
+    """Удалить FSM пользователей, у которых истекли все записи."""
+
+    with get_session() as session:
+        result = session.execute(
+            update(UserState)
+            .where(UserState.fsm_expires_at.is_not(None), UserState.fsm_expires_at < datetime.utcnow())
+            .values(fsm=None, fsm_expires_at=None)
+        )
+        return int(result.rowcount or 0)
+
+
+class PostgresStorage(BaseStorage):
+    def __init__(
+        self,
+        *,
+        state_ttl: float = FSM_STATE_TTL,
+        flush_interval: float = FSM_FLUSH_INTERVAL,
+        flush_batch: int = FSM_FLUSH_BATCH,
+        purge_interval: float = FSM_PURGE_INTERVAL,
+        key_builder: KeyBuilder | None = None,
+    ) -> None:
+        self.state_ttl = state_ttl
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self.purge_interval = purge_interval
+        self.key_builder = key_builder or DefaultKeyBuilder(
+            prefix="fsm", with_bot_id=True, with_business_connection_id=True, with_destiny=True
+        )
+        self._pending: dict[PendingKey, Record] = {}
+        self._dirty: dict[PendingKey, set[str]] = {}
+        self._inflight: dict[PendingKey, Record] = {}
+        self._wakeup: asyncio.Event | None = None
+        self._flusher: asyncio.Task | None = None
+        self._last_purge = time.monotonic()
+
+    def _pending_key(self, key: StorageKey) -> PendingKey:
+        return key.user_id, self.key_builder.build(key)
+
+    async def _get_record(self, key: StorageKey) -> Record:
+        pending_key = self._pending_key(key)
+        record = self._pending.get(pending_key) or self._inflight.get(pending_key)
+        if record is None:
+            record = await run_db(_load_record, *pending_key)
+        if record is None or _is_expired(record, time.time()):
+            return _empty_record()
+        return {
+            "state": record.get("state"),
+            "data": dict(record.get("data") or {}),
+            "expires_at": record.get("expires_at"),
+            "version": int(record.get("version") or 0),
+        }
+
+    async def _put(self, key: StorageKey, record: Record, field: str) -> None:
+        record["expires_at"] = time.time() + self.state_ttl if self.state_ttl > 0 else None
+        pending_key = self._pending_key(key)
+        self._pending[pending_key] = record
+        self._dirty.setdefault(pending_key, set()).add(field)
+        if self.flush_interval <= 0:
+            # Сквозная запись: изменение видно другим процессам сразу после вызова.
+            await self.flush()
+            return
+        self._ensure_flusher()
+        if len(self._pending) >= self.flush_batch and self._wakeup is not None:
+            self._wakeup.set()
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        record = await self._get_record(key)
+        record["state"] = state.state if isinstance(state, State) else state
+        await self._put(key, record, "state")
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        return (await self._get_record(key))["state"]
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        record = await self._get_record(key)
+        record["data"] = dict(data)
+        await self._put(key, record, "data")
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        return (await self._get_record(key))["data"]
+
+    # --- отложенная запись ---
+
+    def _ensure_flusher(self) -> None:
+        if self._flusher is not None and not self._flusher.done():
+            return
+        self._wakeup = asyncio.Event()
+        self._flusher = asyncio.get_running_loop().create_task(self._flush_forever(), name="fsm-flusher")
+
+    async def _flush_forever(self) -> None:
+        assert self._wakeup is not None
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+            if self.purge_interval > 0 and time.monotonic() - self._last_purge >= self.purge_interval:
+                self._last_purge = time.monotonic()
+                try:
+                    await run_db(purge_expired)
+                except Exception:
+                    logger.exception("Не удалось очистить просроченные FSM-состояния")
+
+    async def flush(self) -> int:
+        if not self._pending:
+            return 0
+        batch, self._pending = self._pending, {}
+        dirty, self._dirty = self._dirty, {}
+        self._inflight.update(batch)
+        try:
+            versions = await run_db(
+                _write_records,
+                {pending_key: (record, frozenset(dirty.get(pending_key, ()))) for pending_key, record in batch.items()},
+            )
+        except Exception:
+            logger.exception("Не удалось сохранить %s FSM-записей, повтор при следующем сбросе", len(batch))
+            for pending_key, record in batch.items():
+                if pending_key not in self._pending:
+                    self._pending[pending_key] = record
+                self._dirty.setdefault(pending_key, set()).update(dirty.get(pending_key, ()))
+            return 0
+        else:
+            # Изменения, сделанные во время записи, опираются на только что записанную версию.
+            for pending_key, version in versions.items():
+                record = self._pending.get(pending_key)
+                if record is not None and record.get("version") == batch[pending_key].get("version"):
+                    record["version"] = version
+        finally:
+            for pending_key, record in batch.items():
+                if self._inflight.get(pending_key) is record:
+                    del self._inflight[pending_key]
+        return len(batch)
+
+    async def close(self) -> None:
+        flusher, self._flusher = self._flusher, None
+        if flusher is not None:
+            flusher.cancel()
+            try:
+                await flusher
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+
+
+def make_fsm_storage(kind: str = FSM_STORAGE) -> BaseStorage:
+    """Хранилище FSM для Dispatcher по настройке FSM_STORAGE."""
+
+    if kind == "memory":
+        return MemoryStorage()
+    if kind == "redis":
+        try:
+            from aiogram.fsm.storage.redis import RedisStorage
+        except ImportError as exc:
+            raise RuntimeError("FSM_STORAGE=redis требует установленного пакета redis") from exc
+
+        ttl = timedelta(seconds=FSM_STATE_TTL) if FSM_STATE_TTL > 0 else None
+        return RedisStorage.from_url(
+            FSM_REDIS_URL,
+            key_builder=DefaultKeyBuilder(with_bot_id=True, with_business_connection_id=True, with_destiny=True),
+            state_ttl=ttl,
+            data_ttl=ttl,
+        )
+    if kind != "postgres":
+        logger.warning("Неизвестное FSM_STORAGE=%s, используется postgres", kind)
+    return PostgresStorage()
@@ -0,0 +1,196 @@
+"""Реестр Telegram file_id для картинок бота (узлы сценариев, баннеры).
+
+Картинка узла или баннер задаются адресом (URL, путь /media/... или готовый
+file_id). После первой отправки Telegram возвращает file_id, и он сохраняется в
+telegram_media под ключом (бот, адрес, хэш содержимого). Следующие отправки идут
+по file_id без повторной загрузки файла.
+
+Для локальных файлов /media/... в ключ входит sha256 содержимого: если файл по
+тому же пути заменили, у него новый хэш и он загрузится заново. Реестр не
+трогает конфигурацию бота и её версию. В процессе есть LRU-кэш, поэтому
+повторная отправка обходится без запроса к БД.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from database import get_session, run_db
+from media_paths import MEDIA_ROOT
+from models import TelegramMedia
+
+logger = logging.getLogger(__name__)
+
+MEDIA_REGISTRY_CACHE_SIZE = int(os.getenv("MEDIA_REGISTRY_CACHE_SIZE", "5000"))
+
+MEDIA_URL_PREFIX = "/media/"
+HASH_CHUNK_SIZE = 1024 * 1024
+
+CacheKey = tuple[int, str, str]
+
+_cache: OrderedDict[CacheKey, str] = OrderedDict()
+_cache_lock = threading.Lock()
+# путь файла -> (mtime_ns, size, sha256): файл перечитывается, только если изменился
+_hashes: dict[str, tuple[int, int, str]] = {}
+
+
+def is_file_id(value: str) -> bool:
+    return not value.startswith(("http://", "https://", "/"))
+
+
+def _media_file(source: str) -> Path | None:
+    if not source.startswith(MEDIA_URL_PREFIX):
+        return None
+    path = (MEDIA_ROOT / source[len(MEDIA_URL_PREFIX):]).resolve()
+    if MEDIA_ROOT.resolve() not in path.parents:
+        return None
+    return path
+
+
+def content_hash(source: str) -> str:
+    """sha256 локального файла /media/...; для внешних URL — пустая строка."""
+
+    path = _media_file(source)
+    if path is None:
+        return ""
+    try:
+        stat = path.stat()
+    except OSError:
+        return ""
+    cached = _hashes.get(str(path))
+    if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        return cached[2]
+
+    digest = hashlib.sha256()
+    with path.open("rb") as fh:
+        for chunk in iter(lambda: fh.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    value = digest.hexdigest()
+    _hashes[str(path)] = (stat.st_mtime_ns, stat.st_size, value)
+    return value
+
+
+def _cache_get(key: CacheKey) -> str | None:
+    with _cache_lock:
+        file_id = _cache.get(key)
+        if file_id is not None:
+            _cache.move_to_end(key)
+        return file_id
+
+
+def _cache_put(key: CacheKey, file_id: str) -> None:
+    with _cache_lock:
+        _cache[key] = file_id
+        _cache.move_to_end(key)
+        while len(_cache) > MEDIA_REGISTRY_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def lookup(bot_id: int, source: str) -> str | None:
+    key = (int(bot_id), source, content_hash(source))
+    file_id = _cache_get(key)
+    if file_id is not None:
+        return file_id
+
+    with get_session() as session:
+        file_id = session.scalar(
+            select(TelegramMedia.file_id).where(
+                TelegramMedia.bot_id == key[0],
+                TelegramMedia.source == key[1],
+                TelegramMedia.content_hash == key[2],
+            )
+        )
+    if file_id:
+        _cache_put(key, file_id)
+    return file_id
+
+
+def register(bot_id: int, source: str, file_id: str, file_unique_id: str | None = None) -> None:
+    key = (int(bot_id), source, content_hash(source))
+    if _cache_get(key) == file_id:
+        return
+
+    now = datetime.utcnow()
+    with get_session() as session:
+        insert_fn = postgresql.insert if session.get_bind().dialect.name == "postgresql" else sqlite.insert
+        statement = insert_fn(TelegramMedia).values(
+            bot_id=key[0],
+            source=key[1],
+            content_hash=key[2],
+            file_id=file_id,
+            file_unique_id=file_unique_id,
+            created_at=now,
+            updated_at=now,
+        )
+        session.execute(
+            statement.on_conflict_do_update(
+                index_elements=["bot_id", "source", "content_hash"],
+                set_={"file_id": file_id, "file_unique_id": file_unique_id, "updated_at": now},
+            )
+        )
+    _cache_put(key, file_id)
+
+
+def forget(bot_id: int, source: str) -> None:
+    """Удалить file_id, который Telegram больше не принимает: следующая отправка загрузит файл заново."""
+
+    key = (int(bot_id), source, content_hash(source))
+    with _cache_lock:
+        _cache.pop(key, None)
+    with get_session() as session:
+        session.execute(
+            delete(TelegramMedia).where(
+                TelegramMedia.bot_id == key[0],
+                TelegramMedia.source == key[1],
+                TelegramMedia.content_hash == key[2],
+            )
+        )
+
+
+async def resolve_photo(
+    bot_id: int, source: str | None, *, to_upload: Callable[[str], str | None] | None = None
+) -> str | None:
+    """Что передать в answer_photo: известный file_id или адрес для загрузки."""
+
+    if not source:
+        return None
+    source = source.strip()
+    if not source or is_file_id(source):
+        return source or None
+    # Внешний URL не требует чтения файла для ключа — проверяем кэш без перехода в поток.
+    file_id = _cache_get((int(bot_id), source, "")) if _media_file(source) is None else None
+    if file_id is None:
+        file_id = await run_db(lookup, bot_id, source)
+    if file_id:
+        return file_id
+    return to_upload(source) if to_upload is not None else source
+
+
+async def remember_photo(bot_id: int, source: str | None, sent_message: Any, *, used: str | None = None) -> None:
+    """Запомнить file_id после отправки; если отправка по file_id не удалась — забыть его."""
+
+    if not source:
+        return
+    source = source.strip()
+    if not source or is_file_id(source):
+        return
+    sent_by_file_id = used is not None and is_file_id(used)
+    photos = getattr(sent_message, "photo", None) if sent_message is not None else None
+    try:
+        if photos and not sent_by_file_id:
+            largest = photos[-1]
+            await run_db(register, bot_id, source, largest.file_id, getattr(largest, "file_unique_id", None))
+        elif not photos and sent_by_file_id:
+            await run_db(forget, bot_id, source)
+    except Exception:
+        logger.exception("Не удалось обновить реестр file_id для %s", source)
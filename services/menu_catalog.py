@@ -1,16 +1,22 @@
 from __future__ import annotations
 
+import os
 import re
+import threading
+import time
 import unicodedata
+from dataclasses import dataclass
 from datetime import datetime
-from typing import Any
+from typing import Any, Callable, Iterable
 from urllib.parse import urlparse
 
 from sqlalchemy import func, select
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
 
 from database import get_session
 from models import (
+    CatalogVersion,
     MenuCategory,
     MenuItem,
     ProductBasket,
@@ -19,6 +25,7 @@ from models import (
     SiteBlock,
     SiteSettings,
 )
+from utils.http_cache import dump_json, make_etag
 
 MENU_ITEM_TYPES = {"product", "course", "service", "masterclass"}
 MENU_CATEGORY_TYPES = {"product", "masterclass"}
@@ -26,6 +33,10 @@ BLOCK_PAGES = {"home", "category", "footer", "custom"}
 BLOCK_TYPES = {"banner", "text", "cta", "gallery", "features"}
 LEGACY_ITEM_TYPE_MAP = {"basket": "product", "course": "course"}
 
+# Как часто (в секундах) воркер сверяет свою версию каталога со строкой catalog_version.
+# Изменения, сделанные в этом же процессе, видны сразу; чужие — не позже чем через интервал.
+CATALOG_VERSION_CHECK_INTERVAL = float(os.getenv("CATALOG_VERSION_CHECK_INTERVAL", "2"))
+
 
 def map_legacy_item_type(value: str | None) -> str | None:
     if value is None:
@@ -145,9 +156,9 @@ def _ensure_menu_category(
 
 
 def migrate_legacy_products_to_menu(*, dry_run: bool = False) -> dict[str, int]:
-    from initdb import init_db  # noqa: WPS433
+    from initdb import ensure_schema  # noqa: WPS433
 
-    init_db()
+    ensure_schema()
     created_categories = 0
     created_items = 0
     skipped_items = 0
@@ -332,6 +343,11 @@ def migrate_legacy_products_to_menu(*, dry_run: bool = False) -> dict[str, int]:
         _migrate_items(baskets, legacy_table="products_baskets", legacy_type="basket")
         _migrate_items(courses, legacy_table="products_courses", legacy_type="course")
 
+        if not dry_run and (created_categories or created_items):
+            _bump_catalog_version(session)
+
+    if not dry_run:
+        invalidate_catalog_cache()
     return {
         "categories_created": created_categories,
         "items_created": created_items,
@@ -562,6 +578,32 @@ def get_item_by_id(
         return _serialize_item(item, category)
 
 
+def get_items_by_ids(
+    item_ids: Iterable[int],
+    types: Iterable[str] | None = None,
+    *,
+    include_inactive: bool = False,
+) -> dict[int, dict[str, Any]]:
+    """Загрузить несколько позиций одним запросом: {id: сериализованная позиция}."""
+
+    ids = {int(item_id) for item_id in item_ids}
+    if not ids:
+        return {}
+
+    normalized_types = {
+        normalized
+        for normalized in (normalize_menu_type(value) for value in (types or []))
+        if normalized
+    }
+    with get_session() as session:
+        query = _item_query(session, include_inactive=include_inactive).filter(
+            MenuItem.id.in_(ids)
+        )
+        if normalized_types:
+            query = query.filter(MenuItem.type.in_(normalized_types))
+        return {int(item.id): _serialize_item(item, category) for item, category in query.all()}
+
+
 def build_public_menu(category_type: str | None = None) -> dict[str, Any]:
     normalized_type = normalize_category_type(category_type)
     with get_session() as session:
@@ -639,6 +681,139 @@ def build_public_menu_tree(category_type: str | None = None) -> dict[str, Any]:
     }
 
 
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    version: int
+    body: bytes
+    etag: str
+    last_modified: datetime
+
+
+_catalog_lock = threading.Lock()
+_catalog_state: dict[str, Any] = {"version": None, "updated_at": None, "checked_at": 0.0}
+_catalog_snapshots: dict[tuple[str, str | None], CatalogSnapshot] = {}
+
+
+def _bump_catalog_version(session: Session) -> None:
+    """Увеличить версию каталога в той же транзакции, что и само изменение."""
+
+    # На пустой БД строки ещё нет: INSERT ... ON CONFLICT не даёт двум первым правкам
+    # одновременно вставить id=1 и откатить одну из них на IntegrityError.
+    dialect = session.get_bind().dialect.name
+    insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    statement = insert(CatalogVersion).values(id=1, version=2, updated_at=datetime.utcnow())
+    session.execute(
+        statement.on_conflict_do_update(
+            index_elements=["id"],
+            set_={"version": CatalogVersion.version + 1, "updated_at": statement.excluded.updated_at},
+        )
+    )
+
+
+def _read_catalog_version(session: Session) -> tuple[int, datetime | None]:
+    row = session.execute(
+        select(CatalogVersion.version, CatalogVersion.updated_at).where(CatalogVersion.id == 1)
+    ).first()
+    if row is None:
+        return 1, None
+    return int(row.version or 1), row.updated_at
+
+
+def invalidate_catalog_cache() -> None:
+    """Сбросить снимки текущего процесса; следующий запрос перечитает версию из БД."""
+
+    with _catalog_lock:
+        _catalog_snapshots.clear()
+        _catalog_state["version"] = None
+        _catalog_state["updated_at"] = None
+        _catalog_state["checked_at"] = 0.0
+
+
+def get_catalog_version() -> int:
+    now = time.monotonic()
+    with _catalog_lock:
+        version = _catalog_state["version"]
+        if version is not None and now - _catalog_state["checked_at"] < CATALOG_VERSION_CHECK_INTERVAL:
+            return version
+
+    with get_session() as session:
+        fresh, updated_at = _read_catalog_version(session)
+
+    with _catalog_lock:
+        if fresh != _catalog_state["version"]:
+            _catalog_snapshots.clear()
+            # Строки версии ещё нет (каталог не меняли после установки) — считаем
+            # моментом изменения первую сборку в этом процессе.
+            _catalog_state["updated_at"] = updated_at or datetime.utcnow()
+        _catalog_state["version"] = fresh
+        _catalog_state["checked_at"] = now
+    return fresh
+
+
+def _normalize_block_page(value: str | None) -> str | None:
+    if not value:
+        return None
+    if value not in BLOCK_PAGES:
+        raise ValueError("Unsupported block page")
+    return value
+
+
+_CATALOG_BUILDERS: dict[str, tuple[Callable[[str | None], str | None], Callable[[str | None], Any]]] = {
+    "menu": (normalize_category_type, lambda key: build_public_menu(key)),
+    "tree": (normalize_category_type, lambda key: build_public_menu_tree(key)),
+    "categories": (
+        normalize_category_type,
+        lambda key: {"items": list_categories(include_inactive=False, category_type=key)},
+    ),
+    "items": (
+        normalize_category_type,
+        lambda key: {"items": list_items(include_inactive=False, category_type=key)},
+    ),
+    "blocks": (
+        _normalize_block_page,
+        lambda key: {"items": list_blocks(include_inactive=False, page=key)},
+    ),
+    "settings": (lambda key: None, lambda key: get_site_settings()),
+}
+
+
+def get_catalog_snapshot(kind: str, key: str | None = None) -> CatalogSnapshot:
+    """
+    Готовый JSON публичного каталога для текущей версии.
+
+    key — тип категорий для menu/tree/categories/items и страница для blocks.
+    Снимок строится один раз на версию и ключ; повторные запросы не ходят в БД
+    (кроме периодической сверки версии) и не сериализуют MenuItem заново.
+    """
+
+    entry = _CATALOG_BUILDERS.get(kind)
+    if entry is None:
+        raise KeyError(f"Unknown catalog snapshot: {kind}")
+    normalize, builder = entry
+    normalized_key = normalize(key)
+    cache_key = (kind, normalized_key)
+
+    version = get_catalog_version()
+    with _catalog_lock:
+        snapshot = _catalog_snapshots.get(cache_key)
+        last_modified = _catalog_state["updated_at"] or datetime.utcnow()
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+
+    body = dump_json(builder(normalized_key))
+    snapshot = CatalogSnapshot(
+        version=version,
+        body=body,
+        etag=make_etag(body),
+        last_modified=last_modified,
+    )
+    with _catalog_lock:
+        # Пока строили, версия могла смениться — такой снимок не сохраняем.
+        if _catalog_state["version"] == version:
+            _catalog_snapshots[cache_key] = snapshot
+    return snapshot
+
+
 def get_or_create_site_settings(session: Session) -> SiteSettings:
     settings = session.execute(select(SiteSettings)).scalars().first()
     if settings:
@@ -690,7 +865,9 @@ def update_site_settings(payload: dict[str, Any]) -> dict[str, Any]:
         settings.hero_image_url = normalize_media_path(payload.get("hero_image_url"))
         settings.updated_at = datetime.utcnow()
         session.add(settings)
+        _bump_catalog_version(session)
         session.commit()
+        invalidate_catalog_cache()
         session.refresh(settings)
         return _serialize_settings(settings)
 
@@ -722,7 +899,9 @@ def create_category(payload: dict[str, Any]) -> dict[str, Any]:
             is_active=bool(payload.get("is_active", True)),
         )
         session.add(category)
+        _bump_catalog_version(session)
         session.commit()
+        invalidate_catalog_cache()
         session.refresh(category)
         return _serialize_category(category)
 
@@ -777,7 +956,9 @@ def update_category(category_id: int, payload: dict[str, Any]) -> dict[str, Any]
 
         category.updated_at = datetime.utcnow()
         session.add(category)
+        _bump_catalog_version(session)
         session.commit()
+        invalidate_catalog_cache()
         session.refresh(category)
         return _serialize_category(category)
 
@@ -795,7 +976,9 @@ def delete_category(category_id: int) -> None:
         if items_count:
             raise ValueError("Category has items")
         session.delete(category)
+        _bump_catalog_version(session)
         session.commit()
+        invalidate_catalog_cache()
 
 
 def create_item(payload: dict[str, Any]) -> dict[str, Any]:
@@ -841,7 +1024,9 @@ def create_item(payload: dict[str, Any]) -> dict[str, Any]:
             meta=payload.get("meta") or {},
         )
         session.add(item)
+        _bump_catalog_version(session)
         session.commit()
+        invalidate_catalog_cache()
         session.refresh(item)
         return _serialize_item(item, category)
 
@@ -918,7 +1103,9 @@ def update_item(item_id: int, payload: dict[str, Any]) -> dict[str, Any]:
 
         item.updated_at = datetime.utcnow()
         session.add(item)
+        _bump_catalog_version(session)
         session.commit()
+        invalidate_catalog_cache()
         session.refresh(item)
         return _serialize_item(item, category)
 
@@ -976,7 +1163,9 @@ def create_block(payload: dict[str, Any]) -> dict[str, Any]:
             is_active=bool(payload.get("is_active", True)),
         )
         session.add(block)
+        _bump_catalog_version(session)
         session.commit()
+        invalidate_catalog_cache()
         session.refresh(block)
         return _serialize_block(block)
 
@@ -1010,7 +1199,9 @@ def update_block(block_id: int, payload: dict[str, Any]) -> dict[str, Any]:
             block.is_active = bool(payload.get("is_active"))
         block.updated_at = datetime.utcnow()
         session.add(block)
+        _bump_catalog_version(session)
         session.commit()
+        invalidate_catalog_cache()
         session.refresh(block)
         return _serialize_block(block)
 
@@ -1021,7 +1212,9 @@ def delete_block(block_id: int) -> None:
         if not block:
             raise KeyError("Block not found")
         session.delete(block)
+        _bump_catalog_version(session)
         session.commit()
+        invalidate_catalog_cache()
 
 
 def reorder_blocks(payload: dict[str, Any]) -> None:
@@ -1035,7 +1228,9 @@ def reorder_blocks(payload: dict[str, Any]) -> None:
             session.query(SiteBlock).filter(SiteBlock.id == block_id).update(
                 {"order_index": int(order_index), "updated_at": datetime.utcnow()}
             )
+        _bump_catalog_version(session)
         session.commit()
+        invalidate_catalog_cache()
 
 
 def delete_item(item_id: int) -> None:
@@ -1044,7 +1239,9 @@ def delete_item(item_id: int) -> None:
         if not item:
             raise KeyError("Item not found")
         session.delete(item)
+        _bump_catalog_version(session)
         session.commit()
+        invalidate_catalog_cache()
 
 
 def reorder_entities(payload: dict[str, Any]) -> None:
@@ -1070,4 +1267,6 @@ def reorder_entities(payload: dict[str, Any]) -> None:
                 {"order_index": int(order_index), "updated_at": datetime.utcnow()}
             )
 
+        _bump_catalog_version(session)
         session.commit()
+        invalidate_catalog_cache()
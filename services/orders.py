@@ -1,12 +1,13 @@
 from __future__ import annotations
 
 from datetime import datetime
-from typing import Any, Optional
+from typing import Any, Callable, Optional
 
-from sqlalchemy import select
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
 
 from database import get_session
-from models import Order, OrderItem
+from models import Order, OrderItem, User
 from services import menu_catalog
 from services import stats as stats_service
 from services import users as users_service
@@ -26,21 +27,14 @@ STATUS_TITLES = {
 }
 
 
-def _ensure_user(telegram_id: int, user_name: str | None = None) -> None:
-    user = users_service.get_user_by_telegram_id(telegram_id)
-    if user:
+def _ensure_user(session: Session, telegram_id: int, user_name: str | None = None) -> None:
+    if session.scalar(select(User.id).where(User.telegram_id == telegram_id)) is not None:
         return
+    users_service.get_or_create_user_from_telegram(session, telegram_id=telegram_id, full_name=user_name)
 
-    payload: dict[str, Any] = {"id": telegram_id}
-    if user_name:
-        payload["first_name"] = user_name
-    users_service.get_or_create_user_from_telegram(payload)
-
-
-def _normalize_order_items(items: list[dict[str, Any]]) -> tuple[list[dict[str, Any]], int]:
-    normalized: list[dict[str, Any]] = []
-    total_amount = 0
 
+def normalize_order_items(items: list[dict[str, Any]]) -> tuple[list[dict[str, Any]], int]:
+    lines: list[tuple[dict[str, Any], int, int, str]] = []
     for item in items:
         try:
             product_id = int(item.get("product_id") or 0)
@@ -57,10 +51,21 @@ def _normalize_order_items(items: list[dict[str, Any]]) -> tuple[list[dict[str,
 
         raw_type = item.get("type")
         resolved_type = menu_catalog.map_legacy_item_type(raw_type) or "product"
-        product_data = menu_catalog.get_item_by_id(
-            product_id, include_inactive=True, item_type=resolved_type
-        )
-        if not product_data:
+        lines.append((item, product_id, qty, resolved_type))
+
+    # Все позиции корзины — одним запросом к каталогу, тип сверяется по строке.
+    products = menu_catalog.get_items_by_ids(
+        {product_id for _, product_id, _, _ in lines},
+        {resolved_type for _, _, _, resolved_type in lines},
+        include_inactive=True,
+    )
+
+    normalized: list[dict[str, Any]] = []
+    total_amount = 0
+
+    for item, product_id, qty, resolved_type in lines:
+        product_data = products.get(product_id) or {}
+        if product_data and product_data.get("type") != resolved_type:
             product_data = {}
 
         price_raw = item.get("price")
@@ -100,42 +105,87 @@ def add_order(
     promocode_code: str | None = None,
     discount_amount: int | None = None,
     status: str | None = STATUS_NEW,
+    after_insert: Callable[[Session, int], None] | None = None,
 ) -> int:
-    _ensure_user(user_id, user_name=user_name)
-
-    normalized_items, computed_total = _normalize_order_items(items)
-    order_total = computed_total if normalized_items else int(total)
+    """
+    Сохранить заказ. after_insert(session, order_id) выполняется в той же транзакции —
+    так вместе с заказом атомарно пишутся, например, события outbox.
+    """
+    normalized_items, computed_total = normalize_order_items(items)
 
     with get_session() as session:
-        order = Order(
+        _ensure_user(session, user_id, user_name=user_name)
+        return insert_order(
+            session,
             user_id=user_id,
-            total_amount=order_total,
-            created_at=datetime.utcnow(),
+            items=normalized_items,
+            total=computed_total if normalized_items else int(total),
             customer_name=customer_name,
             contact=contact,
             comment=comment,
+            order_text=order_text,
             promocode_code=promocode_code,
             discount_amount=discount_amount,
-            status=status or STATUS_NEW,
-            order_text=order_text,
+            status=status,
+            after_insert=after_insert,
         )
-        session.add(order)
-        session.flush()
 
-        for item in normalized_items:
-            session.add(
-                OrderItem(
-                    order_id=order.id,
-                    product_id=int(item["product_id"]),
-                    qty=int(item["qty"]),
-                    price=int(item["price"]),
-                    type=item.get("type") or "product",
-                )
-            )
 
-        stats_service.recalc_user_stats(user_id)
+def insert_order(
+    session: Session,
+    *,
+    user_id: int,
+    items: list[dict[str, Any]],
+    total: int,
+    customer_name: str,
+    contact: str,
+    comment: str,
+    order_text: str,
+    promocode_code: str | None = None,
+    discount_amount: int | None = None,
+    status: str | None = STATUS_NEW,
+    after_insert: Callable[[Session, int], None] | None = None,
+) -> int:
+    """
+    Записать заказ в транзакции вызывающего: orders, одна пачка order_items,
+    агрегаты статистики и user_stats. items — результат normalize_order_items.
+    """
+    order = Order(
+        user_id=user_id,
+        total_amount=int(total),
+        created_at=datetime.utcnow(),
+        customer_name=customer_name,
+        contact=contact,
+        comment=comment,
+        promocode_code=promocode_code,
+        discount_amount=discount_amount,
+        status=status or STATUS_NEW,
+        order_text=order_text,
+    )
+    session.add(order)
+    session.flush()
+
+    rows = [
+        {
+            "order_id": order.id,
+            "product_id": int(item["product_id"]),
+            "qty": int(item["qty"]),
+            "price": int(item["price"]),
+            "type": item.get("type") or "product",
+        }
+        for item in items
+    ]
+    if rows:
+        session.execute(insert(OrderItem), rows)
+    stats_service.record_order_created(session, order, rows)
+    stats_service.record_user_order(
+        session, user_id, order.total_amount, order.created_at, status=order.status, order_id=int(order.id)
+    )
+
+    if after_insert is not None:
+        after_insert(session, int(order.id))
 
-        return int(order.id)
+    return int(order.id)
 
 
 def _serialize_order_summary(order: Order) -> dict[str, Any]:
@@ -286,9 +336,11 @@ def set_order_status(order_id: int, status: str) -> bool:
         order = session.get(Order, order_id)
         if not order:
             return False
+        previous_status = order.status
         order.status = status
         session.flush()
-        stats_service.recalc_user_stats(int(order.user_id))
+        stats_service.record_order_status_changed(session, order, previous_status)
+        stats_service.record_user_order_status_changed(session, order.user_id, previous_status, status)
         return True
 
 
@@ -302,9 +354,11 @@ def archive_order_for_user(order_id: int, user_id: int) -> bool:
         if order.status == STATUS_ARCHIVED:
             return True
 
+        previous_status = order.status
         order.status = STATUS_ARCHIVED
         session.flush()
-        stats_service.recalc_user_stats(int(order.user_id))
+        stats_service.record_order_status_changed(session, order, previous_status)
+        stats_service.record_user_order_status_changed(session, order.user_id, previous_status, STATUS_ARCHIVED)
         return True
 
 
@@ -409,17 +463,20 @@ def grant_course_access(
         session.add(order)
         session.flush()
 
-        session.add(
-            OrderItem(
-                order_id=order.id,
-                product_id=course_id,
-                qty=1,
-                price=0,
-                type="course",
-            )
+        item = OrderItem(
+            order_id=order.id,
+            product_id=course_id,
+            qty=1,
+            price=0,
+            type="course",
+        )
+        session.add(item)
+        stats_service.record_order_created(
+            session, order, [{"product_id": course_id, "qty": 1, "price": 0, "type": "course"}]
+        )
+        stats_service.record_user_order(
+            session, user_id, 0, order.created_at, status=STATUS_PAID, order_id=int(order.id)
         )
-
-        stats_service.recalc_user_stats(user_id)
     return True
 
 
@@ -435,7 +492,8 @@ def revoke_course_access(user_id: int, course_id: int) -> bool:
             session.delete(item)
             changed = True
         if changed:
-            stats_service.recalc_user_stats(user_id)
+            # Заказы остаются на месте, поэтому user_stats не меняется.
+            stats_service.record_order_items_removed(session, items)
     return changed
 
 
@@ -0,0 +1,341 @@
+"""Transactional outbox: события пишутся в outbox_messages в транзакции бизнес-операции,
+а доставляет их фоновый воркер с повторами.
+
+Каждое событие уникально по idempotency_key: повторная постановка того же ключа
+ничего не меняет, а обработчик, который порождает новые события (например, заказ →
+сообщения получателям), делает это в той же транзакции, где помечает исходное как done.
+
+Захваченное событие принадлежит воркеру, пока locked_until равен выданной ему
+аренде: перед обработкой каждого сообщения аренда продлевается, а результат
+записывается только при совпадении аренды. Если воркер не успел и событие забрал
+другой, его результат отбрасывается. Обработчики (отправка в Telegram) выполняются
+в собственном пуле потоков outbox, а не в общем пуле run_db.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Callable, Iterable
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.orm import Session
+
+from database import get_session, run_db
+from models import OutboxMessage
+from services import telegram_bot_api
+
+logger = logging.getLogger(__name__)
+
+STATUS_PENDING = "pending"
+STATUS_PROCESSING = "processing"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+KIND_TELEGRAM_MESSAGE = "telegram_message"
+
+OUTBOX_WORKERS = int(os.getenv("OUTBOX_WORKERS", "2"))
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "20"))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "2"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_RETRY_BASE_DELAY = float(os.getenv("OUTBOX_RETRY_BASE_DELAY", "5"))
+OUTBOX_RETRY_MAX_DELAY = float(os.getenv("OUTBOX_RETRY_MAX_DELAY", "900"))
+OUTBOX_LEASE_SECONDS = float(os.getenv("OUTBOX_LEASE_SECONDS", "120"))
+
+
+@dataclass
+class OutboxEvent:
+    kind: str
+    idempotency_key: str
+    payload: dict[str, Any] = field(default_factory=dict)
+
+
+class OutboxPermanentError(Exception):
+    """Повторять бесполезно: событие сразу уходит в failed."""
+
+
+Handler = Callable[[dict[str, Any]], Iterable[OutboxEvent] | None]
+
+_handlers: dict[str, Handler] = {}
+_wakeup: tuple[asyncio.AbstractEventLoop, asyncio.Event] | None = None
+_worker_tasks: list[asyncio.Task] = []
+_wakeup_lock = threading.Lock()
+_executor: ThreadPoolExecutor | None = None
+
+
+def register_handler(kind: str, handler: Handler) -> None:
+    _handlers[kind] = handler
+
+
+def enqueue(session: Session, event: OutboxEvent) -> bool:
+    """Добавить событие в текущую транзакцию. False — такой ключ уже есть."""
+
+    exists = session.execute(
+        select(OutboxMessage.id).where(OutboxMessage.idempotency_key == event.idempotency_key)
+    ).first()
+    if exists:
+        return False
+    now = datetime.utcnow()
+    session.add(
+        OutboxMessage(
+            idempotency_key=event.idempotency_key,
+            kind=event.kind,
+            payload=event.payload,
+            status=STATUS_PENDING,
+            attempts=0,
+            next_attempt_at=now,
+            created_at=now,
+            updated_at=now,
+        )
+    )
+    session.flush()
+    return True
+
+
+def wake() -> None:
+    """Разбудить воркер этого процесса после коммита новых событий (из любого потока)."""
+
+    with _wakeup_lock:
+        target = _wakeup
+    if target is None:
+        return
+    loop, event = target
+    try:
+        loop.call_soon_threadsafe(event.set)
+    except RuntimeError:
+        pass
+
+
+def _retry_delay(attempts: int) -> timedelta:
+    delay = OUTBOX_RETRY_BASE_DELAY * (2 ** max(attempts - 1, 0))
+    return timedelta(seconds=min(delay, OUTBOX_RETRY_MAX_DELAY))
+
+
+def claim_batch(limit: int = OUTBOX_BATCH_SIZE) -> list[OutboxMessage]:
+    """Забрать готовые к отправке события; FOR UPDATE SKIP LOCKED разводит воркеры разных процессов."""
+
+    now = datetime.utcnow()
+    with get_session("jobs") as session:
+        rows = (
+            session.execute(
+                select(OutboxMessage)
+                .where(
+                    or_(
+                        and_(
+                            OutboxMessage.status == STATUS_PENDING,
+                            OutboxMessage.next_attempt_at <= now,
+                        ),
+                        and_(
+                            OutboxMessage.status == STATUS_PROCESSING,
+                            OutboxMessage.locked_until < now,
+                        ),
+                    )
+                )
+                .order_by(OutboxMessage.id)
+                .limit(limit)
+                .with_for_update(skip_locked=True)
+            )
+            .scalars()
+            .all()
+        )
+        for row in rows:
+            row.status = STATUS_PROCESSING
+            row.attempts = int(row.attempts or 0) + 1
+            row.locked_until = now + timedelta(seconds=OUTBOX_LEASE_SECONDS)
+            row.updated_at = now
+        return rows
+
+
+def _renew_lease(message_id: int, lease: datetime | None) -> datetime | None:
+    """Продлить аренду перед обработкой; None — событие уже забрал другой воркер."""
+
+    now = datetime.utcnow()
+    renewed = now + timedelta(seconds=OUTBOX_LEASE_SECONDS)
+    with get_session("jobs") as session:
+        result = session.execute(
+            update(OutboxMessage)
+            .where(
+                OutboxMessage.id == message_id,
+                OutboxMessage.status == STATUS_PROCESSING,
+                OutboxMessage.locked_until == lease,
+            )
+            .values(locked_until=renewed, updated_at=now)
+        )
+        return renewed if result.rowcount == 1 else None
+
+
+def _leased_row(session: Session, message_id: int, lease: datetime) -> OutboxMessage | None:
+    row = session.scalar(
+        select(OutboxMessage)
+        .where(
+            OutboxMessage.id == message_id,
+            OutboxMessage.status == STATUS_PROCESSING,
+            OutboxMessage.locked_until == lease,
+        )
+        .with_for_update()
+    )
+    if row is None:
+        logger.warning("Outbox %s lease lost, result discarded", message_id)
+    return row
+
+
+def _finish(message_id: int, lease: datetime, children: Iterable[OutboxEvent]) -> None:
+    with get_session("jobs") as session:
+        row = _leased_row(session, message_id, lease)
+        if row is None:
+            return
+        for child in children:
+            enqueue(session, child)
+        row.status = STATUS_DONE
+        row.locked_until = None
+        row.last_error = None
+        row.updated_at = datetime.utcnow()
+
+
+def _fail(message_id: int, lease: datetime, error: str, *, permanent: bool) -> None:
+    with get_session("jobs") as session:
+        row = _leased_row(session, message_id, lease)
+        if row is None:
+            return
+        now = datetime.utcnow()
+        row.last_error = error[:2000]
+        row.locked_until = None
+        row.updated_at = now
+        if permanent or int(row.attempts or 0) >= OUTBOX_MAX_ATTEMPTS:
+            row.status = STATUS_FAILED
+        else:
+            row.status = STATUS_PENDING
+            row.next_attempt_at = now + _retry_delay(int(row.attempts or 0))
+
+
+def process_message(message: OutboxMessage) -> bool:
+    # Пачка обрабатывается последовательно, поэтому аренда, выданная при захвате,
+    # к этому моменту могла истечь: продлеваем её на одно сообщение.
+    lease = _renew_lease(message.id, message.locked_until)
+    if lease is None:
+        logger.warning("Outbox %s was reclaimed by another worker, skipped", message.id)
+        return False
+    handler = _handlers.get(message.kind)
+    if handler is None:
+        _fail(message.id, lease, f"no handler for {message.kind}", permanent=True)
+        return False
+    try:
+        children = list(handler(dict(message.payload or {})) or [])
+    except OutboxPermanentError as exc:
+        logger.warning("Outbox %s (%s) failed permanently: %s", message.id, message.kind, exc)
+        _fail(message.id, lease, str(exc), permanent=True)
+        return False
+    except Exception as exc:
+        logger.exception("Outbox %s (%s) attempt %s failed", message.id, message.kind, message.attempts)
+        _fail(message.id, lease, repr(exc), permanent=False)
+        return False
+    _finish(message.id, lease, children)
+    return True
+
+
+def process_batch(limit: int = OUTBOX_BATCH_SIZE) -> int:
+    messages = claim_batch(limit)
+    for message in messages:
+        process_message(message)
+    return len(messages)
+
+
+def get_outbox_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=max(OUTBOX_WORKERS, 1), thread_name_prefix="outbox")
+    return _executor
+
+
+async def _process_claimed(limit: int = OUTBOX_BATCH_SIZE) -> int:
+    # Захват — короткий запрос в пуле run_db; обработчики с медленными вызовами
+    # Telegram занимают только потоки outbox.
+    messages = await run_db(claim_batch, limit)
+    loop = asyncio.get_running_loop()
+    for message in messages:
+        await loop.run_in_executor(get_outbox_executor(), process_message, message)
+    return len(messages)
+
+
+async def _worker_loop(event: asyncio.Event) -> None:
+    while True:
+        try:
+            processed = await _process_claimed()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Outbox worker iteration failed")
+            processed = 0
+        if processed:
+            continue
+        event.clear()
+        try:
+            await asyncio.wait_for(event.wait(), timeout=OUTBOX_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+
+def start_worker(workers: int = OUTBOX_WORKERS) -> None:
+    """Запустить воркеры как asyncio-задачи текущего event loop (вызывается на startup)."""
+
+    global _wakeup
+    if _worker_tasks or workers <= 0:
+        return
+    loop = asyncio.get_running_loop()
+    event = asyncio.Event()
+    with _wakeup_lock:
+        _wakeup = (loop, event)
+    for index in range(workers):
+        _worker_tasks.append(loop.create_task(_worker_loop(event), name=f"outbox-worker-{index}"))
+
+
+async def stop_worker() -> None:
+    global _wakeup, _executor
+    tasks = list(_worker_tasks)
+    _worker_tasks.clear()
+    with _wakeup_lock:
+        _wakeup = None
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def telegram_message_event(
+    idempotency_key: str,
+    chat_id: int,
+    text: str,
+    reply_markup: dict[str, Any] | None = None,
+) -> OutboxEvent:
+    return OutboxEvent(
+        kind=KIND_TELEGRAM_MESSAGE,
+        idempotency_key=idempotency_key,
+        payload={"chat_id": chat_id, "text": text, "reply_markup": reply_markup},
+    )
+
+
+def _deliver_telegram_message(payload: dict[str, Any]) -> None:
+    result = telegram_bot_api.get_client().call_blocking(
+        "sendMessage",
+        chat_id=payload["chat_id"],
+        **telegram_bot_api.build_message_payload(payload.get("text") or "", payload.get("reply_markup")),
+    )
+    if result is None:
+        raise RuntimeError("Telegram API unavailable")
+    if not result.get("ok"):
+        error = f"{result.get('error_code')}: {result.get('description')}"
+        if result.get("error_code") in (400, 403):
+            # Чат не найден, бот заблокирован и т.п. — повтор не поможет.
+            raise OutboxPermanentError(error)
+        # 429 без retry_after, 5xx и прочее — временно, повторяем с backoff.
+        raise RuntimeError(error)
+
+
+register_handler(KIND_TELEGRAM_MESSAGE, _deliver_telegram_message)
@@ -1,59 +1,374 @@
 from __future__ import annotations
 
-from datetime import datetime, timedelta
-from typing import List
+import os
+import random
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
+from typing import Any, Callable, Iterable, List, Mapping
 
-from sqlalchemy import func, select
+from sqlalchemy import and_, case, delete, func, or_, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
 
 from database import get_session
-from initdb import init_db
-from models import Favorite, Order, OrderItem, User, UserStats
+from initdb import ensure_schema
+from models import (
+    Favorite,
+    Order,
+    OrderItem,
+    OrderStatsDaily,
+    ProductSalesStats,
+    StatsCounter,
+    User,
+    UserStats,
+)
 from services import menu_catalog
 
 # NOTE: Этот модуль используется прежде всего для веб-админки
 # (WEBAPP_ADMIN_URL). В Telegram-боте подробные отчёты больше не
 # отображаются, чтобы оставить боту роль CRM-инструмента.
+#
+# Дашборд не агрегирует orders/order_items/users/favorites при каждом открытии:
+# он читает таблицы order_stats_daily, product_sales_stats и stats_counters,
+# которые обновляются в транзакциях, меняющих заказы и избранное (record_* и
+# bump_counter ниже). rebuild_order_stats() пересчитывает их с нуля.
+# Строки order_stats_daily и stats_counters разбиты на STATS_COUNTER_SHARDS
+# shard-строк: параллельные оформления заказов прибавляют к разным строкам и не
+# ждут блокировку одной до commit. Позиции заказа обновляются в порядке
+# (product_id, type), чтобы две транзакции не заблокировали друг друга.
+
+COUNTER_USERS = "users"
+COUNTER_FAVORITES = "favorites"
+COUNTER_ORDERS = "orders"
+COUNTER_ORDERS_AMOUNT = "orders_amount"
+TOP_PRODUCT_TYPES = ("basket", "product")
+STATS_COUNTER_SHARDS = max(int(os.getenv("STATS_COUNTER_SHARDS", "16")), 1)
+
+# Статус заказа -> колонка счётчика в user_stats (заказ без статуса считается новым).
+USER_STATUS_COLUMNS = {
+    "new": "new_count",
+    "in_progress": "in_progress_count",
+    "paid": "paid_count",
+    "sent": "sent_count",
+    "archived": "archived_count",
+}
+USER_STATS_RECONCILE_BATCH = 1000
 
 
 def _parse_date(value: str | None) -> datetime | None:
     if not value:
         return None
     try:
-        return datetime.fromisoformat(value)
+        parsed = datetime.fromisoformat(value)
     except ValueError:
         return None
+    # orders.created_at хранится в UTC без зоны.
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
 
 
-def get_orders_stats_summary(date_from: str | None = None, date_to: str | None = None) -> dict:
-    init_db()
-    filters = []
-    dt_from = _parse_date(date_from)
-    dt_to = _parse_date(date_to)
-    if dt_from:
-        filters.append(Order.created_at >= dt_from)
-    if dt_to:
-        filters.append(Order.created_at <= dt_to)
+def _insert(session: Session, model):
+    dialect = session.get_bind().dialect.name
+    return (postgresql.insert if dialect == "postgresql" else sqlite.insert)(model)
+
+
+def _upsert_add(
+    session: Session,
+    model,
+    keys: dict[str, Any],
+    deltas: dict[str, Any],
+    assign: dict[str, Any] | None = None,
+    assign_if: Callable[[Any], Any] | None = None,
+) -> None:
+    """INSERT ... ON CONFLICT DO UPDATE SET col = col + delta: без гонки при первой записи ключа.
+
+    Колонки из assign при конфликте перезаписываются новым значением; если задан
+    assign_if(excluded), то только когда это условие истинно.
+    """
+
+    assign = assign or {}
+    statement = _insert(session, model).values(**keys, **deltas, **assign)
+    set_ = {name: getattr(model, name) + statement.excluded[name] for name in deltas}
+    for name in assign:
+        value = statement.excluded[name]
+        if assign_if is not None:
+            value = case((assign_if(statement.excluded), value), else_=getattr(model, name))
+        set_[name] = value
+    statement = statement.on_conflict_do_update(index_elements=list(keys), set_=set_)
+    session.execute(statement)
+
+
+def _random_shard() -> int:
+    return random.randrange(STATS_COUNTER_SHARDS)
+
+
+def bump_counter(session: Session, name: str, delta: int | Decimal, shard: int | None = None) -> None:
+    if delta:
+        shard = _random_shard() if shard is None else shard
+        _upsert_add(session, StatsCounter, {"name": name, "shard": shard}, {"value": delta})
+
+
+def _order_day(created_at: datetime | None) -> date:
+    return (created_at or datetime.utcnow()).date()
+
+
+def _item_amount(item: Any) -> Decimal:
+    return Decimal(str(item.price or 0)) * int(item.qty or 0)
+
+
+def _add_product_sales(session: Session, deltas: dict[tuple[int, str], list]) -> None:
+    # Одна строка на позицию и общий порядок блокировок для всех транзакций.
+    for (product_id, item_type), (qty, amount) in sorted(deltas.items()):
+        _upsert_add(
+            session,
+            ProductSalesStats,
+            {"product_id": product_id, "type": item_type},
+            {"total_qty": qty, "total_amount": amount},
+        )
+
+
+def record_order_created(session: Session, order: Order, items: Iterable[Mapping[str, Any]]) -> None:
+    """Учесть новый заказ в агрегатах (в транзакции, где он создан); items — строки order_items."""
+
+    total = Decimal(str(order.total_amount or 0))
+    shard = _random_shard()
+    _upsert_add(
+        session,
+        OrderStatsDaily,
+        {"day": _order_day(order.created_at), "status": order.status or "", "shard": shard},
+        {"orders_count": 1, "total_amount": total},
+    )
+    bump_counter(session, COUNTER_ORDERS, 1, shard)
+    bump_counter(session, COUNTER_ORDERS_AMOUNT, total, shard)
+    deltas: dict[tuple[int, str], list] = {}
+    for item in items:
+        qty = int(item.get("qty") or 0)
+        entry = deltas.setdefault((int(item["product_id"]), item.get("type") or "basket"), [0, Decimal(0)])
+        entry[0] += qty
+        entry[1] += Decimal(str(item.get("price") or 0)) * qty
+    _add_product_sales(session, deltas)
+
+
+def _status_column(status: str | None) -> str | None:
+    return USER_STATUS_COLUMNS.get(status or "new")
+
+
+def _is_later_order(excluded) -> Any:
+    # Заказы коммитятся не по порядку: последний заказ меняется, только если новый позже.
+    return or_(
+        UserStats.last_order_at.is_(None),
+        excluded.last_order_at > UserStats.last_order_at,
+        and_(
+            excluded.last_order_at == UserStats.last_order_at,
+            excluded.last_order_id > func.coalesce(UserStats.last_order_id, 0),
+        ),
+    )
+
+
+def record_user_order(
+    session: Session,
+    user_id: int,
+    order_total: int,
+    created_at: datetime | None = None,
+    *,
+    status: str | None = None,
+    order_id: int | None = None,
+) -> None:
+    """Добавить заказ в user_stats одним upsert, без пересчёта всех заказов пользователя."""
+
+    deltas: dict[str, Any] = {"orders_count": 1, "total_spent": int(order_total or 0)}
+    column = _status_column(status)
+    if column:
+        deltas[column] = 1
+    _upsert_add(
+        session,
+        UserStats,
+        {"user_id": int(user_id)},
+        deltas,
+        assign={"last_order_at": created_at or datetime.utcnow(), "last_order_id": order_id},
+        assign_if=_is_later_order,
+    )
+
+
+def record_user_order_status_changed(
+    session: Session, user_id: int | None, old_status: str | None, new_status: str | None
+) -> None:
+    """Перенести заказ пользователя между счётчиками статусов."""
+
+    old_column, new_column = _status_column(old_status), _status_column(new_status)
+    if user_id is None or old_column == new_column:
+        return
+    deltas = {}
+    if old_column:
+        deltas[old_column] = -1
+    if new_column:
+        deltas[new_column] = 1
+    _upsert_add(session, UserStats, {"user_id": int(user_id)}, deltas)
+
+
+def record_order_status_changed(session: Session, order: Order, old_status: str | None) -> None:
+    """Перенести заказ между статусами в дневных агрегатах."""
+
+    new_status = order.status or ""
+    old_status = old_status or ""
+    if new_status == old_status:
+        return
+    day = _order_day(order.created_at)
+    total = Decimal(str(order.total_amount or 0))
+    shard = _random_shard()
+    # Строки берутся в порядке статуса, а не «откуда → куда»: встречные переходы
+    # двух заказов не ждут друг друга.
+    for status, sign in sorted(((old_status, -1), (new_status, 1))):
+        _upsert_add(
+            session,
+            OrderStatsDaily,
+            {"day": day, "status": status, "shard": shard},
+            {"orders_count": sign, "total_amount": sign * total},
+        )
+
+
+def record_order_items_removed(session: Session, items: Iterable[OrderItem]) -> None:
+    deltas: dict[tuple[int, str], list] = {}
+    for item in items:
+        entry = deltas.setdefault((int(item.product_id), item.type or "basket"), [0, Decimal(0)])
+        entry[0] -= int(item.qty or 0)
+        entry[1] -= _item_amount(item)
+    _add_product_sales(session, deltas)
+
+
+def rebuild_order_stats() -> dict[str, int]:
+    """Пересчитать агрегаты дашборда из исходных таблиц (первичное заполнение и сверка)."""
 
     with get_session() as session:
-        count_row = session.execute(
-            select(
-                func.count(Order.id),
-                func.coalesce(func.sum(Order.total_amount), 0),
-            ).where(*filters)
-        ).first()
+        for model in (OrderStatsDaily, ProductSalesStats, StatsCounter):
+            session.execute(delete(model))
+
+        day = func.date(Order.created_at)
+        status = func.coalesce(Order.status, "")
+        daily_rows = session.execute(
+            select(day, status, func.count(Order.id), func.coalesce(func.sum(Order.total_amount), 0)).group_by(
+                day, status
+            )
+        ).all()
+        for row_day, row_status, orders_count, total_amount in daily_rows:
+            session.add(
+                OrderStatsDaily(
+                    day=row_day if isinstance(row_day, date) else date.fromisoformat(str(row_day)),
+                    status=row_status,
+                    orders_count=int(orders_count or 0),
+                    total_amount=total_amount,
+                )
+            )
 
-        status_rows = session.execute(
-            select(Order.status, func.count(Order.id)).where(*filters).group_by(Order.status)
+        product_rows = session.execute(
+            select(
+                OrderItem.product_id,
+                OrderItem.type,
+                func.coalesce(func.sum(OrderItem.qty), 0),
+                func.coalesce(func.sum(OrderItem.qty * OrderItem.price), 0),
+            ).group_by(OrderItem.product_id, OrderItem.type)
         ).all()
+        for product_id, item_type, total_qty, total_amount in product_rows:
+            session.add(
+                ProductSalesStats(
+                    product_id=int(product_id),
+                    type=item_type or "basket",
+                    total_qty=int(total_qty or 0),
+                    total_amount=total_amount,
+                )
+            )
+        session.flush()
+
+        counters = {
+            COUNTER_USERS: session.scalar(select(func.count(User.id))) or 0,
+            COUNTER_FAVORITES: session.scalar(select(func.count(Favorite.id))) or 0,
+            COUNTER_ORDERS: sum(int(row[2] or 0) for row in daily_rows),
+            COUNTER_ORDERS_AMOUNT: sum(Decimal(str(row[3] or 0)) for row in daily_rows),
+        }
+        session.add_all(StatsCounter(name=name, shard=0, value=value) for name, value in counters.items())
+
+    return {"days": len(daily_rows), "products": len(product_rows)}
+
+
+def get_counters(session: Session) -> dict[str, Decimal]:
+    return {
+        name: value
+        for name, value in session.execute(
+            select(StatsCounter.name, func.sum(StatsCounter.value)).group_by(StatsCounter.name)
+        )
+    }
+
 
-    by_status = {status: int(cnt or 0) for status, cnt in status_rows if status}
-    total_orders = int(count_row[0] or 0) if count_row else 0
-    total_amount = int(count_row[1] or 0) if count_row else 0
+def _orders_by_status(session: Session, *filters) -> list:
+    status = func.coalesce(Order.status, "")
+    return session.execute(
+        select(status, func.count(Order.id), func.coalesce(func.sum(Order.total_amount), 0))
+        .where(*filters)
+        .group_by(status)
+    ).all()
+
+
+def get_orders_stats_summary(date_from: str | None = None, date_to: str | None = None) -> dict:
+    """
+    Заказы и выручка по статусам; границы сравниваются с created_at включительно.
+    Дни, целиком попавшие в период, читаются из order_stats_daily, неполные
+    крайние дни — из orders.
+    """
+    ensure_schema()
+    dt_from = _parse_date(date_from)
+    dt_to = _parse_date(date_to)
+    first_day = None
+    if dt_from is not None:
+        first_day = dt_from.date() if dt_from.time() == time.min else dt_from.date() + timedelta(days=1)
+    last_day = None
+    if dt_to is not None:
+        # День полный, если в период входит и его последняя микросекунда.
+        last_day = (dt_to + timedelta(microseconds=1)).date() - timedelta(days=1)
+
+    totals: dict[str, list] = {}
+
+    def _add(rows) -> None:
+        for status, cnt, amount in rows:
+            entry = totals.setdefault(status or "", [0, 0])
+            entry[0] += int(cnt or 0)
+            entry[1] += int(amount or 0)
+
+    with get_session() as session:
+        if first_day is not None and last_day is not None and first_day > last_day:
+            _add(_orders_by_status(session, Order.created_at >= dt_from, Order.created_at <= dt_to))
+        else:
+            filters = []
+            if first_day is not None:
+                filters.append(OrderStatsDaily.day >= first_day)
+            if last_day is not None:
+                filters.append(OrderStatsDaily.day <= last_day)
+            _add(
+                session.execute(
+                    select(
+                        OrderStatsDaily.status,
+                        func.coalesce(func.sum(OrderStatsDaily.orders_count), 0),
+                        func.coalesce(func.sum(OrderStatsDaily.total_amount), 0),
+                    )
+                    .where(*filters)
+                    .group_by(OrderStatsDaily.status)
+                ).all()
+            )
+            if first_day is not None and dt_from < datetime.combine(first_day, time.min):
+                _add(
+                    _orders_by_status(
+                        session, Order.created_at >= dt_from, Order.created_at < datetime.combine(first_day, time.min)
+                    )
+                )
+            if last_day is not None:
+                tail_start = datetime.combine(last_day + timedelta(days=1), time.min)
+                if tail_start <= dt_to:
+                    _add(_orders_by_status(session, Order.created_at >= tail_start, Order.created_at <= dt_to))
 
     return {
-        "total_orders": total_orders,
-        "total_amount": total_amount,
-        "by_status": by_status,
+        "total_orders": sum(cnt for cnt, _ in totals.values()),
+        "total_amount": sum(amount for _, amount in totals.values()),
+        "by_status": {status: cnt for status, (cnt, _) in totals.items() if status and cnt},
     }
 
 
@@ -67,13 +382,14 @@ def get_orders_stats_by_day(limit_days: int = 7) -> List[dict]:
     with get_session() as session:
         rows = session.execute(
             select(
-                func.date(Order.created_at),
-                func.count(Order.id),
-                func.coalesce(func.sum(Order.total_amount), 0),
+                OrderStatsDaily.day,
+                func.sum(OrderStatsDaily.orders_count),
+                func.coalesce(func.sum(OrderStatsDaily.total_amount), 0),
             )
-            .where(Order.created_at >= datetime.combine(date_from, datetime.min.time()))
-            .group_by(func.date(Order.created_at))
-            .order_by(func.date(Order.created_at).desc())
+            .where(OrderStatsDaily.day >= date_from)
+            .group_by(OrderStatsDaily.day)
+            .having(func.sum(OrderStatsDaily.orders_count) > 0)
+            .order_by(OrderStatsDaily.day.desc())
             .limit(limit_days)
         ).all()
 
@@ -87,112 +403,205 @@ def get_orders_stats_by_day(limit_days: int = 7) -> List[dict]:
     ]
 
 
-def _serialize_top_item(row, product_type: str | None = None) -> dict:
-    product_id = int(row.product_id)
-    resolved_type = menu_catalog.map_legacy_item_type(product_type or getattr(row, "type", None)) or "product"
-    product = menu_catalog.get_item_by_id(
-        product_id,
-        include_inactive=True,
-        item_type=resolved_type,
-    )
-    name = (product or {}).get("title") if isinstance(product, dict) else None
-    if not name and isinstance(product, dict):
-        name = product.get("name")
-    name = name or f"Товар #{product_id}"
-    return {
-        "product_id": product_id,
-        "name": name,
-        "total_qty": int(row.total_qty or 0),
-        "total_amount": int(row.total_amount or 0),
-    }
+def _serialize_top_items(rows, product_type: str | None = None) -> list[dict]:
+    """Названия позиций подгружаются одним запросом на весь топ."""
 
+    types = {
+        menu_catalog.map_legacy_item_type(product_type or row.type) or "product" for row in rows
+    }
+    products = menu_catalog.get_items_by_ids(
+        (row.product_id for row in rows), types, include_inactive=True
+    )
+    result = []
+    for row in rows:
+        product_id = int(row.product_id)
+        product = products.get(product_id)
+        name = (product or {}).get("title") if isinstance(product, dict) else None
+        if not name and isinstance(product, dict):
+            name = product.get("name")
+        name = name or f"Товар #{product_id}"
+        result.append(
+            {
+                "product_id": product_id,
+                "name": name,
+                "total_qty": int(row.total_qty or 0),
+                "total_amount": int(row.total_amount or 0),
+            }
+        )
+    return result
 
-def get_top_products(limit: int = 5) -> list[dict]:
-    if limit <= 0:
-        return []
 
+def _top_sales(types: Iterable[str], limit: int) -> list:
     with get_session() as session:
-        rows = session.execute(
+        return session.execute(
             select(
-                OrderItem.product_id.label("product_id"),
-                OrderItem.type.label("type"),
-                func.sum(OrderItem.qty).label("total_qty"),
-                func.sum(OrderItem.qty * OrderItem.price).label("total_amount"),
+                ProductSalesStats.product_id,
+                ProductSalesStats.type,
+                ProductSalesStats.total_qty,
+                ProductSalesStats.total_amount,
             )
-            .where(OrderItem.type.in_(["basket", "product"]))
-            .group_by(OrderItem.product_id, OrderItem.type)
-            .order_by(func.sum(OrderItem.qty * OrderItem.price).desc())
+            .where(ProductSalesStats.type.in_(list(types)), ProductSalesStats.total_qty > 0)
+            .order_by(ProductSalesStats.total_amount.desc(), ProductSalesStats.product_id)
             .limit(limit)
         ).all()
-    return [_serialize_top_item(row) for row in rows]
 
 
-def get_top_courses(limit: int = 5) -> list[dict]:
+def get_top_products(limit: int = 5) -> list[dict]:
     if limit <= 0:
         return []
+    return _serialize_top_items(_top_sales(TOP_PRODUCT_TYPES, limit))
 
-    with get_session() as session:
-        rows = session.execute(
-            select(
-                OrderItem.product_id.label("product_id"),
-                func.sum(OrderItem.qty).label("total_qty"),
-                func.sum(OrderItem.qty * OrderItem.price).label("total_amount"),
-            )
-            .where(OrderItem.type == "course")
-            .group_by(OrderItem.product_id)
-            .order_by(func.sum(OrderItem.qty * OrderItem.price).desc())
-            .limit(limit)
-        ).all()
-    return [_serialize_top_item(row, "course") for row in rows]
+
+def get_top_courses(limit: int = 5) -> list[dict]:
+    if limit <= 0:
+        return []
+    return _serialize_top_items(_top_sales(["course"], limit), "course")
 
 
 def _get_or_create_user_stats(session, user_id: int) -> UserStats:
     stats = session.scalar(select(UserStats).where(UserStats.user_id == user_id))
     if stats:
         return stats
-    stats = UserStats(user_id=user_id, orders_count=0, total_spent=0)
+    stats = UserStats(
+        user_id=user_id,
+        orders_count=0,
+        total_spent=0,
+        **{column: 0 for column in USER_STATUS_COLUMNS.values()},
+    )
     session.add(stats)
     session.flush()
     return stats
 
 
-def recalc_user_stats(user_id: int) -> dict:
-    with get_session() as session:
-        orders_count = session.scalar(
-            select(func.count(Order.id)).where(Order.user_id == user_id)
+def _expected_user_stats(session: Session, user_ids: list[int]) -> dict[int, dict[str, Any]]:
+    """Значения user_stats по таблице orders для пачки пользователей (три запроса на пачку)."""
+
+    expected: dict[int, dict[str, Any]] = {
+        user_id: {
+            "orders_count": 0,
+            "total_spent": 0,
+            "last_order_at": None,
+            "last_order_id": None,
+            **{column: 0 for column in USER_STATUS_COLUMNS.values()},
+        }
+        for user_id in user_ids
+    }
+    totals = session.execute(
+        select(Order.user_id, func.count(Order.id), func.coalesce(func.sum(Order.total_amount), 0))
+        .where(Order.user_id.in_(user_ids))
+        .group_by(Order.user_id)
+    ).all()
+    for user_id, orders_count, total_spent in totals:
+        expected[user_id]["orders_count"] = int(orders_count or 0)
+        expected[user_id]["total_spent"] = int(total_spent or 0)
+
+    by_status = session.execute(
+        select(Order.user_id, Order.status, func.count(Order.id))
+        .where(Order.user_id.in_(user_ids))
+        .group_by(Order.user_id, Order.status)
+    ).all()
+    for user_id, status, count in by_status:
+        column = _status_column(status)
+        if column:
+            expected[user_id][column] += int(count or 0)
+
+    ranked = (
+        select(
+            Order.user_id,
+            Order.id,
+            Order.created_at,
+            func.row_number()
+            .over(partition_by=Order.user_id, order_by=(Order.created_at.desc(), Order.id.desc()))
+            .label("position"),
         )
-        total_spent = session.scalar(
-            select(func.coalesce(func.sum(Order.total_amount), 0)).where(
-                Order.user_id == user_id
-            )
+        .where(Order.user_id.in_(user_ids))
+        .subquery()
+    )
+    for user_id, order_id, created_at in session.execute(
+        select(ranked.c.user_id, ranked.c.id, ranked.c.created_at).where(ranked.c.position == 1)
+    ):
+        expected[user_id]["last_order_id"] = int(order_id)
+        expected[user_id]["last_order_at"] = created_at
+    return expected
+
+
+def _reconcile_batch(session: Session, user_ids: list[int]) -> int:
+    # Сначала блокируем строки user_stats: заказ, созданный параллельно, ждёт
+    # своего upsert до нашего commit, и его дельта не теряется.
+    current = {
+        stats.user_id: stats
+        for stats in session.scalars(
+            select(UserStats).where(UserStats.user_id.in_(user_ids)).with_for_update()
         )
-        last_order = session.scalar(
-            select(Order.created_at)
-            .where(Order.user_id == user_id)
-            .order_by(Order.created_at.desc(), Order.id.desc())
-            .limit(1)
+    }
+    repaired = 0
+    missing = []
+    for user_id, values in _expected_user_stats(session, user_ids).items():
+        stats = current.get(user_id)
+        if stats is None:
+            if values["orders_count"]:
+                missing.append({"user_id": user_id, **values})
+            continue
+        drift = {name: value for name, value in values.items() if getattr(stats, name) != value}
+        if drift:
+            for name, value in drift.items():
+                setattr(stats, name, value)
+            repaired += 1
+    if missing:
+        # Отсутствующую строку FOR UPDATE не блокирует: её может параллельно вставить
+        # record_user_order. Тогда оставляем её дельтам, расхождение поправит следующий проход.
+        result = session.execute(
+            _insert(session, UserStats).values(missing).on_conflict_do_nothing(index_elements=["user_id"])
         )
+        repaired += max(result.rowcount or 0, 0)
+    return repaired
+
+
+def reconcile_user_stats(
+    user_ids: Iterable[int] | None = None, *, batch_size: int = USER_STATS_RECONCILE_BATCH
+) -> int:
+    """
+    Сверить user_stats с orders и исправить расхождения; возвращает число исправленных строк.
+    Без user_ids проходит всех пользователей с заказами или строкой user_stats пачками по
+    batch_size, каждая пачка — отдельная транзакция.
+    """
+    if user_ids is not None:
+        ids = sorted({int(user_id) for user_id in user_ids})
+        repaired = 0
+        for start in range(0, len(ids), batch_size):
+            with get_session("jobs") as session:
+                repaired += _reconcile_batch(session, ids[start:start + batch_size])
+        return repaired
+
+    repaired = 0
+    last_id: int | None = None
+    while True:
+        with get_session("jobs") as session:
+            candidates = select(Order.user_id.label("user_id")).where(Order.user_id.isnot(None)).union(
+                select(UserStats.user_id.label("user_id"))
+            ).subquery()
+            query = select(candidates.c.user_id)
+            if last_id is not None:
+                query = query.where(candidates.c.user_id > last_id)
+            batch = list(session.scalars(query.order_by(candidates.c.user_id).limit(batch_size)))
+            if not batch:
+                return repaired
+            repaired += _reconcile_batch(session, batch)
+        last_id = batch[-1]
+        if len(batch) < batch_size:
+            return repaired
 
-        stats = _get_or_create_user_stats(session, user_id)
-        stats.orders_count = int(orders_count or 0)
-        stats.total_spent = int(total_spent or 0)
-        stats.last_order_at = last_order
-        session.flush()
-        session.refresh(stats)
 
-        return {
-            "orders_count": stats.orders_count,
-            "total_spent": stats.total_spent,
-            "last_order_at": stats.last_order_at.isoformat() if stats.last_order_at else None,
-        }
+def recalc_user_stats(user_id: int) -> dict:
+    """Пересчитать строку user_stats одного пользователя по orders (ручной ремонт)."""
+
+    reconcile_user_stats([user_id])
+    return get_user_stats(user_id)
 
 
 def update_user_stats(user_id: int, order_total: int, last_order_at: datetime | None = None) -> None:
     with get_session() as session:
-        stats = _get_or_create_user_stats(session, user_id)
-        stats.orders_count = int(stats.orders_count or 0) + 1
-        stats.total_spent = int(stats.total_spent or 0) + int(order_total or 0)
-        stats.last_order_at = last_order_at or datetime.utcnow()
+        record_user_order(session, user_id, order_total, last_order_at)
 
 
 def get_user_stats(user_id: int) -> dict:
@@ -202,17 +611,16 @@ def get_user_stats(user_id: int) -> dict:
             "orders_count": int(stats.orders_count or 0),
             "total_spent": int(stats.total_spent or 0),
             "last_order_at": stats.last_order_at.isoformat() if stats.last_order_at else None,
+            "last_order_id": stats.last_order_id,
+            "orders_by_status": {
+                status: int(getattr(stats, column) or 0) for status, column in USER_STATUS_COLUMNS.items()
+            },
         }
 
 
 def get_admin_dashboard_stats(limit_new_users: int = 5) -> dict:
     with get_session() as session:
-        total_users = session.scalar(select(func.count(User.id))) or 0
-        total_orders = session.scalar(select(func.count(Order.id))) or 0
-        total_amount = session.scalar(
-            select(func.coalesce(func.sum(Order.total_amount), 0))
-        ) or 0
-        favorites_count = session.scalar(select(func.count(Favorite.id))) or 0
+        counters = get_counters(session)
 
         new_users = session.scalars(
             select(User)
@@ -225,10 +633,10 @@ def get_admin_dashboard_stats(limit_new_users: int = 5) -> dict:
 
     return {
         "totals": {
-            "users": int(total_users),
-            "orders": int(total_orders),
-            "amount": int(total_amount),
-            "favorites": int(favorites_count),
+            "users": int(counters.get(COUNTER_USERS) or 0),
+            "orders": int(counters.get(COUNTER_ORDERS) or 0),
+            "amount": int(counters.get(COUNTER_ORDERS_AMOUNT) or 0),
+            "favorites": int(counters.get(COUNTER_FAVORITES) or 0),
         },
         "top_products": top_products,
         "top_courses": top_courses,
@@ -1,4 +1,8 @@
+import asyncio
 import logging
+import os
+import time
+from collections import OrderedDict
 from typing import Any
 
 from aiogram import Bot
@@ -8,6 +12,22 @@ from config import ADMIN_IDS, get_settings
 from utils.telegram import answer_with_thread
 from utils.texts import format_subscription_required_text
 
+# Результат get_chat_member кэшируется по (бот, канал, пользователь): подписка —
+# на SUBSCRIPTION_CACHE_TTL секунд, отсутствие подписки — на короткий
+# SUBSCRIPTION_NEGATIVE_TTL, чтобы «Я подписался» срабатывал почти сразу.
+SUBSCRIPTION_CACHE_TTL = float(os.getenv("SUBSCRIPTION_CACHE_TTL", "300"))
+SUBSCRIPTION_NEGATIVE_TTL = float(os.getenv("SUBSCRIPTION_NEGATIVE_TTL", "5"))
+SUBSCRIPTION_CACHE_SIZE = int(os.getenv("SUBSCRIPTION_CACHE_SIZE", "50000"))
+
+MEMBER_STATUSES = {"member", "administrator", "creator"}
+
+MembershipKey = tuple[int, str | int, int]
+
+_membership_cache: OrderedDict[MembershipKey, tuple[bool, float]] = OrderedDict()
+# Ключи кэша по user_id: forget_membership не перебирает весь кэш.
+_membership_keys_by_user: dict[int, set[MembershipKey]] = {}
+_membership_inflight: dict[MembershipKey, asyncio.Future] = {}
+
 
 def normalize_chat_ref(raw_chat: str) -> str | int | None:
     """Приводит идентификатор канала к @username или числовому chat_id."""
@@ -101,22 +121,101 @@ def get_subscription_keyboard(
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
+def _cached_membership(key: MembershipKey) -> bool | None:
+    cached = _membership_cache.get(key)
+    if cached is None:
+        return None
+    is_member, expires_at = cached
+    if expires_at <= time.monotonic():
+        _drop_membership(key)
+        return None
+    return is_member
+
+
+def _drop_membership(key: MembershipKey) -> None:
+    _membership_cache.pop(key, None)
+    user_keys = _membership_keys_by_user.get(key[2])
+    if user_keys is not None:
+        user_keys.discard(key)
+        if not user_keys:
+            del _membership_keys_by_user[key[2]]
+
+
+def _remember_membership(key: MembershipKey, is_member: bool) -> None:
+    ttl = SUBSCRIPTION_CACHE_TTL if is_member else SUBSCRIPTION_NEGATIVE_TTL
+    if ttl <= 0:
+        return
+    _membership_cache[key] = (is_member, time.monotonic() + ttl)
+    _membership_cache.move_to_end(key)
+    _membership_keys_by_user.setdefault(key[2], set()).add(key)
+    while len(_membership_cache) > SUBSCRIPTION_CACHE_SIZE:
+        _drop_membership(next(iter(_membership_cache)))
+
+
+def forget_membership(user_id: int) -> None:
+    """Сбросить закэшированные проверки пользователя (например, после отписки)."""
+
+    for key in list(_membership_keys_by_user.get(user_id, ())):
+        _drop_membership(key)
+
+
+async def _request_membership(bot: Bot, key: MembershipKey, raw_channel: str) -> bool:
+    _, chat_ref, user_id = key
+    member = await bot.get_chat_member(chat_id=chat_ref, user_id=user_id)
+    status = getattr(member, "status", None)
+    logging.info(
+        "Subscription check: channel=%s raw=%s user_id=%s status=%s",
+        chat_ref,
+        raw_channel,
+        user_id,
+        status,
+    )
+    is_member = status in MEMBER_STATUSES
+    _remember_membership(key, is_member)
+    return is_member
+
+
+async def _is_channel_member(bot: Bot, chat_ref: str | int, user_id: int, raw_channel: str) -> bool:
+    """Подписан ли пользователь на канал; одновременные проверки одного ключа делят один запрос."""
+
+    key: MembershipKey = (bot.id, chat_ref, user_id)
+    cached = _cached_membership(key)
+    if cached is not None:
+        return cached
+
+    future = _membership_inflight.get(key)
+    if future is None:
+        future = asyncio.ensure_future(_request_membership(bot, key, raw_channel))
+        _membership_inflight[key] = future
+        future.add_done_callback(lambda _: _membership_inflight.pop(key, None))
+    # shield: отмена одного ожидающего не должна отменять общий запрос.
+    return await asyncio.shield(future)
+
+
 async def check_channels_subscription(
     bot: Bot, user_id: int, channels: list[str]
 ) -> tuple[bool, str | None]:
     """
     Проверяет подписку пользователя на список каналов.
 
+    Каналы проверяются параллельно, результаты кэшируются (см. SUBSCRIPTION_CACHE_TTL).
     Возвращает (is_ok, error_message). Если error_message не None — проблема на стороне Telegram.
     """
 
-    normalized_channels = [ch.strip() for ch in channels if (ch or "").strip()]
+    normalized_channels = [str(ch).strip() for ch in channels if str(ch or "").strip()]
     if not normalized_channels:
         return True, None
 
-    for raw_channel in normalized_channels:
-        chat_ref = normalize_chat_ref(raw_channel)
+    chat_refs = [normalize_chat_ref(raw_channel) for raw_channel in normalized_channels]
+    checks = [
+        _is_channel_member(bot, chat_ref, user_id, raw_channel)
+        for raw_channel, chat_ref in zip(normalized_channels, chat_refs)
+        if chat_ref is not None
+    ]
+    results = iter(await asyncio.gather(*checks, return_exceptions=True))
 
+    # Итог разбирается в порядке каналов, как при прежней последовательной проверке.
+    for raw_channel, chat_ref in zip(normalized_channels, chat_refs):
         if chat_ref is None:
             logging.warning(
                 "Subscription check: канал не распознан (raw=%s, user_id=%s)",
@@ -125,28 +224,18 @@ async def check_channels_subscription(
             )
             return False, "invalid_channel"
 
-        try:
-            member = await bot.get_chat_member(chat_id=chat_ref, user_id=user_id)
-        except Exception as exc:  # noqa: BLE001
+        result = next(results)
+        if isinstance(result, BaseException):
             logging.warning(
                 "Subscription check: ошибка Telegram (channel=%s raw=%s user_id=%s): %s",
                 chat_ref,
                 raw_channel,
                 user_id,
-                exc,
+                result,
             )
-            return False, str(exc)
-
-        status = getattr(member, "status", None)
-        logging.info(
-            "Subscription check: channel=%s raw=%s user_id=%s status=%s",
-            chat_ref,
-            raw_channel,
-            user_id,
-            status,
-        )
+            return False, str(result)
 
-        if status not in {"member", "administrator", "creator"}:
+        if not result:
             return False, None
 
     return True, None
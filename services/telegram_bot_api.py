@@ -0,0 +1,286 @@
+"""Общий неблокирующий клиент Telegram Bot API для процесса web API.
+
+Все исходящие вызовы бота из API идут через одну aiohttp-сессию (keep-alive),
+которая живёт в отдельном потоке со своим event loop. Поэтому клиентом одинаково
+пользуются и async-эндпоинты (await), и синхронные обработчики из threadpool
+(блокирующие обёртки), а медленный Telegram не занимает event loop uvicorn.
+
+Ограничения:
+- не больше TELEGRAM_API_CONCURRENCY запросов одновременно;
+- в один чат — последовательно и не чаще раза в TELEGRAM_PER_CHAT_INTERVAL секунд;
+- на 429 чат «замораживается» на retry_after, запрос повторяется, пока укладывается
+  в общий дедлайн TELEGRAM_API_DEADLINE.
+
+Состояние чата (lock и время следующей отправки) хранится, только пока оно нужно:
+lock удаляется, когда к чату не осталось запросов, а истёкшие паузы вычищаются
+не реже раза в CHAT_SWEEP_INTERVAL секунд — иначе рассылки по большой базе
+копили бы записи по каждому chat_id.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import logging
+import os
+import threading
+import time
+from typing import Any, Coroutine, Iterable
+
+import aiohttp
+
+from config import get_settings
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_API_BASE = os.getenv("TELEGRAM_API_BASE", "https://api.telegram.org")
+TELEGRAM_API_TIMEOUT = float(os.getenv("TELEGRAM_API_TIMEOUT", "10"))
+TELEGRAM_API_DEADLINE = float(os.getenv("TELEGRAM_API_DEADLINE", "30"))
+TELEGRAM_API_CONCURRENCY = int(os.getenv("TELEGRAM_API_CONCURRENCY", "20"))
+TELEGRAM_PER_CHAT_INTERVAL = float(os.getenv("TELEGRAM_PER_CHAT_INTERVAL", "0.05"))
+CHAT_SWEEP_INTERVAL = 60.0
+
+
+class TelegramBotApi:
+    def __init__(
+        self,
+        token: str | None,
+        *,
+        base_url: str = TELEGRAM_API_BASE,
+        timeout: float = TELEGRAM_API_TIMEOUT,
+        deadline: float = TELEGRAM_API_DEADLINE,
+        concurrency: int = TELEGRAM_API_CONCURRENCY,
+        per_chat_interval: float = TELEGRAM_PER_CHAT_INTERVAL,
+    ) -> None:
+        self.token = token
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.deadline = deadline
+        self.concurrency = concurrency
+        self.per_chat_interval = per_chat_interval
+
+        self._lock = threading.Lock()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._session: aiohttp.ClientSession | None = None
+        self._semaphore: asyncio.Semaphore | None = None
+        self._chat_locks: dict[Any, asyncio.Lock] = {}
+        self._chat_ready_at: dict[Any, float] = {}
+        self._chat_pending: dict[Any, int] = {}
+        self._chats_swept_at = time.monotonic()
+
+    # --- event loop клиента ---
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is not None and self._thread is not None and self._thread.is_alive():
+                return self._loop
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def _run() -> None:
+                asyncio.set_event_loop(loop)
+                loop.call_soon(ready.set)
+                loop.run_forever()
+
+            thread = threading.Thread(target=_run, name="telegram-bot-api", daemon=True)
+            thread.start()
+            ready.wait()
+            self._loop = loop
+            self._thread = thread
+            return loop
+
+    def submit(self, coro: Coroutine[Any, Any, Any]) -> concurrent.futures.Future:
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    def close(self) -> None:
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = None
+            self._thread = None
+        if loop is None:
+            return
+
+        async def _shutdown() -> None:
+            if self._session is not None and not self._session.closed:
+                await self._session.close()
+            self._session = None
+            self._semaphore = None
+            self._chat_locks.clear()
+            self._chat_ready_at.clear()
+            self._chat_pending.clear()
+
+        try:
+            asyncio.run_coroutine_threadsafe(_shutdown(), loop).result(timeout=5)
+        except Exception:
+            logger.exception("Failed to close Telegram Bot API session")
+        loop.call_soon_threadsafe(loop.stop)
+        if thread is not None:
+            thread.join(timeout=5)
+
+    # --- выполняется в потоке клиента ---
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.concurrency, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._session
+
+    def _release_chat(self, chat_id: Any) -> None:
+        pending = self._chat_pending.get(chat_id, 0) - 1
+        if pending > 0:
+            self._chat_pending[chat_id] = pending
+            return
+        self._chat_pending.pop(chat_id, None)
+        self._chat_locks.pop(chat_id, None)
+
+    def _sweep_chats(self) -> None:
+        now = time.monotonic()
+        if now - self._chats_swept_at < CHAT_SWEEP_INTERVAL:
+            return
+        self._chats_swept_at = now
+        expired = [
+            chat_id
+            for chat_id, ready_at in self._chat_ready_at.items()
+            if ready_at <= now and chat_id not in self._chat_pending
+        ]
+        for chat_id in expired:
+            del self._chat_ready_at[chat_id]
+
+    async def _wait_chat_slot(self, chat_id: Any, deadline_at: float) -> bool:
+        delay = self._chat_ready_at.get(chat_id, 0.0) - time.monotonic()
+        if delay <= 0:
+            return True
+        if time.monotonic() + delay > deadline_at:
+            return False
+        await asyncio.sleep(delay)
+        return True
+
+    async def _call(self, method: str, payload: dict[str, Any]) -> dict[str, Any] | None:
+        if not self.token:
+            return None
+        chat_id = payload.get("chat_id")
+        url = f"{self.base_url}/bot{self.token}/{method}"
+        deadline_at = time.monotonic() + self.deadline
+        self._sweep_chats()
+        chat_lock = self._chat_locks.setdefault(chat_id, asyncio.Lock())
+        self._chat_pending[chat_id] = self._chat_pending.get(chat_id, 0) + 1
+        try:
+            async with chat_lock:
+                return await self._send(method, chat_id, url, payload, deadline_at)
+        finally:
+            self._release_chat(chat_id)
+
+    async def _send(
+        self,
+        method: str,
+        chat_id: Any,
+        url: str,
+        payload: dict[str, Any],
+        deadline_at: float,
+    ) -> dict[str, Any] | None:
+        session = self._get_session()
+        while True:
+            if not await self._wait_chat_slot(chat_id, deadline_at):
+                logger.warning("Telegram %s to %s dropped: rate limit exceeds deadline", method, chat_id)
+                return None
+            try:
+                async with self._semaphore:  # type: ignore[union-attr]
+                    async with session.post(url, json=payload) as response:
+                        data = await response.json(content_type=None)
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+                logger.exception("Telegram %s to %s failed", method, chat_id)
+                return None
+            finally:
+                self._chat_ready_at[chat_id] = time.monotonic() + self.per_chat_interval
+
+            if data.get("ok"):
+                return data
+            retry_after = (data.get("parameters") or {}).get("retry_after")
+            if data.get("error_code") == 429 and retry_after:
+                self._chat_ready_at[chat_id] = time.monotonic() + float(retry_after)
+                logger.warning("Telegram %s to %s throttled for %ss", method, chat_id, retry_after)
+                continue
+            logger.warning(
+                "Telegram %s to %s rejected: %s %s",
+                method,
+                chat_id,
+                data.get("error_code"),
+                data.get("description"),
+            )
+            return data
+
+    # --- публичный API ---
+
+    async def call(self, method: str, **payload: Any) -> dict[str, Any] | None:
+        return await asyncio.wrap_future(self.submit(self._call(method, payload)))
+
+    def call_blocking(self, method: str, **payload: Any) -> dict[str, Any] | None:
+        try:
+            return self.submit(self._call(method, payload)).result(timeout=self.deadline + self.timeout)
+        except concurrent.futures.TimeoutError:
+            logger.warning("Telegram %s to %s timed out", method, payload.get("chat_id"))
+            return None
+
+    async def _broadcast(self, chat_ids: list[Any], payload: dict[str, Any]) -> list[dict[str, Any] | None]:
+        return list(
+            await asyncio.gather(
+                *(self._call("sendMessage", {**payload, "chat_id": chat_id}) for chat_id in chat_ids)
+            )
+        )
+
+    async def broadcast(self, chat_ids: Iterable[Any], **payload: Any) -> list[dict[str, Any] | None]:
+        return await asyncio.wrap_future(self.submit(self._broadcast(list(chat_ids), payload)))
+
+    def broadcast_blocking(self, chat_ids: Iterable[Any], **payload: Any) -> list[dict[str, Any] | None]:
+        chat_ids = list(chat_ids)
+        try:
+            return self.submit(self._broadcast(chat_ids, payload)).result(
+                timeout=self.deadline + self.timeout
+            )
+        except concurrent.futures.TimeoutError:
+            logger.warning("Telegram broadcast to %s chats timed out", len(chat_ids))
+            return [None] * len(chat_ids)
+
+
+def build_message_payload(text: str, reply_markup: dict[str, Any] | None = None) -> dict[str, Any]:
+    payload: dict[str, Any] = {"text": text}
+    if reply_markup:
+        payload["reply_markup"] = reply_markup
+    return payload
+
+
+def message_ids(results: Iterable[dict[str, Any] | None]) -> list[int]:
+    ids: list[int] = []
+    for result in results:
+        if not result or not result.get("ok"):
+            continue
+        try:
+            ids.append(int(result["result"]["message_id"]))
+        except (KeyError, TypeError, ValueError):
+            continue
+    return ids
+
+
+_client: TelegramBotApi | None = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> TelegramBotApi:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = TelegramBotApi(get_settings().bot_token)
+    return _client
+
+
+def shutdown() -> None:
+    global _client
+    with _client_lock:
+        client, _client = _client, None
+    if client is not None:
+        client.close()
@@ -0,0 +1,178 @@
+"""Скомпилированный поиск триггеров бота (COMMAND/TEXT/FALLBACK).
+
+Список триггеров из bot_config уже отсортирован: тип (COMMAND → TEXT → FALLBACK),
+затем priority и id. Срабатывает первый подходящий триггер этого списка, поэтому
+каждому триггеру присваивается его номер в списке (rank), и из всех совпадений
+выбирается совпадение с наименьшим rank.
+
+Для каждого типа и режима совпадения строится своя структура:
+- EXACT — словарь значение → rank;
+- STARTS_WITH — префиксное дерево, проход по тексту собирает все префиксы;
+- CONTAINS — автомат Ахо — Корасик, один проход по тексту находит все подстроки.
+FALLBACK срабатывает всегда, поэтому достаточно запомнить первый из них.
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Iterable
+
+if TYPE_CHECKING:  # pragma: no cover - только для аннотаций
+    from services.bot_config import BotTriggerView
+
+_NO_MATCH = -1
+
+
+def _better(current: int, candidate: int) -> int:
+    if candidate == _NO_MATCH:
+        return current
+    if current == _NO_MATCH or candidate < current:
+        return candidate
+    return current
+
+
+class _PrefixTrie:
+    __slots__ = ("_root",)
+
+    def __init__(self) -> None:
+        # Узел: {символ: узел, None: rank шаблона, заканчивающегося здесь}.
+        self._root: dict = {}
+
+    def add(self, value: str, rank: int) -> None:
+        node = self._root
+        for char in value:
+            node = node.setdefault(char, {})
+        node[None] = _better(node.get(None, _NO_MATCH), rank)
+
+    def best(self, text: str) -> int:
+        found = _NO_MATCH
+        node = self._root
+        for char in text:
+            node = node.get(char)
+            if node is None:
+                break
+            found = _better(found, node.get(None, _NO_MATCH))
+        return found
+
+
+class _AhoCorasick:
+    __slots__ = ("_goto", "_fail", "_best")
+
+    def __init__(self, patterns: Iterable[tuple[str, int]]) -> None:
+        goto: list[dict[str, int]] = [{}]
+        best: list[int] = [_NO_MATCH]
+        for value, rank in patterns:
+            state = 0
+            for char in value:
+                next_state = goto[state].get(char)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][char] = next_state
+                    goto.append({})
+                    best.append(_NO_MATCH)
+                state = next_state
+            best[state] = _better(best[state], rank)
+
+        # BFS: суффиксные ссылки и лучший rank среди всех шаблонов, оканчивающихся в узле.
+        fail = [0] * len(goto)
+        queue: deque[int] = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in goto[state].items():
+                link = fail[state]
+                while link and char not in goto[link]:
+                    link = fail[link]
+                candidate = goto[link].get(char, 0)
+                fail[child] = candidate if candidate != child else 0
+                best[child] = _better(best[child], best[fail[child]])
+                queue.append(child)
+
+        self._goto = goto
+        self._fail = fail
+        self._best = best
+
+    def best(self, text: str) -> int:
+        goto, fail, best = self._goto, self._fail, self._best
+        found = _NO_MATCH
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if best[state] != _NO_MATCH:
+                found = _better(found, best[state])
+        return found
+
+
+@dataclass
+class _ModeIndex:
+    exact: dict[str, int] = field(default_factory=dict)
+    prefixes: _PrefixTrie = field(default_factory=_PrefixTrie)
+    contains: list[tuple[str, int]] = field(default_factory=list)
+    automaton: _AhoCorasick | None = None
+
+    def add(self, mode: str, value: str, rank: int) -> None:
+        if mode == "CONTAINS":
+            self.contains.append((value, rank))
+        elif mode == "STARTS_WITH":
+            self.prefixes.add(value, rank)
+        elif value not in self.exact:
+            self.exact[value] = rank
+
+    def freeze(self) -> None:
+        self.automaton = _AhoCorasick(self.contains) if self.contains else None
+        self.contains = []
+
+    def best(self, text: str) -> int:
+        found = self.exact.get(text, _NO_MATCH)
+        found = _better(found, self.prefixes.best(text))
+        if self.automaton is not None:
+            found = _better(found, self.automaton.best(text))
+        return found
+
+
+class TriggerMatcher:
+    """Неизменяемый после сборки индекс триггеров одной версии конфигурации."""
+
+    def __init__(self, triggers: Iterable["BotTriggerView"]) -> None:
+        self._triggers: list["BotTriggerView"] = list(triggers)
+        self._commands = _ModeIndex()
+        self._texts = _ModeIndex()
+        self._fallback = _NO_MATCH
+
+        for rank, trigger in enumerate(self._triggers):
+            trigger_type = (trigger.trigger_type or "").upper()
+            if trigger_type == "FALLBACK":
+                self._fallback = _better(self._fallback, rank)
+                continue
+            if trigger_type not in {"COMMAND", "TEXT"}:
+                continue
+            value = (trigger.trigger_value or "").strip().lower()
+            if not value:
+                continue
+            index = self._commands if trigger_type == "COMMAND" else self._texts
+            index.add((trigger.match_mode or "EXACT").upper(), value, rank)
+
+        self._commands.freeze()
+        self._texts.freeze()
+
+    def __len__(self) -> int:
+        return len(self._triggers)
+
+    def match(self, normalized_text: str, command: str = "") -> "BotTriggerView | None":
+        """Первый по порядку триггер для текста (уже strip().lower()) и команды без «/»."""
+
+        found = _NO_MATCH
+        if command:
+            found = self._commands.best(command)
+        if normalized_text:
+            found = _better(found, self._texts.best(normalized_text))
+        found = _better(found, self._fallback)
+        if found == _NO_MATCH:
+            return None
+        return self._triggers[found]
+
+
+def compile_triggers(triggers: Iterable["BotTriggerView"]) -> TriggerMatcher:
+    return TriggerMatcher(triggers)
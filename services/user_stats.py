@@ -1,66 +1,57 @@
 from __future__ import annotations
 
-from datetime import datetime
+import asyncio
+import logging
+import os
 from typing import Any
 
-from sqlalchemy import func, select
+from sqlalchemy import select
 
-from database import get_session
-from initdb import init_db
-from models import Order
+from database import get_session, run_db
+from initdb import ensure_schema
+from models import UserStats
 from services import orders as orders_service
 from services import stats as stats_service
 
+# Карточка CRM читает только строку user_stats: счётчики поддерживаются дельтами
+# в транзакциях заказов (services.stats.record_user_order*), а фоновая сверка
+# reconcile_user_stats раз в USER_STATS_RECONCILE_INTERVAL секунд исправляет
+# расхождения (ручные правки в БД, падения между процессами).
+USER_STATS_RECONCILE_INTERVAL = float(os.getenv("USER_STATS_RECONCILE_INTERVAL", "3600"))
+
+logger = logging.getLogger(__name__)
+
+_task: asyncio.Task | None = None
+
 
 def get_user_order_stats(user_id: int) -> dict[str, Any]:
-    """Подсчитать статистику по заказам пользователя для CRM."""
+    """Статистика по заказам пользователя для CRM из предрассчитанной строки user_stats."""
 
     result: dict[str, Any] = {
         "user_id": user_id,
         "total_orders": 0,
         "total_amount": 0,
-        "orders_by_status": {
-            orders_service.STATUS_NEW: 0,
-            orders_service.STATUS_IN_PROGRESS: 0,
-            orders_service.STATUS_PAID: 0,
-            orders_service.STATUS_SENT: 0,
-            orders_service.STATUS_ARCHIVED: 0,
-        },
+        "orders_by_status": {status: 0 for status in stats_service.USER_STATUS_COLUMNS},
         "last_order_id": None,
         "last_order_created_at": None,
+        "orders_count": 0,
+        "total_spent": 0,
+        "last_order_at": None,
     }
 
-    init_db()
+    ensure_schema()
     with get_session() as session:
-        count_row = session.execute(
-            select(
-                func.count(Order.id),
-                func.coalesce(func.sum(Order.total_amount), 0),
-            ).where(Order.user_id == user_id)
-        ).first()
-        if count_row:
-            result["total_orders"] = int(count_row[0] or 0)
-            result["total_amount"] = int(count_row[1] or 0)
-
-        status_rows = session.execute(
-            select(Order.status, func.count(Order.id)).where(Order.user_id == user_id).group_by(Order.status)
-        ).all()
-        for status, cnt in status_rows:
-            if status in result["orders_by_status"]:
-                result["orders_by_status"][status] = int(cnt or 0)
-
-        last_order = session.scalar(
-            select(Order).where(Order.user_id == user_id).order_by(Order.created_at.desc(), Order.id.desc()).limit(1)
-        )
-        if last_order:
-            result["last_order_id"] = int(last_order.id)
-            if isinstance(last_order.created_at, datetime):
-                result["last_order_created_at"] = last_order.created_at.isoformat()
-
-    stats_summary = stats_service.get_user_stats(user_id)
-    result["orders_count"] = stats_summary.get("orders_count", result["total_orders"])
-    result["total_spent"] = stats_summary.get("total_spent", result["total_amount"])
-    result["last_order_at"] = stats_summary.get("last_order_at")
+        stats = session.scalar(select(UserStats).where(UserStats.user_id == user_id))
+        if stats is None:
+            return result
+
+        result["total_orders"] = result["orders_count"] = int(stats.orders_count or 0)
+        result["total_amount"] = result["total_spent"] = int(stats.total_spent or 0)
+        for status, column in stats_service.USER_STATUS_COLUMNS.items():
+            result["orders_by_status"][status] = int(getattr(stats, column) or 0)
+        result["last_order_id"] = stats.last_order_id
+        if stats.last_order_at:
+            result["last_order_created_at"] = result["last_order_at"] = stats.last_order_at.isoformat()
 
     return result
 
@@ -73,3 +64,34 @@ def get_user_courses_summary(user_id: int) -> dict[str, Any]:
         "count": len(courses),
         "courses": courses,
     }
+
+
+async def _reconcile_loop(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            repaired = await run_db(stats_service.reconcile_user_stats)
+            if repaired:
+                logger.warning("user_stats reconciliation repaired %s rows", repaired)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("user_stats reconciliation failed")
+
+
+def start_worker(interval: float = USER_STATS_RECONCILE_INTERVAL) -> None:
+    """Запустить периодическую сверку user_stats как asyncio-задачу (вызывается на startup)."""
+
+    global _task
+    if _task is not None or interval <= 0:
+        return
+    _task = asyncio.get_running_loop().create_task(_reconcile_loop(interval), name="user-stats-reconcile")
+
+
+async def stop_worker() -> None:
+    global _task
+    task, _task = _task, None
+    if task is None:
+        return
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
@@ -1,5 +1,9 @@
 from __future__ import annotations
 
+import os
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
 from typing import Any
 
@@ -10,10 +14,20 @@ from sqlalchemy.orm import Session
 
 from config import ADMIN_IDS_SET
 from database import get_session
-from initdb import init_db
+from initdb import ensure_schema
 from models import User
+from services import stats as stats_service
 from utils.phone import normalize_phone
 
+USER_PROFILE_CACHE_SIZE = int(os.getenv("USER_PROFILE_CACHE_SIZE", "10000"))
+USER_PROFILE_CACHE_TTL = float(os.getenv("USER_PROFILE_CACHE_TTL", "3600"))
+
+TelegramProfile = tuple[int, str | None, str | None, str | None]
+
+# telegram_id -> (профиль, который уже записан в users, момент истечения)
+_profile_cache: OrderedDict[int, tuple[TelegramProfile, float]] = OrderedDict()
+_profile_cache_lock = threading.Lock()
+
 
 def _extract_phone(data: dict[str, Any] | None) -> str | None:
     if not data:
@@ -73,6 +87,7 @@ def _get_or_create_user(
         )
         session.add(user)
         session.flush()
+        stats_service.bump_counter(session, stats_service.COUNTER_USERS, 1)
     session.refresh(user)
     return user
 
@@ -95,8 +110,14 @@ def _merge_users(session: Session, target: User, source: User) -> User:
         target.phone = source.phone
     target.is_admin = target.is_admin or source.is_admin
 
+    # Строка source удаляется, а её telegram_id переходит к target: закэшированный
+    # профиль больше не соответствует users.
+    for telegram_id in (source.telegram_id, target.telegram_id):
+        if telegram_id is not None:
+            forget_telegram_profile(int(telegram_id))
     session.delete(source)
     session.flush()
+    stats_service.bump_counter(session, stats_service.COUNTER_USERS, -1)
     session.refresh(target)
     return target
 
@@ -118,6 +139,8 @@ def get_or_create_user_by_phone(session: Session, phone: str) -> User:
         user = session.scalar(select(User).where(User.phone == normalized_phone))
         if not user:
             raise
+    else:
+        stats_service.bump_counter(session, stats_service.COUNTER_USERS, 1)
     session.refresh(user)
     return user
 
@@ -142,6 +165,9 @@ def attach_telegram_id(
             raise HTTPException(status_code=409, detail="telegram_id_conflict")
         user = _merge_users(session, target=user, source=other)
 
+    if user.telegram_id is not None and int(user.telegram_id) != telegram_id:
+        forget_telegram_profile(int(user.telegram_id))
+    forget_telegram_profile(telegram_id)
     user.telegram_id = telegram_id
     user.username = username or user.username
     user.first_name = first_name or user.first_name
@@ -183,7 +209,7 @@ def get_or_create_user_from_telegram(
     last_name = data.get("last_name")
     phone = _extract_phone(data)
 
-    init_db()
+    ensure_schema()
     with get_session() as session:
         return _get_or_create_user(
             session,
@@ -195,8 +221,61 @@ def get_or_create_user_from_telegram(
         )
 
 
+def telegram_profile(data: dict[str, Any]) -> TelegramProfile:
+    return (
+        int(data["id"]),
+        data.get("username"),
+        data.get("first_name"),
+        data.get("last_name"),
+    )
+
+
+def get_cached_telegram_profile(telegram_id: int) -> TelegramProfile | None:
+    """Профиль, с которым пользователь уже сохранён в БД этим процессом (LRU + TTL)."""
+
+    with _profile_cache_lock:
+        cached = _profile_cache.get(telegram_id)
+        if cached is None:
+            return None
+        profile, expires_at = cached
+        if expires_at <= time.monotonic():
+            del _profile_cache[telegram_id]
+            return None
+        _profile_cache.move_to_end(telegram_id)
+        return profile
+
+
+def _remember_telegram_profile(profile: TelegramProfile) -> None:
+    with _profile_cache_lock:
+        _profile_cache[profile[0]] = (profile, time.monotonic() + USER_PROFILE_CACHE_TTL)
+        _profile_cache.move_to_end(profile[0])
+        while len(_profile_cache) > USER_PROFILE_CACHE_SIZE:
+            _profile_cache.popitem(last=False)
+
+
+def forget_telegram_profile(telegram_id: int) -> None:
+    with _profile_cache_lock:
+        _profile_cache.pop(telegram_id, None)
+
+
+def ensure_user_from_telegram(data: dict[str, Any], *, force: bool = False) -> bool:
+    """Upsert пользователя Telegram, только если его профиль изменился.
+
+    force=True пишет в БД без оглядки на кэш (например, на /start: пользователя
+    могли удалить или слить в другом процессе). Возвращает True, если пришлось
+    обратиться к БД.
+    """
+
+    profile = telegram_profile(data)
+    if not force and get_cached_telegram_profile(profile[0]) == profile and not _extract_phone(data):
+        return False
+    get_or_create_user_from_telegram(data)
+    _remember_telegram_profile(profile)
+    return True
+
+
 def update_user_contact(telegram_id: int, phone: str | None) -> User:
-    init_db()
+    ensure_schema()
     with get_session() as session:
         user = session.scalar(select(User).where(User.telegram_id == telegram_id))
         if not user:
@@ -210,13 +289,13 @@ def update_user_contact(telegram_id: int, phone: str | None) -> User:
 
 
 def get_user_by_telegram_id(telegram_id: int) -> User | None:
-    init_db()
+    ensure_schema()
     with get_session() as session:
         return session.scalar(select(User).where(User.telegram_id == telegram_id))
 
 
 def get_user_by_phone(phone: str) -> User | None:
-    init_db()
+    ensure_schema()
     normalized_phone = normalize_phone(phone)
     with get_session() as session:
         return session.scalar(select(User).where(User.phone == normalized_phone))
@@ -0,0 +1,164 @@
+"""Push-доставка сообщений веб-чата: in-process pub/sub и рассылка между воркерами через NOTIFY.
+
+События — только «в сессии N появилось сообщение M». Сами сообщения подписчик
+дочитывает через webchat_service.get_messages(after_id=...), поэтому пропущенное
+или задублированное событие ничего не ломает.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import select
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from sqlalchemy import text
+
+from database import get_engine
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = "webchat_events"
+SUBSCRIBER_QUEUE_SIZE = 64
+LISTENER_RECONNECT_DELAY = float(os.getenv("WEBCHAT_LISTENER_RECONNECT_DELAY", "5"))
+
+# Метка процесса: свои NOTIFY уже доставлены локально, их слушатель пропускает.
+_ORIGIN = uuid.uuid4().hex
+
+_lock = threading.Lock()
+_subscribers: dict[int, set[tuple[asyncio.AbstractEventLoop, asyncio.Queue[int]]]] = defaultdict(set)
+_listener_started = False
+
+
+def _put(queue: asyncio.Queue[int], message_id: int) -> None:
+    try:
+        queue.put_nowait(message_id)
+    except asyncio.QueueFull:
+        # Подписчик всё равно дочитает всё по after_id на следующем событии.
+        pass
+
+
+def _deliver(chat_session_id: int, message_id: int) -> None:
+    with _lock:
+        targets = list(_subscribers.get(chat_session_id, ()))
+    for loop, queue in targets:
+        try:
+            loop.call_soon_threadsafe(_put, queue, message_id)
+        except RuntimeError:
+            # Цикл событий уже закрыт — подписка уйдёт при выходе из subscribe().
+            continue
+
+
+def notify_in_transaction(db, chat_session_id: int, message_id: int) -> None:
+    """Поставить NOTIFY в текущую транзакцию: другие воркеры получат его только после COMMIT."""
+
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    payload = json.dumps({"s": int(chat_session_id), "m": int(message_id), "o": _ORIGIN})
+    db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": NOTIFY_CHANNEL, "payload": payload})
+
+
+def publish(chat_session_id: int, message_id: int) -> None:
+    """Разбудить подписчиков этого процесса. Можно вызывать из любого потока."""
+
+    _deliver(int(chat_session_id), int(message_id))
+
+
+def subscriber_count(chat_session_id: int | None = None) -> int:
+    with _lock:
+        if chat_session_id is not None:
+            return len(_subscribers.get(int(chat_session_id), ()))
+        return sum(len(items) for items in _subscribers.values())
+
+
+@asynccontextmanager
+async def subscribe(chat_session_id: int) -> AsyncIterator[asyncio.Queue[int]]:
+    _ensure_listener()
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue[int] = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+    entry = (loop, queue)
+    key = int(chat_session_id)
+    with _lock:
+        _subscribers[key].add(entry)
+    try:
+        yield queue
+    finally:
+        with _lock:
+            entries = _subscribers.get(key)
+            if entries is not None:
+                entries.discard(entry)
+                if not entries:
+                    _subscribers.pop(key, None)
+
+
+async def wait_for_message(queue: asyncio.Queue[int], timeout: float) -> int | None:
+    try:
+        return await asyncio.wait_for(queue.get(), timeout=timeout)
+    except asyncio.TimeoutError:
+        return None
+
+
+def _handle_notification(raw_payload: str) -> None:
+    try:
+        payload = json.loads(raw_payload)
+        chat_session_id = int(payload["s"])
+        message_id = int(payload["m"])
+    except (TypeError, ValueError, KeyError):
+        logger.warning("webchat: malformed notification payload %r", raw_payload)
+        return
+    if payload.get("o") == _ORIGIN:
+        return
+    _deliver(chat_session_id, message_id)
+
+
+def _listen_forever() -> None:
+    while True:
+        connection = None
+        try:
+            fairy = get_engine().raw_connection()
+            # Отдельное соединение под LISTEN не должно занимать слот пула.
+            fairy.detach()
+            connection = fairy.driver_connection
+            connection.rollback()
+            connection.autocommit = True
+            with connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+            logger.info("webchat: listening for %s notifications", NOTIFY_CHANNEL)
+            while True:
+                readable, _, _ = select.select([connection], [], [], 30)
+                if not readable:
+                    continue
+                connection.poll()
+                while connection.notifies:
+                    notification = connection.notifies.pop(0)
+                    _handle_notification(notification.payload)
+        except Exception:
+            logger.exception("webchat: notification listener failed, reconnecting")
+        finally:
+            if connection is not None:
+                try:
+                    connection.close()
+                except Exception:
+                    pass
+        time.sleep(LISTENER_RECONNECT_DELAY)
+
+
+def _ensure_listener() -> None:
+    global _listener_started
+    if _listener_started:
+        return
+    with _lock:
+        if _listener_started:
+            return
+        _listener_started = True
+    # Без Postgres (sqlite в тестах) доставка работает только внутри процесса.
+    if get_engine().dialect.name != "postgresql":
+        return
+    threading.Thread(target=_listen_forever, name="webchat-listener", daemon=True).start()
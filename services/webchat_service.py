@@ -7,6 +7,7 @@ from sqlalchemy import or_, select
 
 from database import get_session
 from models import WebChatMessage, WebChatSession
+from services import webchat_events
 
 
 def _refresh_session(db_session, chat_session: WebChatSession) -> WebChatSession:
@@ -125,7 +126,10 @@ def _add_message(chat_session: WebChatSession, sender: str, text: str) -> WebCha
         _refresh_session(db, session_obj)
         db.flush()
         db.refresh(message)
-        return message
+        webchat_events.notify_in_transaction(db, session_obj.id, message.id)
+
+    webchat_events.publish(message.session_id, message.id)
+    return message
 
 
 def add_user_message(session: WebChatSession, text: str) -> WebChatMessage:
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Callable, Iterable
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
+
+
+@dataclass
+class SqliteDb:
+    engine: Engine
+    session: Callable[..., Any]
+    statements: list[str] = field(default_factory=list)
+
+
+@pytest.fixture()
+def sqlite_db(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    """Фабрика SQLite-базы в tmp_path, подменяющая get_session в модулях сервисов.
+
+    tables — DDL-строки или модели/таблицы SQLAlchemy. get_session заменяется
+    контекстным менеджером с commit/rollback/close, как в database.get_session.
+    """
+
+    engines: list[Engine] = []
+
+    def _create(modules: ModuleType | Iterable[ModuleType], tables: Iterable[Any]) -> SqliteDb:
+        engine = create_engine(f"sqlite+pysqlite:///{tmp_path / f'db{len(engines)}.sqlite3'}", future=True)
+        engines.append(engine)
+        with engine.begin() as conn:
+            for table in tables:
+                if isinstance(table, str):
+                    conn.exec_driver_sql(table)
+                else:
+                    getattr(table, "__table__", table).create(conn)
+        factory = sessionmaker(bind=engine, expire_on_commit=False, future=True)
+
+        @contextmanager
+        def _session(role=None):
+            session = factory()
+            try:
+                yield session
+                session.commit()
+            except Exception:
+                session.rollback()
+                raise
+            finally:
+                session.close()
+
+        db = SqliteDb(engine=engine, session=_session)
+        event.listen(engine, "before_cursor_execute", lambda conn, cursor, sql, *args: db.statements.append(sql))
+        for module in [modules] if isinstance(modules, ModuleType) else modules:
+            monkeypatch.setattr(module, "get_session", _session)
+        return db
+
+    try:
+        yield _create
+    finally:
+        for engine in engines:
+            engine.dispose()
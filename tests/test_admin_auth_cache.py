@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import os
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from pathlib import Path
+import sys
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+os.environ.setdefault("BOT_TOKEN", "test-bot-token")
+
+from models.admin_user import (
+    AdminPermission,
+    AdminRoleModel,
+    AdminRolePermission,
+    AdminSession,
+    AdminUser,
+    AdminUserRole,
+)
+from services import auth as auth_service
+
+
+@pytest.fixture()
+def admin_db(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    engine = create_engine(f"sqlite+pysqlite:///{tmp_path / 'admins.sqlite3'}", future=True)
+    for model in (AdminUser, AdminSession, AdminRoleModel, AdminPermission, AdminUserRole, AdminRolePermission):
+        model.__table__.create(engine)
+    statements: list[str] = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, sql, *args: statements.append(sql))
+    monkeypatch.setattr(auth_service, "_principals", OrderedDict())
+
+    factory = sessionmaker(bind=engine, expire_on_commit=False, future=True)
+    db = factory()
+    editor = AdminRoleModel(code="admin_bot", title="Бот")
+    viewer = AdminRoleModel(code="viewer", title="Просмотр")
+    editor.permissions = [
+        AdminPermission(code="nodes.edit", title="Узлы"),
+        AdminPermission(code="templates.apply", title="Шаблоны"),
+    ]
+    db.add_all([editor, viewer])
+    # Второй админ с той же ролью не должен попадать в принципал.
+    for username in ("anna", "boris"):
+        user = AdminUser(username=username, password_hash="x", role="admin_bot", is_active=True)
+        user.roles = [editor, viewer] if username == "anna" else [editor]
+        db.add(user)
+    db.add(AdminUser(username="legacy", password_hash="x", role="admin_site", is_active=True))
+    db.commit()
+    try:
+        yield db, statements
+    finally:
+        db.close()
+        engine.dispose()
+
+
+def _user(db, username: str) -> AdminUser:
+    return db.query(AdminUser).filter(AdminUser.username == username).one()
+
+
+def test_principal_is_loaded_with_one_query_and_served_from_cache(admin_db) -> None:
+    db, statements = admin_db
+    token = auth_service.create_session(db, _user(db, "anna")).token
+    legacy_token = auth_service.create_session(db, _user(db, "legacy")).token
+    db.expunge_all()
+
+    statements.clear()
+    principal = auth_service.get_principal(db, token)
+    assert len(statements) == 1
+    assert principal.username == "anna"
+    assert principal.role_codes() == ["admin_bot", "viewer"]
+    assert principal.has_permission("templates.apply") and not principal.has_permission("admins.manage")
+
+    assert auth_service.get_principal(db, token) is principal
+    assert len(statements) == 1
+
+    # Без связей в admin_user_roles используется старое поле role.
+    assert auth_service.get_principal(db, legacy_token).roles == ("admin_site",)
+
+
+def test_cached_principal_is_invalidated_by_logout_and_session_reset(admin_db, monkeypatch: pytest.MonkeyPatch) -> None:
+    db, _ = admin_db
+    anna = _user(db, "anna")
+    first = auth_service.create_session(db, anna).token
+    second = auth_service.create_session(db, anna).token
+    assert auth_service.get_principal(db, first) and auth_service.get_principal(db, second)
+
+    auth_service.remove_session(db, first)
+    assert auth_service.get_principal(db, first) is None
+
+    auth_service.invalidate_user_sessions(db, anna.id)
+    assert auth_service.get_principal(db, second) is None
+
+    # Изменение в обход forget_principals (другой процесс) становится видно после TTL.
+    third = auth_service.create_session(db, anna).token
+    assert auth_service.get_principal(db, third).is_active is True
+    anna.is_active = False
+    db.commit()
+    assert auth_service.get_principal(db, third) is not None
+    monkeypatch.setattr(auth_service, "ADMIN_SESSION_CACHE_TTL", 0)
+    assert auth_service.get_principal(db, third) is None
+
+    # Истёкшая сессия удаляется.
+    boris = _user(db, "boris")
+    expired = AdminSession(user_id=boris.id, token="expired", expires_at=datetime.utcnow() - timedelta(minutes=1))
+    db.add(expired)
+    db.commit()
+    assert auth_service.get_principal(db, "expired") is None
+    assert db.query(AdminSession).filter(AdminSession.token == "expired").count() == 0
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import asyncio
+import importlib
+import inspect
+import os
+import threading
+from pathlib import Path
+import sys
+
+import pytest
+from fastapi import APIRouter, Depends, FastAPI
+from fastapi.routing import APIRoute
+from starlette.datastructures import FormData
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+os.environ.setdefault("BOT_TOKEN", "test-bot-token")
+
+from admin_panel import dependencies
+from admin_panel.executor import AdminRoute
+
+ADMIN_ROUTER_MODULES = (
+    "admin_panel.adminsite.router",
+    "admin_panel.routes.adminbot",
+    "admin_panel.routes.adminbot_admins",
+    "admin_panel.routes.adminbot_automations",
+    "admin_panel.routes.adminbot_buttons",
+    "admin_panel.routes.adminbot_funnel",
+    "admin_panel.routes.adminbot_logs",
+    "admin_panel.routes.adminbot_media",
+    "admin_panel.routes.adminbot_menu_buttons",
+    "admin_panel.routes.adminbot_nodes",
+    "admin_panel.routes.adminbot_runtime",
+    "admin_panel.routes.adminbot_templates",
+    "admin_panel.routes.adminbot_triggers",
+    "admin_panel.routes.adminsite",
+    "admin_panel.routes.auth",
+    "admin_panel.routes.users",
+)
+
+
+async def _call(app: FastAPI, method: str, path: str, body: bytes = b"") -> tuple[int, bytes]:
+    status: int | None = None
+    response_body = bytearray()
+    sent = False
+
+    async def receive() -> dict[str, object]:
+        nonlocal sent
+        if sent:
+            await asyncio.sleep(3600)
+        sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message: dict[str, object]) -> None:
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = int(message["status"])
+        elif message["type"] == "http.response.body":
+            response_body.extend(message.get("body", b""))
+
+    headers = [(b"content-type", b"application/x-www-form-urlencoded")] if body else []
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "method": method,
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": headers,
+        "client": ("testclient", 50000),
+        "server": ("testserver", 80),
+        "scheme": "http",
+    }
+    await app(scope, receive, send)
+    return status or 500, bytes(response_body)
+
+
+def test_admin_route_runs_sync_handler_off_the_event_loop() -> None:
+    public_served = threading.Event()
+    seen: dict[str, object] = {}
+
+    app = FastAPI()
+
+    @app.get("/api/public/menu")
+    async def public_menu() -> dict:
+        public_served.set()
+        return {"items": []}
+
+    router = APIRouter(route_class=AdminRoute)
+
+    @router.post("/adminbot/templates/{code}/apply")
+    def apply_template(code: str, form: FormData = Depends(dependencies.get_request_form)) -> dict:
+        # Пока обработчик админки занят, event loop продолжает отвечать публичным клиентам.
+        seen["public_served"] = public_served.wait(timeout=5)
+        seen["thread"] = threading.current_thread().name
+        return {"code": code, "replace": form.getlist("replace_items")}
+
+    app.include_router(router)
+
+    async def _main() -> list[tuple[int, bytes]]:
+        admin = asyncio.create_task(
+            _call(app, "POST", "/adminbot/templates/shop/apply", b"replace_items=node%3Astart&replace_items=node%3Amenu")
+        )
+        await asyncio.sleep(0.05)
+        public = await _call(app, "GET", "/api/public/menu")
+        return [public, await admin]
+
+    public, admin = asyncio.run(_main())
+    assert public[0] == 200
+    assert admin == (200, b'{"code":"shop","replace":["node:start","node:menu"]}')
+    assert seen["public_served"] is True
+    assert str(seen["thread"]).startswith("admin")
+
+
+def test_admin_handlers_are_sync_and_use_admin_pool(monkeypatch: pytest.MonkeyPatch) -> None:
+    for module_name in ADMIN_ROUTER_MODULES:
+        router = importlib.import_module(module_name).router
+        routes = [route for route in router.routes if isinstance(route, APIRoute)]
+        assert routes, module_name
+        for route in routes:
+            assert isinstance(route, AdminRoute), f"{module_name}: {route.path}"
+            # async def с синхронной Session внутри снова заблокировал бы event loop.
+            assert not inspect.iscoroutinefunction(inspect.unwrap(route.endpoint)), f"{module_name}: {route.path}"
+
+    import database
+
+    roles: list[str | None] = []
+    monkeypatch.setattr(database, "get_sessionmaker", lambda role=None: roles.append(role) or (lambda: _Closable()))
+    generator = dependencies.get_db_session()
+    next(generator)
+    generator.close()
+    assert roles == ["admin"]
+
+
+class _Closable:
+    def close(self) -> None:
+        pass
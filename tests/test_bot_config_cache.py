@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+import sys
+import threading
+import time
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+os.environ.setdefault("BOT_TOKEN", "test-bot-token")
+
+from services import bot_config
+
+
+@pytest.fixture()
+def bot_config_db(sqlite_db, monkeypatch: pytest.MonkeyPatch):
+    db = sqlite_db(
+        bot_config,
+        [
+            """
+            CREATE TABLE bot_runtime (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                config_version INTEGER NOT NULL DEFAULT 1,
+                start_node_code VARCHAR(64),
+                updated_at DATETIME
+            )
+            """,
+        ],
+    )
+    with db.engine.begin() as conn:
+        conn.execute(text("INSERT INTO bot_runtime (config_version, start_node_code) VALUES (3, 'MAIN_MENU')"))
+    builds: list[int] = []
+
+    def _build(session, version, start_node_code):
+        builds.append(version)
+        time.sleep(0.05)
+        node = bot_config.NodeView(
+            code="MAIN_MENU", title=f"v{version}", message_text="", parse_mode="HTML", image_url=None,
+            keyboard=None, reply_buttons=[], node_type="MESSAGE", input_type=None, input_var_key=None,
+            input_required=False, input_min_len=None, input_error_text=None, next_node_code_success=None,
+            next_node_code_cancel=None, cond_var_key=None, cond_operator=None, cond_value=None,
+            next_node_code_true=None, next_node_code_false=None, next_node_code=None, actions=[],
+            condition_type=None, condition_payload=None, config_json=None, clear_chat=False,
+        )
+        return bot_config.BotConfigSnapshot(
+            version=version, start_node_code=start_node_code, nodes={"MAIN_MENU": node}
+        )
+
+    monkeypatch.setattr(bot_config, "_build_snapshot", _build)
+    monkeypatch.setattr(bot_config, "_snapshot", None)
+    monkeypatch.setattr(bot_config, "_ensure_refresher", lambda: None)
+    db.statements.clear()
+    return db.engine, db.statements, builds
+
+
+def test_concurrent_first_lookups_build_one_snapshot_then_skip_db(bot_config_db) -> None:
+    _, queries, builds = bot_config_db
+
+    threads = [threading.Thread(target=bot_config.load_node, args=("MAIN_MENU",)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert builds == [3]
+
+    queries.clear()
+    for _ in range(5):
+        assert bot_config.load_node("MAIN_MENU").title == "v3"
+        assert bot_config.get_start_node_code() == "MAIN_MENU"
+        bot_config.load_triggers()
+        bot_config.load_menu_buttons()
+    assert queries == []
+
+
+def test_refresh_swaps_snapshot_after_version_bump(bot_config_db) -> None:
+    engine, _, builds = bot_config_db
+
+    before = bot_config.get_config_snapshot()
+    assert bot_config.refresh_config() is before
+
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE bot_runtime SET config_version = 4"))
+    bot_config.refresh_config()
+
+    assert builds == [3, 4]
+    assert before.nodes["MAIN_MENU"].title == "v3"
+    assert bot_config.load_node("MAIN_MENU").title == "v4"
+    assert bot_config.get_cached_config_version() == 4
+
+
+def test_admin_commit_wakes_refresher_only_after_commit(bot_config_db, monkeypatch: pytest.MonkeyPatch) -> None:
+    engine, _, _ = bot_config_db
+    wakeup = threading.Event()
+    monkeypatch.setattr(bot_config, "_refresh_wakeup", wakeup)
+
+    with sessionmaker(bind=engine, future=True)() as db:
+        db.execute(text("UPDATE bot_runtime SET config_version = 5"))
+        bot_config.invalidate_config_cache_on_commit(db)
+        db.flush()
+        # До commit поток прочитал бы прежнюю версию.
+        assert not wakeup.is_set()
+        db.commit()
+        assert wakeup.is_set()
+
+        wakeup.clear()
+        db.commit()
+        assert not wakeup.is_set()
@@ -62,6 +62,18 @@ def db_session(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Session:
                 """
             )
         )
+        connection.execute(
+            text(
+                """
+                CREATE TABLE IF NOT EXISTS stats_counters (
+                    name VARCHAR(64) NOT NULL,
+                    shard SMALLINT NOT NULL DEFAULT 0,
+                    value NUMERIC(16, 2) NOT NULL DEFAULT 0,
+                    PRIMARY KEY (name, shard)
+                )
+                """
+            )
+        )
         connection.execute(
             text(
                 """
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+import sys
+
+import pytest
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+os.environ.setdefault("BOT_TOKEN", "test-bot-token")
+
+from models import (
+    BotFunnelNode,
+    BotFunnelNodeUser,
+    BotFunnelPosition,
+    BotFunnelState,
+    BotFunnelTransition,
+    BotLog,
+)
+from services import bot_funnel
+
+STARTED = datetime(2026, 5, 1, 10)
+NOW = STARTED + timedelta(hours=1)
+
+
+@pytest.fixture()
+def funnel_db(sqlite_db):
+    db = sqlite_db(
+        bot_funnel,
+        [
+            BotLog,
+            BotFunnelState,
+            BotFunnelNode,
+            BotFunnelNodeUser,
+            BotFunnelTransition,
+            BotFunnelPosition,
+            # bot_nodes содержит JSONB, поэтому в SQLite создаём только нужные колонки.
+            "CREATE TABLE bot_nodes (id INTEGER PRIMARY KEY, code VARCHAR, title TEXT)",
+        ],
+    )
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO bot_nodes (code, title) VALUES ('MAIN_MENU', 'Меню'), ('CATALOG', 'Каталог'), "
+            "('ORDER', 'Заказ'), ('UNUSED', 'Не используется')"
+        )
+    return db.session
+
+
+def _log(session_factory, events: list[tuple[int, str, str]]) -> None:
+    with session_factory() as session:
+        next_id = session.query(BotLog).count() + 1
+        for offset, (user_id, event_type, node_code) in enumerate(events):
+            session.add(
+                BotLog(
+                    id=next_id + offset,
+                    created_at=STARTED + timedelta(seconds=next_id + offset),
+                    user_id=user_id,
+                    event_type=event_type,
+                    node_code=node_code,
+                    config_version=1,
+                )
+            )
+
+
+def _nodes(funnel: dict) -> dict[str, dict]:
+    return {node["code"]: node for node in funnel["nodes"]}
+
+
+def test_funnel_counts_visits_uniques_dropoff_and_transitions(funnel_db) -> None:
+    _log(
+        funnel_db,
+        [
+            (1, "TRIGGER", "MAIN_MENU"),
+            (1, "NODE_ENTER", "MAIN_MENU"),
+            (2, "NODE_ENTER", "MAIN_MENU"),
+            (1, "NODE_ENTER", "CATALOG"),
+            (1, "ACTION", "CATALOG"),
+            (1, "NODE_ENTER", "ORDER"),
+            (2, "NODE_ENTER", "CATALOG"),
+            (2, "NODE_ENTER", "MAIN_MENU"),
+            (2, "ERROR", "MAIN_MENU"),
+        ],
+    )
+
+    assert bot_funnel.process_pending(limit=4, now=NOW) == 8
+
+    with funnel_db() as session:
+        funnel = bot_funnel.get_funnel(session)
+    nodes = _nodes(funnel)
+    assert nodes["MAIN_MENU"]["visits"] == 3
+    assert nodes["MAIN_MENU"]["unique_users"] == 2
+    assert nodes["MAIN_MENU"]["triggers"] == 1
+    assert nodes["MAIN_MENU"]["exits"] == 2
+    assert nodes["MAIN_MENU"]["dropoff"] == 1
+    assert nodes["CATALOG"]["actions"] == 1
+    assert nodes["CATALOG"]["dropoff"] == 0
+    assert nodes["ORDER"]["dropoff_rate"] == 1.0
+    # Узел графа без событий всё равно попадает в воронку с нулевыми счётчиками.
+    assert nodes["UNUSED"]["exists"] is True
+    assert nodes["UNUSED"]["title"] == "Не используется"
+    assert all(nodes["UNUSED"][name] == 0 for name in bot_funnel.NODE_COUNTERS)
+    assert nodes["UNUSED"]["last_event_at"] is None
+    assert {(item["from"], item["to"]): item["count"] for item in funnel["transitions"]} == {
+        ("MAIN_MENU", "CATALOG"): 2,
+        ("CATALOG", "ORDER"): 1,
+        ("CATALOG", "MAIN_MENU"): 1,
+    }
+    assert funnel["processed_events"] == 8
+
+
+def test_funnel_resumes_from_watermark_and_skips_recent_events(funnel_db) -> None:
+    _log(funnel_db, [(1, "NODE_ENTER", "MAIN_MENU")])
+    assert bot_funnel.process_pending(now=NOW) == 1
+
+    _log(funnel_db, [(1, "NODE_ENTER", "CATALOG")])
+    # Событие моложе BOT_FUNNEL_SAFETY_LAG ещё может быть не последним записанным — ждём.
+    assert bot_funnel.process_pending(now=STARTED) == 0
+    assert bot_funnel.process_pending(now=NOW) == 1
+    assert bot_funnel.process_pending(now=NOW) == 0
+
+    with funnel_db() as session:
+        nodes = _nodes(bot_funnel.get_funnel(session))
+    assert nodes["MAIN_MENU"]["visits"] == 1
+    assert nodes["MAIN_MENU"]["dropoff"] == 0
+    assert nodes["CATALOG"]["dropoff"] == 1
+
+    bot_funnel.reset()
+    assert bot_funnel.process_pending(now=NOW) == 2
+    with funnel_db() as session:
+        assert _nodes(bot_funnel.get_funnel(session))["CATALOG"]["unique_users"] == 1
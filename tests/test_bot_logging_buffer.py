@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+import sys
+
+import pytest
+from sqlalchemy import select
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+os.environ.setdefault("BOT_TOKEN", "test-bot-token")
+
+from models import BotLog
+from services import bot_config, bot_logging
+
+
+@pytest.fixture()
+def bot_logs_db(sqlite_db, monkeypatch: pytest.MonkeyPatch):
+    db = sqlite_db(
+        bot_logging,
+        [
+            """
+            CREATE TABLE bot_logs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created_at DATETIME NOT NULL,
+                user_id BIGINT NOT NULL,
+                username VARCHAR(64),
+                event_type VARCHAR(32) NOT NULL,
+                node_code VARCHAR(64),
+                details TEXT,
+                config_version INTEGER NOT NULL DEFAULT 1
+            )
+            """,
+        ],
+    )
+    monkeypatch.setattr(bot_logging, "_ensure_flusher", lambda: None)
+    monkeypatch.setattr(bot_logging, "_buffer", type(bot_logging._buffer)())
+    monkeypatch.setattr(bot_logging, "_stats", {"written": 0, "dropped": 0, "failed_batches": 0})
+    monkeypatch.setattr(bot_config, "_snapshot", bot_config.BotConfigSnapshot(version=7, start_node_code=None))
+    db.statements.clear()
+    return db.session, db.statements
+
+
+def test_events_are_buffered_and_flushed_in_one_batch(bot_logs_db) -> None:
+    session_factory, queries = bot_logs_db
+
+    for index in range(5):
+        bot_logging.log_node_event(user_id=100 + index, username="u", node_code="MAIN_MENU")
+    assert queries == []
+
+    assert bot_logging.flush() == 5
+    inserts = [query for query in queries if query.lstrip().upper().startswith("INSERT")]
+    assert len(inserts) == 1
+    assert not any("bot_runtime" in query for query in queries)
+
+    with session_factory() as session:
+        rows = session.execute(select(BotLog).order_by(BotLog.id)).scalars().all()
+    assert [row.user_id for row in rows] == [100, 101, 102, 103, 104]
+    assert {row.config_version for row in rows} == {7}
+    assert bot_logging.get_buffer_stats()["written"] == 5
+
+
+def test_full_buffer_drops_new_events_and_counts_them(bot_logs_db, monkeypatch) -> None:
+    monkeypatch.setattr(bot_logging, "BOT_LOG_BUFFER_SIZE", 3)
+
+    for index in range(5):
+        bot_logging.log_error_event(user_id=1, username=None, node_code=None, details={"n": index})
+
+    stats = bot_logging.get_buffer_stats()
+    assert stats["buffered"] == 3
+    assert stats["dropped"] == 2
+    assert bot_logging.flush() == 3
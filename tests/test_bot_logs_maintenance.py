@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+import sys
+
+import pytest
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+os.environ.setdefault("BOT_TOKEN", "test-bot-token")
+
+from models import BotLog, BotLogHourly
+from services import bot_logs, bot_logs_maintenance
+
+
+@pytest.fixture()
+def logs_db(sqlite_db, monkeypatch: pytest.MonkeyPatch):
+    db = sqlite_db(bot_logs_maintenance, [BotLog, BotLogHourly])
+    monkeypatch.setattr(bot_logs_maintenance, "get_engine", lambda role=None: db.engine)
+    return db.session
+
+
+def _add_logs(session_factory, start_id: int, events: list[tuple[datetime, str, str | None]]) -> None:
+    with session_factory() as session:
+        for offset, (created_at, event_type, node_code) in enumerate(events):
+            session.add(
+                BotLog(
+                    id=start_id + offset,
+                    created_at=created_at,
+                    user_id=1,
+                    event_type=event_type,
+                    node_code=node_code,
+                    config_version=3,
+                )
+            )
+
+
+def test_rollup_counts_per_hour_and_recounts_late_events(logs_db) -> None:
+    hour = datetime(2026, 3, 10, 12)
+    _add_logs(
+        logs_db,
+        1,
+        [
+            (hour + timedelta(minutes=1), "NODE_ENTER", "MAIN_MENU"),
+            (hour + timedelta(minutes=2), "NODE_ENTER", "MAIN_MENU"),
+            (hour + timedelta(minutes=3), "BUTTON_CLICK", None),
+            (hour + timedelta(hours=1, minutes=5), "NODE_ENTER", "MAIN_MENU"),
+        ],
+    )
+    now = hour + timedelta(hours=1, minutes=30)
+    assert bot_logs_maintenance.rollup(now=now) == 3
+
+    # Событие из буфера дописалось в уже посчитанный час — повторный прогон его учитывает.
+    _add_logs(logs_db, 10, [(hour + timedelta(minutes=50), "NODE_ENTER", "MAIN_MENU")])
+    bot_logs_maintenance.rollup(now=now)
+
+    with logs_db() as session:
+        summary = bot_logs.fetch_hourly_summary(
+            session, since=hour, group_by=("event_type", "node_code"), by_hour=True
+        )
+        totals = bot_logs.fetch_hourly_summary(session, since=hour)
+
+    assert summary == [
+        {"hour": hour, "event_type": "BUTTON_CLICK", "node_code": "", "events": 1},
+        {"hour": hour, "event_type": "NODE_ENTER", "node_code": "MAIN_MENU", "events": 3},
+        {"hour": hour + timedelta(hours=1), "event_type": "NODE_ENTER", "node_code": "MAIN_MENU", "events": 1},
+    ]
+    assert totals == [
+        {"event_type": "BUTTON_CLICK", "events": 1},
+        {"event_type": "NODE_ENTER", "events": 4},
+    ]
+
+
+def test_partition_bounds_and_retention_without_partitions(logs_db) -> None:
+    assert bot_logs_maintenance.partition_name(datetime(2026, 12, 31, 23)) == "bot_logs_p202612"
+    assert bot_logs_maintenance.add_months(datetime(2026, 11, 1), 3) == datetime(2027, 2, 1)
+    assert bot_logs_maintenance.add_months(datetime(2026, 1, 1), -1) == datetime(2025, 12, 1)
+    assert bot_logs_maintenance.create_partition_sql(datetime(2026, 12, 15)) == (
+        "CREATE TABLE IF NOT EXISTS bot_logs_p202612 PARTITION OF bot_logs "
+        "FOR VALUES FROM ('2026-12-01 00:00:00') TO ('2027-01-01 00:00:00')"
+    )
+
+    # Без секционирования (SQLite, таблица до миграции) обслуживание ничего не удаляет.
+    _add_logs(logs_db, 1, [(datetime(2020, 1, 1), "NODE_ENTER", "OLD")])
+    result = bot_logs_maintenance.run_maintenance(now=datetime(2026, 3, 1))
+    assert result == {"created": [], "rolled_up": 1, "dropped": []}
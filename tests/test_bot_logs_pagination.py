@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+import sys
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+os.environ.setdefault("BOT_TOKEN", "test-bot-token")
+
+from models import BotLog
+from services import bot_logs
+
+
+@pytest.fixture()
+def logs_session(tmp_path: Path):
+    engine = create_engine(f"sqlite+pysqlite:///{tmp_path / 'bot_logs.sqlite3'}", future=True)
+    BotLog.__table__.create(engine)
+    factory = sessionmaker(bind=engine, expire_on_commit=False, future=True)
+    started = datetime(2026, 1, 1)
+    with factory() as session:
+        for index in range(125):
+            session.add(
+                BotLog(
+                    id=index + 1,
+                    # По три события на одну секунду: порядок внутри секунды задаёт id.
+                    created_at=started + timedelta(seconds=index // 3),
+                    user_id=1 + index % 2,
+                    username="anna" if index % 2 else "boris",
+                    event_type="NODE_ENTER",
+                    node_code=f"NODE_{index % 5}",
+                    config_version=1,
+                )
+            )
+        session.commit()
+    with factory() as session:
+        yield session
+    engine.dispose()
+
+
+def test_keyset_pages_cover_every_row_once_in_both_directions(logs_session) -> None:
+    pages = []
+    cursor = None
+    while True:
+        page = bot_logs.fetch_logs(logs_session, after=cursor, per_page=20, count_mode="none")
+        pages.append([row.id for row in page.rows])
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+
+    seen = [row_id for page_ids in pages for row_id in page_ids]
+    assert seen == list(range(125, 0, -1))
+    assert [len(page_ids) for page_ids in pages] == [20] * 6 + [5]
+
+    last_cursor = bot_logs.encode_cursor(logs_session.get(BotLog, pages[-2][-1]))
+    last = bot_logs.fetch_logs(logs_session, after=last_cursor, per_page=20)
+    back = bot_logs.fetch_logs(logs_session, before=last.prev_cursor, per_page=20)
+    assert [row.id for row in back.rows] == pages[-2]
+    assert back.next_cursor is not None
+
+
+def test_filters_and_exact_count_without_postgres(logs_session) -> None:
+    page = bot_logs.fetch_logs(logs_session, per_page=10, username="ANN", node_code="node_1")
+
+    assert page.total == 13
+    assert page.total_is_estimate is False
+    assert all(row.username == "anna" and row.node_code == "NODE_1" for row in page.rows)
+    assert page.prev_cursor is None
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from pathlib import Path
+import sys
+
+from aiogram.types import Update
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+os.environ.setdefault("BOT_TOKEN", "test-bot-token")
+
+import bot_webhook
+
+
+def _update(update_id: int, chat_id: int) -> Update:
+    return Update.model_validate(
+        {
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "date": 0,
+                "chat": {"id": chat_id, "type": "private"},
+                "from": {"id": chat_id, "is_bot": False, "first_name": "u"},
+                "text": f"msg {update_id}",
+            },
+        }
+    )
+
+
+def test_updates_keep_per_chat_order_and_run_chats_in_parallel() -> None:
+    handled: dict[int, list[int]] = {}
+    active: list[int] = []
+    peak = 0
+
+    async def _feed(update: Update) -> None:
+        nonlocal peak
+        chat_id = bot_webhook.shard_key(update)
+        active.append(chat_id)
+        peak = max(peak, len(active))
+        await asyncio.sleep(0.01)
+        handled.setdefault(chat_id, []).append(update.update_id)
+        active.remove(chat_id)
+
+    async def _main() -> dict:
+        pool = bot_webhook.UpdateWorkerPool(_feed, workers=4, queue_size=100)
+        pool.start()
+        for update_id in range(40):
+            assert await pool.submit(_update(update_id, chat_id=100 + update_id % 4))
+        await pool.stop()
+        return pool.metrics()
+
+    metrics = asyncio.run(_main())
+
+    assert handled == {100 + chat: list(range(chat, 40, 4)) for chat in range(4)}
+    assert peak == 4
+    assert metrics["processed"] == 40
+    assert metrics["queue_depth"] == 0
+    assert metrics["handler_ms"]["p95"] >= 10
+
+
+def test_full_queue_rejects_update() -> None:
+    release = asyncio.Event()
+
+    async def _feed(update: Update) -> None:
+        await release.wait()
+
+    async def _main() -> tuple[list[bool], dict]:
+        pool = bot_webhook.UpdateWorkerPool(_feed, workers=1, queue_size=2, enqueue_timeout=0.05)
+        pool.start()
+        accepted = []
+        for update_id in range(4):
+            accepted.append(await pool.submit(_update(update_id, chat_id=1)))
+            await asyncio.sleep(0)
+        metrics = pool.metrics()
+        release.set()
+        await pool.stop()
+        return accepted, metrics
+
+    accepted, metrics = asyncio.run(_main())
+
+    assert accepted == [True, True, True, False]
+    assert metrics["rejected"] == 1
+    assert metrics["queue_depth"] == 2
+
+
+def test_invalid_update_is_acknowledged_and_metrics_need_secret() -> None:
+    from starlette.requests import Request
+
+    class _Pool:
+        submitted: list[Update] = []
+
+        async def submit(self, update: Update) -> bool:
+            self.submitted.append(update)
+            return True
+
+    service = bot_webhook.BotWebhookService(path="/hook", secret="")
+    service.pool = _Pool()
+    service.bot = object()
+    routes = {(route.path, tuple(sorted(route.methods))): route.endpoint for route in service.router.routes}
+    assert ("/hook/metrics", ("GET",)) not in routes
+
+    def _request(body: bytes) -> Request:
+        async def _receive():
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        return Request({"type": "http", "method": "POST", "path": "/hook", "headers": []}, _receive)
+
+    endpoint = routes[("/hook", ("POST",))]
+    assert asyncio.run(endpoint(_request(b'{"update_id": "x"}'))) == {"ok": True}
+    assert asyncio.run(endpoint(_request(b"not json"))) == {"ok": True}
+    assert service.pool.submitted == []
+
+    secured = bot_webhook.BotWebhookService(path="/hook", secret="s")
+    assert "/hook/metrics" in {route.path for route in secured.router.routes}
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+import sys
+
+import pytest
+from sqlalchemy import text
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+os.environ.setdefault("BOT_TOKEN", "test-bot-token")
+
+from services import cart as cart_service
+from services import menu_catalog
+
+
+@pytest.fixture()
+def cart_db(sqlite_db, monkeypatch: pytest.MonkeyPatch):
+    db = sqlite_db(
+        (cart_service, menu_catalog),
+        [
+            """
+            CREATE TABLE menu_categories (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title TEXT NOT NULL,
+                slug VARCHAR(150) NOT NULL,
+                type VARCHAR(32) NOT NULL DEFAULT 'product',
+                parent_id INTEGER,
+                description TEXT,
+                image_url TEXT,
+                order_index INTEGER NOT NULL DEFAULT 0,
+                is_active BOOLEAN NOT NULL DEFAULT 1,
+                created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            """
+            CREATE TABLE menu_items (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                category_id INTEGER NOT NULL,
+                title TEXT NOT NULL,
+                subtitle TEXT,
+                slug VARCHAR(150) NOT NULL,
+                description TEXT,
+                price NUMERIC(12, 2),
+                currency VARCHAR(8),
+                images TEXT NOT NULL DEFAULT '[]',
+                image_url TEXT,
+                legacy_link TEXT,
+                order_index INTEGER NOT NULL DEFAULT 0,
+                is_active BOOLEAN NOT NULL DEFAULT 1,
+                stock_qty INTEGER,
+                type VARCHAR(32) NOT NULL DEFAULT 'product',
+                meta TEXT NOT NULL DEFAULT '{}',
+                created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            """
+            CREATE TABLE cart_items (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id BIGINT,
+                session_id VARCHAR(64),
+                product_id INTEGER NOT NULL,
+                type VARCHAR NOT NULL,
+                qty INTEGER NOT NULL DEFAULT 1
+            )
+            """,
+        ],
+    )
+    with db.engine.begin() as conn:
+        conn.execute(text("INSERT INTO menu_categories (id, title, slug) VALUES (1, 'Корзинки', 'korzinki')"))
+        for item_id in range(1, 21):
+            conn.execute(
+                text(
+                    "INSERT INTO menu_items (id, category_id, title, slug, price, type) "
+                    "VALUES (:id, 1, :title, :slug, 100, 'product')"
+                ),
+                {"id": item_id, "title": f"Item {item_id}", "slug": f"item-{item_id}"},
+            )
+        for item_id in range(1, 21):
+            conn.execute(
+                text("INSERT INTO cart_items (user_id, product_id, type, qty) VALUES (7, :pid, 'basket', 2)"),
+                {"pid": item_id},
+            )
+        conn.execute(text("INSERT INTO cart_items (user_id, product_id, type, qty) VALUES (7, 999, 'basket', 1)"))
+        conn.execute(text("INSERT INTO cart_items (user_id, product_id, type, qty) VALUES (7, 5, 'course', 1)"))
+
+    monkeypatch.setattr(cart_service, "ensure_schema", lambda: None)
+    db.statements.clear()
+    return db.engine, db.statements
+
+
+def test_get_items_by_ids_returns_dict_in_one_query(cart_db) -> None:
+    _, statements = cart_db
+
+    products = menu_catalog.get_items_by_ids([1, 2, 3, 404], {"product"})
+
+    assert set(products) == {1, 2, 3}
+    assert products[2]["title"] == "Item 2"
+    assert len([sql for sql in statements if "FROM menu_items" in sql]) == 1
+
+
+def test_get_cart_items_resolves_products_in_batch_and_drops_stale_rows(cart_db) -> None:
+    engine, statements = cart_db
+
+    items, removed = cart_service.get_cart_items(7)
+
+    assert len(items) == 20
+    assert {item["product_id"] for item in items} == set(range(1, 21))
+    assert sorted(removed) == [5, 999]
+    assert len([sql for sql in statements if "FROM menu_items" in sql]) == 1
+    assert len([sql for sql in statements if sql.startswith("DELETE FROM cart_items")]) == 1
+
+    with engine.connect() as conn:
+        remaining = conn.execute(text("SELECT COUNT(*) FROM cart_items")).scalar()
+    assert remaining == 20
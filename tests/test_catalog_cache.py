@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+import sys
+
+import pytest
+from fastapi import Request
+from sqlalchemy import text
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+os.environ.setdefault("BOT_TOKEN", "test-bot-token")
+
+from services import menu_catalog
+from utils import http_cache
+
+
+@pytest.fixture()
+def catalog_db(sqlite_db, monkeypatch: pytest.MonkeyPatch):
+    db = sqlite_db(
+        menu_catalog,
+        [
+            """
+            CREATE TABLE menu_categories (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title TEXT NOT NULL,
+                slug VARCHAR(150) NOT NULL,
+                type VARCHAR(32) NOT NULL DEFAULT 'product',
+                parent_id INTEGER,
+                description TEXT,
+                image_url TEXT,
+                order_index INTEGER NOT NULL DEFAULT 0,
+                is_active BOOLEAN NOT NULL DEFAULT 1,
+                created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            """
+            CREATE TABLE menu_items (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                category_id INTEGER NOT NULL,
+                title TEXT NOT NULL,
+                subtitle TEXT,
+                slug VARCHAR(150) NOT NULL,
+                description TEXT,
+                price NUMERIC(12, 2),
+                currency VARCHAR(8),
+                images TEXT NOT NULL DEFAULT '[]',
+                image_url TEXT,
+                legacy_link TEXT,
+                order_index INTEGER NOT NULL DEFAULT 0,
+                is_active BOOLEAN NOT NULL DEFAULT 1,
+                stock_qty INTEGER,
+                type VARCHAR(32) NOT NULL DEFAULT 'product',
+                meta TEXT NOT NULL DEFAULT '{}',
+                created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            """
+            CREATE TABLE catalog_version (
+                id INTEGER PRIMARY KEY,
+                version BIGINT NOT NULL DEFAULT 1,
+                updated_at DATETIME NOT NULL
+            )
+            """,
+        ],
+    )
+    with db.engine.begin() as conn:
+        conn.execute(text("INSERT INTO menu_categories (id, title, slug) VALUES (1, 'Корзинки', 'korzinki')"))
+        for item_id in (1, 2):
+            conn.execute(
+                text(
+                    "INSERT INTO menu_items (id, category_id, title, slug, price, order_index) "
+                    "VALUES (:id, 1, :title, :slug, 100, :id)"
+                ),
+                {"id": item_id, "title": f"Item {item_id}", "slug": f"item-{item_id}"},
+            )
+
+    monkeypatch.setattr(menu_catalog, "CATALOG_VERSION_CHECK_INTERVAL", 60.0)
+    menu_catalog.invalidate_catalog_cache()
+    db.statements.clear()
+    try:
+        yield db.engine, db.statements
+    finally:
+        menu_catalog.invalidate_catalog_cache()
+
+
+def _titles(body: bytes) -> list[str]:
+    return [item["title"] for item in json.loads(body)["categories"][0]["items"]]
+
+
+def test_menu_snapshot_is_served_without_sql(catalog_db) -> None:
+    _, statements = catalog_db
+
+    first = menu_catalog.get_catalog_snapshot("menu", "product")
+    statements.clear()
+    second = menu_catalog.get_catalog_snapshot("menu", "product")
+
+    assert second is first
+    assert statements == []
+    assert _titles(first.body) == ["Item 1", "Item 2"]
+
+
+def test_admin_mutation_bumps_version_and_refreshes_snapshot(catalog_db) -> None:
+    engine, _ = catalog_db
+
+    before = menu_catalog.get_catalog_snapshot("menu")
+    menu_catalog.reorder_entities({"items": [{"id": 1, "order_index": 10}]})
+    after = menu_catalog.get_catalog_snapshot("menu")
+
+    assert after.version == before.version + 1
+    assert _titles(after.body) == ["Item 2", "Item 1"]
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT version FROM catalog_version")).scalar() == after.version
+
+
+def test_version_row_is_created_by_first_bump_and_incremented_after(catalog_db) -> None:
+    engine, _ = catalog_db
+
+    for _ in range(2):
+        with menu_catalog.get_session() as session:
+            menu_catalog._bump_catalog_version(session)
+
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT id, version FROM catalog_version")).all() == [(1, 3)]
+
+
+def test_version_bumped_by_another_worker_is_picked_up(catalog_db, monkeypatch: pytest.MonkeyPatch) -> None:
+    engine, _ = catalog_db
+
+    before = menu_catalog.get_catalog_snapshot("menu")
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO catalog_version (id, version, updated_at) VALUES (1, 5, CURRENT_TIMESTAMP)"))
+        conn.execute(text("UPDATE menu_items SET title = 'Renamed' WHERE id = 2"))
+
+    assert menu_catalog.get_catalog_snapshot("menu") is before
+
+    monkeypatch.setattr(menu_catalog, "CATALOG_VERSION_CHECK_INTERVAL", 0.0)
+    after = menu_catalog.get_catalog_snapshot("menu")
+    assert after.version == 5
+    assert _titles(after.body) == ["Item 1", "Renamed"]
+
+
+def test_unknown_category_type_is_rejected(catalog_db) -> None:
+    with pytest.raises(ValueError):
+        menu_catalog.get_catalog_snapshot("menu", "unknown")
+
+
+def _request(headers: dict[str, str]) -> Request:
+    raw = [(key.lower().encode(), value.encode()) for key, value in headers.items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw})
+
+
+def test_conditional_response_returns_304_for_matching_etag(catalog_db) -> None:
+    snapshot = menu_catalog.get_catalog_snapshot("menu")
+
+    fresh = http_cache.conditional_json_response(_request({}), snapshot.body, etag=snapshot.etag)
+    assert fresh.status_code == 200
+    assert fresh.headers["etag"] == snapshot.etag
+    assert "max-age" in fresh.headers["cache-control"]
+
+    cached = http_cache.conditional_json_response(
+        _request({"If-None-Match": f'"stale", W/{snapshot.etag}'}),
+        snapshot.body,
+        etag=snapshot.etag,
+    )
+    assert cached.status_code == 304
+    assert cached.body == b""
+
+
+def test_if_modified_since_is_ignored_when_if_none_match_present() -> None:
+    last_modified = datetime(2024, 5, 1, 12, 0, 0)
+    since = http_cache.format_http_date(last_modified)
+
+    assert http_cache.is_not_modified(_request({"If-Modified-Since": since}), '"a"', last_modified)
+    assert not http_cache.is_not_modified(
+        _request({"If-Modified-Since": since, "If-None-Match": '"b"'}), '"a"', last_modified
+    )
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+import sys
+
+import pytest
+from sqlalchemy import event, func, select
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+os.environ.setdefault("BOT_TOKEN", "test-bot-token")
+
+from models import (
+    CheckoutOrder,
+    Order,
+    OrderItem,
+    OrderStatsDaily,
+    ProductSalesStats,
+    StatsCounter,
+    User,
+    UserStats,
+)
+from services import checkout as checkout_service
+from services import menu_catalog
+from services import stats as stats_service
+from services import users as users_service
+
+CATALOG = {
+    1: {"id": 1, "title": "Корзинка", "price": 100, "type": "product"},
+    2: {"id": 2, "title": "Шкатулка", "price": 250, "type": "product"},
+}
+
+
+@pytest.fixture()
+def checkout_db(sqlite_db, monkeypatch: pytest.MonkeyPatch):
+    db = sqlite_db(
+        checkout_service,
+        [
+            User,
+            Order,
+            OrderItem,
+            UserStats,
+            OrderStatsDaily,
+            ProductSalesStats,
+            StatsCounter,
+            # checkout_orders содержит JSONB, поэтому в SQLite создаём таблицу вручную.
+            "CREATE TABLE checkout_orders (id INTEGER PRIMARY KEY, tg_user_id BIGINT NOT NULL, status VARCHAR NOT NULL, "
+            "items_json JSON NOT NULL, totals_json JSON NOT NULL, client_context_json JSON, created_at DATETIME NOT NULL)",
+        ],
+    )
+    commits: list[int] = []
+    event.listen(db.engine, "commit", lambda conn: commits.append(1))
+
+    monkeypatch.setattr(users_service, "ensure_schema", lambda: None)
+    lookups: list[list[int]] = []
+
+    def _items_by_ids(item_ids, types=None, *, include_inactive=False):
+        lookups.append(sorted(int(item_id) for item_id in item_ids))
+        return {int(i): CATALOG[int(i)] for i in item_ids if int(i) in CATALOG}
+
+    monkeypatch.setattr(menu_catalog, "get_items_by_ids", _items_by_ids)
+    monkeypatch.setattr(menu_catalog, "get_item_by_id", lambda item_id, **kwargs: pytest.fail("per-line catalog lookup"))
+    # Старый путь пересчитывал user_stats во второй сессии — теперь он не должен вызываться.
+    monkeypatch.setattr(stats_service, "recalc_user_stats", lambda user_id: pytest.fail("recalc_user_stats called"))
+    return db.session, commits, lookups
+
+
+def _cart(*lines: tuple[int, int]) -> tuple[list[dict], dict]:
+    items = [
+        {"item_id": item_id, "title": CATALOG[item_id]["title"], "qty": qty, "price": CATALOG[item_id]["price"], "type": "product"}
+        for item_id, qty in lines
+    ]
+    return items, {"qty_total": sum(qty for _, qty in lines), "sum_total": sum(CATALOG[i]["price"] * q for i, q in lines)}
+
+
+def test_checkout_writes_user_orders_items_and_stats_in_one_commit(checkout_db) -> None:
+    session_factory, commits, lookups = checkout_db
+    outbox: list[int] = []
+
+    items, totals = _cart((1, 2), (2, 1))
+    commits.clear()
+    first = checkout_service.place_checkout(
+        telegram_id=501,
+        username="anna",
+        full_name="Анна Петрова",
+        items=items,
+        totals=totals,
+        after_insert=lambda session, order_id: outbox.append(order_id),
+    )
+    assert len(commits) == 1
+    # Все строки корзины разрешаются одним запросом к каталогу.
+    assert lookups == [[1, 2]]
+
+    items, totals = _cart((2, 2))
+    second = checkout_service.place_checkout(telegram_id=501, username="anna", full_name=None, items=items, totals=totals)
+
+    assert outbox == [first.order_id]
+    with session_factory() as session:
+        user = session.scalar(select(User).where(User.telegram_id == 501))
+        assert (user.first_name, user.last_name) == ("Анна", "Петрова")
+        stats = session.scalar(select(UserStats).where(UserStats.user_id == 501))
+        assert (stats.orders_count, stats.total_spent) == (2, 950)
+        assert stats.last_order_at == session.get(Order, second.order_id).created_at
+        assert session.get(Order, first.order_id).customer_name == "Анна"
+        assert session.scalar(select(func.count(OrderItem.id)).where(OrderItem.order_id == first.order_id)) == 2
+        assert session.scalar(select(func.count()).select_from(CheckoutOrder)) == 2
+        assert stats_service.get_counters(session)[stats_service.COUNTER_ORDERS] == 2
+
+
+def test_failed_checkout_rolls_back_every_record(checkout_db) -> None:
+    session_factory, _, _ = checkout_db
+
+    def _outbox_down(session, order_id: int) -> None:
+        raise RuntimeError("outbox unavailable")
+
+    items, totals = _cart((1, 1))
+    with pytest.raises(RuntimeError):
+        checkout_service.place_checkout(
+            telegram_id=502, username=None, full_name="Борис", items=items, totals=totals, after_insert=_outbox_down
+        )
+
+    with session_factory() as session:
+        for model in (User, Order, OrderItem, UserStats, CheckoutOrder, ProductSalesStats):
+            assert session.scalar(select(func.count()).select_from(model)) == 0, model.__tablename__
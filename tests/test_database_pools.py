@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+import sys
+import threading
+
+import pytest
+from sqlalchemy import text
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+import database
+
+
+def test_load_pool_settings_prefers_role_specific_env(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("DB_POOL_SIZE", "7")
+    monkeypatch.setenv("DB_BOT_POOL_SIZE", "3")
+    monkeypatch.setenv("DB_POOL_PRE_PING", "0")
+    monkeypatch.setenv("DB_JOBS_POOL_TIMEOUT", "not-a-number")
+
+    bot = database.load_pool_settings("bot")
+    api = database.load_pool_settings("api")
+    jobs = database.load_pool_settings("jobs")
+
+    assert bot.pool_size == 3
+    assert api.pool_size == 7
+    assert api.pool_pre_ping is False
+    assert jobs.pool_timeout == database._POOL_DEFAULTS["jobs"].pool_timeout
+
+
+def test_pool_stats_report_checkouts_and_overflow(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("DB_JOBS_POOL_SIZE", "1")
+    monkeypatch.setenv("DB_JOBS_MAX_OVERFLOW", "1")
+    engine = database.create_role_engine("jobs", f"sqlite+pysqlite:///{tmp_path / 'pool.sqlite3'}")
+    monkeypatch.setattr(database, "_engines", {"jobs": engine})
+
+    try:
+        with engine.connect() as first, engine.connect() as second:
+            first.execute(text("SELECT 1"))
+            second.execute(text("SELECT 1"))
+            stats = database.get_pool_stats()["jobs"]
+            assert stats["checked_out"] == 2
+            assert stats["overflow"] == 1
+
+        stats = database.get_pool_stats()["jobs"]
+        assert stats["checked_out"] == 0
+        assert stats["checkouts_total"] >= 2
+        assert stats["timeouts_total"] == 0
+    finally:
+        engine.dispose()
+
+
+def test_run_db_executes_outside_event_loop_thread() -> None:
+    loop_thread = threading.get_ident()
+
+    async def _main() -> int:
+        return await database.run_db(threading.get_ident)
+
+    assert asyncio.run(_main()) != loop_thread
@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from datetime import timedelta
+from pathlib import Path
+import sys
+
+import pytest
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.fsm.storage.base import StorageKey
+from sqlalchemy import text
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+os.environ.setdefault("BOT_TOKEN", "test-bot-token")
+
+from models import UserState
+from services import fsm_storage
+
+
+class _Checkout(StatesGroup):
+    waiting_for_name = State()
+
+
+KEY = StorageKey(bot_id=1, chat_id=500, user_id=500)
+
+
+@pytest.fixture()
+def fsm_db(sqlite_db):
+    db = sqlite_db(
+        fsm_storage,
+        [
+            """
+            CREATE TABLE user_state (
+                user_id BIGINT PRIMARY KEY,
+                current_node_code VARCHAR,
+                waiting_node_code VARCHAR,
+                waiting_input_type VARCHAR,
+                waiting_var_key VARCHAR,
+                next_node_code_success VARCHAR,
+                next_node_code_cancel VARCHAR,
+                bot_message_ids TEXT,
+                fsm TEXT,
+                fsm_expires_at DATETIME,
+                updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+        ],
+    )
+    with db.engine.begin() as conn:
+        conn.execute(text("INSERT INTO user_state (user_id, current_node_code) VALUES (500, 'MAIN_MENU')"))
+    return db.session
+
+
+def test_state_is_written_behind_and_shared_between_workers(fsm_db) -> None:
+    async def _main():
+        worker_a = fsm_storage.PostgresStorage(flush_interval=60)
+        worker_b = fsm_storage.PostgresStorage(flush_interval=60)
+
+        await worker_a.set_state(KEY, _Checkout.waiting_for_name)
+        await worker_a.update_data(KEY, {"customer_name": "Анна"})
+        seen_before_flush = await worker_b.get_state(KEY)
+        local_read = await worker_a.get_data(KEY)
+
+        await worker_a.close()
+        shared = (await worker_b.get_state(KEY), await worker_b.get_data(KEY))
+
+        await worker_b.set_state(KEY, None)
+        await worker_b.set_data(KEY, {})
+        await worker_b.close()
+        return seen_before_flush, local_read, shared
+
+    seen_before_flush, local_read, shared = asyncio.run(_main())
+
+    assert seen_before_flush is None
+    assert local_read == {"customer_name": "Анна"}
+    assert shared == ("_Checkout:waiting_for_name", {"customer_name": "Анна"})
+    with fsm_db() as session:
+        row = session.get(UserState, 500)
+        assert row.current_node_code == "MAIN_MENU"
+        assert row.fsm is None
+        assert row.fsm_expires_at is None
+
+
+def test_expired_state_reads_as_empty_and_is_purged(fsm_db) -> None:
+    async def _main():
+        storage = fsm_storage.PostgresStorage(state_ttl=0.05, flush_interval=60)
+        await storage.set_state(KEY, _Checkout.waiting_for_name)
+        await storage.close()
+        await asyncio.sleep(0.1)
+        return await storage.get_state(KEY)
+
+    assert asyncio.run(_main()) is None
+    assert fsm_storage.purge_expired() == 1
+    with fsm_db() as session:
+        assert session.get(UserState, 500).fsm is None
+
+
+def test_concurrent_workers_keep_each_others_fields_and_write_through_is_visible(fsm_db) -> None:
+    async def _main():
+        worker_a = fsm_storage.PostgresStorage(flush_interval=60)
+        worker_b = fsm_storage.PostgresStorage(flush_interval=60)
+
+        # Оба процесса прочитали запись до того, как другой её сбросил.
+        await worker_a.set_state(KEY, _Checkout.waiting_for_name)
+        await worker_b.set_data(KEY, {"phone": "+79990000000"})
+        await worker_a.close()
+        await worker_b.close()
+        merged = (await worker_a.get_state(KEY), await worker_a.get_data(KEY))
+
+        writer = fsm_storage.PostgresStorage(flush_interval=0)
+        reader = fsm_storage.PostgresStorage(flush_interval=60)
+        await writer.update_data(KEY, {"customer_name": "Анна"})
+        visible = await reader.get_data(KEY)
+        await writer.close()
+        return merged, visible
+
+    merged, visible = asyncio.run(_main())
+
+    assert merged == ("_Checkout:waiting_for_name", {"phone": "+79990000000"})
+    assert visible == {"phone": "+79990000000", "customer_name": "Анна"}
+    with fsm_db() as session:
+        [record] = session.get(UserState, 500).fsm.values()
+        assert record["version"] == 3
+
+
+def test_redis_storage_uses_configured_url_and_ttl(monkeypatch: pytest.MonkeyPatch) -> None:
+    fakeredis = pytest.importorskip("fakeredis")
+    from aiogram.fsm.storage.redis import RedisStorage
+
+    server = fakeredis.FakeServer()
+    urls: list[str] = []
+
+    def _from_url(cls, url, connection_kwargs=None, **kwargs):
+        urls.append(url)
+        return cls(redis=fakeredis.aioredis.FakeRedis(server=server), **kwargs)
+
+    monkeypatch.setattr(RedisStorage, "from_url", classmethod(_from_url))
+    monkeypatch.setattr(fsm_storage, "FSM_REDIS_URL", "redis://fsm-host:6380/2")
+    monkeypatch.setattr(fsm_storage, "FSM_STATE_TTL", 3600)
+
+    async def _main():
+        writer = fsm_storage.make_fsm_storage("redis")
+        reader = fsm_storage.make_fsm_storage("redis")
+        await writer.set_state(KEY, _Checkout.waiting_for_name)
+        await writer.set_data(KEY, {"customer_name": "Анна"})
+        result = (await reader.get_state(KEY), await reader.get_data(KEY))
+        state_key = writer.key_builder.build(KEY, "state")
+        ttl = await writer.redis.ttl(state_key)
+        await writer.close()
+        await reader.close()
+        return writer, result, state_key, ttl
+
+    storage, result, state_key, ttl = asyncio.run(_main())
+
+    assert isinstance(storage, RedisStorage)
+    assert urls == ["redis://fsm-host:6380/2"] * 2
+    assert storage.state_ttl == storage.data_ttl == timedelta(hours=1)
+    assert 0 < ttl <= 3600
+    assert str(KEY.bot_id) in state_key
+    assert result == ("_Checkout:waiting_for_name", {"customer_name": "Анна"})
+
+
+def test_redis_storage_without_package_raises(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setitem(sys.modules, "aiogram.fsm.storage.redis", None)
+
+    with pytest.raises(RuntimeError, match="FSM_STORAGE=redis"):
+        fsm_storage.make_fsm_storage("redis")
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from collections import OrderedDict
+from pathlib import Path
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+os.environ.setdefault("BOT_TOKEN", "test-bot-token")
+
+from models import TelegramMedia
+from services import media_registry
+
+BOT_ID = 777
+
+
+@pytest.fixture()
+def registry(sqlite_db, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    db = sqlite_db(media_registry, [TelegramMedia])
+    queries: list[int] = []
+
+    def _counted_session():
+        queries.append(1)
+        return db.session()
+
+    media_root = tmp_path / "media"
+    (media_root / "adminbot").mkdir(parents=True)
+    monkeypatch.setattr(media_registry, "get_session", _counted_session)
+    monkeypatch.setattr(media_registry, "MEDIA_ROOT", media_root)
+    monkeypatch.setattr(media_registry, "_cache", OrderedDict())
+    monkeypatch.setattr(media_registry, "_hashes", {})
+    return SimpleNamespace(queries=queries, media_root=media_root)
+
+
+def _sent(file_id: str) -> SimpleNamespace:
+    return SimpleNamespace(photo=[SimpleNamespace(file_id=f"{file_id}-small"), SimpleNamespace(file_id=file_id, file_unique_id=f"u-{file_id}")])
+
+
+def test_uploaded_photo_is_reused_by_file_id_per_bot(registry, monkeypatch: pytest.MonkeyPatch) -> None:
+    url = "https://cdn.example.com/banner.jpg"
+
+    async def _main() -> list:
+        first = await media_registry.resolve_photo(BOT_ID, url)
+        await media_registry.remember_photo(BOT_ID, url, _sent("AgAD-banner"), used=first)
+        queries_after_upload = len(registry.queries)
+        cached = await media_registry.resolve_photo(BOT_ID, url)
+        assert len(registry.queries) == queries_after_upload
+
+        # Другой процесс (пустой кэш) берёт file_id из БД, другой бот загружает заново.
+        monkeypatch.setattr(media_registry, "_cache", OrderedDict())
+        from_db = await media_registry.resolve_photo(BOT_ID, url)
+        other_bot = await media_registry.resolve_photo(BOT_ID + 1, url)
+        return [first, cached, from_db, other_bot]
+
+    assert asyncio.run(_main()) == [url, "AgAD-banner", "AgAD-banner", url]
+    # Готовый file_id из настроек отдаётся как есть и в реестр не попадает.
+    assert asyncio.run(media_registry.resolve_photo(BOT_ID, "AgAD-static")) == "AgAD-static"
+
+
+def test_local_file_is_keyed_by_content_and_rejected_file_id_is_forgotten(registry) -> None:
+    source = "/media/adminbot/node.jpg"
+    image = registry.media_root / "adminbot" / "node.jpg"
+    image.write_bytes(b"first image")
+
+    def _upload(value: str) -> str:
+        return f"https://miniden.example{value}"
+
+    async def _main() -> list:
+        uploaded = await media_registry.resolve_photo(BOT_ID, source, to_upload=_upload)
+        await media_registry.remember_photo(BOT_ID, source, _sent("AgAD-first"), used=uploaded)
+        reused = await media_registry.resolve_photo(BOT_ID, source, to_upload=_upload)
+
+        image.write_bytes(b"second, replaced image")
+        replaced = await media_registry.resolve_photo(BOT_ID, source, to_upload=_upload)
+        await media_registry.remember_photo(BOT_ID, source, _sent("AgAD-second"), used=replaced)
+        reused_second = await media_registry.resolve_photo(BOT_ID, source, to_upload=_upload)
+
+        # Telegram не принял file_id (ответ ушёл текстом) — запись удаляется.
+        await media_registry.remember_photo(BOT_ID, source, SimpleNamespace(photo=None), used=reused_second)
+        after_forget = await media_registry.resolve_photo(BOT_ID, source, to_upload=_upload)
+        return [uploaded, reused, replaced, reused_second, after_forget]
+
+    assert asyncio.run(_main()) == [
+        "https://miniden.example/media/adminbot/node.jpg",
+        "AgAD-first",
+        "https://miniden.example/media/adminbot/node.jpg",
+        "AgAD-second",
+        "https://miniden.example/media/adminbot/node.jpg",
+    ]
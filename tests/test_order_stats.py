@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import os
+from datetime import datetime
+from pathlib import Path
+import sys
+
+import pytest
+from sqlalchemy import select, update
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+os.environ.setdefault("BOT_TOKEN", "test-bot-token")
+
+from models import (
+    Favorite,
+    Order,
+    OrderItem,
+    OrderStatsDaily,
+    ProductSalesStats,
+    StatsCounter,
+    User,
+    UserStats,
+)
+from services import favorites as favorites_service
+from services import menu_catalog
+from services import orders as orders_service
+from services import stats as stats_service
+from services import users as users_service
+
+CATALOG = {
+    1: {"id": 1, "title": "Корзинка", "price": 100, "type": "product"},
+    2: {"id": 2, "title": "Шкатулка", "price": 250, "type": "product"},
+    7: {"id": 7, "title": "Курс плетения", "price": 0, "type": "course"},
+}
+
+
+@pytest.fixture()
+def shop_db(sqlite_db, monkeypatch: pytest.MonkeyPatch):
+    sqlite_db(
+        (stats_service, orders_service, users_service, favorites_service),
+        [User, Order, OrderItem, Favorite, UserStats, OrderStatsDaily, ProductSalesStats, StatsCounter],
+    )
+    lookups: list[set[int]] = []
+
+    def _items_by_ids(item_ids, types=None, *, include_inactive=False):
+        ids = {int(item_id) for item_id in item_ids}
+        lookups.append(ids)
+        return {item_id: CATALOG[item_id] for item_id in ids if item_id in CATALOG}
+
+    for module in (stats_service, users_service, favorites_service):
+        monkeypatch.setattr(module, "ensure_schema", lambda: None)
+    monkeypatch.setattr(menu_catalog, "get_items_by_ids", _items_by_ids)
+    return lookups
+
+
+def _order(user_id: int, items: list[dict]) -> int:
+    return orders_service.add_order(
+        user_id=user_id,
+        user_name="Анна",
+        items=items,
+        total=0,
+        customer_name="Анна",
+        contact="+70000000000",
+        comment="",
+        order_text="",
+    )
+
+
+def test_dashboard_reads_aggregates_kept_in_sync_with_orders(shop_db) -> None:
+    first = _order(10, [{"product_id": 1, "qty": 2, "type": "product"}, {"product_id": 2, "qty": 1, "type": "product"}])
+    _order(11, [{"product_id": 2, "qty": 3, "type": "product"}])
+    orders_service.grant_course_access(10, 7)
+    favorites_service.add_favorite(10, 1, "product")
+    favorites_service.add_favorite(11, 1, "product")
+    favorites_service.remove_favorite(11, 1, "product")
+
+    assert orders_service.set_order_status(first, orders_service.STATUS_PAID) is True
+    assert orders_service.revoke_course_access(10, 7) is True
+
+    stats = stats_service.get_admin_dashboard_stats()
+    assert stats["totals"] == {"users": 2, "orders": 3, "amount": 1200, "favorites": 1}
+    assert [(item["name"], item["total_qty"], item["total_amount"]) for item in stats["top_products"]] == [
+        ("Шкатулка", 4, 1000),
+        ("Корзинка", 2, 200),
+    ]
+    assert stats["top_courses"] == []
+    # Названия топа загружаются одним запросом на список.
+    assert shop_db[-2:] == [{1, 2}, set()]
+
+    summary = stats_service.get_orders_stats_summary()
+    assert summary == {
+        "total_orders": 3,
+        "total_amount": 1200,
+        "by_status": {orders_service.STATUS_NEW: 1, orders_service.STATUS_PAID: 2},
+    }
+    assert stats_service.get_orders_stats_by_day(1)[0]["orders_count"] == 3
+    with stats_service.get_session() as session:
+        # Дашборд читает итоги из счётчиков, а не суммирует order_stats_daily по дням.
+        assert stats_service.get_counters(session)["orders"] == 3
+        assert set(session.scalars(select(StatsCounter.name))) == {"users", "favorites", "orders", "orders_amount"}
+
+
+def test_rebuild_matches_incremental_aggregates(shop_db) -> None:
+    first = _order(10, [{"product_id": 1, "qty": 1, "type": "product"}])
+    _order(12, [{"product_id": 2, "qty": 2, "type": "product"}])
+    orders_service.archive_order_for_user(first, 10)
+    favorites_service.add_favorite(12, 2, "product")
+
+    incremental = (
+        stats_service.get_admin_dashboard_stats()["totals"],
+        stats_service.get_orders_stats_summary(),
+        stats_service.get_top_products(),
+    )
+    assert stats_service.rebuild_order_stats() == {"days": 2, "products": 2}
+    rebuilt = (
+        stats_service.get_admin_dashboard_stats()["totals"],
+        stats_service.get_orders_stats_summary(),
+        stats_service.get_top_products(),
+    )
+    assert rebuilt == incremental
+    assert incremental[1]["by_status"] == {orders_service.STATUS_ARCHIVED: 1, orders_service.STATUS_NEW: 1}
+
+
+def test_summary_period_bounds_compare_order_timestamps(shop_db) -> None:
+    placed = {
+        datetime(2024, 4, 30, 12, 0): 1,
+        datetime(2024, 5, 1, 9, 0): 1,
+        datetime(2024, 5, 1, 11, 0): 2,
+        datetime(2024, 5, 2, 8, 0): 1,
+    }
+    for created_at, product_id in placed.items():
+        order_id = _order(10, [{"product_id": product_id, "qty": 1, "type": "product"}])
+        with stats_service.get_session() as session:
+            session.execute(update(Order).where(Order.id == order_id).values(created_at=created_at))
+    stats_service.rebuild_order_stats()
+
+    def _summary(date_from=None, date_to=None):
+        summary = stats_service.get_orders_stats_summary(date_from, date_to)
+        return summary["total_orders"], summary["total_amount"]
+
+    # Внутри одного дня считается по orders.
+    assert _summary("2024-04-30T13:00", "2024-05-01T10:00") == (1, 100)
+    # Полный 30 апреля из агрегатов, утро 1 мая — из orders.
+    assert _summary("2024-04-30", "2024-05-01T10:00") == (2, 200)
+    # Верхняя граница без времени — полночь, заказ 2 мая в 08:00 не входит.
+    assert _summary("2024-05-01", "2024-05-02") == (2, 350)
+    assert _summary(None, "2024-05-01T23:59:59.999999") == (3, 450)
+    assert _summary("2024-05-01T10:00+03:00") == (3, 450)
+
+
+def test_order_rows_are_merged_sorted_and_sharded(shop_db, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(stats_service, "STATS_COUNTER_SHARDS", 4)
+    upserts: list[tuple[str, dict]] = []
+    original = stats_service._upsert_add
+
+    def _recording(session, model, keys, deltas, **kwargs):
+        upserts.append((model.__tablename__, dict(keys)))
+        return original(session, model, keys, deltas, **kwargs)
+
+    monkeypatch.setattr(stats_service, "_upsert_add", _recording)
+    _order(
+        10,
+        [
+            {"product_id": 2, "qty": 1, "type": "product"},
+            {"product_id": 1, "qty": 1, "type": "product"},
+            {"product_id": 2, "qty": 2, "type": "product"},
+        ],
+    )
+
+    products = [keys for table, keys in upserts if table == "product_sales_stats"]
+    assert products == [{"product_id": 1, "type": "product"}, {"product_id": 2, "type": "product"}]
+    [daily] = [keys for table, keys in upserts if table == "order_stats_daily"]
+    counters = [keys for table, keys in upserts if table == "stats_counters" and keys["name"] != "users"]
+    assert 0 <= daily["shard"] < 4
+    assert {keys["shard"] for keys in counters} == {daily["shard"]}
+    assert stats_service.get_top_products()[0]["total_qty"] == 3
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+import sys
+
+import pytest
+from sqlalchemy import select, update
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+os.environ.setdefault("BOT_TOKEN", "test-bot-token")
+
+from models import OutboxMessage
+from services import outbox as outbox_service
+
+
+@pytest.fixture()
+def outbox_db(sqlite_db, monkeypatch: pytest.MonkeyPatch):
+    db = sqlite_db(
+        outbox_service,
+        [
+            """
+            CREATE TABLE outbox_messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                idempotency_key VARCHAR(191) NOT NULL UNIQUE,
+                kind VARCHAR(64) NOT NULL,
+                payload TEXT NOT NULL DEFAULT '{}',
+                status VARCHAR(16) NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at DATETIME NOT NULL,
+                locked_until DATETIME,
+                last_error TEXT,
+                created_at DATETIME NOT NULL,
+                updated_at DATETIME NOT NULL
+            )
+            """,
+        ],
+    )
+    roles: list[str | None] = []
+
+    def _worker_session(role=None):
+        roles.append(role)
+        return db.session()
+
+    db.session.roles = roles
+    monkeypatch.setattr(outbox_service, "get_session", _worker_session)
+    monkeypatch.setattr(outbox_service, "_handlers", dict(outbox_service._handlers))
+    return db.session
+
+
+def _rows(session_factory) -> dict[str, OutboxMessage]:
+    with session_factory() as session:
+        return {row.idempotency_key: row for row in session.execute(select(OutboxMessage)).scalars()}
+
+
+def test_handler_children_are_enqueued_once_and_parent_marked_done(outbox_db) -> None:
+    delivered: list[str] = []
+
+    def _plan(payload):
+        return [
+            outbox_service.OutboxEvent("test_message", f"order:{payload['order_id']}:{chat}", {"chat": chat})
+            for chat in (1, 2)
+        ]
+
+    outbox_service.register_handler("test_order", _plan)
+    outbox_service.register_handler("test_message", lambda payload: delivered.append(payload["chat"]))
+
+    event = outbox_service.OutboxEvent("test_order", "test_order:7", {"order_id": 7})
+    with outbox_db() as session:
+        assert outbox_service.enqueue(session, event) is True
+        assert outbox_service.enqueue(session, event) is False
+
+    assert outbox_service.process_batch() == 1
+    assert outbox_service.process_batch() == 2
+    assert outbox_service.process_batch() == 0
+
+    rows = _rows(outbox_db)
+    assert sorted(delivered) == [1, 2]
+    assert {key: row.status for key, row in rows.items()} == {
+        "test_order:7": "done",
+        "order:7:1": "done",
+        "order:7:2": "done",
+    }
+
+
+def test_failed_delivery_is_rescheduled_and_permanent_error_stops_retries(outbox_db) -> None:
+    def _flaky(payload):
+        raise RuntimeError("telegram down")
+
+    def _rejected(payload):
+        raise outbox_service.OutboxPermanentError("403: bot was blocked by the user")
+
+    outbox_service.register_handler("flaky", _flaky)
+    outbox_service.register_handler("rejected", _rejected)
+    with outbox_db() as session:
+        outbox_service.enqueue(session, outbox_service.OutboxEvent("flaky", "flaky:1"))
+        outbox_service.enqueue(session, outbox_service.OutboxEvent("rejected", "rejected:1"))
+
+    started = datetime.utcnow()
+    assert outbox_service.process_batch() == 2
+    assert outbox_service.process_batch() == 0
+
+    rows = _rows(outbox_db)
+    assert rows["flaky:1"].status == "pending"
+    assert rows["flaky:1"].attempts == 1
+    assert rows["flaky:1"].next_attempt_at > started
+    assert "telegram down" in rows["flaky:1"].last_error
+    assert rows["rejected:1"].status == "failed"
+
+
+@pytest.mark.parametrize(
+    "response, status",
+    [
+        ({"ok": False, "error_code": 502, "description": "Bad Gateway"}, "pending"),
+        ({"ok": False, "error_code": 429, "description": "Too Many Requests"}, "pending"),
+        ({"ok": False, "error_code": 403, "description": "Forbidden: bot was blocked by the user"}, "failed"),
+    ],
+)
+def test_telegram_error_codes_map_to_retry_or_failure(outbox_db, monkeypatch, response, status) -> None:
+    class _Client:
+        def call_blocking(self, method, **payload):
+            return response
+
+    monkeypatch.setattr(outbox_service.telegram_bot_api, "get_client", lambda: _Client())
+    with outbox_db() as session:
+        outbox_service.enqueue(session, outbox_service.telegram_message_event("tg:1", 42, "hi"))
+
+    assert outbox_service.process_batch() == 1
+
+    row = _rows(outbox_db)["tg:1"]
+    assert (row.status, row.attempts) == (status, 1)
+    assert str(response["error_code"]) in row.last_error
+
+
+def test_worker_that_lost_its_lease_does_not_deliver_or_finish(outbox_db) -> None:
+    delivered: list[int] = []
+    outbox_service.register_handler("slow", lambda payload: delivered.append(payload["n"]))
+    with outbox_db() as session:
+        outbox_service.enqueue(session, outbox_service.OutboxEvent("slow", "slow:1", {"n": 1}))
+
+    [stale] = outbox_service.claim_batch()
+    # Аренда первого воркера истекла, и событие забрал второй.
+    with outbox_db() as session:
+        session.execute(update(OutboxMessage).values(locked_until=datetime.utcnow() - timedelta(seconds=1)))
+    [fresh] = outbox_service.claim_batch()
+
+    assert outbox_service.process_message(stale) is False
+    outbox_service._finish(stale.id, stale.locked_until, [])
+    assert delivered == []
+    assert _rows(outbox_db)["slow:1"].status == "processing"
+
+    assert outbox_service.process_message(fresh) is True
+    row = _rows(outbox_db)["slow:1"]
+    assert (row.status, row.attempts, delivered) == ("done", 2, [1])
+    # Воркер берёт соединения из пула роли jobs, а не из пула API.
+    assert set(outbox_db.roles) == {"jobs"}
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+from pathlib import Path
+import sys
+
+import pytest
+from sqlalchemy import create_engine, select
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+import initdb
+from models import SchemaMigration
+
+
+@pytest.fixture()
+def sqlite_engine(tmp_path: Path):
+    engine = create_engine(f"sqlite+pysqlite:///{tmp_path / 'migrations.sqlite3'}", future=True)
+    try:
+        yield engine
+    finally:
+        engine.dispose()
+
+
+def test_apply_migrations_runs_each_step_once(sqlite_engine) -> None:
+    calls: list[str] = []
+    steps = [
+        ("0001_first", lambda: calls.append("first")),
+        ("0002_second", lambda: calls.append("second")),
+    ]
+
+    assert initdb.apply_migrations(steps, bind=sqlite_engine) == ["0001_first", "0002_second"]
+    assert initdb.apply_migrations(steps, bind=sqlite_engine) == []
+    assert calls == ["first", "second"]
+
+    with sqlite_engine.connect() as conn:
+        versions = set(conn.execute(select(SchemaMigration.version)).scalars())
+    assert versions == {"0001_first", "0002_second"}
+
+
+def test_apply_migrations_does_not_record_failed_step(sqlite_engine) -> None:
+    def _broken() -> None:
+        raise RuntimeError("boom")
+
+    steps = [("0001_ok", lambda: None), ("0002_broken", _broken)]
+
+    with pytest.raises(RuntimeError):
+        initdb.apply_migrations(steps, bind=sqlite_engine)
+
+    assert initdb.get_applied_migrations(bind=sqlite_engine) == {"0001_ok"}
+
+
+def test_ensure_schema_runs_init_db_once(monkeypatch: pytest.MonkeyPatch) -> None:
+    calls: list[int] = []
+
+    def _fake_init_db() -> None:
+        calls.append(1)
+        monkeypatch.setattr(initdb, "_schema_ready", True)
+
+    monkeypatch.setattr(initdb, "_schema_ready", False)
+    monkeypatch.setattr(initdb, "init_db", _fake_init_db)
+
+    for _ in range(5):
+        initdb.ensure_schema()
+
+    assert calls == [1]
+    assert initdb.is_schema_ready()
@@ -112,9 +112,7 @@ def test_automation_edit_missing_rule_returns_404(monkeypatch: object) -> None:
         "scheme": "http",
     }
     request = Request(scope)
-    response = asyncio.run(
-        adminbot_automations.automations_edit_form(request, 999, DummyDb())
-    )
+    response = adminbot_automations.automations_edit_form(request, 999, DummyDb())
     assert response.status_code == 404
 
 
@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from pathlib import Path
+import sys
+import time
+from types import SimpleNamespace
+
+import pytest
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+os.environ.setdefault("BOT_TOKEN", "test-bot-token")
+
+from services import subscription
+
+
+class _FakeBot:
+    id = 1
+
+    def __init__(self, statuses: dict[str, str]) -> None:
+        self.statuses = statuses
+        self.calls: list[tuple[object, int]] = []
+
+    async def get_chat_member(self, chat_id, user_id):
+        self.calls.append((chat_id, user_id))
+        await asyncio.sleep(0.1)
+        return SimpleNamespace(status=self.statuses[chat_id])
+
+
+@pytest.fixture(autouse=True)
+def _clean_cache(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(subscription, "_membership_cache", type(subscription._membership_cache)())
+    monkeypatch.setattr(subscription, "_membership_inflight", {})
+    monkeypatch.setattr(subscription, "_membership_keys_by_user", {})
+
+
+def test_burst_of_checks_makes_one_concurrent_call_per_channel() -> None:
+    bot = _FakeBot({"@one": "member", "@two": "creator"})
+
+    async def _main():
+        started = time.monotonic()
+        results = await asyncio.gather(
+            *(subscription.check_channels_subscription(bot, 7, ["@one", "t.me/two"]) for _ in range(5))
+        )
+        return results, time.monotonic() - started
+
+    results, elapsed = asyncio.run(_main())
+    cached = asyncio.run(subscription.check_channels_subscription(bot, 7, ["@one", "@two"]))
+
+    assert results == [(True, None)] * 5
+    assert cached == (True, None)
+    assert sorted(bot.calls) == [("@one", 7), ("@two", 7)]
+    assert elapsed < 0.19
+
+
+def test_negative_result_expires_quickly_and_errors_are_not_cached(monkeypatch) -> None:
+    monkeypatch.setattr(subscription, "SUBSCRIPTION_NEGATIVE_TTL", 0.05)
+    bot = _FakeBot({"@one": "left"})
+
+    assert asyncio.run(subscription.check_channels_subscription(bot, 7, ["@one"])) == (False, None)
+    assert asyncio.run(subscription.check_channels_subscription(bot, 7, ["@one"])) == (False, None)
+    assert len(bot.calls) == 1
+
+    time.sleep(0.06)
+    bot.statuses = {}
+    ok, error = asyncio.run(subscription.check_channels_subscription(bot, 7, ["@one"]))
+    assert ok is False and error
+    bot.statuses = {"@one": "member"}
+    assert asyncio.run(subscription.check_channels_subscription(bot, 7, ["@one"])) == (True, None)
+    assert len(bot.calls) == 3
+
+
+def test_forget_membership_drops_only_that_users_results() -> None:
+    bot = _FakeBot({"@one": "left"})
+
+    assert asyncio.run(subscription.check_channels_subscription(bot, 7, ["@one"])) == (False, None)
+    assert asyncio.run(subscription.check_channels_subscription(bot, 8, ["@one"])) == (False, None)
+    # «Я подписался» после отказа: пользователь 7 успел подписаться.
+    bot.statuses["@one"] = "member"
+    subscription.forget_membership(7)
+
+    assert asyncio.run(subscription.check_channels_subscription(bot, 7, ["@one"])) == (True, None)
+    assert asyncio.run(subscription.check_channels_subscription(bot, 8, ["@one"])) == (False, None)
+    assert bot.calls == [("@one", 7), ("@one", 8), ("@one", 7)]
+
+
+def test_sequential_taps_within_negative_ttl_do_not_reach_telegram() -> None:
+    bot = _FakeBot({"@one": "left"})
+
+    # В webhook-режиме апдейты одного чата идут по очереди, и single-flight их не объединяет.
+    for _ in range(3):
+        assert asyncio.run(subscription.check_channels_subscription(bot, 7, ["@one"])) == (False, None)
+
+    assert bot.calls == [("@one", 7)]
+
+
+def test_evicted_entries_leave_the_user_index(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(subscription, "SUBSCRIPTION_CACHE_SIZE", 2)
+    bot = _FakeBot({"@one": "member"})
+
+    for user_id in (7, 8, 9):
+        asyncio.run(subscription.check_channels_subscription(bot, user_id, ["@one"]))
+
+    assert set(subscription._membership_keys_by_user) == {8, 9}
+    subscription.forget_membership(8)
+    assert list(subscription._membership_cache) == [(1, "@one", 9)]
+    assert set(subscription._membership_keys_by_user) == {9}
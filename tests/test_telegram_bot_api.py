@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from pathlib import Path
+import sys
+import threading
+import time
+
+import pytest
+from aiohttp import web
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+os.environ.setdefault("BOT_TOKEN", "test-bot-token")
+
+from services import telegram_bot_api
+
+
+@pytest.fixture()
+def fake_bot_api():
+    calls: list[tuple[int, float]] = []
+    throttled: set[int] = set()
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    state: dict[str, object] = {}
+
+    async def _send_message(request: web.Request) -> web.Response:
+        payload = await request.json()
+        chat_id = int(payload["chat_id"])
+        calls.append((chat_id, time.monotonic()))
+        if chat_id == 429 and chat_id not in throttled:
+            throttled.add(chat_id)
+            return web.json_response(
+                {"ok": False, "error_code": 429, "parameters": {"retry_after": 1}}
+            )
+        await asyncio.sleep(0.3)
+        return web.json_response({"ok": True, "result": {"message_id": chat_id * 10}})
+
+    async def _start() -> None:
+        app = web.Application()
+        app.router.add_post("/bottoken/sendMessage", _send_message)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        state["runner"] = runner
+        state["port"] = runner.addresses[0][1]
+
+    def _run() -> None:
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(_start())
+        started.set()
+        loop.run_forever()
+
+    thread = threading.Thread(target=_run, daemon=True)
+    thread.start()
+    started.wait()
+
+    client = telegram_bot_api.TelegramBotApi(
+        "token", base_url=f"http://127.0.0.1:{state['port']}", timeout=5, deadline=5
+    )
+    try:
+        yield client, calls
+    finally:
+        client.close()
+        asyncio.run_coroutine_threadsafe(state["runner"].cleanup(), loop).result()  # type: ignore[union-attr]
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+
+
+def test_broadcast_fans_out_concurrently(fake_bot_api) -> None:
+    client, calls = fake_bot_api
+
+    started = time.monotonic()
+    results = client.broadcast_blocking([1, 2, 3, 4], text="Новый заказ")
+    elapsed = time.monotonic() - started
+
+    assert telegram_bot_api.message_ids(results) == [10, 20, 30, 40]
+    assert len(calls) == 4
+    assert elapsed < 0.9
+
+
+def test_retry_after_is_honoured_for_throttled_chat(fake_bot_api) -> None:
+    client, calls = fake_bot_api
+
+    async def _main():
+        return await client.call("sendMessage", chat_id=429, text="hi")
+
+    result = asyncio.run(_main())
+
+    assert result and result["ok"]
+    attempts = [moment for chat_id, moment in calls if chat_id == 429]
+    assert len(attempts) == 2
+    assert attempts[1] - attempts[0] >= 0.95
+
+
+def test_idle_chat_state_is_dropped(fake_bot_api, monkeypatch) -> None:
+    client, _calls = fake_bot_api
+
+    client.broadcast_blocking([1, 2, 3], text="Новый заказ")
+
+    assert client._chat_locks == {}
+    assert client._chat_pending == {}
+    assert set(client._chat_ready_at) == {1, 2, 3}
+
+    time.sleep(client.per_chat_interval * 2)
+    monkeypatch.setattr(telegram_bot_api, "CHAT_SWEEP_INTERVAL", 0.0)
+    client.call_blocking("sendMessage", chat_id=4, text="hi")
+
+    assert set(client._chat_ready_at) == {4}
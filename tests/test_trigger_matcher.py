@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+import random
+import sys
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+os.environ.setdefault("BOT_TOKEN", "test-bot-token")
+
+from services.bot_config import BotTriggerView
+from services.trigger_matcher import compile_triggers
+
+TYPE_ORDER = {"COMMAND": 0, "TEXT": 1, "FALLBACK": 2}
+
+
+def _trigger(trigger_id: int, trigger_type: str, value: str | None, mode: str = "EXACT", priority: int = 100):
+    return BotTriggerView(
+        id=trigger_id,
+        trigger_type=trigger_type,
+        trigger_value=value,
+        match_mode=mode,
+        target_node_code=f"NODE_{trigger_id}",
+        priority=priority,
+        is_enabled=True,
+    )
+
+
+def _sorted(triggers):
+    return sorted(triggers, key=lambda t: (TYPE_ORDER.get(t.trigger_type.upper(), 99), t.priority, t.id))
+
+
+def _linear_match(triggers, normalized_text: str, command: str):
+    # Прежний перебор из handlers/start._process_triggers — эталон порядка срабатывания.
+    for trigger in triggers:
+        trigger_type = trigger.trigger_type.upper()
+        value = (trigger.trigger_value or "").strip().lower()
+        mode = (trigger.match_mode or "EXACT").upper()
+        if trigger_type == "FALLBACK":
+            return trigger
+        subject = command if trigger_type == "COMMAND" else normalized_text
+        if trigger_type not in {"COMMAND", "TEXT"} or not subject or not value:
+            continue
+        if mode == "CONTAINS" and value in subject:
+            return trigger
+        if mode == "STARTS_WITH" and subject.startswith(value):
+            return trigger
+        if mode not in {"CONTAINS", "STARTS_WITH"} and subject == value:
+            return trigger
+    return None
+
+
+def test_priority_and_fallback_order_is_preserved() -> None:
+    triggers = _sorted(
+        [
+            _trigger(1, "TEXT", "цена", "CONTAINS", priority=50),
+            _trigger(2, "TEXT", "какая цена", "EXACT", priority=100),
+            _trigger(3, "TEXT", "какая", "STARTS_WITH", priority=10),
+            _trigger(4, "COMMAND", "help"),
+            _trigger(5, "FALLBACK", None, priority=200),
+            _trigger(6, "FALLBACK", None, priority=100),
+            _trigger(7, "TEXT", "", "CONTAINS", priority=1),
+        ]
+    )
+    matcher = compile_triggers(triggers)
+
+    assert matcher.match("какая цена", "").id == 3
+    assert matcher.match("а цена?", "").id == 1
+    assert matcher.match("/help", "help").id == 4
+    assert matcher.match("привет", "").id == 6
+    assert compile_triggers([t for t in triggers if t.trigger_type != "FALLBACK"]).match("привет", "") is None
+
+
+def test_compiled_matcher_agrees_with_linear_scan() -> None:
+    rng = random.Random(12)
+    alphabet = "абвгд"
+
+    def _word(max_len: int) -> str:
+        return "".join(rng.choice(alphabet) for _ in range(rng.randint(1, max_len)))
+
+    triggers = _sorted(
+        _trigger(
+            index,
+            rng.choice(["TEXT", "TEXT", "COMMAND", "UNKNOWN"]),
+            _word(4),
+            rng.choice(["EXACT", "CONTAINS", "STARTS_WITH"]),
+            priority=rng.randint(1, 20),
+        )
+        for index in range(1, 300)
+    )
+    matcher = compile_triggers(triggers)
+
+    for _ in range(2000):
+        text = _word(12)
+        command = rng.choice(["", text[:3]])
+        assert matcher.match(text, command) == _linear_match(triggers, text, command)
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from pathlib import Path
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+os.environ.setdefault("BOT_TOKEN", "test-bot-token")
+
+from middlewares.user_registration import EnsureUserMiddleware
+from services import users as users_service
+
+
+@pytest.fixture()
+def upserts(monkeypatch: pytest.MonkeyPatch) -> list[dict]:
+    calls: list[dict] = []
+    monkeypatch.setattr(users_service, "get_or_create_user_from_telegram", calls.append)
+    monkeypatch.setattr(users_service, "_profile_cache", type(users_service._profile_cache)())
+    return calls
+
+
+def _event(username: str) -> SimpleNamespace:
+    return SimpleNamespace(
+        from_user=SimpleNamespace(id=42, username=username, first_name="Анна", last_name=None)
+    )
+
+
+def test_unchanged_profile_skips_db_and_change_is_written_in_background(upserts) -> None:
+    middleware = EnsureUserMiddleware()
+    seen_by_handler: list[int] = []
+
+    async def _handler(event, data):
+        seen_by_handler.append(len(upserts))
+
+    async def _main() -> None:
+        await middleware(_handler, _event("anna"), {})
+        await middleware(_handler, _event("anna"), {})
+        await middleware(_handler, _event("anna_new"), {})
+        await asyncio.gather(*middleware._background)
+
+    asyncio.run(_main())
+
+    # Первый раз обработчик ждёт записи, повтор без изменений в БД не ходит,
+    # смена username пишется уже после вызова обработчика.
+    assert seen_by_handler == [1, 1, 1]
+    assert [call["username"] for call in upserts] == ["anna", "anna_new"]
+    assert users_service.get_cached_telegram_profile(42) == (42, "anna_new", "Анна", None)
+
+
+def test_profile_cache_is_bounded(upserts, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(users_service, "USER_PROFILE_CACHE_SIZE", 2)
+
+    for telegram_id in (1, 2, 3):
+        users_service.ensure_user_from_telegram({"id": telegram_id})
+
+    assert users_service.get_cached_telegram_profile(1) is None
+    assert users_service.ensure_user_from_telegram({"id": 3}) is False
+    assert len(upserts) == 3
+
+
+def test_merge_forgets_cached_profiles_and_start_bypasses_cache(upserts, monkeypatch: pytest.MonkeyPatch) -> None:
+    for telegram_id in (7, 8):
+        users_service.ensure_user_from_telegram({"id": telegram_id})
+    source = SimpleNamespace(id=1, telegram_id=7, username=None, first_name=None, last_name=None, phone=None, is_admin=False)
+    target = SimpleNamespace(id=2, telegram_id=8, username=None, first_name=None, last_name=None, phone=None, is_admin=False)
+    session = SimpleNamespace(delete=lambda row: None, flush=lambda: None, refresh=lambda row: None)
+    monkeypatch.setattr(users_service.stats_service, "bump_counter", lambda *args: None)
+
+    users_service._merge_users(session, target=target, source=source)
+
+    assert users_service.get_cached_telegram_profile(7) is None
+    assert users_service.get_cached_telegram_profile(8) is None
+    assert users_service.ensure_user_from_telegram({"id": 9}) is True
+    assert users_service.ensure_user_from_telegram({"id": 9}, force=True) is True
+    assert len(upserts) == 4
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import os
+from datetime import datetime
+from pathlib import Path
+import sys
+
+import pytest
+from sqlalchemy import delete, update
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+os.environ.setdefault("BOT_TOKEN", "test-bot-token")
+
+from models import Order, OrderItem, OrderStatsDaily, ProductSalesStats, StatsCounter, User, UserStats
+from services import menu_catalog
+from services import orders as orders_service
+from services import stats as stats_service
+from services import user_stats as user_stats_service
+from services import users as users_service
+
+CATALOG = {
+    1: {"id": 1, "title": "Корзинка", "price": 100, "type": "product"},
+    2: {"id": 2, "title": "Шкатулка", "price": 250, "type": "product"},
+    7: {"id": 7, "title": "Курс плетения", "price": 0, "type": "course"},
+}
+
+
+@pytest.fixture()
+def shop_db(sqlite_db, monkeypatch: pytest.MonkeyPatch):
+    db = sqlite_db(
+        (stats_service, orders_service, users_service, user_stats_service),
+        [User, Order, OrderItem, UserStats, OrderStatsDaily, ProductSalesStats, StatsCounter],
+    )
+    for module in (stats_service, users_service, user_stats_service):
+        monkeypatch.setattr(module, "ensure_schema", lambda: None)
+    monkeypatch.setattr(
+        menu_catalog,
+        "get_items_by_ids",
+        lambda item_ids, types=None, *, include_inactive=False: {int(i): CATALOG[int(i)] for i in item_ids if int(i) in CATALOG},
+    )
+    return db.session, db.statements
+
+
+def _order(user_id: int, *lines: tuple[int, int]) -> int:
+    items = [{"product_id": item_id, "qty": qty} for item_id, qty in lines]
+    return orders_service.add_order(
+        user_id=user_id,
+        user_name="Анна",
+        items=items,
+        total=0,
+        customer_name="Анна",
+        contact="@anna",
+        comment="",
+        order_text="",
+    )
+
+
+def test_order_changes_update_user_stats_by_deltas(shop_db) -> None:
+    first = _order(601, (1, 2))
+    second = _order(601, (2, 1))
+    third = _order(601, (1, 1), (2, 2))
+    orders_service.grant_course_access(601, 7)
+
+    assert orders_service.set_order_status(first, orders_service.STATUS_PAID)
+    assert orders_service.set_order_status(second, orders_service.STATUS_SENT)
+    assert orders_service.set_order_status(second, orders_service.STATUS_SENT)
+    assert orders_service.archive_order_for_user(third, 601)
+    assert orders_service.archive_order_for_user(third, 601)
+
+    stats = stats_service.get_user_stats(601)
+    assert (stats["orders_count"], stats["total_spent"]) == (4, 200 + 250 + 600)
+    assert stats["orders_by_status"] == {"new": 0, "in_progress": 0, "paid": 2, "sent": 1, "archived": 1}
+    assert stats["last_order_id"] > third
+
+    # Дельты совпадают с пересчётом по orders: сверке нечего исправлять.
+    assert stats_service.reconcile_user_stats() == 0
+
+
+def test_reconcile_repairs_drift_and_crm_reads_only_user_stats(shop_db) -> None:
+    session_factory, statements = shop_db
+    anna = _order(602, (1, 1))
+    _order(603, (2, 2))
+    with session_factory() as session:
+        session.execute(
+            update(UserStats)
+            .where(UserStats.user_id == 602)
+            .values(orders_count=5, total_spent=1, paid_count=3, last_order_id=None)
+        )
+        session.execute(update(Order).where(Order.user_id == 603).values(user_id=None))
+        session.add(UserStats(user_id=604, orders_count=0, total_spent=0, last_order_at=None))
+        session.add(Order(user_id=605, total_amount=70, status=orders_service.STATUS_IN_PROGRESS))
+
+    assert stats_service.reconcile_user_stats(batch_size=2) == 3
+    assert stats_service.reconcile_user_stats(batch_size=2) == 0
+
+    statements.clear()
+    crm = user_stats_service.get_user_order_stats(602)
+    assert len(statements) == 1 and "FROM user_stats" in statements[0]
+    assert (crm["total_orders"], crm["total_amount"], crm["last_order_id"]) == (1, 100, anna)
+    assert crm["orders_by_status"]["new"] == 1 and crm["orders_by_status"]["paid"] == 0
+    assert user_stats_service.get_user_order_stats(603)["total_orders"] == 0
+    assert user_stats_service.get_user_order_stats(605)["orders_by_status"]["in_progress"] == 1
+    assert user_stats_service.get_user_order_stats(999)["orders_count"] == 0
+
+
+def test_late_commit_keeps_latest_order_and_reconcile_tolerates_concurrent_insert(
+    shop_db, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    session_factory, _ = shop_db
+    newer, older = datetime(2024, 5, 2, 10, 0), datetime(2024, 5, 1, 10, 0)
+    with session_factory() as session:
+        stats_service.record_user_order(session, 610, 100, newer, status="new", order_id=20)
+        # Заказ, созданный раньше, закоммичен позже.
+        stats_service.record_user_order(session, 610, 50, older, status="new", order_id=19)
+    stats = stats_service.get_user_stats(610)
+    assert (stats["orders_count"], stats["last_order_id"]) == (2, 20)
+    assert stats["last_order_at"] == newer.isoformat()
+
+    _order(611, (1, 1))
+    with session_factory() as session:
+        session.execute(delete(UserStats).where(UserStats.user_id == 611))
+
+    expected_user_stats = stats_service._expected_user_stats
+
+    def _with_concurrent_order(session, user_ids):
+        expected = expected_user_stats(session, user_ids)
+        # Строку, которой не было при блокировке, успел вставить record_user_order.
+        stats_service.record_user_order(session, 611, 250, status="new", order_id=99)
+        return expected
+
+    monkeypatch.setattr(stats_service, "_expected_user_stats", _with_concurrent_order)
+    assert stats_service.reconcile_user_stats([611]) == 0
+    assert stats_service.get_user_stats(611)["total_spent"] == 250
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from pathlib import Path
+import sys
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+os.environ.setdefault("BOT_TOKEN", "test-bot-token")
+
+import routes_public
+from services import webchat_events, webchat_service
+
+
+@pytest.fixture()
+def webchat_db(sqlite_db, monkeypatch: pytest.MonkeyPatch):
+    db = sqlite_db(
+        webchat_service,
+        [
+            """
+            CREATE TABLE webchat_sessions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id VARCHAR(64) NOT NULL UNIQUE,
+                session_key VARCHAR(64) UNIQUE,
+                user_identifier TEXT,
+                user_agent TEXT,
+                client_ip VARCHAR(64),
+                status VARCHAR(16) DEFAULT 'open',
+                created_at DATETIME NOT NULL,
+                updated_at DATETIME NOT NULL,
+                last_message_at DATETIME,
+                unread_for_manager INTEGER NOT NULL DEFAULT 0,
+                telegram_thread_message_id BIGINT
+            )
+            """,
+            """
+            CREATE TABLE webchat_messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id INTEGER NOT NULL,
+                sender VARCHAR(16) NOT NULL,
+                text TEXT NOT NULL,
+                created_at DATETIME NOT NULL,
+                is_read_by_manager BOOLEAN NOT NULL DEFAULT 0,
+                is_read_by_client BOOLEAN NOT NULL DEFAULT 0
+            )
+            """,
+        ],
+    )
+    monkeypatch.setattr(webchat_events, "_listener_started", True)
+    return db.engine
+
+
+def test_publish_from_worker_thread_wakes_subscriber() -> None:
+    async def _main() -> int | None:
+        async with webchat_events.subscribe(42) as queue:
+            assert webchat_events.subscriber_count(42) == 1
+            threading.Thread(target=webchat_events.publish, args=(42, 7)).start()
+            return await webchat_events.wait_for_message(queue, timeout=2)
+
+    assert asyncio.run(_main()) == 7
+    assert webchat_events.subscriber_count(42) == 0
+
+
+def test_long_poll_returns_manager_reply_without_client_polling(webchat_db) -> None:
+    chat_session = webchat_service.get_or_create_session("wcs_test")
+    first = webchat_service.add_user_message(chat_session, "Здравствуйте")
+
+    async def _main() -> dict:
+        poll = asyncio.create_task(
+            routes_public.api_webchat_poll("wcs_test", after_id=first.id, timeout=5)
+        )
+        while webchat_events.subscriber_count(chat_session.id) == 0:
+            await asyncio.sleep(0.01)
+        await asyncio.to_thread(webchat_service.add_manager_message, chat_session, "Добрый день")
+        return await asyncio.wait_for(poll, timeout=5)
+
+    response = asyncio.run(_main())
+
+    assert [message["text"] for message in response["messages"]] == ["Добрый день"]
+    assert response["status"] == "waiting_manager"
+
+
+def test_long_poll_for_unknown_session_is_404(webchat_db) -> None:
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(routes_public.api_webchat_poll("wcs_missing", timeout=5))
+
+    assert excinfo.value.status_code == 404
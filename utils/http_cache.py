@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any
+
+from fastapi import Request, Response
+
+# Публичные данные каталога: браузер и nginx могут отдавать копию max-age секунд,
+# дальше — ревалидация по ETag (304 без тела).
+PUBLIC_API_MAX_AGE = int(os.getenv("PUBLIC_API_MAX_AGE", "30"))
+PUBLIC_CACHE_CONTROL = (
+    f"public, max-age={PUBLIC_API_MAX_AGE}, stale-while-revalidate={PUBLIC_API_MAX_AGE * 2}"
+)
+# Ответы под авторизацией: хранить можно только в браузере и только с ревалидацией.
+PRIVATE_CACHE_CONTROL = "private, no-cache"
+
+
+def dump_json(payload: Any) -> bytes:
+    # Тот же формат, что у JSONResponse в FastAPI.
+    return json.dumps(
+        payload, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def format_http_date(value: datetime) -> str:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def _parse_http_date(value: str) -> datetime | None:
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if parsed is None:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def _strip_weak(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def is_not_modified(
+    request: Request, etag: str, last_modified: datetime | None = None
+) -> bool:
+    """
+    Проверка условного GET по RFC 9110: If-None-Match важнее If-Modified-Since.
+
+    If-None-Match сравнивается слабо (W/"x" совпадает с "x"), как требует стандарт для GET.
+    """
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        expected = _strip_weak(etag)
+        return any(_strip_weak(tag) == expected for tag in if_none_match.split(","))
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        since = _parse_http_date(if_modified_since)
+        if since is None:
+            return False
+        if last_modified.tzinfo is None:
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def conditional_json_response(
+    request: Request,
+    body: bytes,
+    *,
+    etag: str | None = None,
+    last_modified: datetime | None = None,
+    cache_control: str = PUBLIC_CACHE_CONTROL,
+) -> Response:
+    """JSON-ответ с ETag/Last-Modified/Cache-Control или пустой 304, если копия клиента актуальна."""
+
+    etag = etag or make_etag(body)
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_http_date(last_modified)
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -16,14 +16,20 @@ from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from starlette.routing import NoMatchFound
 
+import bot_webhook
 from admin_panel import STATIC_DIR
 from admin_panel.adminsite import ADMINSITE_STATIC_ROOT
+from admin_panel.executor import shutdown_admin_executor
 from initdb import init_db
 from media_paths import MEDIA_ROOT, ensure_media_dirs
 from routes_adminbot import router as adminbot_router
 from routes_adminsite import router as adminsite_router
 from routes_auth import router as auth_router
 from routes_public import BUILD_COMMIT, STATIC_DIR_PUBLIC, WEBAPP_DIR, router as public_router
+from services import bot_funnel, bot_logs_maintenance
+from services import outbox as outbox_service
+from services import telegram_bot_api
+from services import user_stats as user_stats_service
 from utils.logging_config import API_LOG_FILE, setup_logging
 
 ADMINSITE_STATIC_PATH = ADMINSITE_STATIC_ROOT.resolve()
@@ -213,6 +219,47 @@ def startup_event() -> None:
     )
 
 
+@app.on_event("startup")
+async def start_outbox_worker() -> None:
+    # Доставка уведомлений из outbox_messages; OUTBOX_WORKERS=0 отключает воркер в этом процессе.
+    outbox_service.start_worker()
+
+
+@app.on_event("startup")
+async def start_bot_log_jobs() -> None:
+    # Партиции, сводка и срок хранения bot_logs; BOT_LOGS_MAINTENANCE_INTERVAL=0 отключает.
+    bot_logs_maintenance.start_worker()
+    # Инкрементальная воронка по узлам; BOT_FUNNEL_INTERVAL=0 отключает.
+    bot_funnel.start_worker()
+    # Сверка user_stats с orders; USER_STATS_RECONCILE_INTERVAL=0 отключает.
+    user_stats_service.start_worker()
+
+
+# BOT_WEBHOOK_IN_API=1: апдейты Telegram принимаются этим же приложением
+# (процесс bot.py тогда не запускается).
+bot_webhook_service = bot_webhook.BotWebhookService() if bot_webhook.BOT_WEBHOOK_IN_API else None
+if bot_webhook_service is not None:
+    app.include_router(bot_webhook_service.router)
+
+
+@app.on_event("startup")
+async def start_bot_webhook() -> None:
+    if bot_webhook_service is not None:
+        await bot_webhook_service.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event() -> None:
+    if bot_webhook_service is not None:
+        await bot_webhook_service.stop()
+    await outbox_service.stop_worker()
+    await bot_logs_maintenance.stop_worker()
+    await bot_funnel.stop_worker()
+    await user_stats_service.stop_worker()
+    telegram_bot_api.shutdown()
+    shutdown_admin_executor()
+
+
 # Keep admin/site routers below static mounts so catch-all paths never override /static.
 app.include_router(auth_router)
 app.include_router(adminbot_router)
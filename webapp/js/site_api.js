@@ -9,9 +9,8 @@ export async function request(path, params = null) {
     });
   }
 
-  url.searchParams.set('_', Date.now().toString());
-
-  const response = await fetch(url.toString(), { cache: 'no-store' });
+  // Сервер отдаёт ETag: браузер ревалидирует копию и получает 304 без тела.
+  const response = await fetch(url.toString(), { cache: 'no-cache' });
   const text = await response.text();
   const isJson = text.trim().startsWith('{') || text.trim().startsWith('[');
   const payload = isJson ? JSON.parse(text || '{}') : text;
@@ -37,9 +36,8 @@ export async function requestWithStatus(path, params = null) {
     });
   }
 
-  url.searchParams.set('_', Date.now().toString());
-
-  const response = await fetch(url.toString(), { cache: 'no-store' });
+  // Сервер отдаёт ETag: браузер ревалидирует копию и получает 304 без тела.
+  const response = await fetch(url.toString(), { cache: 'no-cache' });
   const status = response.status;
   const statusText = response.statusText || '';
   const text = await response.text();
@@ -1,12 +1,15 @@
 (function () {
   const WEBCHAT_API_BASE = '/api/webchat';
   const WEBCHAT_STORAGE_KEY = 'support_widget_session_key';
-  const WEBCHAT_POLL_INTERVAL = 4000; // мс
+  const WEBCHAT_LONG_POLL_TIMEOUT = 25; // сек, ожидание на сервере
+  const WEBCHAT_RETRY_DELAY = 3000; // мс
 
   let sessionKey = null;
   let isSessionInitialized = false;
-  let pollTimer = null;
-  let isPolling = false;
+  let isStreaming = false;
+  let eventSource = null;
+  let longPollController = null;
+  let lastMessageId = 0;
   const renderedMessageKeys = new Set();
 
   console.log('Support widget script loaded');
@@ -136,7 +139,7 @@
         if (!resp.ok) {
           console.error('Failed to send webchat message', resp.status);
           appendMessageToUI('system', 'Не удалось отправить сообщение. Попробуйте ещё раз.');
-        } else {
+        } else if (!isStreaming) {
           await fetchMessagesFromServer();
         }
       } catch (err) {
@@ -150,7 +153,12 @@
         initSessionKey();
       }
       try {
-        const url = WEBCHAT_API_BASE + '/messages?session_key=' + encodeURIComponent(sessionKey);
+        const url =
+          WEBCHAT_API_BASE +
+          '/messages?session_key=' +
+          encodeURIComponent(sessionKey) +
+          '&after_id=' +
+          lastMessageId;
         const resp = await fetch(url, { method: 'GET' });
         if (!resp.ok) {
           console.error('Failed to fetch webchat messages', resp.status);
@@ -170,6 +178,9 @@
       if (!bodyEl || !Array.isArray(messages)) return;
       messages.forEach(function (m) {
         const sender = m && m.sender ? m.sender : 'system';
+        if (m && typeof m.id === 'number' && m.id > lastMessageId) {
+          lastMessageId = m.id;
+        }
         const key =
           m && m.id !== undefined && m.id !== null
             ? `id-${m.id}`
@@ -179,19 +190,93 @@
       });
     }
 
-    function startPollingMessages() {
-      if (isPolling) return;
-      isPolling = true;
-      fetchMessagesFromServer();
-      pollTimer = window.setInterval(fetchMessagesFromServer, WEBCHAT_POLL_INTERVAL);
+    function openEventStream() {
+      const url =
+        WEBCHAT_API_BASE +
+        '/stream?session_key=' +
+        encodeURIComponent(sessionKey) +
+        '&after_id=' +
+        lastMessageId;
+      let opened = false;
+      eventSource = new EventSource(url);
+      eventSource.onopen = function () {
+        opened = true;
+      };
+      eventSource.onmessage = function (event) {
+        try {
+          renderMessages([JSON.parse(event.data)]);
+        } catch (err) {
+          console.error('Bad webchat event', err);
+        }
+      };
+      eventSource.onerror = function () {
+        // После успешного открытия EventSource переподключается сам (с Last-Event-ID).
+        // Если поток не открылся ни разу (прокси режет SSE) — уходим на long-polling.
+        if (opened || !eventSource) return;
+        eventSource.close();
+        eventSource = null;
+        runLongPoll();
+      };
+    }
+
+    async function runLongPoll() {
+      while (isStreaming && !eventSource) {
+        longPollController = window.AbortController ? new AbortController() : null;
+        try {
+          const url =
+            WEBCHAT_API_BASE +
+            '/poll?session_key=' +
+            encodeURIComponent(sessionKey) +
+            '&after_id=' +
+            lastMessageId +
+            '&timeout=' +
+            WEBCHAT_LONG_POLL_TIMEOUT;
+          const resp = await fetch(url, {
+            method: 'GET',
+            signal: longPollController ? longPollController.signal : undefined
+          });
+          if (!resp.ok) {
+            throw new Error('status ' + resp.status);
+          }
+          const data = await resp.json().catch(() => null);
+          if (data && Array.isArray(data.messages)) {
+            renderMessages(data.messages);
+          }
+        } catch (err) {
+          if (!isStreaming) break;
+          console.error('Error long-polling webchat messages', err);
+          await new Promise((resolve) => window.setTimeout(resolve, WEBCHAT_RETRY_DELAY));
+        }
+      }
+      longPollController = null;
+    }
+
+    async function startMessageStream() {
+      if (isStreaming) return;
+      isStreaming = true;
+      await ensureWebchatSessionStarted();
+      await fetchMessagesFromServer();
+      if (!isStreaming || !isSessionInitialized) {
+        isStreaming = false;
+        return;
+      }
+      if (window.EventSource) {
+        openEventStream();
+      } else {
+        runLongPoll();
+      }
     }
 
-    function stopPollingMessages() {
-      if (!isPolling) return;
-      isPolling = false;
-      if (pollTimer) {
-        window.clearInterval(pollTimer);
-        pollTimer = null;
+    function stopMessageStream() {
+      if (!isStreaming) return;
+      isStreaming = false;
+      if (eventSource) {
+        eventSource.close();
+        eventSource = null;
+      }
+      if (longPollController) {
+        longPollController.abort();
+        longPollController = null;
       }
     }
 
@@ -199,15 +284,16 @@
       const isOpen = panel.classList.toggle('support-widget-panel--open');
       if (isOpen) {
         console.log('Support widget: panel opened');
-        ensureWebchatSessionStarted();
-        startPollingMessages();
+        startMessageStream();
+      } else {
+        stopMessageStream();
       }
     };
 
     fab.addEventListener('click', togglePanel);
     closeBtn?.addEventListener('click', () => {
       panel.classList.remove('support-widget-panel--open');
-      stopPollingMessages();
+      stopMessageStream();
     });
     if (sendBtnEl) {
       sendBtnEl.addEventListener('click', function () {